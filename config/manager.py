@@ -65,7 +65,10 @@ class ConfigurationManager:
                 "brightness_factor": 1.1,
                 "sharpen_factor": 1.0,
                 "noise_reduction_radius": 1,
-                "binarization_threshold": 128
+                "binarization_threshold": 128,
+                "engine": "fused",
+                "adaptive": True,
+                "max_skew_angle": 5.0
             },
             
             "formatting": {
@@ -76,6 +79,10 @@ class ConfigurationManager:
                 "table_detection_threshold": 0.7,
                 "column_detection_threshold": 0.6,
                 "heading_detection_threshold": 0.8,
+                "line_tolerance": 0.5,
+                "paragraph_gap": 0.8,
+                "column_gap": 1.5,
+                "table_min_rows": 2,
                 "max_line_length": 80,
                 "paragraph_spacing": 2,
                 "table_alignment": "left"
@@ -84,13 +91,23 @@ class ConfigurationManager:
             "batch": {
                 "size": 10,
                 "timeout": 30,
-                "retry_count": 3
+                "retry_count": 3,
+                "execution_mode": "process",
+                "max_workers": None
+            },
+            
+            "cache": {
+                "enabled": True,
+                "path": "./output/.ocr_cache.sqlite",
+                "incremental": False
             },
             
             "output": {
                 "directory": "./output",
                 "filename_pattern": "{original_name}_OCR.md",
-                "include_backup": True
+                "include_backup": True,
+                "streaming": False,
+                "manifest_path": None
             },
             
             "logging": {
@@ -229,6 +246,9 @@ class ConfigurationManager:
             if 'max_size' in preprocess_config and not isinstance(preprocess_config['max_size'], int):
                 raise ValidationError("'max_size' must be an integer", 'max_size')
             
+            if 'engine' in preprocess_config and preprocess_config['engine'] not in ('fused', 'pil'):
+                raise ValidationError("'engine' must be 'fused' or 'pil'", 'engine')
+            
             # Validate formatting section
             format_config = config['formatting']
             if 'confidence_threshold' in format_config:
@@ -236,6 +256,14 @@ class ConfigurationManager:
                 if not isinstance(threshold, (int, float)) or not (0 <= threshold <= 100):
                     raise ValidationError("'confidence_threshold' must be between 0 and 100", 'confidence_threshold')
             
+            for key in ('line_tolerance', 'paragraph_gap', 'column_gap'):
+                if key in format_config and (not isinstance(format_config[key], (int, float)) or format_config[key] <= 0):
+                    raise ValidationError(f"'{key}' must be a positive number", key)
+            
+            if 'table_min_rows' in format_config and (not isinstance(format_config['table_min_rows'], int)
+                                                      or format_config['table_min_rows'] < 1):
+                raise ValidationError("'table_min_rows' must be a positive integer", 'table_min_rows')
+            
             # Validate batch section
             batch_config = config['batch']
             if 'size' in batch_config and not isinstance(batch_config['size'], int):
@@ -244,6 +272,18 @@ class ConfigurationManager:
             if 'timeout' in batch_config and not isinstance(batch_config['timeout'], int):
                 raise ValidationError("'timeout' must be an integer", 'timeout')
             
+            if 'execution_mode' in batch_config and batch_config['execution_mode'] not in ('process', 'thread'):
+                raise ValidationError("'execution_mode' must be 'process' or 'thread'", 'execution_mode')
+            
+            max_workers = batch_config.get('max_workers')
+            if max_workers is not None and (not isinstance(max_workers, int) or max_workers <= 0):
+                raise ValidationError("'max_workers' must be a positive integer or null", 'max_workers')
+            
+            # Validate cache section
+            cache_config = config.get('cache', {})
+            if 'path' in cache_config and not isinstance(cache_config['path'], str):
+                raise ValidationError("'path' must be a string", 'path')
+            
             # Validate output section
             output_config = config['output']
             if 'directory' in output_config and not isinstance(output_config['directory'], str):
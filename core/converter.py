@@ -13,7 +13,7 @@ import json
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
 import concurrent.futures
 import time
 
@@ -22,12 +22,74 @@ from core.ocr_processor import TesseractOCRProcessor
 from core.preprocessor import ImagePreprocessor
 from core.formatter import MarkdownFormatter
 from core.metadata_generator import MetadataGenerator
+from core.result_cache import OCRResultCache, config_fingerprint
 from config.manager import ConfigurationManager
 from config.validator import InputValidator
 from errors.handler import ErrorHandler
 from errors.exceptions import PNGToMarkdownError, ProcessingError, FileOperationError
 
 
+# Statistics that are summed across worker processes
+COUNTER_STATISTICS = (
+    'total_files_processed', 'successful_files', 'failed_files', 'total_processing_time',
+    'cache_hits', 'cache_misses', 'skipped_unchanged'
+)
+
+# Converter resident in each worker process of the process pool, built once by _init_worker
+_worker_converter = None
+
+# Encoder for the JSON sections appended to the markdown, written piece by piece
+_JSON_ENCODER = json.JSONEncoder(indent=2, ensure_ascii=False)
+
+# Failed files listed in the summary of a streaming run; the manifest has all of them
+MAX_SUMMARY_FAILURES = 100
+
+# Files between progress log lines in a streaming run
+PROGRESS_INTERVAL = 100
+
+
+def _init_worker(config: Dict[str, Any]) -> None:
+    """Build the worker-resident converter with its OCR processor and preprocessor."""
+    global _worker_converter
+    _worker_converter = PNGToMarkdownConverter(config)
+
+
+def _convert_in_worker(input_path: str, output_path: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert one file with the worker-resident converter, returning the change in its statistics."""
+    statistics = _worker_converter.statistics
+    before = {key: statistics[key] for key in COUNTER_STATISTICS}
+    success = _worker_converter.convert_file(input_path, output_path, **kwargs)
+    return {
+        'success': success,
+        'statistics': {key: statistics[key] - before[key] for key in COUNTER_STATISTICS}
+    }
+
+
+class _RunningSummary:
+    """Counts of a conversion run, updated one result at a time."""
+    
+    def __init__(self, max_failed_files: Optional[int] = None):
+        self.total_files = 0
+        self.successful_files = 0
+        self.failed_file_list = []
+        self.failed_files_omitted = 0
+        self.max_failed_files = max_failed_files
+    
+    def add(self, file_path: str, result: Dict[str, Any]) -> None:
+        """Count one file's result."""
+        self.total_files += 1
+        if result['success']:
+            self.successful_files += 1
+        elif self.max_failed_files is None or len(self.failed_file_list) < self.max_failed_files:
+            self.failed_file_list.append(file_path)
+        else:
+            self.failed_files_omitted += 1
+    
+    @property
+    def success_rate(self) -> float:
+        return (self.successful_files / self.total_files) * 100 if self.total_files > 0 else 0
+
+
 class PNGToMarkdownConverter:
     """
     Main entry point for PNG to Markdown conversion.
@@ -51,38 +113,37 @@ class PNGToMarkdownConverter:
         else:
             self.config_manager = ConfigurationManager()
         
-        # Initialize components
+        # Initialize components; they read their own section of the full configuration
         self.ocr_processor = TesseractOCRProcessor(
-            tesseract_path=self.config_manager.get_config('tesseract.path'),
-            config=self.config_manager.get_tesseract_config()
+            config=self.config_manager.config
         )
         
         self.preprocessor = ImagePreprocessor(
-            config=self.config_manager.get_preprocessing_config()
+            config=self.config_manager.config
         )
         
         self.formatter = MarkdownFormatter(
-            config=self.config_manager.get_formatting_config()
+            config=self.config_manager.config
         )
         
         self.metadata_generator = MetadataGenerator(
-            config=self.config_manager.get_metadata_config()
+            config=self.config_manager.config
         )
         
         self.validator = InputValidator(
             config=self.config_manager.get_validation_config()
         )
         
+        # Persistent OCR result cache keyed by image hash, config fingerprint and engine version
+        self.result_cache = None
+        if self.config_manager.get_config('cache.enabled', True):
+            self.result_cache = OCRResultCache(
+                self.config_manager.get_config('cache.path', './output/.ocr_cache.sqlite'),
+                engine_version=self.ocr_processor.get_engine_version()
+            )
+        
         # Initialize statistics
-        self.statistics = {
-            'total_files_processed': 0,
-            'successful_files': 0,
-            'failed_files': 0,
-            'total_processing_time': 0,
-            'average_processing_time': 0,
-            'start_time': None,
-            'end_time': None
-        }
+        self.reset_statistics()
     
     def convert_file(self, input_path: str, output_path: str, **kwargs) -> bool:
         """
@@ -115,35 +176,51 @@ class PNGToMarkdownConverter:
             
             # Process the file
             start_time = time.time()
-            
-            # Apply preprocessing if enabled
-            processed_image = input_path
-            if kwargs.get('preprocess', self.config_manager.get_config('preprocessing.enabled')):
-                processed_image = self.preprocessor.preprocess_image(input_path)
-            
-            # Extract text with OCR
-            ocr_results = self.ocr_processor.extract_text_with_metadata(processed_image)
+            preprocess = kwargs.get('preprocess', self.config_manager.get_config('preprocessing.enabled'))
+            
+            # Reuse OCR results of an identical image processed with the same settings
+            ocr_results = None
+            image_hash = fingerprint = output_fingerprint = None
+            if self.result_cache is not None:
+                image_hash = self.result_cache.file_hash(input_path)
+                fingerprint = self._ocr_fingerprint(preprocess)
+                
+                output_fingerprint = self._output_fingerprint(fingerprint, kwargs)
+                incremental = kwargs.get('incremental', self.config_manager.get_config('cache.incremental', False))
+                if incremental and self.result_cache.is_up_to_date(input_path, image_hash, output_fingerprint, output_path):
+                    self.logger.info(f"Unchanged since last run, skipping: {input_path}")
+                    self.statistics['total_files_processed'] += 1
+                    self.statistics['successful_files'] += 1
+                    self.statistics['skipped_unchanged'] += 1
+                    return True
+                
+                ocr_results = self.result_cache.get(image_hash, fingerprint)
+                if ocr_results is not None:
+                    self.statistics['cache_hits'] += 1
+                else:
+                    self.statistics['cache_misses'] += 1
+            
+            if ocr_results is None:
+                # Apply preprocessing if enabled
+                processed_image = input_path
+                if preprocess:
+                    processed_image = self.preprocessor.preprocess_image(input_path)
+                
+                # Extract text with OCR
+                ocr_results = self.ocr_processor.extract_text_with_metadata(processed_image)
+                
+                if self.result_cache is not None:
+                    self.result_cache.put(image_hash, fingerprint, ocr_results)
             
             # Apply confidence threshold if specified
             confidence_threshold = kwargs.get('confidence_threshold', self.config_manager.get_config('formatting.confidence_threshold'))
             if confidence_threshold > 0:
                 ocr_results = self._apply_confidence_threshold(ocr_results, confidence_threshold)
             
-            # Format results to markdown
-            markdown_content = self.formatter.format_ocr_results(ocr_results)
-            
-            # Generate metadata if enabled
-            if kwargs.get('include_metadata', self.config_manager.get_config('formatting.include_metadata')):
-                metadata = self.metadata_generator.generate_processing_metadata(input_path, ocr_results)
-                markdown_content += f"\n\n## Metadata\n\n{json.dumps(metadata, indent=2, ensure_ascii=False)}"
-            
-            # Generate statistics if enabled
-            if kwargs.get('include_statistics', self.config_manager.get_config('formatting.include_statistics')):
-                statistics = self.metadata_generator.calculate_quality_metrics(ocr_results)
-                markdown_content += f"\n\n## Statistics\n\n{json.dumps(statistics, indent=2, ensure_ascii=False)}"
-            
-            # Write output file
-            self._write_output_file(output_path, markdown_content)
+            # Format results to markdown, writing each section as it is produced
+            self._write_output_file(output_path, self._iter_markdown(input_path, ocr_results, kwargs))
+            if self.result_cache is not None:
+                self.result_cache.record_output(input_path, image_hash, output_fingerprint, output_path)
             
             # Update statistics
             processing_time = time.time() - start_time
@@ -166,18 +243,46 @@ class PNGToMarkdownConverter:
             self.logger.error(error_msg)
             return False
     
+    def _iter_markdown(self, input_path: str, ocr_results: Dict[str, Any],
+                       kwargs: Dict[str, Any]) -> Iterator[str]:
+        """Markdown for one file as chunks in output order, without building the whole document."""
+        for index, section in enumerate(self.formatter.iter_format_ocr_results(ocr_results)):
+            if index:
+                yield "\n\n"
+            yield section
+        
+        # Generate metadata if enabled
+        if kwargs.get('include_metadata', self.config_manager.get_config('formatting.include_metadata')):
+            metadata = self.metadata_generator.generate_processing_metadata(input_path, ocr_results)
+            yield "\n\n## Metadata\n\n"
+            yield from _JSON_ENCODER.iterencode(metadata)
+        
+        # Generate statistics if enabled
+        if kwargs.get('include_statistics', self.config_manager.get_config('formatting.include_statistics')):
+            statistics = self.metadata_generator.calculate_quality_metrics(ocr_results)
+            yield "\n\n## Statistics\n\n"
+            yield from _JSON_ENCODER.iterencode(statistics)
+    
     def convert_directory(self, input_dir: str, output_dir: str, **kwargs) -> Dict[str, Any]:
         """
         Convert all PNG files in a directory to markdown.
         
+        In streaming mode (the `streaming` option or output.streaming) per-file results
+        are written to a JSONL manifest as files finish instead of being returned, and
+        the summary is computed from running counts, so memory use does not grow with
+        the number of files. Each run replaces the manifest of the previous one.
+        
         Args:
             input_dir: Directory containing PNG files
             output_dir: Directory to save markdown files
-            **kwargs: Additional configuration options
+            **kwargs: Additional configuration options; streaming and manifest_path
+                override the output configuration
             
         Returns:
-            Dict: Conversion results summary
+            Dict: Conversion results summary, with 'results' or, when streaming, 'manifest_path'
         """
+        streaming = kwargs.pop('streaming', self.config_manager.get_config('output.streaming', False))
+        manifest_path = kwargs.pop('manifest_path', None) or self.config_manager.get_config('output.manifest_path')
         try:
             self.logger.info(f"Starting directory conversion: {input_dir} -> {output_dir}")
             
@@ -192,10 +297,16 @@ class PNGToMarkdownConverter:
             # Validate and create output directory
             output_dir = self.validator.sanitize_output_path(output_dir)
             
-            # Find all PNG files in input directory
-            png_files = self._find_png_files(input_dir)
+            # Find all PNG files in input directory; a streaming run converts them as the walk finds them
+            if streaming:
+                manifest_path = manifest_path or os.path.join(output_dir, 'manifest.jsonl')
+                summary = self._convert_streaming(self._iter_png_files(input_dir), output_dir, manifest_path, **kwargs)
+                found_files = summary['total_files'] > 0
+            else:
+                png_files = self._find_png_files(input_dir)
+                found_files = bool(png_files)
             
-            if not png_files:
+            if not found_files:
                 self.logger.warning(f"No PNG files found in directory: {input_dir}")
                 return {
                     'success': False,
@@ -208,6 +319,15 @@ class PNGToMarkdownConverter:
                     }
                 }
             
+            if streaming:
+                self.statistics['end_time'] = datetime.now()
+                self.logger.info(f"Directory conversion completed: {summary}")
+                return {
+                    'success': True,
+                    'manifest_path': manifest_path,
+                    'summary': summary
+                }
+            
             # Process files
             results = self._process_batch(png_files, output_dir, **kwargs)
             
@@ -241,67 +361,180 @@ class PNGToMarkdownConverter:
     
     def _find_png_files(self, directory: str) -> List[str]:
         """Find all PNG files in a directory."""
-        png_files = []
+        return list(self._iter_png_files(directory))
+    
+    def _iter_png_files(self, directory: str) -> Iterator[str]:
+        """Yield the PNG files in a directory as the walk finds them."""
         supported_formats = self.config_manager.get_config('validation.supported_formats', [])
         
         for root, dirs, files in os.walk(directory):
             for file in files:
                 file_ext = os.path.splitext(file)[1].lower()
                 if file_ext in supported_formats:
-                    file_path = os.path.join(root, file)
-                    png_files.append(file_path)
+                    yield os.path.join(root, file)
+    
+    def _convert_streaming(self, files: Iterable[str], output_dir: str, manifest_path: str,
+                           **kwargs) -> Dict[str, Any]:
+        """
+        Convert files, writing each result to a JSONL manifest as it finishes.
+        
+        The manifest is truncated first so it only describes this run.
+        
+        Returns:
+            Dict: Summary computed from running counts
+        """
+        manifest_dir = os.path.dirname(manifest_path)
+        if manifest_dir:
+            os.makedirs(manifest_dir, exist_ok=True)
+        
+        running = _RunningSummary(max_failed_files=MAX_SUMMARY_FAILURES)
+        with open(manifest_path, 'w', encoding='utf-8', buffering=1) as manifest:
+            for file_path, result in self.iter_convert_files(files, output_dir, **kwargs):
+                record = {'input_path': file_path, **result, 'timestamp': datetime.now().isoformat()}
+                manifest.write(json.dumps(record, ensure_ascii=False) + '\n')
+                running.add(file_path, result)
+                
+                if running.total_files % PROGRESS_INTERVAL == 0:
+                    self.logger.info(f"Converted {running.total_files} files "
+                                     f"({running.successful_files} successful, {running.success_rate:.1f}%)")
         
-        return png_files
+        return self._summarize(running)
     
     def _process_batch(self, files: List[str], output_dir: str, **kwargs) -> Dict[str, Any]:
         """Process files in batch."""
-        results = {}
-        batch_size = kwargs.get('batch_size', self.config_manager.get_config('batch.size', 10))
-        timeout = kwargs.get('timeout', self.config_manager.get_config('batch.timeout', 30))
+        return dict(self.iter_convert_files(files, output_dir, **kwargs))
+    
+    def iter_convert_directory(self, input_dir: str, output_dir: str,
+                               **kwargs) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Convert all PNG files in a directory, yielding each result as its file finishes.
         
-        # Process files in batches
-        for i in range(0, len(files), batch_size):
-            batch_files = files[i:i + batch_size]
-            batch_results = self._process_batch_files(batch_files, output_dir, **kwargs)
-            results.update(batch_results)
+        Args:
+            input_dir: Directory containing PNG files
+            output_dir: Directory to save markdown files
+            **kwargs: Additional configuration options
+            
+        Yields:
+            Tuple of (input path, result dict with success, output_path and error)
+        """
+        if not os.path.exists(input_dir):
+            raise FileOperationError(f"Input directory does not exist: {input_dir}", input_dir, 'read')
         
-        return results
+        output_dir = self.validator.sanitize_output_path(output_dir)
+        yield from self.iter_convert_files(self._find_png_files(input_dir), output_dir, **kwargs)
     
-    def _process_batch_files(self, files: List[str], output_dir: str, **kwargs) -> Dict[str, Any]:
-        """Process a batch of files."""
-        results = {}
-        
-        # Use ThreadPoolExecutor for parallel processing
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            future_to_file = {}
-            
-            for file_path in files:
-                # Generate output filename
-                output_filename = self._generate_output_filename(file_path, kwargs.get('filename_pattern'))
-                output_path = os.path.join(output_dir, output_filename)
-                
-                # Submit conversion task
+    def iter_convert_files(self, files: List[str], output_dir: str,
+                           **kwargs) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Convert files on a worker pool, yielding each result as its file finishes.
+        
+        Files are fed to the pool continuously, keeping two per worker in flight,
+        rather than in lock-step batches. In 'process' mode (the default) every
+        worker process builds its own OCR processor and preprocessor once and
+        reuses them for all of its files, so preprocessing runs on all cores
+        instead of contending for the GIL. 'thread' mode shares this converter's
+        components between threads.
+        
+        Args:
+            files: Input file paths; any iterable, consumed as workers free up
+            output_dir: Directory to save markdown files
+            **kwargs: Additional configuration options; execution_mode and
+                max_workers override the batch configuration
+            
+        Yields:
+            Tuple of (input path, result dict with success, output_path and error)
+        """
+        timeout = kwargs.get('timeout', self.config_manager.get_config('batch.timeout', 30))
+        execution_mode = kwargs.pop('execution_mode', self.config_manager.get_config('batch.execution_mode', 'process'))
+        max_workers = kwargs.pop('max_workers', None) or self.config_manager.get_config('batch.max_workers')
+        max_workers = max_workers or os.cpu_count() or 1
+        if hasattr(files, '__len__'):
+            max_workers = min(max_workers, max(len(files), 1))
+        
+        if execution_mode == 'process':
+            executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_worker,
+                initargs=(self.config_manager.copy_config(),)
+            )
+        elif execution_mode == 'thread':
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        else:
+            raise ProcessingError(f"Unknown execution mode: {execution_mode}")
+        
+        file_count = f"{len(files)} " if hasattr(files, '__len__') else ''
+        self.logger.info(f"Converting {file_count}files with {max_workers} {execution_mode} workers")
+        if self.statistics['start_time'] is None:
+            self.statistics['start_time'] = datetime.now()
+        
+        pending_files = iter(files)
+        in_flight = {}
+        
+        def submit_next() -> bool:
+            file_path = next(pending_files, None)
+            if file_path is None:
+                return False
+            output_path = os.path.join(output_dir, self._generate_output_filename(file_path, kwargs.get('filename_pattern')))
+            if execution_mode == 'process':
+                future = executor.submit(_convert_in_worker, file_path, output_path, kwargs)
+            else:
                 future = executor.submit(self.convert_file, file_path, output_path, **kwargs)
-                future_to_file[future] = file_path
-            
-            # Collect results
-            for future in concurrent.futures.as_completed(future_to_file, timeout=timeout):
-                file_path = future_to_file[future]
-                try:
-                    success = future.result()
-                    results[file_path] = {
-                        'success': success,
-                        'output_path': os.path.join(output_dir, self._generate_output_filename(file_path, kwargs.get('filename_pattern'))),
-                        'error': None
-                    }
-                except Exception as e:
-                    results[file_path] = {
-                        'success': False,
-                        'output_path': None,
-                        'error': str(e)
-                    }
+            in_flight[future] = (file_path, output_path)
+            return True
+        
+        try:
+            for _ in range(2 * max_workers):
+                if not submit_next():
+                    break
+            
+            while in_flight:
+                done, _ = concurrent.futures.wait(
+                    in_flight, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                if not done:
+                    raise concurrent.futures.TimeoutError(f"No file finished converting within {timeout}s")
+                
+                for future in done:
+                    file_path, output_path = in_flight.pop(future)
+                    submit_next()
+                    yield file_path, self._collect_result(future, output_path, execution_mode)
+        finally:
+            for future in in_flight:
+                future.cancel()
+            executor.shutdown(wait=True)
+    
+    def _collect_result(self, future: concurrent.futures.Future, output_path: str,
+                        execution_mode: str) -> Dict[str, Any]:
+        """Turn a finished conversion future into a result dict, updating statistics for worker processes."""
+        try:
+            outcome = future.result()
+        except Exception as e:
+            return {'success': False, 'output_path': None, 'error': str(e)}
+        
+        if execution_mode != 'process':
+            return {'success': outcome, 'output_path': output_path, 'error': None}
         
-        return results
+        # Worker processes keep their own statistics; fold theirs into ours
+        for key, delta in outcome['statistics'].items():
+            self.statistics[key] += delta
+        if self.statistics['total_files_processed']:
+            self.statistics['average_processing_time'] = self.statistics['total_processing_time'] / self.statistics['total_files_processed']
+        return {'success': outcome['success'], 'output_path': output_path, 'error': None}
+    
+    def _ocr_fingerprint(self, preprocess: bool) -> str:
+        """Fingerprint of the settings that affect OCR results."""
+        return config_fingerprint({
+            'preprocessing': self.config_manager.get_config('preprocessing', {}) if preprocess else None,
+            'tesseract': self.config_manager.get_config('tesseract', {})
+        })
+    
+    def _output_fingerprint(self, ocr_fingerprint: str, kwargs: Dict[str, Any]) -> str:
+        """Fingerprint of the settings that affect the written markdown."""
+        return config_fingerprint({
+            'ocr': ocr_fingerprint,
+            'formatting': self.config_manager.get_config('formatting', {}),
+            'options': {key: kwargs.get(key) for key in ('confidence_threshold', 'include_metadata', 'include_statistics')}
+        })
     
     def _generate_output_filename(self, input_path: str, pattern: Optional[str] = None) -> str:
         """Generate output filename based on input and pattern."""
@@ -339,8 +572,14 @@ class PNGToMarkdownConverter:
         
         return ocr_results
     
-    def _write_output_file(self, output_path: str, content: str) -> None:
-        """Write output file."""
+    def _write_output_file(self, output_path: str, content: Union[str, Iterable[str]]) -> None:
+        """
+        Write output file from a string or from chunks as they are produced.
+        
+        Chunks go to a temporary file next to the output, which replaces the output
+        only once complete, so a failure part-way leaves any previous output intact.
+        """
+        temp_path = f"{output_path}.tmp"
         try:
             # Create directory if it doesn't exist
             output_dir = os.path.dirname(output_path)
@@ -348,19 +587,32 @@ class PNGToMarkdownConverter:
                 os.makedirs(output_dir, exist_ok=True)
             
             # Write file
-            from utils.encoding_utils import safe_write_text
-            safe_write_text(output_path, '', encoding='utf-8')
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            chunks = [content] if isinstance(content, str) else content
+            with open(temp_path, 'w', encoding='utf-8', errors='replace') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(temp_path, output_path)
             
             # Create backup if enabled
             if self.config_manager.get_config('output.include_backup', True):
                 backup_path = self._create_backup(output_path)
                 self.logger.info(f"Backup created: {backup_path}")
             
+        except PNGToMarkdownError:
+            # Errors raised while producing the content, e.g. by the formatter
+            self._remove_temp_file(temp_path)
+            raise
         except Exception as e:
+            self._remove_temp_file(temp_path)
             raise FileOperationError(f"Failed to write output file: {output_path}", output_path, 'write')
     
+    def _remove_temp_file(self, temp_path: str) -> None:
+        """Remove a partially written output file."""
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+    
     def _create_backup(self, file_path: str) -> str:
         """Create backup of existing file."""
         import shutil
@@ -377,27 +629,31 @@ class PNGToMarkdownConverter:
     
     def _generate_summary(self, results: Dict[str, Any]) -> Dict[str, Any]:
         """Generate processing summary."""
-        total_files = len(results)
-        successful_files = sum(1 for result in results.values() if result['success'])
-        failed_files = total_files - successful_files
-        success_rate = (successful_files / total_files) * 100 if total_files > 0 else 0
-        
-        # Get failed files
-        failed_file_list = [file_path for file_path, result in results.items() if not result['success']]
-        
+        running = _RunningSummary()
+        for file_path, result in results.items():
+            running.add(file_path, result)
+        return self._summarize(running)
+    
+    def _summarize(self, running: _RunningSummary) -> Dict[str, Any]:
+        """Generate processing summary from running counts."""
         return {
-            'total_files': total_files,
-            'successful_files': successful_files,
-            'failed_files': failed_files,
-            'success_rate': success_rate,
-            'failed_files': failed_file_list,
+            'total_files': running.total_files,
+            'successful_files': running.successful_files,
+            'success_rate': running.success_rate,
+            'failed_files': running.failed_file_list,
+            'failed_files_omitted': running.failed_files_omitted,
             'processing_time': self.statistics['total_processing_time'],
-            'average_processing_time': self.statistics['average_processing_time']
+            'average_processing_time': self.statistics['average_processing_time'],
+            'cache_hit_rate': self.get_statistics()['cache_hit_rate'],
+            'skipped_unchanged': self.statistics['skipped_unchanged']
         }
     
     def get_statistics(self) -> Dict[str, Any]:
         """Get processing statistics."""
-        return self.statistics.copy()
+        statistics = self.statistics.copy()
+        lookups = statistics['cache_hits'] + statistics['cache_misses']
+        statistics['cache_hit_rate'] = statistics['cache_hits'] / lookups if lookups else 0.0
+        return statistics
     
     def reset_statistics(self) -> None:
         """Reset processing statistics."""
@@ -407,6 +663,9 @@ class PNGToMarkdownConverter:
             'failed_files': 0,
             'total_processing_time': 0,
             'average_processing_time': 0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'skipped_unchanged': 0,
             'start_time': None,
             'end_time': None
         }
@@ -444,10 +703,10 @@ class PNGToMarkdownConverter:
             self.config_manager.update_config(updates)
             
             # Update component configurations
-            self.ocr_processor.update_config(self.config_manager.get_tesseract_config())
-            self.preprocessor.update_config(self.config_manager.get_preprocessing_config())
-            self.formatter.update_config(self.config_manager.get_formatting_config())
-            self.metadata_generator.update_config(self.config_manager.get_metadata_config())
+            self.ocr_processor = TesseractOCRProcessor(config=self.config_manager.config)
+            self.preprocessor.update_config(self.config_manager.config)
+            self.formatter.update_config(self.config_manager.config)
+            self.metadata_generator.update_config(self.config_manager.config)
             self.validator.update_config(self.config_manager.get_validation_config())
             
             self.logger.info("Configuration updated successfully")
@@ -489,6 +748,10 @@ class PNGToMarkdownConverter:
             # Reset statistics
             self.reset_statistics()
             
+            # Release the result cache connection (cached results are kept)
+            if self.result_cache is not None:
+                self.result_cache.close()
+            
             # Clear any temporary files
             temp_dir = self.config_manager.get_config('output.directory', './output')
             if os.path.exists(temp_dir):
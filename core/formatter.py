@@ -10,13 +10,14 @@ Version: 1.0.0
 
 import re
 import json
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from datetime import datetime
 import textwrap
 
 # Local imports
 from errors.exceptions import ImageError
 from errors.handler import ErrorHandler
+from core.layout import LayoutAnalyzer
 
 
 class MarkdownFormatter:
@@ -46,6 +47,13 @@ class MarkdownFormatter:
         self.column_detection_threshold = self.config.get('formatting', {}).get('column_detection_threshold', 0.6)
         self.heading_detection_threshold = self.config.get('formatting', {}).get('heading_detection_threshold', 0.8)
         
+        # Layout geometry, in multiples of the page's median word height
+        self.line_tolerance = self.config.get('formatting', {}).get('line_tolerance', 0.5)
+        self.paragraph_gap = self.config.get('formatting', {}).get('paragraph_gap', 0.8)
+        self.column_gap = self.config.get('formatting', {}).get('column_gap', 1.5)
+        self.table_min_rows = self.config.get('formatting', {}).get('table_min_rows', 2)
+        self.layout_analyzer = self._create_layout_analyzer()
+        
         # Markdown formatting settings
         self.max_line_length = self.config.get('formatting', {}).get('max_line_length', 80)
         self.paragraph_spacing = self.config.get('formatting', {}).get('paragraph_spacing', 2)
@@ -61,38 +69,47 @@ class MarkdownFormatter:
         Returns:
             str: Formatted markdown content
         """
+        return '\n\n'.join(self.iter_format_ocr_results(ocr_results))
+    
+    def iter_format_ocr_results(self, ocr_results: Dict[str, Any]) -> Iterator[str]:
+        """
+        Format OCR results into markdown sections, one at a time.
+        
+        Sections are produced lazily (the page content one paragraph or table at a
+        time) so they can be written out as they are generated; joined with blank
+        lines they make up the output of format_ocr_results.
+        
+        Args:
+            ocr_results: OCR results from processor
+            
+        Yields:
+            str: Markdown sections in document order
+        """
         try:
             print("Formatting OCR results to markdown")
             
-            # Initialize markdown content
-            markdown_content = []
-            
             # Add header
-            markdown_content.append(self._generate_header(ocr_results))
+            yield self._generate_header(ocr_results)
             
             # Add main content
             if self.preserve_layout:
-                markdown_content.append(self._preserve_layout(ocr_results.get('text_blocks', [])))
+                yield from self._iter_layout(ocr_results.get('text_blocks', []))
             else:
-                markdown_content.append(self._format_basic_text(ocr_results.get('text', '')))
+                yield self._format_basic_text(ocr_results.get('text', ''))
             
             # Add metadata section
             if self.include_metadata:
-                markdown_content.append(self._add_metadata_section(ocr_results))
+                yield self._add_metadata_section(ocr_results)
             
             # Add statistics section
             if self.include_statistics:
-                markdown_content.append(self._add_statistics_section(ocr_results))
+                yield self._add_statistics_section(ocr_results)
             
             # Add confidence analysis
             if 'confidence_scores' in ocr_results:
-                markdown_content.append(self._add_confidence_analysis(ocr_results['confidence_scores']))
-            
-            # Combine all sections
-            full_content = '\n\n'.join(markdown_content)
+                yield self._add_confidence_analysis(ocr_results['confidence_scores'])
             
             print("Markdown formatting completed")
-            return full_content
             
         except Exception as e:
             error_msg = f"Markdown formatting failed: {e}"
@@ -113,79 +130,41 @@ class MarkdownFormatter:
         ]
         return '\n'.join(header_lines)
     
+    def _create_layout_analyzer(self) -> LayoutAnalyzer:
+        """Create the layout analyzer from the current settings."""
+        return LayoutAnalyzer(
+            line_tolerance=self.line_tolerance,
+            paragraph_gap=self.paragraph_gap,
+            column_gap=self.column_gap,
+            table_min_rows=self.table_min_rows,
+            table_detection_threshold=self.table_detection_threshold,
+            column_detection_threshold=self.column_detection_threshold
+        )
+    
     def _preserve_layout(self, text_blocks: List[Dict]) -> str:
         """Preserve original layout in markdown format."""
+        return '\n\n'.join(self._iter_layout(text_blocks))
+    
+    def _iter_layout(self, text_blocks: List[Dict]) -> Iterator[str]:
+        """Format the page's paragraphs and tables in reading order, one at a time."""
         if not text_blocks:
-            return ""
-        
-        # Sort blocks by position to maintain reading order
-        sorted_blocks = sorted(text_blocks, key=lambda x: (x['y'], x['x']))
-        
-        # Group blocks by line and paragraph
-        line_groups = self._group_blocks_by_line(sorted_blocks)
-        paragraph_groups = self._group_blocks_by_paragraph(line_groups)
+            return
         
-        # Format each paragraph
-        formatted_paragraphs = []
-        for paragraph in paragraph_groups:
-            formatted_paragraph = self._format_paragraph(paragraph)
-            if formatted_paragraph.strip():
-                formatted_paragraphs.append(formatted_paragraph)
-        
-        return '\n\n'.join(formatted_paragraphs)
+        for region in self.layout_analyzer.analyze(text_blocks):
+            if region['type'] == 'table':
+                formatted_region = self.create_markdown_table(region['rows'])
+            else:
+                formatted_region = self._format_paragraph(region['lines'])
+            if formatted_region.strip():
+                yield formatted_region
     
     def _group_blocks_by_line(self, blocks: List[Dict]) -> List[List[Dict]]:
-        """Group text blocks by line based on y-coordinate."""
-        if not blocks:
-            return []
-        
-        lines = []
-        current_line = []
-        current_y = blocks[0]['y']
-        line_tolerance = 10  # Pixels tolerance for same line
-        
-        for block in blocks:
-            if abs(block['y'] - current_y) <= line_tolerance:
-                current_line.append(block)
-            else:
-                # Sort line by x-coordinate
-                current_line.sort(key=lambda x: x['x'])
-                lines.append(current_line)
-                current_line = [block]
-                current_y = block['y']
-        
-        # Add the last line
-        if current_line:
-            current_line.sort(key=lambda x: x['x'])
-            lines.append(current_line)
-        
-        return lines
+        """Group text blocks by line, with a tolerance relative to the font height."""
+        return self.layout_analyzer.group_lines(blocks)
     
     def _group_blocks_by_paragraph(self, lines: List[List[Dict]]) -> List[List[List[Dict]]]:
-        """Group lines into paragraphs based on spacing."""
-        if not lines:
-            return []
-        
-        paragraphs = []
-        current_paragraph = []
-        prev_y = 0
-        
-        for line in lines:
-            if current_paragraph:
-                # Check if this line is a new paragraph (significant y gap)
-                y_gap = line[0]['y'] - prev_y
-                if y_gap > 20:  # Threshold for new paragraph
-                    paragraphs.append(current_paragraph)
-                    current_paragraph = []
-            
-            current_paragraph.append(line)
-            prev_y = line[0]['y']
-        
-        # Add the last paragraph
-        if current_paragraph:
-            paragraphs.append(current_paragraph)
-        
-        return paragraphs
+        """Group lines into paragraphs at gaps relative to the font height."""
+        return self.layout_analyzer.group_paragraphs(lines)
     
     def _format_paragraph(self, paragraph: List[List[Dict]]) -> str:
         """Format a paragraph with proper markdown."""
@@ -379,39 +358,22 @@ class MarkdownFormatter:
         return '\n'.join(analysis_lines)
     
     def detect_tables(self, text_blocks: List[Dict]) -> List[Dict]:
-        """Detect table structures in text blocks."""
+        """Detect tables as runs of rows whose cells line up on shared column gutters."""
         tables = []
         
-        # Simple table detection based on alignment patterns
-        # This is a basic implementation - in production, you'd want more sophisticated detection
-        for i in range(len(text_blocks) - 2):
-            # Check if we have a potential table row (aligned text blocks)
-            if self._is_potential_table_row(text_blocks[i:i+3]):
-                table_row = {
-                    'type': 'table_row',
-                    'blocks': text_blocks[i:i+3],
-                    'confidence': self._calculate_row_confidence(text_blocks[i:i+3])
-                }
-                tables.append(table_row)
+        for region in self.layout_analyzer.analyze(text_blocks):
+            if region['type'] == 'table':
+                blocks = [block for line in region['lines'] for block in line]
+                tables.append({
+                    'type': 'table',
+                    'rows': region['rows'],
+                    'columns': region['columns'],
+                    'blocks': blocks,
+                    'confidence': self._calculate_row_confidence(blocks)
+                })
         
         return tables
     
-    def _is_potential_table_row(self, blocks: List[Dict]) -> bool:
-        """Check if blocks form a potential table row."""
-        if len(blocks) < 2:
-            return False
-        
-        # Check if blocks are roughly aligned (similar y-coordinates)
-        y_coords = [block['y'] for block in blocks]
-        y_variation = max(y_coords) - min(y_coords)
-        
-        # Check if blocks have reasonable spacing
-        x_coords = [block['x'] for block in blocks]
-        x_spacing = [x_coords[i+1] - x_coords[i] for i in range(len(x_coords)-1)]
-        
-        # Simple heuristic: low y variation and consistent x spacing
-        return y_variation < 20 and all(spacing > 10 for spacing in x_spacing)
-    
     def _calculate_row_confidence(self, blocks: List[Dict]) -> float:
         """Calculate confidence for a table row."""
         if not blocks:
@@ -425,8 +387,13 @@ class MarkdownFormatter:
         if not table_data:
             return ""
         
-        # Calculate column widths
-        col_widths = [max(len(str(row[i])) for row in table_data) for i in range(len(table_data[0]))]
+        # Escape cell separators and pad short rows
+        column_count = max(len(row) for row in table_data)
+        table_data = [[str(cell).replace('|', '\\|') for cell in row] + [''] * (column_count - len(row))
+                      for row in table_data]
+        
+        # Calculate column widths (the separator row needs at least three dashes)
+        col_widths = [max(3, max(len(row[i]) for row in table_data)) for i in range(column_count)]
         
         # Build table
         table_lines = []
@@ -478,6 +445,10 @@ class MarkdownFormatter:
             'table_detection_threshold': self.table_detection_threshold,
             'column_detection_threshold': self.column_detection_threshold,
             'heading_detection_threshold': self.heading_detection_threshold,
+            'line_tolerance': self.line_tolerance,
+            'paragraph_gap': self.paragraph_gap,
+            'column_gap': self.column_gap,
+            'table_min_rows': self.table_min_rows,
             'max_line_length': self.max_line_length,
             'paragraph_spacing': self.paragraph_spacing,
             'table_alignment': self.table_alignment
@@ -499,6 +470,13 @@ class MarkdownFormatter:
         self.column_detection_threshold = formatting_config.get('column_detection_threshold', self.column_detection_threshold)
         self.heading_detection_threshold = formatting_config.get('heading_detection_threshold', self.heading_detection_threshold)
         
+        # Update layout geometry
+        self.line_tolerance = formatting_config.get('line_tolerance', self.line_tolerance)
+        self.paragraph_gap = formatting_config.get('paragraph_gap', self.paragraph_gap)
+        self.column_gap = formatting_config.get('column_gap', self.column_gap)
+        self.table_min_rows = formatting_config.get('table_min_rows', self.table_min_rows)
+        self.layout_analyzer = self._create_layout_analyzer()
+        
         # Update formatting settings
         self.max_line_length = formatting_config.get('max_line_length', self.max_line_length)
         self.paragraph_spacing = formatting_config.get('paragraph_spacing', self.paragraph_spacing)
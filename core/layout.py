@@ -0,0 +1,233 @@
+"""
+Layout Analysis Module
+
+This module reconstructs page structure from positioned OCR words. The word
+boxes are loaded once into NumPy arrays and the page is cut recursively at
+whitespace gutters (an XY-cut): vertical gutters separate columns and table
+cells, horizontal gaps separate paragraphs. All distances are relative to the
+page's median word height, so the same settings work at any resolution, and
+each cut only sorts the words of its own region.
+
+Author: Kilo Code
+Version: 1.0.0
+"""
+
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+# Cells holding at least this many words are considered prose rather than table cells
+PROSE_CELL_WORDS = 4
+
+
+class _Page:
+    """Word boxes of one page as parallel arrays."""
+
+    def __init__(self, blocks: List[Dict[str, Any]]):
+        self.blocks = blocks
+        self.x0 = np.fromiter((block['x'] for block in blocks), dtype=np.float64, count=len(blocks))
+        self.y0 = np.fromiter((block['y'] for block in blocks), dtype=np.float64, count=len(blocks))
+        self.x1 = self.x0 + np.fromiter((block.get('width', 0) for block in blocks), dtype=np.float64, count=len(blocks))
+        self.height = np.maximum(
+            np.fromiter((block.get('height', 0) for block in blocks), dtype=np.float64, count=len(blocks)), 1.0)
+        self.y1 = self.y0 + self.height
+        self.cy = (self.y0 + self.y1) / 2
+        self.font_height = float(np.median(self.height))
+
+
+class LayoutAnalyzer:
+    """
+    Groups OCR word blocks into lines, paragraphs, columns and tables.
+    """
+
+    def __init__(self, line_tolerance: float = 0.5, paragraph_gap: float = 0.8, column_gap: float = 1.5,
+                 table_min_rows: int = 2, table_detection_threshold: float = 0.7,
+                 column_detection_threshold: float = 0.6):
+        """
+        Initialize layout analyzer.
+
+        Args:
+            line_tolerance: Maximum vertical offset of words on one line, in font heights
+            paragraph_gap: Minimum vertical gap between paragraphs, in font heights
+            column_gap: Minimum horizontal gutter between columns or table cells, in font heights
+            table_min_rows: Minimum number of rows for a table
+            table_detection_threshold: Fraction of rows that must span several cells in a table
+            column_detection_threshold: Fraction of prose-length cells above which aligned
+                blocks are read as text columns rather than a table
+        """
+        self.line_tolerance = line_tolerance
+        self.paragraph_gap = paragraph_gap
+        self.column_gap = column_gap
+        self.table_min_rows = table_min_rows
+        self.table_detection_threshold = table_detection_threshold
+        self.column_detection_threshold = column_detection_threshold
+
+    def analyze(self, blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Split a page into regions in reading order.
+
+        Args:
+            blocks: Text blocks with x, y, width and height
+
+        Returns:
+            List[Dict]: Regions; paragraphs have 'lines' (lists of blocks in reading order),
+            tables additionally have 'rows' (cell texts) and 'columns' (x extents)
+        """
+        if not blocks:
+            return []
+
+        page = _Page(blocks)
+        regions = []
+
+        # Depth-first over the cut tree, children pushed in reverse to keep reading order
+        pending = [np.arange(len(blocks))]
+        while pending:
+            indices = pending.pop()
+
+            columns = self._split(page.x0, page.x1, indices, self.column_gap * page.font_height)
+            bands = self._split(page.y0, page.y1, indices, self.paragraph_gap * page.font_height)
+
+            if len(columns) > 1:
+                lines = self._lines(page, indices)
+                column_of, counts = self._cell_counts(page, lines, columns)
+                occupied = counts > 0
+                prose_cells = np.count_nonzero(counts >= PROSE_CELL_WORDS) / np.count_nonzero(occupied)
+                spanning_rows = np.count_nonzero(occupied.sum(axis=1) >= 2) / len(lines)
+
+                # Text columns are read one after the other. Anything else is cut into
+                # paragraph bands first, so headings and text around a table stay out of it;
+                # table rows split apart by the bands are joined again afterwards.
+                if prose_cells >= self.column_detection_threshold or (
+                        len(bands) == 1 and spanning_rows < self.table_detection_threshold):
+                    pending.extend(reversed(columns))
+                elif len(bands) > 1:
+                    pending.extend(reversed(bands))
+                else:
+                    regions.append(self._table_region(page, lines, columns, column_of))
+                continue
+
+            if len(bands) > 1:
+                pending.extend(reversed(bands))
+                continue
+
+            regions.append({'type': 'paragraph', 'lines': self._to_blocks(page, self._lines(page, indices))})
+
+        return self._merge_tables(regions)
+
+    def group_lines(self, blocks: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Group blocks into lines, top to bottom, each sorted left to right. Blocks may be in any order."""
+        if not blocks:
+            return []
+        page = _Page(blocks)
+        return self._to_blocks(page, self._lines(page, np.arange(len(blocks))))
+
+    def group_paragraphs(self, lines: List[List[Dict[str, Any]]]) -> List[List[List[Dict[str, Any]]]]:
+        """Group consecutive lines into paragraphs at vertical gaps larger than the paragraph gap."""
+        lines = [line for line in lines if line]
+        if not lines:
+            return []
+
+        font_height = float(np.median([block.get('height', 0) or 1 for line in lines for block in line]))
+        tops = np.array([min(block['y'] for block in line) for line in lines], dtype=np.float64)
+        bottoms = np.array([max(block['y'] + (block.get('height', 0) or 1) for block in line) for line in lines],
+                           dtype=np.float64)
+        breaks = np.nonzero(tops[1:] - bottoms[:-1] >= self.paragraph_gap * font_height)[0] + 1
+
+        bounds = [0] + breaks.tolist() + [len(lines)]
+        return [lines[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+    @staticmethod
+    def _split(low: np.ndarray, high: np.ndarray, indices: np.ndarray, gap: float) -> List[np.ndarray]:
+        """Split indices at gaps of at least `gap` in the projection of the [low, high) intervals."""
+        order = indices[np.argsort(low[indices], kind='stable')]
+        reach = np.maximum.accumulate(high[order])
+        breaks = np.nonzero(low[order][1:] - reach[:-1] >= gap)[0] + 1
+        return np.split(order, breaks)
+
+    def _lines(self, page: _Page, indices: np.ndarray) -> List[np.ndarray]:
+        """Cluster words into lines by vertical centre, with a tolerance relative to the words' height."""
+        order = indices[np.argsort(page.cy[indices], kind='stable')]
+        centres = page.cy[order]
+        heights = page.height[order]
+
+        lines = []
+        start = 0
+        anchor = centres[0]
+        line_height = heights[0]
+        for i in range(1, len(order)):
+            if centres[i] - anchor > self.line_tolerance * max(line_height, heights[i]):
+                lines.append(order[start:i])
+                start = i
+                anchor = centres[i]
+                line_height = heights[i]
+            else:
+                anchor += (centres[i] - anchor) / (i - start + 1)
+                line_height = max(line_height, heights[i])
+        lines.append(order[start:])
+
+        return [line[np.argsort(page.x0[line], kind='stable')] for line in lines]
+
+    @staticmethod
+    def _cell_counts(page: _Page, lines: List[np.ndarray],
+                     columns: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Column number of every block, and the number of words in each (line, column) cell."""
+        column_of = np.empty(len(page.blocks), dtype=np.int64)
+        for number, members in enumerate(columns):
+            column_of[members] = number
+
+        row_of = np.repeat(np.arange(len(lines)), [len(line) for line in lines])
+        cells = row_of * len(columns) + column_of[np.concatenate(lines)]
+        counts = np.bincount(cells, minlength=len(lines) * len(columns)).reshape(len(lines), len(columns))
+        return column_of, counts
+
+    def _table_region(self, page: _Page, lines: List[np.ndarray], columns: List[np.ndarray],
+                      column_of: np.ndarray) -> Dict[str, Any]:
+        """Build a table region from lines of blocks separated by vertical gutters."""
+        rows = []
+        for line in lines:
+            row = [[] for _ in columns]
+            for index in line:
+                row[column_of[index]].append(page.blocks[index]['text'])
+            rows.append([' '.join(words) for words in row])
+
+        return {
+            'type': 'table',
+            'rows': rows,
+            'lines': self._to_blocks(page, lines),
+            'columns': [(float(page.x0[members].min()), float(page.x1[members].max())) for members in columns]
+        }
+
+    def _merge_tables(self, regions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Join consecutive table regions with overlapping columns, which the cut separates when
+        rows are spaced like paragraphs, and turn tables with too few rows back into text.
+        """
+        merged = []
+        for region in regions:
+            previous = merged[-1] if merged else None
+            if (region['type'] == 'table' and previous is not None and previous['type'] == 'table'
+                    and self._columns_overlap(previous['columns'], region['columns'])):
+                previous['rows'].extend(region['rows'])
+                previous['lines'].extend(region['lines'])
+                previous['columns'] = [(min(a[0], b[0]), max(a[1], b[1]))
+                                       for a, b in zip(previous['columns'], region['columns'])]
+            else:
+                merged.append(region)
+
+        return [
+            {'type': 'paragraph', 'lines': region['lines']}
+            if region['type'] == 'table' and len(region['rows']) < self.table_min_rows else region
+            for region in merged
+        ]
+
+    @staticmethod
+    def _columns_overlap(first: List[Tuple[float, float]], second: List[Tuple[float, float]]) -> bool:
+        """Check whether two column layouts have the same number of columns and each pair overlaps."""
+        return len(first) == len(second) and all(
+            a[0] < b[1] and b[0] < a[1] for a, b in zip(first, second)
+        )
+
+    @staticmethod
+    def _to_blocks(page: _Page, lines: List[np.ndarray]) -> List[List[Dict[str, Any]]]:
+        """Map index arrays back to block dictionaries."""
+        return [[page.blocks[index] for index in line] for line in lines]
@@ -14,6 +14,7 @@ import time
 from typing import Dict, Any, List, Optional, Union
 from datetime import datetime
 from PIL import Image
+import pytesseract
 
 # Local imports
 from errors.exceptions import OCRError, DependencyError
@@ -42,6 +43,13 @@ class TesseractOCRProcessor:
         self.oem = self.config.get('tesseract', {}).get('oem', 3)
         self.confidence_threshold = self.config.get('tesseract', {}).get('confidence_threshold', 0)
         self.custom_config = self.config.get('tesseract', {}).get('config', '')
+        # Derive the plain text from the image_to_data result instead of a second recognition pass
+        self.single_pass = self.config.get('tesseract', {}).get('single_pass', True)
+        
+        # Use a specific Tesseract binary instead of the one on PATH
+        tesseract_path = self.config.get('tesseract', {}).get('path')
+        if tesseract_path:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_path
         
         # Validate OCR dependencies
         self._validate_dependencies()
@@ -54,7 +62,7 @@ class TesseractOCRProcessor:
             print(f"PIL version: {PIL.__version__}")
             
             # Check if language data is available
-            available_languages = self._get_available_languages()
+            available_languages = self.get_available_languages()
             missing_languages = [lang for lang in self.languages if lang not in available_languages]
             
             if missing_languages:
@@ -68,12 +76,12 @@ class TesseractOCRProcessor:
             self.error_handler.handle_ocr_error(OCRError(error_msg), {'processor': 'OCRProcessor'})
             raise OCRError(error_msg)
     
-    def extract_text_with_metadata(self, image_path: str) -> Dict[str, Any]:
+    def extract_text_with_metadata(self, image_path: Union[str, Image.Image]) -> Dict[str, Any]:
         """
         Extract text with comprehensive metadata.
         
         Args:
-            image_path: Path to input image
+            image_path: Path to input image, or an already loaded (preprocessed) image
             
         Returns:
             Dict: Contains text, confidence scores, bounding boxes, timestamps
@@ -81,21 +89,29 @@ class TesseractOCRProcessor:
         start_time = time.time()
         
         try:
-            # Validate input
-            if not os.path.exists(image_path):
-                raise OCRError(f"Image file not found: {image_path}")
-            
-            # Load image
-            image = Image.open(image_path)
+            if isinstance(image_path, Image.Image):
+                image = image_path
+                image_path = getattr(image, 'filename', '') or None
+            else:
+                # Validate input
+                if not os.path.exists(image_path):
+                    raise OCRError(f"Image file not found: {image_path}")
+                
+                # Load image
+                image = Image.open(image_path)
             
             # Build Tesseract configuration
             config = self._build_tesseract_config()
             
-            # Extract text data
+            # Extract word data (boxes, confidences, layout numbers) in one recognition pass
             text_data = self._extract_text_data(image, config)
+            parsed = self._parse_text_data(text_data)
             
-            # Extract detailed text with bounding boxes
-            detailed_text = self._extract_detailed_text(image, config)
+            # Plain text: rebuilt from the word data, or recognized again in two-pass mode
+            if self.single_pass:
+                detailed_text = parsed['text']
+            else:
+                detailed_text = self._extract_detailed_text(image, config)
             
             # Extract confidence information
             confidence_scores = self._extract_confidence_scores(text_data)
@@ -110,10 +126,11 @@ class TesseractOCRProcessor:
                 'processing_time': processing_time,
                 'text': detailed_text.strip(),
                 'text_blocks': self._organize_text_blocks(text_data),
+                'lines': parsed['lines'],
                 'confidence_scores': confidence_scores,
                 'statistics': {
-                    'total_words': len(text_data['text'].split()),
-                    'total_lines': len([line for line in text_data['text'].split('\n') if line.strip()]),
+                    'total_words': parsed['word_count'],
+                    'total_lines': len(parsed['lines']),
                     'average_confidence': confidence_scores.get('average_confidence', 0),
                     'high_confidence_words': confidence_scores.get('high_confidence_count', 0),
                     'low_confidence_words': confidence_scores.get('low_confidence_count', 0)
@@ -124,7 +141,8 @@ class TesseractOCRProcessor:
                     'tesseract_config': config,
                     'languages_used': self.languages,
                     'psm_mode': self.psm,
-                    'oem_mode': self.oem
+                    'oem_mode': self.oem,
+                    'single_pass': self.single_pass
                 }
             }
             
@@ -206,14 +224,96 @@ class TesseractOCRProcessor:
         
         return ' '.join(config_parts)
     
+    def _extract_text_data(self, image: Image.Image, config: str) -> Dict[str, List[Any]]:
+        """Run Tesseract once and return its word-level TSV data as column lists."""
+        return pytesseract.image_to_data(
+            image,
+            lang='+'.join(self.languages),
+            config=config,
+            output_type=pytesseract.Output.DICT
+        )
+    
+    def _extract_detailed_text(self, image: Image.Image, config: str) -> str:
+        """Run Tesseract for plain text only (second recognition pass in two-pass mode)."""
+        return pytesseract.image_to_string(image, lang='+'.join(self.languages), config=config)
+    
+    def _parse_text_data(self, text_data: Dict[str, List[Any]]) -> Dict[str, Any]:
+        """
+        Group Tesseract word data into lines and rebuild the plain text.
+        
+        Lines are joined with newlines and paragraphs and blocks separated by a
+        blank line, matching the layout of image_to_string output.
+        
+        Returns:
+            Dict: text, lines (text, confidence, bounding box and layout numbers) and word_count
+        """
+        lines = []
+        current = None
+        word_count = 0
+        
+        for i in range(len(text_data['text'])):
+            word = text_data['text'][i].strip()
+            if not word:
+                continue
+            word_count += 1
+            key = (int(text_data['block_num'][i]), int(text_data['par_num'][i]), int(text_data['line_num'][i]))
+            left, top = int(text_data['left'][i]), int(text_data['top'][i])
+            right, bottom = left + int(text_data['width'][i]), top + int(text_data['height'][i])
+            confidence = float(text_data['conf'][i])
+            
+            if current is None or current['key'] != key:
+                current = {'key': key, 'words': [], 'confidences': [],
+                           'left': left, 'top': top, 'right': right, 'bottom': bottom}
+                lines.append(current)
+            current['words'].append(word)
+            current['confidences'].append(confidence)
+            current['left'] = min(current['left'], left)
+            current['top'] = min(current['top'], top)
+            current['right'] = max(current['right'], right)
+            current['bottom'] = max(current['bottom'], bottom)
+        
+        text_parts = []
+        previous_key = None
+        for line in lines:
+            if previous_key is not None:
+                # New paragraph or block: blank line, same paragraph: newline
+                text_parts.append('\n\n' if line['key'][:2] != previous_key[:2] else '\n')
+            text_parts.append(' '.join(line['words']))
+            previous_key = line['key']
+        
+        return {
+            'text': ''.join(text_parts),
+            'lines': [
+                {
+                    'text': ' '.join(line['words']),
+                    'confidence': sum(line['confidences']) / len(line['confidences']),
+                    'x': line['left'],
+                    'y': line['top'],
+                    'width': line['right'] - line['left'],
+                    'height': line['bottom'] - line['top'],
+                    'block_number': line['key'][0],
+                    'paragraph_number': line['key'][1],
+                    'line_number': line['key'][2],
+                    'word_count': len(line['words'])
+                }
+                for line in lines
+            ],
+            'word_count': word_count
+        }
+    
     def _extract_confidence_scores(self, text_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Extract confidence scores from Tesseract data."""
+        """Extract confidence scores of recognized words from Tesseract data."""
         confidences = []
         high_confidence_count = 0
         low_confidence_count = 0
         
         for i in range(len(text_data['text'])):
-            confidence = int(text_data['conf'][i])
+            # Page, block, paragraph and line rows carry no text and a confidence of -1
+            if not text_data['text'][i].strip():
+                continue
+            confidence = int(float(text_data['conf'][i]))
+            if confidence < 0:
+                continue
             confidences.append(confidence)
             
             if confidence >= self.confidence_threshold:
@@ -239,7 +339,7 @@ class TesseractOCRProcessor:
             if text_data['text'][i].strip():  # Only process non-empty text
                 block = {
                     'text': text_data['text'][i],
-                    'confidence': int(text_data['conf'][i]),
+                    'confidence': int(float(text_data['conf'][i])),
                     'x': int(text_data['left'][i]),
                     'y': int(text_data['top'][i]),
                     'width': int(text_data['width'][i]),
@@ -263,6 +363,13 @@ class TesseractOCRProcessor:
             self.error_handler.handle_ocr_error(OCRError(f"Failed to get available languages: {e}"), {})
             return []
     
+    def get_engine_version(self) -> str:
+        """Get the Tesseract version string, or 'unknown' if it cannot be determined."""
+        try:
+            return str(pytesseract.get_tesseract_version())
+        except Exception:
+            return 'unknown'
+    
     def validate_installation(self) -> bool:
         """Validate OCR installation and dependencies."""
         try:
@@ -0,0 +1,189 @@
+"""
+OCR Result Cache Module
+
+This module provides a persistent SQLite cache of OCR results keyed by the
+SHA-256 of the input image, a fingerprint of the preprocessing and Tesseract
+configuration, and the Tesseract version. It also remembers which output each
+input last produced, so incremental runs can skip images that have not changed.
+
+Author: Kilo Code
+Version: 1.0.0
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# Local imports
+from errors.exceptions import FileOperationError
+
+
+def file_sha256(file_path: str) -> str:
+    """Calculate SHA256 hash of file."""
+    hash_sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hash_sha256.update(chunk)
+    return hash_sha256.hexdigest()
+
+
+def config_fingerprint(config: Dict[str, Any]) -> str:
+    """Stable hash of the configuration values that affect OCR output."""
+    encoded = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+
+
+class OCRResultCache:
+    """
+    Persistent cache of OCR results in a SQLite database.
+
+    Safe to share between threads and between the worker processes of the
+    converter's process pool: each process opens its own connection and
+    SQLite serializes the writes.
+    """
+
+    def __init__(self, path: str, engine_version: str = 'unknown'):
+        """
+        Initialize the cache.
+
+        Args:
+            path: SQLite database file
+            engine_version: OCR engine version; results of other versions are not reused
+        """
+        self.path = path
+        self.engine_version = engine_version
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database for this process, creating the schema on first use. Caller holds the lock."""
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS ocr_results (
+                    image_hash TEXT NOT NULL,
+                    config_fingerprint TEXT NOT NULL,
+                    engine_version TEXT NOT NULL,
+                    result_json TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    PRIMARY KEY (image_hash, config_fingerprint, engine_version)
+                );
+                CREATE TABLE IF NOT EXISTS files (
+                    input_path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    image_hash TEXT NOT NULL,
+                    config_fingerprint TEXT,
+                    engine_version TEXT,
+                    output_path TEXT
+                );
+            """)
+        except sqlite3.Error as e:
+            raise FileOperationError(f"Failed to open OCR result cache: {e}", self.path, 'read')
+
+        self._connection = connection
+        self._pid = os.getpid()
+        return connection
+
+    def file_hash(self, input_path: str) -> str:
+        """
+        Get the SHA256 of an input file, reusing the stored hash if its size and mtime are unchanged.
+
+        Args:
+            input_path: Input image path
+
+        Returns:
+            str: Hex digest of the file contents
+        """
+        stat = os.stat(input_path)
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT size, mtime_ns, image_hash FROM files WHERE input_path = ?",
+                (os.path.abspath(input_path),)
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        return file_sha256(input_path)
+
+    def get(self, image_hash: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """
+        Get cached OCR results.
+
+        Returns:
+            Dict: OCR results, or None on a miss
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT result_json FROM ocr_results "
+                "WHERE image_hash = ? AND config_fingerprint = ? AND engine_version = ?",
+                (image_hash, fingerprint, self.engine_version)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, image_hash: str, fingerprint: str, ocr_results: Dict[str, Any]) -> None:
+        """Store OCR results."""
+        result_json = json.dumps(ocr_results, ensure_ascii=False, default=str)
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO ocr_results VALUES (?, ?, ?, ?, ?)",
+                    (image_hash, fingerprint, self.engine_version, result_json, datetime.now().isoformat())
+                )
+
+    def record_output(self, input_path: str, image_hash: str, fingerprint: str, output_path: str) -> None:
+        """Remember the output produced from an input file and the state it was produced from."""
+        stat = os.stat(input_path)
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (os.path.abspath(input_path), stat.st_size, stat.st_mtime_ns, image_hash,
+                     fingerprint, self.engine_version, os.path.abspath(output_path))
+                )
+
+    def is_up_to_date(self, input_path: str, image_hash: str, fingerprint: str, output_path: str) -> bool:
+        """
+        Check whether an output was written by an earlier run from the same image,
+        configuration and engine version and still exists.
+
+        Returns:
+            bool: True if the output does not need to be regenerated
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT image_hash, config_fingerprint, engine_version, output_path FROM files WHERE input_path = ?",
+                (os.path.abspath(input_path),)
+            ).fetchone()
+        return (row is not None
+                and row == (image_hash, fingerprint, self.engine_version, os.path.abspath(output_path))
+                and os.path.exists(output_path))
+
+    def clear(self) -> None:
+        """Remove all cached results and output records."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM ocr_results")
+                connection.execute("DELETE FROM files")
+
+    def close(self) -> None:
+        """Close this process's connection."""
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+            self._pid = None
@@ -14,6 +14,8 @@ import json
 import logging
 import asyncio
 import base64
+import binascii
+import time
 from typing import Dict, Any, List, Optional, Union
 from pathlib import Path
 from PIL import Image
@@ -56,6 +58,10 @@ class EasyOCRMCPServer:
         self.ocr_processor = None
         self.logger = logging.getLogger(__name__)
         
+        # Decode guard and in-flight limit for base64 requests
+        self.max_base64_bytes = self.config_manager.get_config('validation.max_base64_bytes', 20 * 1024 * 1024)
+        self._request_slots = asyncio.Semaphore(self.config_manager.get_config('performance.thread_pool_size', 2))
+        
         # Initialize MCP server
         self.mcp = FastMCP("EasyOCR MCP Server")
         
@@ -104,7 +110,8 @@ class EasyOCRMCPServer:
             full_config = {
                 'easyocr': ocr_config,
                 'preprocessing': preprocessing_config,
-                'batch': batch_config
+                'batch': batch_config,
+                'validation': self.config_manager.get_config('validation', {})
             }
             
             # Initialize OCR processor
@@ -184,8 +191,21 @@ class EasyOCRMCPServer:
             if not valid_paths:
                 raise ValueError("No valid image files provided")
             
-            # Extract text in batch
-            result = self.ocr_processor.extract_batch(valid_paths)
+            # Extract text in batch off the event loop, collecting results as they complete
+            start_time = time.time()
+            results = {}
+            async with self._request_slots:
+                batch = self.ocr_processor.iter_extract_batch(valid_paths)
+                while True:
+                    image_result = await asyncio.to_thread(next, batch, None)
+                    if image_result is None:
+                        break
+                    results[image_result['input_path']] = image_result
+                    self.logger.info(f"Completed {len(results)}/{len(valid_paths)}: {image_result['input_path']}")
+            
+            result = self.ocr_processor.summarize_batch(
+                [results[path] for path in valid_paths], time.time() - start_time
+            )
             
             self.logger.info(f"Batch text extraction completed for {len(valid_paths)} images")
             return result
@@ -198,9 +218,13 @@ class EasyOCRMCPServer:
         """
         Extract text from a base64 encoded image.
         
+        The image is decoded in memory and passed to the OCR processor without
+        touching disk. Payloads over validation.max_base64_bytes and images over
+        validation.max_image_pixels are rejected before decoding.
+        
         Args:
-            base64_image: Base64 encoded image string
-            image_format: Image format (png, jpg, jpeg, etc.)
+            base64_image: Base64 encoded image string, optionally a data URL
+            image_format: Image format hint (png, jpg, jpeg, etc.); the actual format is detected from the data
             
         Returns:
             Dict: OCR results with metadata
@@ -208,30 +232,26 @@ class EasyOCRMCPServer:
         try:
             self.logger.info("Extracting text from base64 image")
             
+            # Strip a data URL prefix such as "data:image/png;base64,"
+            if base64_image.startswith('data:'):
+                base64_image = base64_image.partition(',')[2]
+            
+            # Check the decoded size before decoding (4 base64 characters per 3 bytes)
+            decoded_size = len(base64_image) * 3 // 4
+            if self.max_base64_bytes and decoded_size > self.max_base64_bytes:
+                raise ValueError(f"Image data too large: {decoded_size} bytes exceeds {self.max_base64_bytes}")
+            
             # Decode base64 image
             try:
                 image_data = base64.b64decode(base64_image)
-            except Exception as e:
+            except (binascii.Error, ValueError) as e:
                 raise ValueError(f"Invalid base64 image data: {e}")
             
-            # Create temporary file
-            temp_dir = os.path.join(os.path.dirname(__file__), 'temp')
-            os.makedirs(temp_dir, exist_ok=True)
-            
-            temp_path = os.path.join(temp_dir, f"temp_image.{image_format}")
-            
-            # Save image to temporary file
-            with open(temp_path, 'wb') as f:
-                f.write(image_data)
-            
-            # Extract text
-            result = self.ocr_processor.extract_text_with_metadata(temp_path)
-            
-            # Clean up temporary file
-            try:
-                os.remove(temp_path)
-            except:
-                pass
+            # Bound decoded images in memory; OCR runs off the event loop
+            async with self._request_slots:
+                result = await asyncio.to_thread(
+                    self.ocr_processor.extract_text_from_bytes, image_data, f"<base64 {image_format}>"
+                )
             
             self.logger.info("Text extraction from base64 image completed")
             return result
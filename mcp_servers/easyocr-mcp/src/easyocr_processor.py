@@ -9,10 +9,14 @@ Author: Kilo Code
 Version: 1.0.0
 """
 
+import io
 import os
+import queue
 import time
 import logging
-from typing import Dict, Any, List, Optional, Union, Tuple
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Any, Iterator, List, Optional, Union, Tuple
 from datetime import datetime
 from PIL import Image
 import numpy as np
@@ -55,11 +59,21 @@ class EasyOCRProcessor:
         # Batch processing settings
         self.batch_size = self.config.get('batch', {}).get('size', 5)
         self.batch_timeout = self.config.get('batch', {}).get('timeout', 30)
+        self.prefetch_workers = self.config.get('batch', {}).get('prefetch_workers', 2)
+        self.reader_instances = self.config.get('batch', {}).get('reader_instances', 1)
+        
+        # Largest image decoded from a buffer, in pixels
+        self.max_image_pixels = self.config.get('validation', {}).get('max_image_pixels', 50000000)
         
         # Model preloading
         self.model_loaded = False
         self.reader = None
         
+        # Resident readers, each used by one recognition at a time
+        self._reader_lock = threading.Lock()
+        self._idle_readers = queue.Queue()
+        self._reader_count = 0
+        
         # Validate OCR dependencies
         self._validate_dependencies()
     
@@ -95,6 +109,15 @@ class EasyOCRProcessor:
         if self.model_loaded:
             return
         
+        with self._reader_lock:
+            if not self.model_loaded:
+                self.reader = self._create_reader()
+                self._idle_readers.put(self.reader)
+                self._reader_count = 1
+                self.model_loaded = True
+    
+    def _create_reader(self):
+        """Create and warm up an EasyOCR reader."""
         try:
             print("Loading EasyOCR model...")
             import easyocr
@@ -111,7 +134,7 @@ class EasyOCRProcessor:
             model_args.update(self.recognize_text_args)
             
             # Initialize reader
-            self.reader = easyocr.Reader(
+            reader = easyocr.Reader(
                 lang_list=self.languages,
                 gpu=self.gpu,
                 model_storage_directory=self.model_storage_directory,
@@ -120,16 +143,46 @@ class EasyOCRProcessor:
             
             # Test model loading
             test_image = np.zeros((100, 100, 3), dtype=np.uint8)
-            self.reader.readtext(test_image)
+            reader.readtext(test_image)
             
-            self.model_loaded = True
             print("EasyOCR model loaded successfully")
+            return reader
             
         except Exception as e:
             error_msg = f"Failed to load EasyOCR model: {e}"
             self.error_handler.handle_ocr_error(OCRError(error_msg), {'processor': 'EasyOCRProcessor'})
             raise OCRError(error_msg)
     
+    def _acquire_reader(self):
+        """Take an idle reader, creating one if fewer than reader_instances exist."""
+        self._load_model()
+        try:
+            return self._idle_readers.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._reader_lock:
+            create = self._reader_count < self.reader_instances
+            if create:
+                self._reader_count += 1
+        if not create:
+            return self._idle_readers.get()
+        
+        try:
+            return self._create_reader()
+        except Exception:
+            with self._reader_lock:
+                self._reader_count -= 1
+            raise
+    
+    def _reset_readers(self) -> None:
+        """Drop all readers so the next recognition loads them with the current settings."""
+        with self._reader_lock:
+            self.model_loaded = False
+            self.reader = None
+            self._idle_readers = queue.Queue()
+            self._reader_count = 0
+    
     def extract_text_with_metadata(self, image_path: str) -> Dict[str, Any]:
         """
         Extract text with comprehensive metadata.
@@ -150,54 +203,102 @@ class EasyOCRProcessor:
             # Load and preprocess image
             image = self._load_and_preprocess_image(image_path)
             
-            # Load model if not already loaded
-            self._load_model()
-            
-            # Extract text data
-            text_data = self._extract_text_data(image)
-            
-            # Calculate processing statistics
-            processing_time = time.time() - start_time
-            
-            # Build result dictionary
-            result = {
-                'input_path': image_path,
-                'timestamp': datetime.now().isoformat(),
-                'processing_time': processing_time,
-                'text': self._format_text_output(text_data),
-                'text_blocks': self._organize_text_blocks(text_data),
-                'confidence_scores': self._extract_confidence_scores(text_data),
-                'statistics': {
-                    'total_words': len(self._extract_words(text_data)),
-                    'total_lines': len([line for line in self._extract_lines(text_data) if line.strip()]),
-                    'average_confidence': self._calculate_average_confidence(text_data),
-                    'high_confidence_words': self._count_high_confidence_words(text_data),
-                    'low_confidence_words': self._count_low_confidence_words(text_data)
-                },
-                'metadata': {
-                    'image_size': image.size,
-                    'image_mode': image.mode,
-                    'easyocr_config': {
-                        'languages': self.languages,
-                        'gpu': self.gpu,
-                        'confidence_threshold': self.confidence_threshold,
-                        'model_storage_directory': self.model_storage_directory
-                    },
-                    'preprocessing_applied': {
-                        'max_image_size': self.max_image_size,
-                        'use_grayscale': self.use_grayscale,
-                        'use_binarization': self.use_binarization
-                    }
-                }
-            }
-            
-            return result
+            return self._recognize(image, image_path, start_time)
             
         except Exception as e:
             error_msg = f"OCR extraction failed for {image_path}: {e}"
             self.error_handler.handle_ocr_error(OCRError(error_msg), {'image_path': image_path})
             raise OCRError(error_msg)
     
+    def extract_text_from_bytes(self, image_data: bytes, source: str = '<memory>') -> Dict[str, Any]:
+        """
+        Extract text with metadata from an encoded image held in memory.
+        
+        Args:
+            image_data: Encoded image (PNG, JPEG, ...)
+            source: Name reported as input_path in the result
+            
+        Returns:
+            Dict: Same structure as extract_text_with_metadata
+        """
+        start_time = time.time()
+        
+        try:
+            image = self._preprocess_image(self.decode_image(image_data))
+            return self._recognize(image, source, start_time)
+            
+        except Exception as e:
+            error_msg = f"OCR extraction failed for {source}: {e}"
+            self.error_handler.handle_ocr_error(OCRError(error_msg), {'image_path': source})
+            raise OCRError(error_msg)
+    
+    def decode_image(self, image_data: bytes) -> Image.Image:
+        """
+        Decode an in-memory image, refusing images larger than max_image_pixels.
+        
+        The dimensions are read from the header before any pixel data is decoded.
+        
+        Args:
+            image_data: Encoded image bytes
+            
+        Returns:
+            PIL.Image: Decoded image
+        """
+        try:
+            image = Image.open(io.BytesIO(image_data))
+        except Exception as e:
+            raise OCRError(f"Unrecognized image data: {e}")
+        
+        width, height = image.size
+        if self.max_image_pixels and width * height > self.max_image_pixels:
+            raise OCRError(f"Image too large: {width}x{height} exceeds {self.max_image_pixels} pixels")
+        
+        image.load()
+        return image
+    
+    def _recognize(self, image: Image.Image, input_path: str, start_time: float) -> Dict[str, Any]:
+        """Run OCR on a preprocessed image and build the result dictionary."""
+        # Load model if not already loaded
+        self._load_model()
+        
+        # Extract text data
+        text_data = self._extract_text_data(image)
+        
+        # Calculate processing statistics
+        processing_time = time.time() - start_time
+        
+        # Build result dictionary
+        return {
+            'input_path': input_path,
+            'timestamp': datetime.now().isoformat(),
+            'processing_time': processing_time,
+            'text': self._format_text_output(text_data),
+            'text_blocks': self._organize_text_blocks(text_data),
+            'confidence_scores': self._extract_confidence_scores(text_data),
+            'statistics': {
+                'total_words': len(self._extract_words(text_data)),
+                'total_lines': len([line for line in self._extract_lines(text_data) if line.strip()]),
+                'average_confidence': self._calculate_average_confidence(text_data),
+                'high_confidence_words': self._count_high_confidence_words(text_data),
+                'low_confidence_words': self._count_low_confidence_words(text_data)
+            },
+            'metadata': {
+                'image_size': image.size,
+                'image_mode': image.mode,
+                'easyocr_config': {
+                    'languages': self.languages,
+                    'gpu': self.gpu,
+                    'confidence_threshold': self.confidence_threshold,
+                    'model_storage_directory': self.model_storage_directory
+                },
+                'preprocessing_applied': {
+                    'max_image_size': self.max_image_size,
+                    'use_grayscale': self.use_grayscale,
+                    'use_binarization': self.use_binarization
+                }
+            }
+        }
+    
     def extract_batch(self, image_paths: List[str]) -> Dict[str, Any]:
         """
         Extract text from multiple images in batch.
@@ -209,34 +310,102 @@ class EasyOCRProcessor:
             Dict: Batch extraction results with statistics
         """
         start_time = time.time()
-        results = []
-        failed_files = []
-        
-        # Process in batches
-        for i in range(0, len(image_paths), self.batch_size):
-            batch_paths = image_paths[i:i + self.batch_size]
-            batch_start = time.time()
-            
-            for image_path in batch_paths:
-                try:
-                    print(f"Processing {i + 1}/{len(image_paths)}: {image_path}")
-                    result = self.extract_text_with_metadata(image_path)
-                    results.append(result)
-                except Exception as e:
-                    print(f"Failed to process {image_path}: {e}")
-                    failed_files.append(image_path)
-                    results.append({
-                        'input_path': image_path,
-                        'error': str(e),
-                        'timestamp': datetime.now().isoformat()
-                    })
-            
-            batch_time = time.time() - batch_start
-            print(f"Batch {i//self.batch_size + 1} completed in {batch_time:.2f} seconds")
-        
-        # Calculate batch statistics
-        batch_time = time.time() - start_time
-        successful_files = len([r for r in results if 'error' not in r])
+        results = [None] * len(image_paths)
+        for index, result in self._run_batch(image_paths):
+            results[index] = result
+        return self.summarize_batch(results, time.time() - start_time)
+    
+    def iter_extract_batch(self, image_paths: List[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Extract text from multiple images, yielding each result as soon as it completes.
+        
+        Results arrive in completion order. Failed images yield a dict with
+        input_path, error and timestamp.
+        
+        Args:
+            image_paths: List of image file paths
+            
+        Yields:
+            Dict: Per-image OCR result
+        """
+        for _, result in self._run_batch(image_paths):
+            yield result
+    
+    def _run_batch(self, image_paths: List[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Batch pipeline: loading and preprocessing are prefetched on prefetch_workers
+        threads while recognition runs on reader_instances threads, each with its
+        own resident reader. At most batch_size images are in flight.
+        """
+        if not image_paths:
+            return
+        
+        # Load the first reader before any image is decoded
+        self._load_model()
+        
+        window = max(self.batch_size, self.prefetch_workers + self.reader_instances)
+        pending = iter(enumerate(image_paths))
+        loading = {}
+        recognizing = {}
+        completed = 0
+        
+        with ThreadPoolExecutor(max_workers=self.prefetch_workers, thread_name_prefix='ocr-prefetch') as loaders, \
+                ThreadPoolExecutor(max_workers=self.reader_instances, thread_name_prefix='ocr-recognize') as recognizers:
+            
+            def fill_window():
+                while len(loading) + len(recognizing) < window:
+                    item = next(pending, None)
+                    if item is None:
+                        return
+                    index, image_path = item
+                    loading[loaders.submit(self._load_and_preprocess_image, image_path)] = (index, image_path, time.time())
+            
+            fill_window()
+            while loading or recognizing:
+                done, _ = wait(list(loading) + list(recognizing), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in loading:
+                        index, image_path, start_time = loading.pop(future)
+                        try:
+                            image = future.result()
+                        except Exception as e:
+                            completed += 1
+                            yield index, self._batch_error(image_path, e)
+                            continue
+                        recognizing[recognizers.submit(self._recognize, image, image_path, start_time)] = (index, image_path)
+                    else:
+                        index, image_path = recognizing.pop(future)
+                        completed += 1
+                        try:
+                            result = future.result()
+                            print(f"Processed {completed}/{len(image_paths)}: {image_path}")
+                        except Exception as e:
+                            result = self._batch_error(image_path, e)
+                        yield index, result
+                fill_window()
+    
+    def _batch_error(self, image_path: str, error: Exception) -> Dict[str, Any]:
+        """Result entry for an image that failed in a batch."""
+        print(f"Failed to process {image_path}: {error}")
+        return {
+            'input_path': image_path,
+            'error': str(error),
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def summarize_batch(self, results: List[Dict[str, Any]], batch_time: float) -> Dict[str, Any]:
+        """
+        Build the batch result with aggregate statistics from per-image results.
+        
+        Args:
+            results: Per-image results
+            batch_time: Wall-clock time of the batch in seconds
+            
+        Returns:
+            Dict: Batch extraction results with statistics
+        """
+        failed_files = [r['input_path'] for r in results if 'error' in r]
+        successful_files = len(results) - len(failed_files)
         
         # Aggregate statistics
         total_words = sum(r.get('statistics', {}).get('total_words', 0) for r in results if 'error' not in r)
@@ -247,19 +416,21 @@ class EasyOCRProcessor:
         batch_result = {
             'batch_timestamp': datetime.now().isoformat(),
             'total_processing_time': batch_time,
-            'total_files': len(image_paths),
+            'total_files': len(results),
             'successful_files': successful_files,
             'failed_files': len(failed_files),
-            'success_rate': (successful_files / len(image_paths)) * 100 if image_paths else 0,
+            'success_rate': (successful_files / len(results)) * 100 if results else 0,
             'failed_file_paths': failed_files,
             'results': results,
             'batch_statistics': {
                 'total_words_extracted': total_words,
                 'total_lines_extracted': total_lines,
                 'average_confidence': avg_confidence,
-                'average_processing_time': batch_time / len(image_paths) if image_paths else 0,
+                'average_processing_time': batch_time / len(results) if results else 0,
                 'batch_size': self.batch_size,
-                'batches_processed': (len(image_paths) + self.batch_size - 1) // self.batch_size
+                'batches_processed': (len(results) + self.batch_size - 1) // self.batch_size,
+                'prefetch_workers': self.prefetch_workers,
+                'reader_instances': self.reader_instances
             }
         }
         
@@ -339,26 +510,31 @@ class EasyOCRProcessor:
             image_array = np.array(image)
             
             # Extract text with EasyOCR
-            results = self.reader.readtext(
-                image_array,
-                decoder='beamsearch',
-                beamWidth=5,
-                batch_size=1,
-                workers=1 if not self.gpu else 0,
-                allowlist=None,
-                blocklist=None,
-                detail=1,
-                rotation_info=[0],
-                y_ths=0.5,
-                x_ths=0.5,
-                contrast_ths=0.1,
-                adjust_contrast=0.0,
-                filter_ths=0.1,
-                text_threshold=self.confidence_threshold / 100.0,
-                link_threshold=0.4,
-                low_text=0.4,
-                output_format='dict'
-            )
+            idle_readers = self._idle_readers
+            reader = self._acquire_reader()
+            try:
+                results = reader.readtext(
+                    image_array,
+                    decoder='beamsearch',
+                    beamWidth=5,
+                    batch_size=1,
+                    workers=1 if not self.gpu else 0,
+                    allowlist=None,
+                    blocklist=None,
+                    detail=1,
+                    rotation_info=[0],
+                    y_ths=0.5,
+                    x_ths=0.5,
+                    contrast_ths=0.1,
+                    adjust_contrast=0.0,
+                    filter_ths=0.1,
+                    text_threshold=self.confidence_threshold / 100.0,
+                    link_threshold=0.4,
+                    low_text=0.4,
+                    output_format='dict'
+                )
+            finally:
+                idle_readers.put(reader)
             
             return results
             
@@ -500,8 +676,12 @@ class EasyOCRProcessor:
             test_image_array = np.array(test_image)
             
             # Load model and test
-            self._load_model()
-            results = self.reader.readtext(test_image_array)
+            idle_readers = self._idle_readers
+            reader = self._acquire_reader()
+            try:
+                results = reader.readtext(test_image_array)
+            finally:
+                idle_readers.put(reader)
             
             return True
             
@@ -513,15 +693,13 @@ class EasyOCRProcessor:
         """Set OCR languages."""
         self.languages = languages
         # Reset model to reload with new languages
-        self.model_loaded = False
-        self.reader = None
+        self._reset_readers()
     
     def set_gpu(self, gpu: bool) -> None:
         """Enable/disable GPU usage."""
         self.gpu = gpu
         # Reset model to apply GPU setting
-        self.model_loaded = False
-        self.reader = None
+        self._reset_readers()
     
     def set_confidence_threshold(self, threshold: int) -> None:
         """Set confidence threshold."""
@@ -534,8 +712,7 @@ class EasyOCRProcessor:
         """Set model storage directory."""
         self.model_storage_directory = directory
         # Reset model to use new directory
-        self.model_loaded = False
-        self.reader = None
+        self._reset_readers()
     
     def get_processor_info(self) -> Dict[str, Any]:
         """Get processor information and configuration."""
@@ -553,6 +730,8 @@ class EasyOCRProcessor:
             },
             'batch_settings': {
                 'batch_size': self.batch_size,
-                'batch_timeout': self.batch_timeout
+                'batch_timeout': self.batch_timeout,
+                'prefetch_workers': self.prefetch_workers,
+                'reader_instances': self.reader_instances
             }
         }
\ No newline at end of file
@@ -2,7 +2,8 @@
 Everything Search MCP Server
 
 This module provides the MCP (Model Context Protocol) server for Everything Search.
-It handles MCP protocol communication and exposes file search functionality through the Everything SDK.
+It handles MCP protocol communication and exposes file search functionality through the Everything SDK,
+or through a native file index on hosts where the SDK is not available.
 
 Author: Kilo Code
 Version: 1.0.0
@@ -14,6 +15,7 @@ import json
 import logging
 import asyncio
 import ctypes
+import shutil
 from typing import Dict, Any, List, Optional, Union
 from pathlib import Path
 from datetime import datetime
@@ -32,12 +34,14 @@ except ImportError:
     print("MCP package not found. Please install MCP dependencies.")
     sys.exit(1)
 
-# Everything SDK imports
+# Everything SDK imports (optional; the native file index is used without it)
 try:
     import everything_sdk
 except ImportError:
-    print("Everything SDK not found. Please install everything-sdk.")
-    sys.exit(1)
+    everything_sdk = None
+
+# Local imports
+from file_index import FileIndex
 
 
 class EverythingSearchMCPServer:
@@ -55,6 +59,10 @@ class EverythingSearchMCPServer:
         """
         self.config_path = config_path
         self.logger = logging.getLogger(__name__)
+        self.config = self._load_config(config_path)
+        self.sdk_path = None
+        self.sdk_available = False
+        self.file_index = None
         
         # Initialize MCP server
         self.mcp = FastMCP("Everything Search MCP Server")
@@ -62,8 +70,12 @@ class EverythingSearchMCPServer:
         # Setup logging
         self._setup_logging()
         
-        # Initialize Everything SDK
-        self._initialize_everything_sdk()
+        # Initialize the search backend
+        backend = self.config.get('everything_search', {}).get('backend', 'auto')
+        if backend == 'sdk' or (backend == 'auto' and everything_sdk is not None and os.name == 'nt'):
+            self._initialize_everything_sdk()
+        else:
+            self._initialize_file_index()
         
         # Register tools
         self._register_tools()
@@ -90,6 +102,36 @@ class EverythingSearchMCPServer:
             # Fallback to basic logging
             logging.basicConfig(level=logging.INFO)
     
+    @staticmethod
+    def _load_config(config_path: Optional[str]) -> Dict[str, Any]:
+        """Load the JSON configuration file, if any."""
+        if not config_path or not os.path.exists(config_path):
+            return {}
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _initialize_file_index(self) -> None:
+        """Open the native file index and build or refresh it in the background."""
+        try:
+            index_config = self.config.get('file_index', {})
+            roots = index_config.get('roots') or [os.path.expanduser('~')]
+            
+            self.file_index = FileIndex(
+                db_path=os.path.expanduser(index_config.get('db_path', '~/.cache/everything-search-mcp/index.sqlite')),
+                roots=[os.path.expanduser(root) for root in roots],
+                workers=index_config.get('crawl_workers', 8),
+                exclude=index_config.get('exclude_dirs', []),
+                use_inotify=index_config.get('use_inotify', True)
+            )
+            # Queries are served from the stored or partially built index meanwhile
+            self.file_index.start(index_config.get('refresh_interval', 60))
+            self.logger.info(f"Native file index opened with {len(self.file_index):,} stored entries, "
+                             f"indexing {self.file_index.roots} in the background")
+            
+        except Exception as e:
+            self.logger.error(f"Failed to initialize file index: {e}")
+            raise
+    
     def _initialize_everything_sdk(self) -> None:
         """Initialize the Everything SDK with configuration."""
         try:
@@ -156,11 +198,13 @@ class EverythingSearchMCPServer:
         try:
             self.logger.info(f"Searching for files with query: {query}")
             
-            if not self.sdk_available:
-                raise RuntimeError("Everything SDK is not available")
-            
             # Perform search
-            results = everything_sdk.search(query, max_results)
+            if self.file_index is not None:
+                results = self.file_index.search(query, max_results)
+            else:
+                if not self.sdk_available:
+                    raise RuntimeError("Everything SDK is not available")
+                results = everything_sdk.search(query, max_results)
             
             # Format results
             formatted_results = []
@@ -180,6 +224,7 @@ class EverythingSearchMCPServer:
                 'query': query,
                 'results': formatted_results,
                 'total_count': len(formatted_results),
+                'index_status': self._index_status(),
                 'timestamp': datetime.now().isoformat()
             }
             
@@ -207,16 +252,25 @@ class EverythingSearchMCPServer:
         try:
             self.logger.info(f"Advanced search for files with query: {query}")
             
-            if not self.sdk_available:
-                raise RuntimeError("Everything SDK is not available")
-            
-            # Set search options
-            everything_sdk.set_case_sensitive(case_sensitive)
-            everything_sdk.set_whole_word(whole_word)
-            everything_sdk.set_regex(regex)
-            
-            # Perform search
-            results = everything_sdk.search(query, max_results)
+            if self.file_index is not None:
+                results = self.file_index.search(query, max_results, case_sensitive=case_sensitive,
+                                                 whole_word=whole_word, regex=regex)
+            else:
+                if not self.sdk_available:
+                    raise RuntimeError("Everything SDK is not available")
+                
+                # Set search options
+                everything_sdk.set_case_sensitive(case_sensitive)
+                everything_sdk.set_whole_word(whole_word)
+                everything_sdk.set_regex(regex)
+                
+                # Perform search
+                results = everything_sdk.search(query, max_results)
+                
+                # Reset search options
+                everything_sdk.set_case_sensitive(False)
+                everything_sdk.set_whole_word(False)
+                everything_sdk.set_regex(False)
             
             # Format results
             formatted_results = []
@@ -230,17 +284,13 @@ class EverythingSearchMCPServer:
                     'is_directory': result.get('is_directory', False)
                 })
             
-            # Reset search options
-            everything_sdk.set_case_sensitive(False)
-            everything_sdk.set_whole_word(False)
-            everything_sdk.set_regex(False)
-            
             self.logger.info(f"Found {len(formatted_results)} results for advanced query: {query}")
             
             return {
                 'query': query,
                 'results': formatted_results,
                 'total_count': len(formatted_results),
+                'index_status': self._index_status(),
                 'options': {
                     'case_sensitive': case_sensitive,
                     'whole_word': whole_word,
@@ -266,11 +316,13 @@ class EverythingSearchMCPServer:
         try:
             self.logger.info(f"Getting file info for: {file_path}")
             
-            if not self.sdk_available:
-                raise RuntimeError("Everything SDK is not available")
-            
             # Get file information
-            info = everything_sdk.get_file_info(file_path)
+            if self.file_index is not None:
+                info = self._stat_file_info(file_path)
+            else:
+                if not self.sdk_available:
+                    raise RuntimeError("Everything SDK is not available")
+                info = everything_sdk.get_file_info(file_path)
             
             if not info:
                 raise FileNotFoundError(f"File not found: {file_path}")
@@ -306,11 +358,13 @@ class EverythingSearchMCPServer:
         try:
             self.logger.info("Listing available drives")
             
-            if not self.sdk_available:
-                raise RuntimeError("Everything SDK is not available")
-            
-            # Get drives
-            drives = everything_sdk.list_drives()
+            # Get drives (the indexed roots for the native index)
+            if self.file_index is not None:
+                drives = self._index_roots_info()
+            else:
+                if not self.sdk_available:
+                    raise RuntimeError("Everything SDK is not available")
+                drives = everything_sdk.list_drives()
             
             formatted_drives = []
             for drive in drives:
@@ -345,12 +399,14 @@ class EverythingSearchMCPServer:
         try:
             self.logger.info(f"Searching for files with extension: {extension}")
             
-            if not self.sdk_available:
-                raise RuntimeError("Everything SDK is not available")
-            
             # Perform search by extension
-            query = f"*.{extension}"
-            results = everything_sdk.search(query, max_results)
+            if self.file_index is not None:
+                results = self.file_index.search_by_extension(extension, max_results)
+            else:
+                if not self.sdk_available:
+                    raise RuntimeError("Everything SDK is not available")
+                query = f"*.{extension}"
+                results = everything_sdk.search(query, max_results)
             
             # Format results
             formatted_results = []
@@ -370,6 +426,7 @@ class EverythingSearchMCPServer:
                 'extension': extension,
                 'results': formatted_results,
                 'total_count': len(formatted_results),
+                'index_status': self._index_status(),
                 'timestamp': datetime.now().isoformat()
             }
             
@@ -394,7 +451,7 @@ class EverythingSearchMCPServer:
         try:
             self.logger.info(f"Searching for files by size: {min_size}-{max_size} {size_unit}")
             
-            if not self.sdk_available:
+            if self.file_index is None and not self.sdk_available:
                 raise RuntimeError("Everything SDK is not available")
             
             # Convert size to bytes
@@ -410,7 +467,10 @@ class EverythingSearchMCPServer:
             max_bytes = max_size * multiplier if max_size else None
             
             # Perform search
-            results = everything_sdk.search_by_size(min_bytes, max_bytes, max_results)
+            if self.file_index is not None:
+                results = self.file_index.search_by_size(min_bytes, max_bytes, max_results)
+            else:
+                results = everything_sdk.search_by_size(min_bytes, max_bytes, max_results)
             
             # Format results
             formatted_results = []
@@ -434,6 +494,7 @@ class EverythingSearchMCPServer:
                 },
                 'results': formatted_results,
                 'total_count': len(formatted_results),
+                'index_status': self._index_status(),
                 'timestamp': datetime.now().isoformat()
             }
             
@@ -458,7 +519,7 @@ class EverythingSearchMCPServer:
         try:
             self.logger.info(f"Searching for files by date: {date_from} to {date_to}")
             
-            if not self.sdk_available:
+            if self.file_index is None and not self.sdk_available:
                 raise RuntimeError("Everything SDK is not available")
             
             # Parse dates
@@ -471,7 +532,14 @@ class EverythingSearchMCPServer:
                 to_date = datetime.strptime(date_to, date_format)
             
             # Perform search
-            results = everything_sdk.search_by_date(from_date, to_date, max_results)
+            if self.file_index is not None:
+                # A date without a time of day includes the whole day
+                end = None
+                if to_date:
+                    end = to_date.timestamp() + (86400 if to_date == datetime.combine(to_date.date(), datetime.min.time()) else 0)
+                results = self.file_index.search_by_mtime(from_date.timestamp() if from_date else None, end, max_results)
+            else:
+                results = everything_sdk.search_by_date(from_date, to_date, max_results)
             
             # Format results
             formatted_results = []
@@ -495,6 +563,7 @@ class EverythingSearchMCPServer:
                 },
                 'results': formatted_results,
                 'total_count': len(formatted_results),
+                'index_status': self._index_status(),
                 'timestamp': datetime.now().isoformat()
             }
             
@@ -519,6 +588,17 @@ class EverythingSearchMCPServer:
                 'error_message': None
             }
             
+            if self.file_index is not None:
+                result = {
+                    'valid': True,
+                    'sdk_info': sdk_info,
+                    'backend': 'native',
+                    'index': self.file_index.get_statistics(),
+                    'timestamp': datetime.now().isoformat()
+                }
+                self.logger.info("Native file index in use")
+                return result
+            
             if self.sdk_available:
                 try:
                     # Try to get SDK version
@@ -542,6 +622,47 @@ class EverythingSearchMCPServer:
             self.logger.error(f"Failed to validate SDK installation: {e}")
             raise
     
+    def _index_status(self) -> Optional[str]:
+        """'indexing' while the native index is being built and results may be incomplete, then 'ready'."""
+        if self.file_index is None:
+            return None
+        return 'ready' if self.file_index.ready else 'indexing'
+    
+    def _stat_file_info(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """File information from os.stat, in the Everything SDK's format."""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        
+        name = os.path.basename(file_path)
+        is_directory = os.path.isdir(file_path)
+        return {
+            'name': name,
+            'size': 0 if is_directory else stat.st_size,
+            'modified': datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            'created': datetime.fromtimestamp(stat.st_ctime).isoformat(),
+            'accessed': datetime.fromtimestamp(stat.st_atime).isoformat(),
+            'extension': '' if is_directory else os.path.splitext(name)[1][1:].lower(),
+            'is_directory': is_directory,
+            'is_hidden': name.startswith('.'),
+            'is_system': False,
+            'is_readonly': not os.access(file_path, os.W_OK)
+        }
+    
+    def _index_roots_info(self) -> List[Dict[str, Any]]:
+        """Indexed roots with their file system usage, in the Everything SDK's drive format."""
+        drives = []
+        for root in self.file_index.roots:
+            try:
+                usage = shutil.disk_usage(root)
+                drives.append({'name': os.path.basename(root) or root, 'path': root, 'type': 'fixed',
+                               'size': usage.total, 'free_space': usage.free, 'is_ready': True})
+            except OSError:
+                drives.append({'name': os.path.basename(root) or root, 'path': root, 'type': 'fixed',
+                               'size': 0, 'free_space': 0, 'is_ready': False})
+        return drives
+    
     async def start_server(self) -> None:
         """Start the MCP server."""
         try:
@@ -567,11 +688,13 @@ class EverythingSearchMCPServer:
             'description': 'MCP server for Everything Search with fast local file search',
             'author': 'Kilo Code',
             'config_path': self.config_path,
+            'backend': 'native' if self.file_index is not None else 'sdk',
             'sdk_info': {
                 'sdk_path': self.sdk_path,
                 'sdk_available': self.sdk_available,
                 'sdk_version': None
-            }
+            },
+            'index_info': self.file_index.get_statistics() if self.file_index is not None else None
         }
 
 
@@ -0,0 +1,757 @@
+"""
+Native File Index
+
+This module provides a persistent file index for hosts without the Everything SDK.
+Entries (path, size, mtime, extension) are crawled with parallel os.scandir calls,
+stored in SQLite, and kept current either from inotify events (Linux) or by
+comparing directory mtimes. Queries are answered from in-memory indexes built
+from the database: name trigram posting lists, per-extension lists and arrays
+sorted by size and by mtime.
+
+Author: Kilo Code
+Version: 1.0.0
+"""
+
+import os
+import re
+import bisect
+import ctypes
+import ctypes.util
+import fnmatch
+import logging
+import select
+import sqlite3
+import struct
+import threading
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# Rebuild the in-memory indexes once this share of slots belongs to removed files
+COMPACT_RATIO = 0.25
+
+# Re-sort the size and mtime orderings instead of editing them after this many changes
+MAX_SORTED_EDITS = 5000
+
+# A scanned directory: (path, mtime_ns, [(entry_path, size, mtime, is_dir), ...])
+ScannedDirectory = Tuple[str, int, List[Tuple[str, int, float, bool]]]
+
+
+def _scan_directory(path: str, exclude: Set[str]) -> Optional[ScannedDirectory]:
+    """List one directory; None if it cannot be read."""
+    try:
+        dir_mtime = os.stat(path).st_mtime_ns
+        entries = []
+        with os.scandir(path) as iterator:
+            for entry in iterator:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if is_dir and entry.name in exclude:
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                entries.append((entry.path, 0 if is_dir else stat.st_size, stat.st_mtime, is_dir))
+        return path, dir_mtime, entries
+    except OSError:
+        return None
+
+
+def _trigrams(name: str) -> Set[str]:
+    """Distinct three-character substrings of a name."""
+    return {name[i:i + 3] for i in range(len(name) - 2)}
+
+
+def _extension(name: str) -> str:
+    """Lowercase extension without the dot."""
+    return os.path.splitext(name)[1][1:].lower()
+
+
+class _InotifyWatcher:
+    """
+    Collects the directories with changes reported by inotify.
+
+    A directory is marked dirty when an entry in it is created, deleted, moved,
+    written or has its attributes changed. If the event queue overflows or a
+    watch cannot be added (fs.inotify.max_user_watches), the watcher reports
+    itself unreliable and the index falls back to mtime comparison.
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_DONT_FOLLOW = 0x02000000
+
+    MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+            IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c')
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self._lock = threading.Lock()
+        self._watches: Dict[int, str] = {}
+        self._dirty: Set[str] = set()
+        self.reliable = True
+        self._watch_failed = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='file-index-inotify', daemon=True)
+        self._thread.start()
+
+    def add(self, path: str) -> None:
+        """Watch a directory."""
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self.MASK)
+        with self._lock:
+            if wd < 0:
+                self.reliable = False
+                self._watch_failed = True
+            else:
+                self._watches[wd] = path
+
+    def take(self) -> Tuple[Set[str], bool]:
+        """Return and clear the dirty directories, and whether they are complete."""
+        with self._lock:
+            dirty, reliable = self._dirty, self.reliable
+            self._dirty = set()
+            return dirty, reliable
+
+    def reset(self) -> None:
+        """Mark the watcher reliable again after a full mtime comparison, unless a watch is missing."""
+        with self._lock:
+            self.reliable = not self._watch_failed
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._fd], [], [], 1.0)
+            if not readable:
+                continue
+            try:
+                data = os.read(self._fd, 1 << 16)
+            except BlockingIOError:
+                continue
+            except OSError:
+                return
+
+            offset = 0
+            with self._lock:
+                while offset < len(data):
+                    wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+                    offset += self.EVENT_HEADER.size + length
+                    if mask & self.IN_Q_OVERFLOW:
+                        self.reliable = False
+                        continue
+                    path = self._watches.get(wd)
+                    if path is None:
+                        continue
+                    if mask & self.IN_IGNORED:
+                        del self._watches[wd]
+                    elif mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                        self._dirty.add(os.path.dirname(path))
+                    else:
+                        self._dirty.add(path)
+
+    def close(self) -> None:
+        """Stop watching."""
+        self._stop.set()
+        self._thread.join(timeout=5)
+        os.close(self._fd)
+
+
+class FileIndex:
+    """
+    Persistent index of the files under a set of root directories.
+
+    The database holds one row per entry and the mtime of every indexed
+    directory. On load the rows are turned into column arrays addressed by a
+    slot number, with name trigram and extension posting lists of slots in
+    ascending order. Removed entries leave empty slots until the indexes are
+    compacted. Size and mtime orderings are sorted lazily after changes.
+    """
+
+    def __init__(self, db_path: str, roots: Iterable[str], workers: int = 8,
+                 exclude: Iterable[str] = (), use_inotify: bool = True):
+        """
+        Initialize the index, loading entries already stored in the database.
+
+        Args:
+            db_path: SQLite database file
+            roots: Directories to index
+            workers: Threads used to crawl directories
+            exclude: Directory names that are not descended into
+            use_inotify: Follow changes with inotify where available
+        """
+        self.db_path = db_path
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.workers = workers
+        self.exclude = set(exclude)
+        self.use_inotify = use_inotify
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._watcher: Optional[_InotifyWatcher] = None
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._refresh_stop = threading.Event()
+        # Set once a build or refresh has brought the index up to date
+        self._ready = threading.Event()
+        self.last_refresh: Optional[datetime] = None
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                parent TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                is_dir INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS files_parent ON files (parent);
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL
+            );
+        """)
+
+        self._load()
+
+    # ------------------------------------------------------------------
+    # In-memory indexes
+
+    def _reset_memory(self) -> None:
+        self._paths: List[Optional[str]] = []
+        self._names: List[str] = []
+        self._sizes = array('q')
+        self._mtimes = array('d')
+        self._is_dir = bytearray()
+        self._slots: Dict[str, int] = {}
+        self._trigrams: Dict[str, array] = {}
+        self._extensions: Dict[str, array] = {}
+        self._dir_mtimes: Dict[str, int] = {}
+        self._removed = 0
+        self._by_size: Optional[Tuple[array, array]] = None
+        self._by_mtime: Optional[Tuple[array, array]] = None
+        self._name_blob: Optional[Tuple[str, array]] = None
+        self._sorted_edits = 0
+
+    def _load(self) -> None:
+        """Build the in-memory indexes from the database."""
+        with self._lock:
+            self._reset_memory()
+            for path, size, mtime, is_dir in self._db.execute("SELECT path, size, mtime, is_dir FROM files"):
+                self._add(path, size, mtime, bool(is_dir))
+            self._dir_mtimes = dict(self._db.execute("SELECT path, mtime_ns FROM dirs"))
+            self._sort_orderings()
+
+    def _add(self, path: str, size: int, mtime: float, is_dir: bool) -> None:
+        slot = len(self._paths)
+        name = os.path.basename(path).lower()
+        self._paths.append(path)
+        self._names.append(name)
+        self._sizes.append(size)
+        self._mtimes.append(mtime)
+        self._is_dir.append(is_dir)
+        self._slots[path] = slot
+        for trigram in _trigrams(name):
+            postings = self._trigrams.get(trigram)
+            if postings is None:
+                postings = self._trigrams[trigram] = array('I')
+            postings.append(slot)
+        if not is_dir:
+            extension = _extension(name)
+            postings = self._extensions.get(extension)
+            if postings is None:
+                postings = self._extensions[extension] = array('I')
+            postings.append(slot)
+            self._sorted_insert(self._by_size, size, slot)
+            self._sorted_insert(self._by_mtime, mtime, slot)
+        self._name_blob = None
+
+    def _discard(self, path: str) -> None:
+        slot = self._slots.pop(path, None)
+        if slot is None:
+            return
+        if not self._is_dir[slot]:
+            self._sorted_remove(self._by_size, self._sizes[slot], slot)
+            self._sorted_remove(self._by_mtime, self._mtimes[slot], slot)
+        self._paths[slot] = None
+        self._removed += 1
+
+    def _update(self, path: str, size: int, mtime: float) -> None:
+        slot = self._slots[path]
+        if not self._is_dir[slot]:
+            self._sorted_remove(self._by_size, self._sizes[slot], slot)
+            self._sorted_remove(self._by_mtime, self._mtimes[slot], slot)
+            self._sorted_insert(self._by_size, size, slot)
+            self._sorted_insert(self._by_mtime, mtime, slot)
+        self._sizes[slot] = size
+        self._mtimes[slot] = mtime
+
+    def _sort_orderings(self) -> None:
+        """Sort live files by size and by mtime."""
+        self._by_size = self._sorted_by(self._sizes)
+        self._by_mtime = self._sorted_by(self._mtimes)
+        self._sorted_edits = 0
+
+    def _sorted_insert(self, ordering: Optional[Tuple[array, array]], value: float, slot: int) -> None:
+        if ordering is not None and self._count_sorted_edit():
+            slots, values = ordering
+            position = bisect.bisect_right(values, value)
+            values.insert(position, value)
+            slots.insert(position, slot)
+
+    def _sorted_remove(self, ordering: Optional[Tuple[array, array]], value: float, slot: int) -> None:
+        if ordering is not None and self._count_sorted_edit():
+            slots, values = ordering
+            position = bisect.bisect_left(values, value)
+            while slots[position] != slot:
+                position += 1
+            del values[position]
+            del slots[position]
+
+    def _count_sorted_edit(self) -> bool:
+        """Count an edit of the orderings; past MAX_SORTED_EDITS drop them to be re-sorted instead."""
+        self._sorted_edits += 1
+        if self._sorted_edits > MAX_SORTED_EDITS:
+            self._by_size = self._by_mtime = None
+            return False
+        return True
+
+    def _sorted_by(self, values: array) -> Tuple[array, array]:
+        """Slots of live files ordered by a column, and the column values in that order."""
+        slots = sorted((slot for slot, path in enumerate(self._paths) if path is not None and not self._is_dir[slot]),
+                       key=values.__getitem__)
+        return array('I', slots), array(values.typecode, (values[slot] for slot in slots))
+
+    # ------------------------------------------------------------------
+    # Crawling and refreshing
+
+    def _crawl(self, directories: Iterable[str], descend: Callable[[str], bool]) -> Iterator[ScannedDirectory]:
+        """Scan directories on the worker pool, following subdirectories accepted by descend."""
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='file-index-scan') as pool:
+            pending = {pool.submit(_scan_directory, path, self.exclude) for path in directories}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    scanned = future.result()
+                    if scanned is None:
+                        continue
+                    for entry_path, _, _, is_dir in scanned[2]:
+                        if is_dir and descend(entry_path):
+                            pending.add(pool.submit(_scan_directory, entry_path, self.exclude))
+                    yield scanned
+
+    def _apply(self, scanned: ScannedDirectory, counts: Dict[str, int]) -> None:
+        """Bring the stored children of a scanned directory in line with its listing. Caller holds the lock."""
+        dir_path, dir_mtime, entries = scanned
+        current = {path: (size, mtime, is_dir) for path, size, mtime, is_dir in entries}
+        stored = {
+            path: (size, mtime, bool(is_dir))
+            for path, size, mtime, is_dir in self._db.execute(
+                "SELECT path, size, mtime, is_dir FROM files WHERE parent = ?", (dir_path,))
+        }
+
+        for path, (_, _, is_dir) in stored.items():
+            if path not in current:
+                if is_dir:
+                    self._remove_tree(path, counts)
+                self._db.execute("DELETE FROM files WHERE path = ?", (path,))
+                self._discard(path)
+                counts['removed'] += 1
+
+        for path, (size, mtime, is_dir) in current.items():
+            previous = stored.get(path)
+            if previous == (size, mtime, is_dir):
+                continue
+            self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                             (path, dir_path, size, mtime, int(is_dir)))
+            if previous is None:
+                counts['added'] += 1
+            elif previous[2] == is_dir:
+                counts['updated'] += 1
+                self._update(path, size, mtime)
+                continue
+            else:
+                # Replaced by an entry of the other kind
+                if previous[2]:
+                    self._remove_tree(path, counts)
+                self._discard(path)
+                counts['updated'] += 1
+            self._add(path, size, mtime, is_dir)
+
+        self._db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (dir_path, dir_mtime))
+        self._dir_mtimes[dir_path] = dir_mtime
+        if self._watcher is not None:
+            self._watcher.add(dir_path)
+
+    def _remove_tree(self, dir_path: str, counts: Dict[str, int]) -> None:
+        """Remove everything stored below a directory. Caller holds the lock."""
+        prefix = dir_path.rstrip(os.sep) + os.sep
+        upper = prefix[:-1] + chr(ord(os.sep) + 1)
+        for (path,) in self._db.execute("SELECT path FROM files WHERE path >= ? AND path < ?", (prefix, upper)).fetchall():
+            self._discard(path)
+            counts['removed'] += 1
+        self._db.execute("DELETE FROM files WHERE path >= ? AND path < ?", (prefix, upper))
+        self._db.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (dir_path, prefix, upper))
+        for path in [path for path in self._dir_mtimes if path == dir_path or path.startswith(prefix)]:
+            del self._dir_mtimes[path]
+
+    def _update_directories(self, directories: Iterable[str], descend: Callable[[str], bool]) -> Dict[str, int]:
+        counts = {'directories': 0, 'added': 0, 'removed': 0, 'updated': 0}
+        pending_commit = 0
+        for scanned in self._crawl(directories, descend):
+            with self._lock:
+                self._apply(scanned, counts)
+                counts['directories'] += 1
+                pending_commit += 1
+                if pending_commit >= 500:
+                    self._db.commit()
+                    pending_commit = 0
+        with self._lock:
+            self._db.commit()
+            if self._removed > COMPACT_RATIO * max(len(self._paths), 1) and self._removed > 10000:
+                self._load()
+            elif self._by_size is None or self._by_mtime is None:
+                self._sort_orderings()
+            self._sorted_edits = 0
+        return counts
+
+    def build(self) -> Dict[str, int]:
+        """
+        Crawl all roots, replacing the stored index.
+
+        Returns:
+            Dict: Numbers of directories scanned and entries added
+        """
+        with self._refresh_lock:
+            self._start_watcher()
+            with self._lock:
+                self._db.execute("DELETE FROM files")
+                self._db.execute("DELETE FROM dirs")
+                self._db.commit()
+                self._reset_memory()
+            counts = self._update_directories(self.roots, lambda path: True)
+            self.last_refresh = datetime.now()
+            self._ready.set()
+            self.logger.info(f"Indexed {len(self):,} entries in {counts['directories']:,} directories")
+            return counts
+
+    def refresh(self, compare_mtimes: bool = False) -> Dict[str, int]:
+        """
+        Bring the index up to date.
+
+        Rescans the directories inotify reported as changed, or, without a
+        reliable watcher, the directories whose mtime differs from the stored
+        one. New subdirectories are crawled in full. Without inotify, content
+        changes to existing files are seen once their directory is rescanned.
+
+        Args:
+            compare_mtimes: Compare directory mtimes even if inotify is reliable
+
+        Returns:
+            Dict: Numbers of directories rescanned and entries added, removed and updated
+        """
+        with self._refresh_lock:
+            if not self._dir_mtimes:
+                return self.build()
+
+            dirty, reliable = self._watcher.take() if self._watcher is not None else (set(), False)
+            if compare_mtimes or not reliable:
+                dirty |= self._changed_directories()
+                if self._watcher is not None:
+                    self._watcher.reset()
+
+            known = set(self._dir_mtimes)
+            counts = self._update_directories(
+                sorted(path for path in dirty if path in known or path in self.roots),
+                lambda path: path not in known
+            )
+            self.last_refresh = datetime.now()
+            self._ready.set()
+            return counts
+
+    def _changed_directories(self) -> Set[str]:
+        """Directories whose mtime differs from the stored one, stat'ed in parallel."""
+        with self._lock:
+            stored = list(self._dir_mtimes.items())
+
+        def changed(item: Tuple[str, int]) -> bool:
+            try:
+                return os.stat(item[0]).st_mtime_ns != item[1]
+            except OSError:
+                return False  # removed; its parent's mtime changed as well
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='file-index-stat') as pool:
+            flags = pool.map(changed, stored, chunksize=256)
+            return {path for (path, _), flag in zip(stored, flags) if flag}
+
+    def _start_watcher(self) -> None:
+        if not self.use_inotify or self._watcher is not None or not hasattr(os, 'O_CLOEXEC'):
+            return
+        try:
+            self._watcher = _InotifyWatcher()
+        except (OSError, AttributeError, TypeError) as e:
+            self.logger.info(f"inotify unavailable, refreshing by mtime comparison: {e}")
+
+    def ensure_built(self) -> None:
+        """Build the index if nothing is stored yet, otherwise refresh it."""
+        if self._dir_mtimes:
+            self._start_watcher()
+            with self._lock:
+                directories = list(self._dir_mtimes)
+            if self._watcher is not None:
+                for path in directories:
+                    self._watcher.add(path)
+            # Changes made while nothing was watching show up as directory mtime changes
+            self.refresh(compare_mtimes=True)
+        else:
+            self.build()
+
+    def start(self, interval: float = 60.0) -> None:
+        """
+        Bring the index up to date, then refresh it every interval seconds, in a background thread.
+
+        Queries are answered from the stored index, or from the entries crawled
+        so far on a first build, while the index is being brought up to date.
+        """
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        self._refresh_stop.clear()
+
+        def loop():
+            if not self._ready.is_set():
+                try:
+                    self.ensure_built()
+                except Exception as e:
+                    self.logger.error(f"File index build failed: {e}")
+            while not self._refresh_stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    self.logger.error(f"File index refresh failed: {e}")
+
+        self._refresh_thread = threading.Thread(target=loop, name='file-index-refresh', daemon=True)
+        self._refresh_thread.start()
+
+    @property
+    def ready(self) -> bool:
+        """Whether a build or refresh has completed, so queries see every entry."""
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the index is up to date; returns False on timeout."""
+        return self._ready.wait(timeout)
+
+    def stop(self) -> None:
+        """Stop background refreshing and inotify watching."""
+        self._refresh_stop.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout=10)
+            self._refresh_thread = None
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+
+    def close(self) -> None:
+        """Stop refreshing and close the database."""
+        self.stop()
+        with self._lock:
+            self._db.close()
+
+    # ------------------------------------------------------------------
+    # Queries
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _entry(self, slot: int) -> Dict[str, Any]:
+        path = self._paths[slot]
+        name = os.path.basename(path)
+        is_dir = bool(self._is_dir[slot])
+        return {
+            'name': name,
+            'path': os.path.dirname(path),
+            'full_path': path,
+            'size': self._sizes[slot],
+            'modified': datetime.fromtimestamp(self._mtimes[slot]).isoformat(),
+            'extension': '' if is_dir else _extension(name),
+            'is_directory': is_dir
+        }
+
+    def _candidates(self, literals: List[str]) -> Iterable[int]:
+        """
+        Slots that may match, in ascending order.
+
+        With a literal of three or more characters this is its rarest trigram's
+        posting list; with only shorter literals, the names containing the longest
+        one, found with str.find over all names joined by NULs; otherwise every slot.
+        """
+        rarest = None
+        for literal in literals:
+            for trigram in _trigrams(literal):
+                slots = self._trigrams.get(trigram, ())
+                if rarest is None or len(slots) < len(rarest):
+                    rarest = slots
+        if rarest is not None:
+            return rarest
+
+        literals = [literal for literal in literals if literal]
+        if literals:
+            return self._scan_names(max(literals, key=len))
+        return range(len(self._paths))
+
+    def _scan_names(self, literal: str) -> Iterator[int]:
+        """Slots whose lowercase name contains a literal."""
+        if self._name_blob is None:
+            starts = array('I')
+            position = 0
+            for name in self._names:
+                starts.append(position)
+                position += len(name) + 1
+            self._name_blob = ('\0'.join(self._names), starts)
+        blob, starts = self._name_blob
+
+        last = -1
+        position = blob.find(literal)
+        while position != -1:
+            slot = bisect.bisect_right(starts, position) - 1
+            if slot != last:
+                yield slot
+                last = slot
+            position = blob.find(literal, position + 1)
+
+    def _term_matcher(self, term: str, case_sensitive: bool, whole_word: bool) -> Tuple[Callable[[int], bool], List[str]]:
+        """Predicate for one query term and the literal text usable for trigram lookup."""
+        in_path = os.sep in term or '/' in term
+        if not case_sensitive:
+            term = term.lower()
+
+        def text(slot: int) -> str:
+            if in_path:
+                path = self._paths[slot]
+                return path if case_sensitive else path.lower()
+            return os.path.basename(self._paths[slot]) if case_sensitive else self._names[slot]
+
+        if whole_word:
+            pattern = re.compile(r'\b' + re.escape(term) + r'\b')
+            literals = [] if in_path else [term.lower()]
+            return (lambda slot: pattern.search(text(slot)) is not None), literals
+
+        if '*' in term or '?' in term:
+            pattern = re.compile(fnmatch.translate(term))
+            literals = [] if in_path or '[' in term else [piece.lower() for piece in re.split(r'[*?]', term)]
+            return (lambda slot: pattern.match(text(slot)) is not None), literals
+
+        literals = [] if in_path else [term.lower()]
+        return (lambda slot: term in text(slot)), literals
+
+    def search(self, query: str, max_results: int = 100, case_sensitive: bool = False,
+               whole_word: bool = False, regex: bool = False) -> List[Dict[str, Any]]:
+        """
+        Find entries by name.
+
+        Space-separated terms must all match. A term is a substring of the name,
+        a wildcard pattern (* and ?) matched against the whole name, or, if it
+        contains a path separator, matched against the full path.
+
+        Args:
+            query: Search query
+            max_results: Maximum number of results
+            case_sensitive: Match case
+            whole_word: Match terms as whole words
+            regex: Treat the query as one regular expression searched in the name
+
+        Returns:
+            List: Matching entries
+        """
+        with self._lock:
+            if regex:
+                pattern = re.compile(query, 0 if case_sensitive else re.IGNORECASE)
+                matchers = [lambda slot: pattern.search(os.path.basename(self._paths[slot])) is not None]
+                literals = []
+            else:
+                matchers, literals = [], []
+                for term in query.split():
+                    matcher, term_literals = self._term_matcher(term, case_sensitive, whole_word)
+                    matchers.append(matcher)
+                    literals.extend(term_literals)
+
+            results = []
+            for slot in self._candidates(literals):
+                if self._paths[slot] is not None and all(matcher(slot) for matcher in matchers):
+                    results.append(self._entry(slot))
+                    if len(results) >= max_results:
+                        break
+            return results
+
+    def search_by_extension(self, extension: str, max_results: int = 100) -> List[Dict[str, Any]]:
+        """Find files with an extension (with or without the leading dot)."""
+        with self._lock:
+            results = []
+            for slot in self._extensions.get(extension.lower().lstrip('.'), ()):
+                if self._paths[slot] is not None:
+                    results.append(self._entry(slot))
+                    if len(results) >= max_results:
+                        break
+            return results
+
+    def search_by_size(self, min_bytes: int = 0, max_bytes: Optional[int] = None,
+                       max_results: int = 100) -> List[Dict[str, Any]]:
+        """Find files with min_bytes <= size <= max_bytes, smallest first."""
+        with self._lock:
+            if self._by_size is None:
+                self._sort_orderings()
+            slots, sizes = self._by_size
+            start = bisect.bisect_left(sizes, min_bytes)
+            end = len(sizes) if max_bytes is None else bisect.bisect_right(sizes, max_bytes)
+            return [self._entry(slot) for slot in slots[start:min(end, start + max_results)]]
+
+    def search_by_mtime(self, start: Optional[float] = None, end: Optional[float] = None,
+                        max_results: int = 100) -> List[Dict[str, Any]]:
+        """Find files modified at or after start and before end (POSIX timestamps), oldest first."""
+        with self._lock:
+            if self._by_mtime is None:
+                self._sort_orderings()
+            slots, mtimes = self._by_mtime
+            first = 0 if start is None else bisect.bisect_left(mtimes, start)
+            last = len(mtimes) if end is None else bisect.bisect_left(mtimes, end)
+            return [self._entry(slot) for slot in slots[first:min(last, first + max_results)]]
+
+    def get_entry(self, path: str) -> Optional[Dict[str, Any]]:
+        """Get the indexed entry for a path."""
+        with self._lock:
+            slot = self._slots.get(os.path.abspath(path))
+            return self._entry(slot) if slot is not None else None
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get index size and refresh state."""
+        with self._lock:
+            return {
+                'status': 'ready' if self._ready.is_set() else 'indexing',
+                'entries': len(self._slots),
+                'directories': len(self._dir_mtimes),
+                'removed_slots': self._removed,
+                'trigrams': len(self._trigrams),
+                'roots': self.roots,
+                'db_path': self.db_path,
+                'inotify': self._watcher is not None,
+                'last_refresh': self.last_refresh.isoformat() if self.last_refresh else None
+            }
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the Native File Index
+
+This module contains unit tests for the file index used when the Everything SDK is not available.
+Tests cover the initial crawl, name, extension, size and date queries, and incremental refresh.
+
+Author: Kilo Code
+Version: 1.0.0
+"""
+
+import os
+import sys
+import time
+import threading
+import pytest
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys_path = str(Path(__file__).parent.parent.parent / "src")
+if sys_path not in sys.path:
+    sys.path.insert(0, sys_path)
+
+import file_index
+from file_index import FileIndex
+
+
+def _write(path: Path, size: int, mtime: float = None) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+class TestFileIndex:
+    """Test suite for the native file index."""
+
+    @pytest.fixture
+    def tree(self, tmp_path):
+        """Create a small directory tree to index."""
+        root = tmp_path / "root"
+        _write(root / "report_2024.pdf", 1500, mtime=1700000000)
+        _write(root / "notes.txt", 10, mtime=1710000000)
+        _write(root / "docs" / "Annual Report.docx", 5000, mtime=1720000000)
+        _write(root / "docs" / "deep" / "report_draft.txt", 300, mtime=1730000000)
+        _write(root / "node_modules" / "report.js", 20)
+        return root
+
+    @pytest.fixture
+    def index(self, tree, tmp_path):
+        """Create and build an index of the tree, refreshed by mtime comparison."""
+        index = FileIndex(str(tmp_path / "index.sqlite"), [str(tree)], workers=4,
+                          exclude=["node_modules"], use_inotify=False)
+        index.build()
+        yield index
+        index.close()
+
+    def test_build_indexes_files_and_directories(self, index):
+        """Test that the crawl records every entry outside excluded directories."""
+        assert len(index) == 6
+        assert index.search("report_", max_results=10)[0]['extension'] in ('pdf', 'txt')
+        assert not index.search("report.js")
+
+    def test_search_substring_wildcard_and_path(self, index):
+        """Test substring, multi-term, wildcard and path queries."""
+        names = lambda results: sorted(entry['name'] for entry in results)
+
+        assert names(index.search("report")) == ["Annual Report.docx", "report_2024.pdf", "report_draft.txt"]
+        assert names(index.search("report txt")) == ["report_draft.txt"]
+        assert names(index.search("*.pdf")) == ["report_2024.pdf"]
+        assert names(index.search("rep*t.docx")) == []
+        assert names(index.search("annual*.docx")) == ["Annual Report.docx"]
+        assert names(index.search("docs/deep")) == ["deep", "report_draft.txt"]
+        assert names(index.search("Report", case_sensitive=True)) == ["Annual Report.docx"]
+        assert names(index.search(r"report_\d+", regex=True)) == ["report_2024.pdf"]
+        assert len(index.search("report", max_results=2)) == 2
+
+    def test_search_by_extension_size_and_mtime(self, index):
+        """Test queries answered from the extension lists and sorted arrays."""
+        assert [entry['name'] for entry in index.search_by_extension(".TXT")] == ["notes.txt", "report_draft.txt"]
+        assert [entry['size'] for entry in index.search_by_size(100, 5000)] == [300, 1500, 5000]
+        assert [entry['size'] for entry in index.search_by_size(1000)] == [1500, 5000]
+        assert [entry['name'] for entry in index.search_by_mtime(1705000000, 1725000000)] == \
+            ["notes.txt", "Annual Report.docx"]
+
+    def test_refresh_applies_changes(self, index, tree):
+        """Test that refresh picks up added, removed and replaced entries by mtime comparison."""
+        time.sleep(0.01)
+        _write(tree / "docs" / "new_report.md", 42)
+        os.remove(tree / "notes.txt")
+        _write(tree / "extra" / "inner" / "report_new.csv", 7)
+
+        counts = index.refresh()
+
+        assert counts['added'] == 4
+        assert counts['removed'] == 1
+        assert sorted(entry['name'] for entry in index.search("new")) == ["new_report.md", "report_new.csv"]
+        assert not index.search("notes")
+        assert [entry['size'] for entry in index.search_by_size(0, 50)] == [7, 42]
+
+        # Removing a directory drops everything below it
+        os.remove(tree / "docs" / "deep" / "report_draft.txt")
+        os.rmdir(tree / "docs" / "deep")
+        index.refresh()
+        assert not index.search("draft")
+
+    def test_index_persists_between_instances(self, index, tmp_path, tree):
+        """Test that a new instance loads the stored index without crawling."""
+        reopened = FileIndex(index.db_path, [str(tree)], use_inotify=False)
+        try:
+            assert len(reopened) == len(index)
+            assert reopened.get_entry(str(tree / "notes.txt"))['size'] == 10
+        finally:
+            reopened.close()
+
+    def test_start_serves_queries_while_building(self, tree, tmp_path, monkeypatch):
+        """Test that start() builds in the background, answering from the partial index meanwhile."""
+        release = threading.Event()
+        scan = file_index._scan_directory
+
+        def slow_scan(path, exclude):
+            if os.path.basename(path) == "docs":
+                release.wait(10)
+            return scan(path, exclude)
+
+        monkeypatch.setattr(file_index, "_scan_directory", slow_scan)
+        index = FileIndex(str(tmp_path / "index.sqlite"), [str(tree)], workers=4,
+                          exclude=["node_modules"], use_inotify=False)
+        try:
+            index.start(interval=3600)
+            assert index.get_statistics()['status'] == 'indexing'
+
+            deadline = time.monotonic() + 10
+            while not index.search("notes") and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert [entry['name'] for entry in index.search("notes")] == ["notes.txt"]
+            assert not index.search("draft")
+            assert not index.ready
+
+            release.set()
+            assert index.wait_ready(10)
+            assert index.get_statistics()['status'] == 'ready'
+            assert [entry['name'] for entry in index.search("draft")] == ["report_draft.txt"]
+        finally:
+            release.set()
+            index.close()
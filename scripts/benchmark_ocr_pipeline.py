@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+OCR Pipeline Benchmark
+
+Renders synthetic text pages at several sizes and densities and times each
+stage of the PNG to Markdown pipeline separately: ImagePreprocessor,
+TesseractOCRProcessor, MarkdownFormatter and the end-to-end
+PNGToMarkdownConverter.convert_file. For every page size, density and stage
+it reports pages/sec, p50/p95 latency and how far resident memory rose above
+its level at the start of the stage (sampled while the stage runs, since the
+process-wide peak only ever grows), and --json writes the same numbers, plus
+the process-wide peak RSS, as JSON for comparison across releases.
+
+The formatter stage is fed the word boxes the page was rendered from rather
+than OCR output, so its numbers do not depend on Tesseract. The OCR and
+end-to-end stages need Tesseract and pytesseract; leave them out with
+--stages preprocess format on machines without them.
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add the repository root to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import PIL
+from PIL import Image, ImageDraw, ImageFont
+
+from config.manager import ConfigurationManager
+
+STAGES = ("preprocess", "ocr", "format", "end_to_end")
+
+# Page sizes in pixels (width, height)
+SIZES = {
+    "small": (800, 1000),
+    "letter-150dpi": (1275, 1650),
+    "a4-300dpi": (2480, 3508),
+}
+
+# Font size as a fraction of the page height, line pitch in font sizes, and text columns
+DENSITIES = {
+    "sparse": {"font": 0.030, "line_pitch": 2.0, "columns": 1},
+    "normal": {"font": 0.016, "line_pitch": 1.5, "columns": 1},
+    "dense": {"font": 0.010, "line_pitch": 1.25, "columns": 2},
+}
+
+WORDS = ("invoice", "total", "amount", "the", "of", "and", "report", "quarterly", "revenue",
+         "customer", "order", "2024", "42.50", "shipping", "address", "page", "summary",
+         "table", "column", "Markdown", "image", "text", "recognition", "layout", "a", "to")
+
+# Lines per synthetic paragraph
+PARAGRAPH_LINES = 6
+
+
+def _load_font(size: int):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        try:
+            return ImageFont.load_default(size=size)
+        except TypeError:
+            # Pillow before 10.1 only has the fixed-size bitmap font
+            return ImageFont.load_default()
+
+
+def _render_page(width: int, height: int, density: dict, seed: int):
+    """Render a page of random words, returning the image and the word boxes drawn."""
+    rng = random.Random(seed)
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    font_size = max(8, int(height * density["font"]))
+    font = _load_font(font_size)
+    pitch = int(font_size * density["line_pitch"])
+    space = draw.textlength(" ", font=font)
+
+    margin = int(width * 0.06)
+    gutter = int(width * 0.04)
+    column_width = (width - 2 * margin - gutter * (density["columns"] - 1)) // density["columns"]
+
+    blocks = []
+    for column in range(density["columns"]):
+        left = margin + column * (column_width + gutter)
+        y = margin
+        line_number = 0
+        while y + pitch < height - margin:
+            x = left
+            word_number = 0
+            while True:
+                word = rng.choice(WORDS)
+                word_width = draw.textlength(word, font=font)
+                if x + word_width > left + column_width:
+                    break
+                draw.text((x, y), word, fill=0, font=font)
+                box = draw.textbbox((x, y), word, font=font)
+                word_number += 1
+                blocks.append({
+                    "text": word, "confidence": 95,
+                    "x": box[0], "y": box[1], "width": box[2] - box[0], "height": box[3] - box[1],
+                    "line_number": line_number, "block_number": column,
+                    "paragraph_number": line_number // PARAGRAPH_LINES, "word_number": word_number,
+                })
+                x += word_width + space
+            line_number += 1
+            y += pitch * (2 if line_number % PARAGRAPH_LINES == 0 else 1)
+    return image, blocks
+
+
+def _percentile(sorted_samples, fraction: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    rank = max(1, math.ceil(fraction * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+# Seconds between resident memory samples while a stage runs
+RSS_SAMPLE_INTERVAL = 0.005
+
+
+def _current_rss_mb():
+    """Current resident set size of this process in MB, or None where it cannot be read."""
+    try:
+        import psutil
+    except ImportError:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+        except (OSError, ValueError, AttributeError):
+            return None
+    return psutil.Process().memory_info().rss / 2 ** 20
+
+
+class _RSSSampler:
+    """Sample current RSS on a thread and keep the highest value seen above a baseline."""
+
+    def __init__(self):
+        self.baseline = _current_rss_mb()
+        self.peak = self.baseline
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        rss = _current_rss_mb()
+        if rss is not None and rss > self.peak:
+            self.peak = rss
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self._sample()
+
+    def __enter__(self):
+        if self.baseline is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.baseline is not None:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+
+    @property
+    def delta_mb(self):
+        """Peak RSS during the stage minus the RSS when it started, or None."""
+        return None if self.baseline is None else self.peak - self.baseline
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where it cannot be read."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def _summarize(samples, errors, rss_delta_mb):
+    result = {"pages": len(samples), "errors": errors}
+    if samples:
+        ordered = sorted(samples)
+        result.update({
+            "pages_per_sec": len(samples) / sum(samples),
+            "p50_ms": _percentile(ordered, 0.50) * 1000,
+            "p95_ms": _percentile(ordered, 0.95) * 1000,
+            "mean_ms": statistics.fmean(samples) * 1000,
+        })
+    result["rss_delta_mb"] = rss_delta_mb
+    return result
+
+
+def _run_pages(call, pages, repeat: int, warmup: int, samples, errors):
+    """Call call(page) over all pages, appending latencies; stop at the first exception or False result."""
+    try:
+        for page in pages[:warmup]:
+            call(page)
+        for _ in range(repeat):
+            for page in pages:
+                start = time.perf_counter()
+                outcome = call(page)
+                elapsed = time.perf_counter() - start
+                if outcome is False:
+                    errors.append(f"failed on {page['path']}")
+                    return
+                samples.append(elapsed)
+    except Exception as e:
+        errors.append(f"{type(e).__name__}: {e}")
+
+
+def _time_stage(call, pages, repeat: int, warmup: int):
+    """Time call(page) over all pages and measure how far RSS rises above its level before the stage."""
+    samples = []
+    errors = []
+    with _RSSSampler() as rss:
+        _run_pages(call, pages, repeat, warmup, samples, errors)
+    return _summarize(samples, errors, rss.delta_mb)
+
+
+def _build_stages(config, output_dir: str, stages):
+    """Create the pipeline components once, mapping each stage to a callable of one page."""
+    calls = {}
+    if "preprocess" in stages:
+        from core.preprocessor import ImagePreprocessor
+        preprocessor = ImagePreprocessor(config)
+        calls["preprocess"] = lambda page: preprocessor.preprocess_image(page["path"])
+    if "ocr" in stages:
+        from core.ocr_processor import TesseractOCRProcessor
+        ocr_processor = TesseractOCRProcessor(config)
+        calls["ocr"] = lambda page: ocr_processor.extract_text_with_metadata(page["path"])
+    if "format" in stages:
+        from core.formatter import MarkdownFormatter
+        formatter = MarkdownFormatter(config)
+        calls["format"] = lambda page: formatter.format_ocr_results(page["ocr_results"])
+    if "end_to_end" in stages:
+        from core.converter import PNGToMarkdownConverter
+        try:
+            converter = PNGToMarkdownConverter(config)
+        except Exception as e:
+            message = f"{type(e).__name__}: {e}"
+
+            def converter_unavailable(page):
+                raise RuntimeError(f"converter could not be created ({message})")
+            calls["end_to_end"] = converter_unavailable
+        else:
+            calls["end_to_end"] = lambda page: converter.convert_file(
+                page["path"], os.path.join(output_dir, Path(page["path"]).stem + ".md"))
+    return calls
+
+
+def _environment(config):
+    environment = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pillow": PIL.__version__,
+    }
+    try:
+        import numpy
+        environment["numpy"] = numpy.__version__
+    except ImportError:
+        environment["numpy"] = None
+    try:
+        from core.ocr_processor import TesseractOCRProcessor
+        environment["tesseract"] = TesseractOCRProcessor(config).get_engine_version()
+    except Exception:
+        environment["tesseract"] = None
+    try:
+        environment["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=Path(__file__).parent.parent,
+            capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        environment["git_commit"] = None
+    return environment
+
+
+def run(sizes, densities, stages, pages: int, repeat: int, warmup: int, config_path, json_path, verbose: bool):
+    manager = ConfigurationManager(config_path)
+    # Measure real work: no result cache hits and no backup copies of the output
+    manager._merge_config({"cache": {"enabled": False}, "output": {"include_backup": False}})
+    config = manager.copy_config()
+
+    with tempfile.TemporaryDirectory(prefix="ocr_benchmark_") as work_dir, open(os.devnull, "w") as devnull:
+        # Components print progress; keep it out of the report unless asked for
+        def quiet():
+            return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(devnull)
+
+        with quiet():
+            environment = _environment(config)
+            calls = _build_stages(config, work_dir, stages)
+
+        report = {
+            "benchmark": "ocr_pipeline",
+            "timestamp": datetime.now().isoformat(),
+            "environment": environment,
+            "parameters": {"sizes": sizes, "densities": densities, "stages": stages,
+                           "pages": pages, "repeat": repeat, "warmup": warmup, "config": config_path},
+            "results": [],
+        }
+        print(f"stages={','.join(stages)}, {pages} pages x {repeat} per scenario, "
+              f"tesseract={environment['tesseract']}\n")
+        print(f"{'size':<14}{'density':<9}{'stage':<12}{'pages/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'RSS rise':>11}")
+
+        for size in sizes:
+            width, height = SIZES[size]
+            for density in densities:
+                page_set = []
+                for number in range(pages):
+                    image, blocks = _render_page(width, height, DENSITIES[density], seed=number)
+                    path = os.path.join(work_dir, f"{size}_{density}_{number}.png")
+                    image.save(path)
+                    page_set.append({"path": path, "ocr_results": {
+                        "text": " ".join(block["text"] for block in blocks), "text_blocks": blocks,
+                        "input_path": path, "processing_time": 0.0,
+                    }})
+
+                scenario = {"size": size, "width": width, "height": height, "density": density,
+                            "words_per_page": len(page_set[0]["ocr_results"]["text_blocks"]), "stages": {}}
+                for stage in stages:
+                    with quiet():
+                        result = _time_stage(calls[stage], page_set, repeat, warmup)
+                    scenario["stages"][stage] = result
+                    _print_row(size, density, stage, result)
+                report["results"].append(scenario)
+
+    # ru_maxrss only ever grows, so it is reported once for the whole process
+    report["process_peak_rss_mb"] = _peak_rss_mb()
+    if report["process_peak_rss_mb"] is not None:
+        print(f"\nProcess-wide peak RSS: {report['process_peak_rss_mb']:.1f} MB")
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {json_path}")
+    return report
+
+
+def _print_row(size: str, density: str, stage: str, result):
+    rss = f"{result['rss_delta_mb']:8.1f} MB" if result["rss_delta_mb"] is not None else f"{'n/a':>11}"
+    if result["pages"]:
+        print(f"{size:<14}{density:<9}{stage:<12}{result['pages_per_sec']:9.2f}"
+              f"{result['p50_ms']:10.1f}{result['p95_ms']:10.1f}{rss}")
+    if result["errors"]:
+        print(f"{size:<14}{density:<9}{stage:<12} error: {result['errors'][0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the PNG to Markdown pipeline on synthetic pages")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES), help="Page sizes")
+    parser.add_argument("--densities", nargs="+", choices=list(DENSITIES), default=list(DENSITIES),
+                        help="Text densities")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="Stages to time")
+    parser.add_argument("--pages", type=int, default=5, help="Distinct pages per size and density")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed passes over the pages")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed pages run first in each stage")
+    parser.add_argument("--config", help="Configuration file to benchmark instead of the defaults")
+    parser.add_argument("--json", dest="json_path", help="Write the results as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own progress output")
+    args = parser.parse_args()
+    run(args.sizes, args.densities, args.stages, args.pages, args.repeat, args.warmup,
+        args.config, args.json_path, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tesseract Single-Pass Benchmark
+
+Compares per-page OCR time of the two-pass extraction (image_to_data for word
+boxes, then image_to_string for the text) with the single-pass mode that
+rebuilds the text from the image_to_data result, and reports how often the
+two produce different words.
+
+Needs Tesseract and pytesseract. Pass PNG files or directories of them.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add the repository root to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PIL import Image
+
+from core.ocr_processor import TesseractOCRProcessor
+
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".tif", ".tiff")
+
+
+def _find_images(paths):
+    images = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            images.extend(sorted(p for p in path.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES))
+        else:
+            images.append(path)
+    return images
+
+
+def _report(name: str, samples):
+    samples = sorted(samples)
+    print(f"{name:<12} p50={samples[len(samples) // 2] * 1000:9.1f} ms  "
+          f"p99={samples[int(len(samples) * 0.99)] * 1000:9.1f} ms  "
+          f"mean={statistics.fmean(samples) * 1000:9.1f} ms")
+
+
+def run(paths, repeat: int, languages, psm: int):
+    images = _find_images(paths)
+    if not images:
+        print("No images found")
+        return
+
+    processor = TesseractOCRProcessor({'tesseract': {'languages': languages, 'psm': psm}})
+    config = processor._build_tesseract_config()
+    print(f"{len(images)} pages x {repeat}, languages={'+'.join(languages)}, {config}\n")
+
+    two_pass, single_pass = [], []
+    mismatches = 0
+    for image_path in images:
+        image = Image.open(image_path)
+        image.load()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = processor._extract_text_data(image, config)
+            processor._parse_text_data(data)
+            text = processor._extract_detailed_text(image, config)
+            two_pass.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            data = processor._extract_text_data(image, config)
+            parsed = processor._parse_text_data(data)
+            single_pass.append(time.perf_counter() - start)
+
+        if text.split() != parsed['text'].split():
+            mismatches += 1
+
+    _report("two-pass", two_pass)
+    _report("single-pass", single_pass)
+    saved = statistics.fmean(two_pass) - statistics.fmean(single_pass)
+    print(f"\nsaved per page: {saved * 1000:.1f} ms ({saved / statistics.fmean(two_pass) * 100:.1f}%)")
+    print(f"pages whose words differ between modes: {mismatches}/{len(images)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark single-pass against two-pass Tesseract extraction")
+    parser.add_argument("paths", nargs="+", help="Image files or directories")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per page and mode")
+    parser.add_argument("--lang", default="eng", help="Tesseract languages, '+'-separated")
+    parser.add_argument("--psm", type=int, default=3, help="Page segmentation mode")
+    args = parser.parse_args()
+    run(args.paths, args.repeat, args.lang.split("+"), args.psm)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter Benchmark
+
+Compares per-check latency of the sliding-window engine with the previous
+list-based tracking (append, filter last 24h, sum) at a simulated 10k requests
+per second for one user. Simulated time is injected, so the run takes seconds
+while covering several minutes of traffic.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add the src directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from token_management.sliding_window import SlidingWindowRateLimiter
+
+
+class ListTracker:
+    """The previous per-key list tracking, kept here only for comparison."""
+
+    def __init__(self):
+        self.entries = []
+
+    def check(self, now: datetime, limit: int, window: timedelta) -> bool:
+        usage = sum(count for ts, count in self.entries if ts >= now - window)
+        if usage + 1 > limit:
+            return False
+        self.entries.append((now, 1))
+        cutoff = now - timedelta(hours=24)
+        self.entries = [(ts, count) for ts, count in self.entries if ts > cutoff]
+        return True
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return {
+        "p50": samples[len(samples) // 2] * 1e6,
+        "p99": samples[int(len(samples) * 0.99)] * 1e6,
+        "mean": statistics.fmean(samples) * 1e6,
+    }
+
+
+def run(rate: int, seconds: int, window_seconds: int, limit: int, legacy_seconds: int):
+    step = 1.0 / rate
+    engine = SlidingWindowRateLimiter()
+
+    print(f"Sliding window: {rate} req/s, window={window_seconds}s, limit={limit}")
+    print(f"{'sim second':>10} {'p50 us':>9} {'p99 us':>9} {'mean us':>9}")
+    for second in range(seconds):
+        samples = []
+        for i in range(rate):
+            now = second + i * step
+            start = time.perf_counter()
+            engine.try_acquire("user_api", limit, window_seconds, now=now)
+            samples.append(time.perf_counter() - start)
+        if second in (0, 1, 9) or (second + 1) % 30 == 0:
+            stats = _percentiles(samples)
+            print(f"{second + 1:>10} {stats['p50']:9.2f} {stats['p99']:9.2f} {stats['mean']:9.2f}")
+
+    if legacy_seconds <= 0:
+        return
+
+    print(f"\nList tracking (previous implementation), first {legacy_seconds}s")
+    print(f"{'sim second':>10} {'p50 us':>9} {'p99 us':>9} {'mean us':>9}")
+    tracker = ListTracker()
+    base = datetime.utcnow()
+    window = timedelta(seconds=window_seconds)
+    for second in range(legacy_seconds):
+        samples = []
+        # Sample 1% of the second's requests to keep the run short; the list
+        # still grows by the full rate because every request is recorded.
+        for i in range(rate):
+            now = base + timedelta(seconds=second + i * step)
+            if i % 100:
+                tracker.entries.append((now, 1))
+                continue
+            start = time.perf_counter()
+            tracker.check(now, limit, window)
+            samples.append(time.perf_counter() - start)
+        stats = _percentiles(samples)
+        print(f"{second + 1:>10} {stats['p50']:9.2f} {stats['p99']:9.2f} {stats['mean']:9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rate limiter check latency")
+    parser.add_argument("--rate", type=int, default=10000, help="Requests per simulated second")
+    parser.add_argument("--seconds", type=int, default=120, help="Simulated seconds to run")
+    parser.add_argument("--window", type=int, default=60, help="Window length in seconds")
+    parser.add_argument("--limit", type=int, default=1_000_000, help="Requests allowed per window")
+    parser.add_argument("--legacy-seconds", type=int, default=5,
+                        help="Simulated seconds to run the list-based tracker (0 to skip)")
+    args = parser.parse_args()
+    run(args.rate, args.seconds, args.window, args.limit, args.legacy_seconds)
+
+
+if __name__ == "__main__":
+    main()
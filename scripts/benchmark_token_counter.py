@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Token Counter Benchmark
+
+Compares per-text latency of the in-process tokenizer with pg_tiktoken
+(one SQL round trip per text) and reports how often the two disagree.
+The cache is bypassed so every sample measures a real count.
+
+The local tokenizer needs tiktoken or a vocabulary directory (--vocab-dir or
+$TOKENIZER_VOCAB_DIR). pg_tiktoken needs the Simba Postgres database; pass
+--skip-db to benchmark the local path only.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add the src directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from token_management.tokenizer_engine import create_tokenizer_backend
+
+WORDS = ("token", "counting", "latency", "database", "round", "trip", "streaming",
+         "the", "of", "a", "Postgres", "vocabulary", "merge", "rank", "byte", "pair",
+         "encoding", "1234", "3.14", "naïve", "café", "—", "{\"key\": \"value\"}")
+
+
+def _make_texts(count: int, words: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words)) for _ in range(count)]
+
+
+def _report(name: str, samples):
+    samples = sorted(samples)
+    print(f"{name:<24} p50={samples[len(samples) // 2] * 1e6:10.1f} us  "
+          f"p99={samples[int(len(samples) * 0.99)] * 1e6:10.1f} us  "
+          f"mean={statistics.fmean(samples) * 1e6:10.1f} us")
+
+
+def run(count: int, words: int, encoding: str, backend: str, vocab_dir: str, skip_db: bool):
+    texts = _make_texts(count, words)
+    tokenizer = create_tokenizer_backend(encoding, backend=backend, vocab_dir=vocab_dir)
+    print(f"{count} texts of {words} words, encoding={encoding}, local backend={tokenizer.name}\n")
+
+    local_counts = []
+    samples = []
+    for text in texts:
+        start = time.perf_counter()
+        local_counts.append(tokenizer.count(text))
+        samples.append(time.perf_counter() - start)
+    _report("local count", samples)
+
+    start = time.perf_counter()
+    batch_counts = tokenizer.count_batch(texts)
+    batch_elapsed = time.perf_counter() - start
+    print(f"{'local count_batch':<24} {batch_elapsed / count * 1e6:10.1f} us/text "
+          f"({batch_elapsed * 1000:.1f} ms total)")
+    assert batch_counts == local_counts
+
+    if skip_db:
+        return
+
+    from simba.simba.database.postgres import PostgresDB
+
+    db = PostgresDB()
+    if not db.is_tiktoken_available():
+        print("\npg_tiktoken is not available in the database; skipping")
+        return
+
+    db_counts = []
+    samples = []
+    for text in texts:
+        start = time.perf_counter()
+        db_counts.append(int(db.get_token_count(text)))
+        samples.append(time.perf_counter() - start)
+    _report("pg_tiktoken count", samples)
+
+    mismatches = sum(1 for a, b in zip(local_counts, db_counts) if a != b)
+    print(f"\nMismatches between local and pg_tiktoken: {mismatches}/{count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local tokenizer against pg_tiktoken")
+    parser.add_argument("--count", type=int, default=2000, help="Number of texts")
+    parser.add_argument("--words", type=int, default=200, help="Words per text")
+    parser.add_argument("--encoding", default="cl100k_base", help="Encoding name")
+    parser.add_argument("--backend", default="auto", help="Local backend (auto, tiktoken, bpe)")
+    parser.add_argument("--vocab-dir", default=None, help="Directory of .tiktoken vocabulary files")
+    parser.add_argument("--skip-db", action="store_true", help="Only benchmark the local tokenizer")
+    args = parser.parse_args()
+    run(args.count, args.words, args.encoding, args.backend, args.vocab_dir, args.skip_db)
+
+
+if __name__ == "__main__":
+    main()
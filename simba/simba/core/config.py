@@ -107,6 +107,8 @@ class EmbeddingConfig(BaseModel):
     provider: str = "openai"
     model_name: str = "text-embedding-3-small"
     device: str = "cpu"
+    # Content-addressed cache for chunk embeddings: "postgres", "sqlite" or "none"
+    cache_backend: str = "none"
 
     additional_params: Dict[str, Any] = Field(default_factory=dict)
 
@@ -62,14 +62,14 @@ def get_embeddings(**kwargs) -> Embeddings:
 
     try:
         if settings.embedding.provider == "openai":
-            return OpenAIEmbeddings(
+            model = OpenAIEmbeddings(
                 model=settings.embedding.model_name,
                 **settings.embedding.additional_params,
                 **kwargs,
             )
 
         elif settings.embedding.provider == "huggingface":
-            return HuggingFaceEmbeddings(
+            model = HuggingFaceEmbeddings(
                 model_name=settings.embedding.model_name,
                 model_kwargs={"device": device},  # Use the potentially overridden device
                 **settings.embedding.additional_params,
@@ -77,14 +77,14 @@ def get_embeddings(**kwargs) -> Embeddings:
             )
 
         elif settings.embedding.provider == "ollama":
-            return OllamaEmbeddings(
+            model = OllamaEmbeddings(
                 model_name=settings.embedding.model_name or "nomic-embed-text",
                 **settings.embedding.additional_params,
                 **kwargs,
             )
 
         elif settings.embedding.provider == "cohere":
-            return CohereEmbeddings(
+            model = CohereEmbeddings(
                 model=settings.embedding.model_name or "embed-english-v3.0",
                 **settings.embedding.additional_params,
                 **kwargs,
@@ -93,3 +93,38 @@ def get_embeddings(**kwargs) -> Embeddings:
     except Exception as e:
         logger.error(f"Error creating embeddings for provider {settings.embedding.provider}: {e}")
         raise
+
+    return _with_cache(model, kwargs)
+
+
+def _with_cache(model: Embeddings, kwargs: dict) -> Embeddings:
+    """Wrap the model in a content-addressed cache if one is configured."""
+    backend_name = settings.embedding.cache_backend
+    if backend_name == "none":
+        return model
+
+    # Import here to avoid circular import
+    from simba.embeddings.cache import (
+        CachedEmbeddings,
+        PostgresEmbeddingCache,
+        SQLiteEmbeddingCache,
+    )
+
+    try:
+        if backend_name == "postgres":
+            backend = PostgresEmbeddingCache()
+        elif backend_name == "sqlite":
+            backend = SQLiteEmbeddingCache(settings.paths.vector_store_dir / "embedding_cache.db")
+        else:
+            raise ValueError(f"Unsupported embedding cache backend: {backend_name}")
+    except Exception as e:
+        logger.warning(f"Embedding cache disabled, could not initialize {backend_name} backend: {e}")
+        return model
+
+    params = {**settings.embedding.additional_params, **kwargs}
+    return CachedEmbeddings(
+        model,
+        backend,
+        model_name=f"{settings.embedding.provider}/{settings.embedding.model_name}",
+        dimension=params.get("dimensions"),
+    )
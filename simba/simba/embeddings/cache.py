@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import unicodedata
+from abc import ABC, abstractmethod
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from langchain.schema.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize chunk text for cache keying.
+
+    Applies NFC normalization and collapses whitespace so that re-splitting a
+    document with cosmetic whitespace differences still hits the cache.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def embedding_cache_key(text: str, model_name: str, dimension: int) -> str:
+    """Content address of an embedding: sha256 over model, dimension and normalized text."""
+    payload = f"{model_name}\x00{dimension}\x00{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCacheBackend(ABC):
+    """Storage for content-addressed embeddings."""
+
+    @abstractmethod
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """Return the cached embeddings for the keys that are present."""
+
+    @abstractmethod
+    def put_many(self, entries: Dict[str, List[float]], model_name: str, dimension: int) -> None:
+        """Store embeddings by key."""
+
+
+class SQLiteEmbeddingCache(EmbeddingCacheBackend):
+    """Embedding cache in a local SQLite file; vectors are stored as float32 blobs."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embedding_cache
+            (key TEXT PRIMARY KEY, model_name TEXT, dimension INTEGER, embedding BLOB)
+            """
+        )
+        self._conn.commit()
+        logger.info(f"Initialized embedding cache at {self.db_path}")
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        # Stay below SQLite's bound-parameter limit
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = list(keys[start:start + 500])
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, embedding FROM embedding_cache WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, entries: Dict[str, List[float]], model_name: str, dimension: int) -> None:
+        rows = [
+            (key, model_name, dimension, array("f", vector).tobytes())
+            for key, vector in entries.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embedding_cache VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+
+class PostgresEmbeddingCache(EmbeddingCacheBackend):
+    """Embedding cache in the embedding_cache table of the Simba Postgres database."""
+
+    def __init__(self):
+        from simba.database.postgres import PostgresDB
+
+        self._db = PostgresDB
+        with self._db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS embedding_cache (
+                        key TEXT PRIMARY KEY,
+                        model_name TEXT NOT NULL,
+                        dimension INTEGER NOT NULL,
+                        embedding REAL[] NOT NULL,
+                        created_at TIMESTAMPTZ DEFAULT NOW()
+                    )
+                    """
+                )
+            conn.commit()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+        with self._db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT key, embedding FROM embedding_cache WHERE key = ANY(%s)",
+                    (list(keys),),
+                )
+                return {key: list(embedding) for key, embedding in cursor.fetchall()}
+
+    def put_many(self, entries: Dict[str, List[float]], model_name: str, dimension: int) -> None:
+        if not entries:
+            return
+        from psycopg2.extras import execute_values
+
+        with self._db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                execute_values(
+                    cursor,
+                    "INSERT INTO embedding_cache (key, model_name, dimension, embedding) "
+                    "VALUES %s ON CONFLICT (key) DO NOTHING",
+                    [(key, model_name, dimension, list(vector)) for key, vector in entries.items()],
+                )
+            conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that skips the provider for chunks it has seen before.
+
+    embed_documents looks every text up by content address (normalized text,
+    model name, dimension) and only sends the misses to the wrapped model.
+    Queries are not cached. Backend failures are logged and fall through to
+    the wrapped model so the cache can never break embedding.
+    """
+
+    def __init__(self, embeddings: Embeddings, backend: EmbeddingCacheBackend,
+                 model_name: str, dimension: Optional[int] = None):
+        """
+        Args:
+            embeddings: Model to call on cache misses
+            backend: Where cached vectors are stored
+            model_name: Embedding model name, part of the cache key
+            dimension: Embedding dimension, part of the cache key. Probed with
+                one embed_query call on first use when not given.
+        """
+        self.embeddings = embeddings
+        self.backend = backend
+        self.model_name = model_name
+        self._dimension = dimension
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = len(self.embeddings.embed_query("dimension probe"))
+        return self._dimension
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [embedding_cache_key(text, self.model_name, self.dimension) for text in texts]
+
+        try:
+            cached = self.backend.get_many(list(set(keys)))
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed, embedding everything: {e}")
+            cached = {}
+
+        # Embed each distinct missing text once
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            cached.update(fresh)
+            try:
+                self.backend.put_many(fresh, self.model_name, self.dimension)
+            except Exception as e:
+                logger.warning(f"Failed to store {len(fresh)} embeddings in cache: {e}")
+
+        logger.debug(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
@@ -6,9 +6,13 @@ from .file_handling import (
 from .loader import Loader
 from .utils import check_file_exists
 from .document_ingestion import DocumentIngestionService
+from .pipeline import IngestionPipeline, PipelineConfig, PipelineResult
 
 __all__ = [
     "DocumentIngestionService",
+    "IngestionPipeline",
+    "PipelineConfig",
+    "PipelineResult",
     "load_file_from_path",
     "save_file_locally",
     "delete_file_locally",
@@ -3,7 +3,7 @@ import logging
 import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional
 
 import aiofiles
 from fastapi import UploadFile
@@ -17,6 +17,7 @@ from simba.splitting import Splitter
 from simba.core.factories.storage_factory import StorageFactory
 from simba.storage.base import StorageProvider
 from .loader import Loader
+from .pipeline import IngestionPipeline, PipelineConfig, PipelineResult
 from .file_handling import delete_file_locally
 
 
@@ -95,6 +96,41 @@ class DocumentIngestionService:
                 await self.storage.delete_file(saved_path)
             raise
 
+    async def ingest_folder(self, folder: Path, user_id: str, recursive: bool = True,
+                            config: Optional[PipelineConfig] = None) -> PipelineResult:
+        """Ingest every supported file in a folder through the staged pipeline
+        
+        Files are streamed through load, split, embed and insert stages connected
+        by bounded queues, so memory stays constant regardless of folder size.
+        
+        Args:
+            folder: The folder to ingest
+            user_id: Owner of the ingested documents
+            recursive: Whether to descend into subfolders
+            config: Worker counts, queue size and embedding batch size
+            
+        Returns:
+            PipelineResult: Inserted document IDs, failures and per-stage metrics
+        """
+        folder = Path(folder)
+        if not folder.is_dir():
+            raise ValueError(f"{folder} is not a directory")
+        
+        pattern = "**/*" if recursive else "*"
+        paths: Iterable[Path] = (
+            path for path in folder.glob(pattern)
+            if path.is_file() and path.suffix.lower() in self.loader.SUPPORTED_EXTENSIONS
+        )
+        
+        pipeline = IngestionPipeline(
+            vector_store=self.vector_store,
+            database=self.database,
+            config=config,
+            loader=self.loader,
+            splitter=self.splitter,
+        )
+        return await pipeline.run(paths, user_id)
+
     def get_document(self, document_id: str) -> Optional[Document]:
         """Get a document by its ID"""
         try:
@@ -0,0 +1,308 @@
+import asyncio
+import inspect
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from langchain.schema import Document
+
+from simba.core.factories.embeddings_factory import get_embeddings
+from simba.embeddings.utils import _clean_documents
+from simba.models.simbadoc import MetadataType, SimbaDoc
+from simba.splitting import Splitter
+from .loader import Loader
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's input; one is queued per downstream worker.
+_DONE = object()
+
+
+def _accepts_precomputed_embeddings(vector_store) -> bool:
+    """Whether the store's add_documents takes document_id and embeddings keywords."""
+    try:
+        parameters = inspect.signature(vector_store.add_documents).parameters
+    except (TypeError, ValueError):
+        return False
+    if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters.values()):
+        return True
+    return "document_id" in parameters and "embeddings" in parameters
+
+
+@dataclass
+class PipelineConfig:
+    """Worker counts and buffer sizes for the ingestion pipeline."""
+    load_workers: int = 4
+    split_workers: int = 4
+    embed_workers: int = 2
+    insert_workers: int = 2
+    # Maximum number of files buffered between two stages. A full queue blocks
+    # the upstream stage, which keeps memory bounded regardless of folder size.
+    queue_size: int = 16
+    # Number of chunks sent to embed_documents per call
+    embed_batch_size: int = 64
+
+
+@dataclass
+class StageMetrics:
+    """Throughput counters for one pipeline stage."""
+    name: str
+    processed: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    # Time spent waiting for room in the downstream queue (backpressure)
+    blocked_seconds: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def throughput(self) -> float:
+        """Items processed per second of stage wall time."""
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "processed": self.processed,
+            "errors": self.errors,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "throughput_per_second": round(self.throughput, 2),
+        }
+
+
+@dataclass
+class _IngestItem:
+    """A file moving through the pipeline."""
+    path: Path
+    document_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    loader_name: Optional[str] = None
+    documents: List[Document] = field(default_factory=list)
+    embeddings: Optional[List[List[float]]] = None
+
+
+@dataclass
+class PipelineResult:
+    """Outcome of a pipeline run."""
+    document_ids: List[str] = field(default_factory=list)
+    failures: Dict[str, str] = field(default_factory=dict)
+    metrics: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+
+class IngestionPipeline:
+    """
+    Staged ingestion pipeline: load -> split -> embed -> insert.
+
+    Stages run concurrently and are connected by bounded asyncio queues, so a
+    folder of any size is processed with memory proportional to queue_size.
+    Blocking work (file parsing, splitting, embedding, database writes) runs in
+    worker threads so every stage makes progress in parallel.
+    """
+
+    STAGES = ("load", "split", "embed", "insert")
+
+    def __init__(self, vector_store, database, config: Optional[PipelineConfig] = None,
+                 loader: Optional[Loader] = None, splitter: Optional[Splitter] = None):
+        """
+        Initialize the pipeline.
+
+        Args:
+            vector_store: Store the chunks are added to. When its add_documents
+                accepts precomputed embeddings (pgvector) chunks are embedded
+                in the embed stage; otherwise the store embeds them itself.
+            database: Database service used to persist the parent SimbaDoc
+            config: Pipeline sizing; defaults to PipelineConfig()
+            loader: Loader used to resolve file extensions
+            splitter: Splitter used to chunk loaded documents
+        """
+        self.vector_store = vector_store
+        self.database = database
+        self.precomputed_embeddings = _accepts_precomputed_embeddings(vector_store)
+        self.config = config or PipelineConfig()
+        self.loader = loader or Loader()
+        self.splitter = splitter or Splitter()
+        self.metrics: Dict[str, StageMetrics] = {}
+        self.failures: Dict[str, str] = {}
+
+    async def run(self, paths: Iterable[Path], user_id: str) -> PipelineResult:
+        """
+        Ingest files through the pipeline.
+
+        Args:
+            paths: Files to ingest; consumed lazily
+            user_id: Owner of the ingested documents
+
+        Returns:
+            PipelineResult with inserted document IDs, per-file failures and stage metrics
+        """
+        cfg = self.config
+        self.metrics = {name: StageMetrics(name) for name in self.STAGES}
+        self.failures = {}
+        document_ids: List[str] = []
+
+        to_load: asyncio.Queue = asyncio.Queue(maxsize=cfg.queue_size)
+        to_split: asyncio.Queue = asyncio.Queue(maxsize=cfg.queue_size)
+        to_embed: asyncio.Queue = asyncio.Queue(maxsize=cfg.queue_size)
+        to_insert: asyncio.Queue = asyncio.Queue(maxsize=cfg.queue_size)
+
+        async def insert(item: _IngestItem) -> List[_IngestItem]:
+            await self._insert(item, user_id)
+            document_ids.append(item.document_id)
+            return []
+
+        async def produce() -> None:
+            for path in paths:
+                await to_load.put(_IngestItem(path=Path(path)))
+            for _ in range(cfg.load_workers):
+                await to_load.put(_DONE)
+
+        await asyncio.gather(
+            produce(),
+            self._run_stage("load", self._load, to_load, to_split,
+                            cfg.load_workers, cfg.split_workers),
+            self._run_stage("split", self._split, to_split, to_embed,
+                            cfg.split_workers, cfg.embed_workers),
+            self._run_stage("embed", self._embed, to_embed, to_insert,
+                            cfg.embed_workers, cfg.insert_workers),
+            self._run_stage("insert", insert, to_insert, None,
+                            cfg.insert_workers, 0),
+        )
+
+        result = PipelineResult(
+            document_ids=document_ids,
+            failures=dict(self.failures),
+            metrics=self.get_metrics(),
+        )
+        logger.info(
+            f"Ingestion pipeline finished: {len(document_ids)} documents, "
+            f"{len(self.failures)} failures, metrics={result.metrics}"
+        )
+        return result
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage throughput metrics for the current or last run."""
+        return {name: m.to_dict() for name, m in self.metrics.items()}
+
+    async def _run_stage(self, name: str,
+                         handler: Callable[[_IngestItem], Awaitable[List[_IngestItem]]],
+                         inbox: asyncio.Queue, outbox: Optional[asyncio.Queue],
+                         workers: int, downstream_workers: int) -> None:
+        """Run a stage's workers until the inbox is drained, then signal downstream."""
+        metrics = self.metrics[name]
+        metrics.started_at = time.perf_counter()
+
+        async def worker() -> None:
+            while True:
+                item = await inbox.get()
+                if item is _DONE:
+                    return
+                start = time.perf_counter()
+                try:
+                    results = await handler(item)
+                except Exception as e:
+                    metrics.errors += 1
+                    self.failures[str(item.path)] = f"{name}: {e}"
+                    logger.error(f"Ingestion {name} stage failed for {item.path}: {e}")
+                    continue
+                metrics.busy_seconds += time.perf_counter() - start
+                metrics.processed += 1
+
+                if outbox is None:
+                    continue
+                for result in results:
+                    wait_start = time.perf_counter()
+                    await outbox.put(result)
+                    metrics.blocked_seconds += time.perf_counter() - wait_start
+
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        metrics.finished_at = time.perf_counter()
+
+        if outbox is not None:
+            for _ in range(downstream_workers):
+                await outbox.put(_DONE)
+
+    async def _load(self, item: _IngestItem) -> List[_IngestItem]:
+        file_extension = item.path.suffix.lower()
+        loader_cls = self.loader.SUPPORTED_EXTENSIONS.get(file_extension)
+        if loader_cls is None:
+            raise ValueError(f"Unsupported file type {file_extension}")
+        if item.path.stat().st_size == 0:
+            raise ValueError(f"File {item.path} is empty")
+
+        # Resolve the loader class here rather than through Loader.aload, which
+        # stores it on the shared instance and would race between workers.
+        item.loader_name = loader_cls.__name__
+        item.documents = await asyncio.to_thread(
+            lambda: loader_cls(file_path=str(item.path)).load()
+        )
+        return [item]
+
+    async def _split(self, item: _IngestItem) -> List[_IngestItem]:
+        chunks = await asyncio.to_thread(self.splitter.split_document, item.documents)
+        chunks = _clean_documents(chunks)
+        for chunk in chunks:
+            chunk.id = str(uuid.uuid4())
+            chunk.metadata["document_id"] = item.document_id
+        item.documents = chunks
+        return [item]
+
+    async def _embed(self, item: _IngestItem) -> List[_IngestItem]:
+        if not self.precomputed_embeddings:
+            return [item]
+        embeddings_model = get_embeddings()
+        batch_size = self.config.embed_batch_size
+        texts = [doc.page_content for doc in item.documents]
+        vectors: List[List[float]] = []
+        for i in range(0, len(texts), batch_size):
+            vectors.extend(
+                await asyncio.to_thread(embeddings_model.embed_documents, texts[i:i + batch_size])
+            )
+        item.embeddings = vectors
+        return [item]
+
+    async def _insert(self, item: _IngestItem, user_id: str) -> None:
+        file_size = item.path.stat().st_size
+        metadata = MetadataType(
+            filename=item.path.name,
+            type=item.path.suffix.lower(),
+            page_number=len(item.documents),
+            chunk_number=0,
+            enabled=True,
+            parsing_status="Unparsed",
+            size=f"{file_size / (1024 * 1024):.2f} MB",
+            loader=item.loader_name,
+            uploadedAt=datetime.now().isoformat(),
+            file_path=str(item.path),
+            parser=None,
+        )
+        simbadoc = SimbaDoc.from_documents(
+            id=item.document_id, documents=item.documents, metadata=metadata
+        )
+
+        await asyncio.to_thread(self.database.insert_document, simbadoc, user_id)
+        try:
+            if self.precomputed_embeddings:
+                added = await asyncio.to_thread(
+                    self.vector_store.add_documents,
+                    documents=item.documents,
+                    document_id=item.document_id,
+                    embeddings=item.embeddings,
+                )
+            else:
+                added = await asyncio.to_thread(self.vector_store.add_documents, item.documents)
+            if added is False:
+                raise RuntimeError(f"Vector store rejected the chunks of {item.path.name}")
+        except Exception:
+            # The parent document is already committed; remove it so a failed
+            # chunk insert does not leave it orphaned
+            await asyncio.to_thread(self.database.delete_document, item.document_id)
+            raise
+        # Drop the payload so finished items do not pin memory
+        item.documents = []
+        item.embeddings = None
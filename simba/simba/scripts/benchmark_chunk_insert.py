@@ -0,0 +1,88 @@
+"""
+Benchmark chunk inserts into chunks_embeddings: ORM add_all vs binary COPY.
+
+Usage:
+    python -m simba.scripts.benchmark_chunk_insert --chunks 5000 --batch-size 1000
+
+Creates a throwaway parent document, inserts the same synthetic chunks through
+both paths and deletes everything it wrote afterwards.
+"""
+
+import argparse
+import time
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+
+from simba.database.postgres import SQLDocument
+from simba.vector_store.pgvector import ChunkEmbedding, PGVectorStore
+
+
+def _make_chunks(count: int, dim: int):
+    rng = np.random.default_rng(0)
+    documents = [
+        Document(
+            id=str(uuid.uuid4()),
+            page_content=f"Benchmark chunk {i} " + "lorem ipsum " * 40,
+            metadata={"chunk_index": i, "source": "benchmark"},
+        )
+        for i in range(count)
+    ]
+    embeddings = rng.random((count, dim), dtype=np.float32).tolist()
+    return documents, embeddings
+
+
+def _with_fresh_ids(documents):
+    return [
+        Document(id=str(uuid.uuid4()), page_content=d.page_content, metadata=d.metadata)
+        for d in documents
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=ChunkEmbedding.embedding.type.dim)
+    args = parser.parse_args()
+
+    store = PGVectorStore()
+    user_id = f"benchmark-{uuid.uuid4()}"
+    document_id = str(uuid.uuid4())
+
+    session = store._Session()
+    try:
+        session.add(SQLDocument(id=document_id, user_id=user_id, data={}))
+        session.commit()
+    finally:
+        session.close()
+
+    documents, embeddings = _make_chunks(args.chunks, args.dim)
+    try:
+        start = time.perf_counter()
+        store.add_documents(_with_fresh_ids(documents), document_id,
+                            embeddings=embeddings, use_copy=False)
+        orm_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store.bulk_insert_chunks(_with_fresh_ids(documents), document_id, user_id,
+                                 embeddings, batch_size=args.batch_size)
+        copy_seconds = time.perf_counter() - start
+    finally:
+        session = store._Session()
+        try:
+            session.query(SQLDocument).filter(SQLDocument.id == document_id).delete()
+            session.query(ChunkEmbedding).filter(ChunkEmbedding.user_id == user_id).delete()
+            session.commit()
+        finally:
+            session.close()
+
+    print(f"chunks={args.chunks} dim={args.dim} batch_size={args.batch_size}")
+    print(f"ORM add_all : {orm_seconds:8.3f} s  ({args.chunks / orm_seconds:10.1f} rows/s)")
+    print(f"binary COPY : {copy_seconds:8.3f} s  ({args.chunks / copy_seconds:10.1f} rows/s)")
+    print(f"speedup     : {orm_seconds / copy_seconds:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
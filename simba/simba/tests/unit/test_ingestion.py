@@ -143,6 +143,127 @@ def test_get_document():
     mock_vector_store.get_document.assert_called_once_with("test-doc-id")
 
 
+# Test the staged folder ingestion pipeline
+@pytest.mark.asyncio
+async def test_ingestion_pipeline_folder():
+    from simba.ingestion.pipeline import IngestionPipeline, PipelineConfig
+
+    mock_db = MagicMock()
+    mock_vector_store = MagicMock()
+    mock_embeddings = MagicMock()
+    mock_embeddings.embed_documents.side_effect = lambda texts: [[0.1, 0.2] for _ in texts]
+
+    mock_loader_cls = MagicMock(__name__="TextLoader")
+    mock_loader_cls.return_value.load.side_effect = lambda: [
+        Document(page_content="Test content", metadata={})
+    ]
+    mock_loader = MagicMock()
+    mock_loader.SUPPORTED_EXTENSIONS = {".txt": mock_loader_cls}
+
+    mock_splitter = MagicMock()
+    mock_splitter.split_document.side_effect = lambda docs: [
+        Document(page_content=f"chunk {i}", metadata={}) for i in range(3)
+    ]
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = []
+        for i in range(5):
+            path = Path(folder) / f"file_{i}.txt"
+            path.write_text("Test content")
+            paths.append(path)
+
+        config = PipelineConfig(load_workers=2, split_workers=2, embed_workers=2,
+                                insert_workers=1, queue_size=1, embed_batch_size=2)
+        pipeline = IngestionPipeline(mock_vector_store, mock_db, config=config,
+                                     loader=mock_loader, splitter=mock_splitter)
+
+        with patch("simba.ingestion.pipeline.get_embeddings", return_value=mock_embeddings):
+            result = await pipeline.run(paths, user_id="user-1")
+
+    assert len(result.document_ids) == 5
+    assert not result.failures
+    assert mock_db.insert_document.call_count == 5
+    assert mock_vector_store.add_documents.call_count == 5
+    # 3 chunks per file in batches of 2 -> 2 embed calls per file
+    assert mock_embeddings.embed_documents.call_count == 10
+    for stage in IngestionPipeline.STAGES:
+        assert result.metrics[stage]["processed"] == 5
+
+
+def _pipeline_loader_and_splitter():
+    mock_loader_cls = MagicMock(__name__="TextLoader")
+    mock_loader_cls.return_value.load.side_effect = lambda: [
+        Document(page_content="Test content", metadata={})
+    ]
+    mock_loader = MagicMock()
+    mock_loader.SUPPORTED_EXTENSIONS = {".txt": mock_loader_cls}
+
+    mock_splitter = MagicMock()
+    mock_splitter.split_document.side_effect = lambda docs: [
+        Document(page_content=f"chunk {i}", metadata={}) for i in range(3)
+    ]
+    return mock_loader, mock_splitter
+
+
+# Test the pipeline with a store that embeds chunks itself (faiss)
+@pytest.mark.asyncio
+async def test_ingestion_pipeline_store_without_precomputed_embeddings():
+    from simba.ingestion.pipeline import IngestionPipeline
+
+    class FaissLikeStore:
+        def __init__(self):
+            self.added = []
+
+        def add_documents(self, documents):
+            self.added.append(documents)
+            return True
+
+    mock_db = MagicMock()
+    store = FaissLikeStore()
+    mock_embeddings = MagicMock()
+    mock_loader, mock_splitter = _pipeline_loader_and_splitter()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = Path(folder) / "file.txt"
+        path.write_text("Test content")
+        pipeline = IngestionPipeline(store, mock_db, loader=mock_loader, splitter=mock_splitter)
+
+        with patch("simba.ingestion.pipeline.get_embeddings", return_value=mock_embeddings):
+            result = await pipeline.run([path], user_id="user-1")
+
+    assert not result.failures
+    assert len(result.document_ids) == 1
+    assert [len(chunks) for chunks in store.added] == [3]
+    mock_embeddings.embed_documents.assert_not_called()
+
+
+# Test a failed chunk insert removes the parent document
+@pytest.mark.asyncio
+async def test_ingestion_pipeline_failed_insert_removes_document():
+    from simba.ingestion.pipeline import IngestionPipeline
+
+    mock_db = MagicMock()
+    mock_vector_store = MagicMock()
+    mock_vector_store.add_documents.side_effect = RuntimeError("store unavailable")
+    mock_embeddings = MagicMock()
+    mock_embeddings.embed_documents.side_effect = lambda texts: [[0.1, 0.2] for _ in texts]
+    mock_loader, mock_splitter = _pipeline_loader_and_splitter()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = Path(folder) / "file.txt"
+        path.write_text("Test content")
+        pipeline = IngestionPipeline(mock_vector_store, mock_db,
+                                     loader=mock_loader, splitter=mock_splitter)
+
+        with patch("simba.ingestion.pipeline.get_embeddings", return_value=mock_embeddings):
+            result = await pipeline.run([path], user_id="user-1")
+
+    assert result.document_ids == []
+    assert "store unavailable" in result.failures[str(path)]
+    document = mock_db.insert_document.call_args[0][0]
+    mock_db.delete_document.assert_called_once_with(document.id)
+
+
 # Test the Celery task for document ingestion
 def test_ingest_document_task():
     """Test the Celery task for document ingestion"""
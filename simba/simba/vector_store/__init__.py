@@ -1,4 +1,5 @@
 from .vector_store_service import VectorStoreService
 from .pgvector import PGVectorStore
+from .reranker import RerankerService, get_reranker
 
-__all__ = ["VectorStoreService", "PGVectorStore"]
+__all__ = ["VectorStoreService", "PGVectorStore", "RerankerService", "get_reranker"]
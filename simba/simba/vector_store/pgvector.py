@@ -1,6 +1,8 @@
 import logging
-from typing import List, Optional, Tuple, Dict, Any, Union
+from typing import List, Optional, Tuple, Dict, Any, Union, Iterator
 from psycopg2.extras import RealDictCursor, Json
+import io
+import struct
 import uuid
 import json
 from datetime import datetime
@@ -14,6 +16,7 @@ from simba.core.config import settings
 from simba.models.simbadoc import SimbaDoc, MetadataType
 from simba.database.postgres import PostgresDB, Base, DateTimeEncoder, SQLDocument
 from simba.vector_store.base import VectorStoreBase
+from simba.vector_store.reranker import DEFAULT_RERANKER_MODEL, get_reranker
 from simba.core.factories.embeddings_factory import get_embeddings
 from langchain_openai import OpenAIEmbeddings
 from langchain.vectorstores import VectorStore
@@ -27,6 +30,54 @@ supabase = get_supabase_client()
 
 logger = logging.getLogger(__name__)
 
+# Columns needed to rebuild a Document from a chunk row. Retrieval queries
+# project only these so the embedding vector and timestamps stay in the database.
+CHUNK_RESULT_COLUMNS = "id, document_id, data"
+
+# Above this many rows, retrieval switches to a server-side (named) cursor and
+# fetches results in batches of STREAM_BATCH_SIZE instead of in one round trip.
+STREAM_THRESHOLD = 500
+STREAM_BATCH_SIZE = 200
+
+# add_documents switches from ORM inserts to binary COPY at this many chunks.
+# Each COPY carries at most BULK_INSERT_BATCH_SIZE rows.
+BULK_INSERT_THRESHOLD = 64
+BULK_INSERT_BATCH_SIZE = 1000
+
+_COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+_COPY_HEADER = _COPY_SIGNATURE + struct.pack("!ii", 0, 0)
+_COPY_TRAILER = struct.pack("!h", -1)
+_CHUNK_COPY_SQL = (
+    "COPY chunks_embeddings (id, document_id, user_id, data, embedding) "
+    "FROM STDIN WITH (FORMAT BINARY)"
+)
+
+
+def _copy_field(value: bytes) -> bytes:
+    """Length-prefix one field for the binary COPY format."""
+    return struct.pack("!i", len(value)) + value
+
+
+def encode_chunk_copy_row(chunk_id: str, document_id: str, user_id: str,
+                          data: Dict[str, Any], embedding: List[float]) -> bytes:
+    """
+    Encode one chunks_embeddings row in PostgreSQL's binary COPY format.
+    
+    jsonb is sent as a version byte followed by the JSON text, and vector uses
+    pgvector's binary layout: int16 dimension, int16 unused, float4 values.
+    """
+    vector = np.asarray(embedding, dtype=">f4")
+    vector_bytes = struct.pack("!hh", vector.shape[0], 0) + vector.tobytes()
+    data_bytes = b"\x01" + json.dumps(data, cls=DateTimeEncoder).encode("utf-8")
+    return b"".join((
+        struct.pack("!h", 5),
+        _copy_field(str(chunk_id).encode("utf-8")),
+        _copy_field(str(document_id).encode("utf-8")),
+        _copy_field(str(user_id).encode("utf-8")),
+        _copy_field(data_bytes),
+        _copy_field(vector_bytes),
+    ))
+
 class ChunkEmbedding(Base):
     """SQLAlchemy model for chunks_embeddings table"""
     __tablename__ = 'chunks_embeddings'
@@ -108,8 +159,22 @@ class PGVectorStore(VectorStore):
         )
         return get_embeddings()
         
-    def add_documents(self, documents: List[Document], document_id: str) -> bool:
-        """Add documents to the store using SQLAlchemy ORM."""
+    def add_documents(self, documents: List[Document], document_id: str,
+                      embeddings: Optional[List[List[float]]] = None,
+                      use_copy: Optional[bool] = None) -> bool:
+        """Add documents to the store.
+        
+        Small batches go through the SQLAlchemy ORM; large ones through
+        bulk_insert_chunks (binary COPY).
+        
+        Args:
+            documents: Chunks to store
+            document_id: ID of the parent document
+            embeddings: Optional precomputed embeddings aligned with documents.
+                When omitted, they are generated with self.embeddings.
+            use_copy: Force (True) or disable (False) the COPY path. By default
+                it is used for BULK_INSERT_THRESHOLD chunks or more.
+        """
         session = None
         try:
             session = self._Session()
@@ -122,9 +187,24 @@ class PGVectorStore(VectorStore):
             # Get user_id from the document
             user_id = str(existing_doc.user_id)
             
-            # Generate embeddings for all documents
-            texts = [doc.page_content for doc in documents]
-            embeddings = self.embeddings.embed_documents(texts)
+            # Generate embeddings unless the caller already computed them
+            if embeddings is None:
+                texts = [doc.page_content for doc in documents]
+                embeddings = self.embeddings.embed_documents(texts)
+            elif len(embeddings) != len(documents):
+                raise ValueError(
+                    f"Got {len(embeddings)} embeddings for {len(documents)} documents"
+                )
+            
+            if use_copy is None:
+                use_copy = len(documents) >= BULK_INSERT_THRESHOLD
+            
+            if use_copy:
+                # Release the ORM session before the COPY path opens its own
+                session.close()
+                session = None
+                self.bulk_insert_chunks(documents, document_id, user_id, embeddings)
+                return True
             
             # Create ChunkEmbedding objects and explicitly set their IDs
             chunk_objects = []
@@ -157,6 +237,69 @@ class PGVectorStore(VectorStore):
             if session:
                 session.close()
     
+    def bulk_insert_chunks(self, documents: List[Document], document_id: str, user_id: str,
+                           embeddings: List[List[float]],
+                           batch_size: int = BULK_INSERT_BATCH_SIZE,
+                           atomic: bool = True) -> int:
+        """
+        Insert chunks with binary COPY instead of per-row ORM INSERTs.
+        
+        Rows are streamed in COPY batches of batch_size. With atomic=True all
+        batches share one transaction, so a failure leaves no partial document;
+        with atomic=False each batch is committed on its own, which bounds the
+        transaction size for very large documents.
+        
+        Args:
+            documents: Chunks to store
+            document_id: ID of the parent document
+            user_id: Owner of the chunks
+            embeddings: Embeddings aligned with documents
+            batch_size: Rows per COPY statement
+            atomic: Whether to commit once at the end or after every batch
+            
+        Returns:
+            Number of rows written
+        """
+        session = None
+        written = 0
+        try:
+            session = self._Session()
+            raw_conn = session.connection().connection
+            cur = raw_conn.cursor()
+            
+            for start in range(0, len(documents), batch_size):
+                buf = io.BytesIO()
+                buf.write(_COPY_HEADER)
+                for doc, embedding in zip(documents[start:start + batch_size],
+                                          embeddings[start:start + batch_size]):
+                    buf.write(encode_chunk_copy_row(
+                        doc.id, document_id, user_id,
+                        {"page_content": doc.page_content, "metadata": doc.metadata},
+                        embedding
+                    ))
+                buf.write(_COPY_TRAILER)
+                buf.seek(0)
+                
+                cur.copy_expert(_CHUNK_COPY_SQL, buf)
+                written += min(batch_size, len(documents) - start)
+                if not atomic:
+                    session.commit()
+                    raw_conn = session.connection().connection
+                    cur = raw_conn.cursor()
+            
+            session.commit()
+            logger.info(f"Bulk inserted {written} chunks for document {document_id}")
+            return written
+        
+        except Exception as e:
+            if session:
+                session.rollback()
+            logger.error(f"Bulk insert failed after {written} chunks: {e}")
+            raise
+        finally:
+            if session:
+                session.close()
+
     def count_chunks(self) -> int:
         """
         Count the total number of chunks in the store.
@@ -237,75 +380,169 @@ class PGVectorStore(VectorStore):
         
         return first_pass_doc_ids
 
-    def _retrieve_with_dense_vector(self, query: str, user_id: str, top_k: int, 
-                               document_ids: Optional[List[str]] = None) -> List[Document]:
+    @staticmethod
+    def _row_to_document(row: Dict[str, Any], score_key: str) -> Document:
         """
-        Perform pure vector similarity search.
+        Build a Document from a projected chunk row.
         
         Args:
-            query: Search query
-            user_id: User ID for filtering
-            top_k: Number of results to retrieve
-            document_ids: Optional list of document IDs to filter by (from BM25)
+            row: Row containing id, document_id, data and the score column
+            score_key: Name of the score column to copy into the metadata
             
         Returns:
-            List of Document objects with results
+            Document with the chunk id, document id and score in its metadata
+        """
+        data = row['data'] or {}
+        return Document(
+            page_content=data.get('page_content', ''),
+            metadata={
+                **data.get('metadata', {}),
+                'id': row['id'],
+                'document_id': row['document_id'],
+                score_key: row[score_key]
+            }
+        )
+
+    def _iter_chunk_rows(self, sql: str, params: List[Any], top_k: int,
+                         batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Execute a chunk retrieval query and yield its rows.
+        
+        Small result sets are fetched in one round trip. When top_k exceeds
+        STREAM_THRESHOLD a named server-side cursor is used so rows are
+        transferred and decoded batch_size at a time.
+        
+        Args:
+            sql: Query projecting CHUNK_RESULT_COLUMNS plus a score column
+            params: Query parameters
+            top_k: Requested number of rows (the query's LIMIT)
+            batch_size: Rows per network fetch when streaming
+            
+        Yields:
+            Result rows as dictionaries
         """
         session = None
         try:
-            # Get a session and its engine
             session = self._Session()
             conn = session.connection()
-            cur = conn.connection.cursor(cursor_factory=RealDictCursor)
-            
-            # Generate query embedding
-            query_embedding = self.embeddings.embed_query(query)
-            query_embedding_array = np.array(query_embedding)
-            # Convert numpy array to list for psycopg2
-            query_embedding_list = query_embedding_array.tolist()
-            
-            # Prepare the SQL query
-            sql = """
-                SELECT * FROM chunks_embeddings 
-                WHERE user_id = %s 
-            """
-            
-            params = [user_id]
-            
-            if document_ids:
-                sql += " AND document_id = ANY(%s) "
-                params.append(document_ids)
-            
-            sql += """
-                ORDER BY embedding <=> %s::vector
-                LIMIT %s
-            """
-            params.extend([query_embedding_list, top_k])
-            
-            # Execute query
-            cur.execute(sql, params)
-            rows = cur.fetchall()
-            
-            # Convert rows to Document objects
-            results = []
-            for row in rows:
-                # Create a document with the data from the row
-                doc = Document(
-                    page_content=row['data'].get('page_content', ''),
-                    metadata={
-                        **row['data'].get('metadata', {}),
-                        'id': row['id'],
-                        'document_id': row['document_id']
-                    }
-                )
-                results.append(doc)
             
-            return results
+            if top_k <= STREAM_THRESHOLD:
+                cur = conn.connection.cursor(cursor_factory=RealDictCursor)
+                cur.execute(sql, params)
+                for row in cur.fetchall():
+                    yield row
+                return
+            
+            # Named cursors live inside the session's transaction and keep the
+            # result set on the server; itersize controls the fetch batch.
+            cur = conn.connection.cursor(
+                name=f"chunks_stream_{uuid4().hex}",
+                cursor_factory=RealDictCursor
+            )
+            cur.itersize = batch_size
+            try:
+                cur.execute(sql, params)
+                for row in cur:
+                    yield row
+            finally:
+                cur.close()
         
         finally:
             if session:
                 session.close()
 
+    def _dense_vector_query(self, query: str, user_id: str, top_k: int,
+                            document_ids: Optional[List[str]] = None) -> Tuple[str, List[Any]]:
+        """Build the SQL and parameters for a dense vector search."""
+        # Generate query embedding
+        query_embedding = self.embeddings.embed_query(query)
+        # Convert numpy array to list for psycopg2
+        query_embedding_list = np.asarray(query_embedding).tolist()
+        
+        sql = f"""
+            SELECT {CHUNK_RESULT_COLUMNS}, embedding <=> %s::vector AS distance
+            FROM chunks_embeddings 
+            WHERE user_id = %s 
+        """
+        
+        params = [query_embedding_list, user_id]
+        
+        if document_ids:
+            sql += " AND document_id = ANY(%s) "
+            params.append(document_ids)
+        
+        sql += """
+            ORDER BY distance
+            LIMIT %s
+        """
+        params.append(top_k)
+        return sql, params
+
+    def _text_search_query(self, query: str, user_id: str, top_k: int,
+                           document_ids: Optional[List[str]] = None,
+                           language: str = 'french') -> Tuple[str, List[Any]]:
+        """Build the SQL and parameters for a full-text search."""
+        sql = f"""
+            SELECT {CHUNK_RESULT_COLUMNS},
+                   ts_rank(to_tsvector(%s, data->>'page_content'), 
+                           plainto_tsquery(%s, %s)) AS rank
+            FROM chunks_embeddings 
+            WHERE user_id = %s 
+        """
+        
+        params = [language, language, query, user_id]
+        
+        if document_ids:
+            sql += " AND document_id = ANY(%s) "
+            params.append(document_ids)
+        
+        sql += """
+            ORDER BY rank DESC
+            LIMIT %s
+        """
+        params.append(top_k)
+        return sql, params
+
+    def _retrieve_with_dense_vector(self, query: str, user_id: str, top_k: int, 
+                               document_ids: Optional[List[str]] = None) -> List[Document]:
+        """
+        Perform pure vector similarity search.
+        
+        Args:
+            query: Search query
+            user_id: User ID for filtering
+            top_k: Number of results to retrieve
+            document_ids: Optional list of document IDs to filter by (from BM25)
+            
+        Returns:
+            List of Document objects with results; the cosine distance is
+            stored in metadata['distance']
+        """
+        return list(self.iter_dense_vector(query, user_id, top_k, document_ids))
+
+    def iter_dense_vector(self, query: str, user_id: str, top_k: int,
+                          document_ids: Optional[List[str]] = None,
+                          batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Document]:
+        """
+        Stream vector similarity search results.
+        
+        Same query as _retrieve_with_dense_vector, but Documents are yielded as
+        rows arrive, using a server-side cursor for large top_k.
+        
+        Args:
+            query: Search query
+            user_id: User ID for filtering
+            top_k: Number of results to retrieve
+            document_ids: Optional list of document IDs to filter by
+            batch_size: Rows per network fetch when streaming
+            
+        Yields:
+            Document objects in ascending distance order
+        """
+        sql, params = self._dense_vector_query(query, user_id, top_k, document_ids)
+        for row in self._iter_chunk_rows(sql, params, top_k, batch_size):
+            yield self._row_to_document(row, 'distance')
+
     def _retrieve_with_text_search(self, query: str, user_id: str, top_k: int, 
                                  document_ids: Optional[List[str]] = None,
                                  language: str = 'french') -> List[Document]:
@@ -320,57 +557,32 @@ class PGVectorStore(VectorStore):
             language: Language for text search
             
         Returns:
-            List of Document objects with results
+            List of Document objects with results; the ts_rank score is
+            stored in metadata['rank']
         """
-        session = None
-        try:
-            # Get a session and its engine
-            session = self._Session()
-            conn = session.connection()
-            cur = conn.connection.cursor(cursor_factory=RealDictCursor)
-            
-            # Prepare the SQL query for text search
-            sql = """
-                SELECT * FROM chunks_embeddings 
-                WHERE user_id = %s 
-            """
-            
-            params = [user_id]
-            
-            if document_ids:
-                sql += " AND document_id = ANY(%s) "
-                params.append(document_ids)
-            
-            sql += f"""
-                ORDER BY ts_rank(to_tsvector(%s, data->>'page_content'), 
-                               plainto_tsquery(%s, %s)) DESC
-                LIMIT %s
-            """
-            params.extend([language, language, query, top_k])
-            
-            # Execute query
-            cur.execute(sql, params)
-            rows = cur.fetchall()
-            
-            # Convert rows to Document objects
-            results = []
-            for row in rows:
-                # Create a document with the data from the row
-                doc = Document(
-                    page_content=row['data'].get('page_content', ''),
-                    metadata={
-                        **row['data'].get('metadata', {}),
-                        'id': row['id'],
-                        'document_id': row['document_id']
-                    }
-                )
-                results.append(doc)
-            
-            return results
+        return list(self.iter_text_search(query, user_id, top_k, document_ids, language))
+
+    def iter_text_search(self, query: str, user_id: str, top_k: int,
+                         document_ids: Optional[List[str]] = None,
+                         language: str = 'french',
+                         batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Document]:
+        """
+        Stream full-text search results.
         
-        finally:
-            if session:
-                session.close()
+        Args:
+            query: Search query
+            user_id: User ID for filtering
+            top_k: Number of results to retrieve
+            document_ids: Optional list of document IDs to filter by
+            language: Language for text search
+            batch_size: Rows per network fetch when streaming
+            
+        Yields:
+            Document objects in descending rank order
+        """
+        sql, params = self._text_search_query(query, user_id, top_k, document_ids, language)
+        for row in self._iter_chunk_rows(sql, params, top_k, batch_size):
+            yield self._row_to_document(row, 'rank')
 
     def _fuse_results_rrf(self, *ranked_lists: List[Document], k: int = 60, top_k: int = 100) -> List[Document]:
         """
@@ -681,7 +893,7 @@ class PGVectorStore(VectorStore):
                 session.close()
 
     def rerank_results(self, query: str, initial_results: List[Document], top_k: int = 20, 
-                      model_name: str = 'cross-encoder/ms-marco-MiniLM-L-12-v2') -> List[Document]:
+                      model_name: str = DEFAULT_RERANKER_MODEL) -> List[Document]:
         """
         Rerank retrieval results using cross-encoder.
         
@@ -695,30 +907,9 @@ class PGVectorStore(VectorStore):
             Reranked list of Document objects
         """
         try:
-            from sentence_transformers import CrossEncoder
-            
-            # Initialize cross-encoder model
-            cross_encoder = CrossEncoder(model_name)
-            
-            # Extract text content from results
-            pairs = []
-            for doc in initial_results:
-                pairs.append((query, doc.page_content))
-            
-            # Get cross-encoder scores
-            scores = cross_encoder.predict(pairs)
-            
-            # Create list of (score, index) tuples
-            scored_indices = [(score, i) for i, score in enumerate(scores)]
-            
-            # Sort by score and get indices
-            sorted_indices = [i for _, i in sorted(scored_indices, reverse=True)]
-            
-            # Reorder documents using the sorted indices
-            reranked_results = [initial_results[i] for i in sorted_indices]
-            
-            # Return top k results
-            return reranked_results[:top_k]
+            # The registry keeps one loaded model per name and caches scores,
+            # so only the first call for a model pays the load time.
+            return get_reranker(model_name).rerank(query, initial_results, top_k)
             
         except ImportError:
             logger.warning("Could not import sentence_transformers. Reranking skipped. Install with 'pip install sentence-transformers'")
@@ -0,0 +1,254 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from queue import Empty, Queue
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RERANKER_MODEL = 'cross-encoder/ms-marco-MiniLM-L-12-v2'
+
+
+@dataclass
+class RerankTimings:
+    """Timing breakdown (milliseconds) and cache counters for one rerank call."""
+    model_load_ms: float = 0.0
+    cache_lookup_ms: float = 0.0
+    queue_wait_ms: float = 0.0
+    inference_ms: float = 0.0
+    total_ms: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    batch_size: int = 0
+
+
+@dataclass
+class _ScoreRequest:
+    """Pairs submitted to the micro-batcher by a single rerank call."""
+    pairs: List[Tuple[str, str]]
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class RerankerService:
+    """
+    Process-wide cross-encoder reranker.
+
+    One instance per model name is kept loaded for the lifetime of the process
+    (see get_reranker). Concurrent rerank calls are merged into a single
+    predict() call by a background micro-batcher, and (query, chunk) scores are
+    cached with LRU eviction so repeated queries skip inference.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANKER_MODEL,
+                 max_batch_size: int = 64, max_wait_ms: float = 5.0,
+                 cache_size: int = 10000):
+        """
+        Initialize the reranker service.
+
+        Args:
+            model_name: Cross-encoder model to load
+            max_batch_size: Maximum number of pairs scored in one predict() call
+            max_wait_ms: How long the batcher waits for more requests to merge
+            cache_size: Maximum number of cached (query, chunk) scores
+        """
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.cache_size = cache_size
+
+        self._model = None
+        self._model_lock = threading.Lock()
+
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        self._queue: "Queue[_ScoreRequest]" = Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+        self.last_timings = RerankTimings()
+
+    def _load_model(self) -> float:
+        """Load the cross-encoder once. Returns the time spent loading in ms."""
+        if self._model is not None:
+            return 0.0
+        with self._model_lock:
+            if self._model is not None:
+                return 0.0
+            from sentence_transformers import CrossEncoder
+
+            start = time.perf_counter()
+            self._model = CrossEncoder(self.model_name)
+            elapsed = (time.perf_counter() - start) * 1000
+            logger.info(f"Loaded cross-encoder {self.model_name} in {elapsed:.0f} ms")
+            return elapsed
+
+    def _ensure_worker(self) -> None:
+        """Start the micro-batching thread on first use."""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(
+                target=self._batch_loop,
+                name=f"reranker-{self.model_name}",
+                daemon=True
+            )
+            self._worker.start()
+
+    def _batch_loop(self) -> None:
+        """Collect queued requests into batches and score them together."""
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            pending = len(first.pairs)
+            deadline = time.perf_counter() + self.max_wait_ms / 1000
+
+            while pending < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except Empty:
+                    break
+                batch.append(request)
+                pending += len(request.pairs)
+
+            pairs = [pair for request in batch for pair in request.pairs]
+            try:
+                start = time.perf_counter()
+                scores = self._model.predict(pairs, batch_size=self.max_batch_size)
+                inference_ms = (time.perf_counter() - start) * 1000
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            offset = 0
+            for request in batch:
+                count = len(request.pairs)
+                request.future.set_result(
+                    ([float(s) for s in scores[offset:offset + count]], start, inference_ms, len(pairs))
+                )
+                offset += count
+
+    @staticmethod
+    def _cache_key(query_hash: str, doc: Document) -> Tuple[str, str]:
+        """Key a score by query hash and chunk id (content hash when the id is missing)."""
+        chunk_id = doc.metadata.get('id') or getattr(doc, 'id', None)
+        if not chunk_id:
+            chunk_id = hashlib.sha1(doc.page_content.encode('utf-8')).hexdigest()
+        return query_hash, str(chunk_id)
+
+    def score(self, query: str, documents: Sequence[Document]) -> Tuple[List[float], RerankTimings]:
+        """
+        Score documents against a query.
+
+        Args:
+            query: Search query
+            documents: Documents to score
+
+        Returns:
+            Tuple of (scores aligned with documents, timing breakdown)
+        """
+        timings = RerankTimings()
+        call_start = time.perf_counter()
+        timings.model_load_ms = self._load_model()
+
+        query_hash = hashlib.sha1(query.encode('utf-8')).hexdigest()
+        keys = [self._cache_key(query_hash, doc) for doc in documents]
+        scores: List[Optional[float]] = [None] * len(documents)
+
+        lookup_start = time.perf_counter()
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    scores[i] = cached
+        timings.cache_lookup_ms = (time.perf_counter() - lookup_start) * 1000
+
+        missing = [i for i, s in enumerate(scores) if s is None]
+        timings.cache_hits = len(documents) - len(missing)
+        timings.cache_misses = len(missing)
+
+        if missing:
+            self._ensure_worker()
+            request = _ScoreRequest(pairs=[(query, documents[i].page_content) for i in missing])
+            self._queue.put(request)
+            new_scores, started_at, inference_ms, batch_size = request.future.result()
+            timings.queue_wait_ms = (started_at - request.enqueued_at) * 1000
+            timings.inference_ms = inference_ms
+            timings.batch_size = batch_size
+
+            with self._cache_lock:
+                for i, value in zip(missing, new_scores):
+                    scores[i] = value
+                    self._cache[keys[i]] = value
+                    self._cache.move_to_end(keys[i])
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        timings.total_ms = (time.perf_counter() - call_start) * 1000
+        self.last_timings = timings
+        return scores, timings
+
+    def rerank(self, query: str, documents: List[Document], top_k: int = 20) -> List[Document]:
+        """
+        Rerank documents by cross-encoder score.
+
+        Args:
+            query: Search query
+            documents: Documents to rerank
+            top_k: Number of results to return
+
+        Returns:
+            Top-k documents in descending score order
+        """
+        if not documents:
+            return []
+        scores, timings = self.score(query, documents)
+        logger.debug(
+            f"Reranked {len(documents)} docs in {timings.total_ms:.1f} ms "
+            f"(hits={timings.cache_hits}, inference={timings.inference_ms:.1f} ms, "
+            f"queue={timings.queue_wait_ms:.1f} ms)"
+        )
+        order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)
+        return [documents[i] for i in order[:top_k]]
+
+    def clear_cache(self) -> None:
+        """Drop all cached scores."""
+        with self._cache_lock:
+            self._cache.clear()
+
+
+_rerankers: Dict[str, RerankerService] = {}
+_rerankers_lock = threading.Lock()
+
+
+def get_reranker(model_name: str = DEFAULT_RERANKER_MODEL, **kwargs) -> RerankerService:
+    """
+    Get the process-wide reranker for a model, creating it on first use.
+
+    Args:
+        model_name: Cross-encoder model name
+        **kwargs: RerankerService options, only applied when the instance is created
+
+    Returns:
+        Shared RerankerService instance
+    """
+    with _rerankers_lock:
+        service = _rerankers.get(model_name)
+        if service is None:
+            service = RerankerService(model_name, **kwargs)
+            _rerankers[model_name] = service
+        return service
@@ -30,6 +30,8 @@ import aiohttp
 import requests
 from urllib.parse import urlparse
 
+from src.token_management.cache import LRUCache
+
 # Import token management components
 try:
     from .token_counter import TokenCounter
@@ -130,7 +132,7 @@ class ExternalAPITokenIntegration:
         self.middleware = TokenQuotaMiddleware()
         self.api_stats: Dict[str, Dict] = {}
         self.operation_history: List[APIOperationContext] = []
-        self.request_cache: Dict[str, int] = {}  # Cache request hash to token count
+        self.request_cache = LRUCache(max_entries=10000, ttl=3600)  # Cache request hash to token count
         self.rate_limiters: Dict[str, Any] = {}  # API-specific rate limiters
         
         logger.info("External API Token Integration initialized")
@@ -171,8 +173,8 @@ class ExternalAPITokenIntegration:
             request_hash = self._generate_request_hash(api_name, endpoint, method, params, json_data)
             
             # Check if request already exists (token optimization)
-            if request_hash in self.request_cache:
-                cached_tokens = self.request_cache[request_hash]
+            cached_tokens = self.request_cache.get(request_hash)
+            if cached_tokens is not None:
                 logger.info(f"Request hash {request_hash[:8]}... found in cache, using {cached_tokens} tokens")
                 return APITokenResult(
                     success=True,
@@ -499,9 +501,8 @@ class ExternalAPITokenIntegration:
             stats = self.api_stats[session_key]
             
             # Calculate cache hit rate
-            total_cache_lookups = sum(self.request_cache.values()) if self.request_cache else 0
-            cache_hits = len([v for v in self.request_cache.values() if v > 0])
-            cache_hit_rate = (cache_hits / max(total_cache_lookups, 1)) * 100
+            cache_metrics = self.request_cache.get_metrics()
+            cache_hit_rate = cache_metrics['hit_rate']
             
             # Calculate success rate
             total_operations = stats.get('total_operations', 0)
@@ -516,7 +517,8 @@ class ExternalAPITokenIntegration:
                 'average_duration_per_operation': stats.get('average_duration_per_operation', 0),
                 'cache_hit_rate': round(cache_hit_rate, 2),
                 'success_rate': round(success_rate, 2),
-                'cached_request_count': len(self.request_cache)
+                'cached_request_count': len(self.request_cache),
+                'cache_evictions': cache_metrics['evictions']
             }
             
         except Exception as e:
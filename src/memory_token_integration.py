@@ -24,6 +24,8 @@ from datetime import datetime, timezone
 import traceback
 import hashlib
 
+from src.token_management.cache import LRUCache
+
 # Import token management components
 try:
     from .token_counter import TokenCounter
@@ -120,7 +122,7 @@ class MemoryTokenIntegration:
         self.middleware = TokenQuotaMiddleware()
         self.memory_stats: Dict[str, Dict] = {}
         self.operation_history: List[MemoryOperationContext] = []
-        self.content_cache: Dict[str, int] = {}  # Cache content hash to token count
+        self.content_cache = LRUCache(max_entries=10000)  # Cache content hash to token count
         
         logger.info("Memory Token Integration initialized")
     
@@ -152,8 +154,8 @@ class MemoryTokenIntegration:
             content_hash = self._generate_content_hash(content)
             
             # Check if content already exists (token optimization)
-            if content_hash in self.content_cache:
-                cached_tokens = self.content_cache[content_hash]
+            cached_tokens = self.content_cache.get(content_hash)
+            if cached_tokens is not None:
                 logger.info(f"Content hash {content_hash[:8]}... found in cache, using {cached_tokens} tokens")
                 return MemoryTokenResult(
                     success=True,
@@ -358,8 +360,7 @@ class MemoryTokenIntegration:
             await self._record_token_usage(context, tokens_used)
             
             # Remove from cache
-            if content_hash in self.content_cache:
-                del self.content_cache[content_hash]
+            self.content_cache.pop(content_hash)
             
             # Update statistics
             await self._update_memory_stats(context, tokens_used)
@@ -498,9 +499,8 @@ class MemoryTokenIntegration:
             stats = self.memory_stats[session_key]
             
             # Calculate cache hit rate
-            total_cache_lookups = sum(self.content_cache.values()) if self.content_cache else 0
-            cache_hits = len([v for v in self.content_cache.values() if v > 0])
-            cache_hit_rate = (cache_hits / max(total_cache_lookups, 1)) * 100
+            cache_metrics = self.content_cache.get_metrics()
+            cache_hit_rate = cache_metrics['hit_rate']
             
             return {
                 'total_operations': stats.get('total_operations', 0),
@@ -508,7 +508,8 @@ class MemoryTokenIntegration:
                 'operations_by_type': stats.get('operations_by_type', {}),
                 'average_tokens_per_operation': stats.get('average_tokens_per_operation', 0),
                 'cache_hit_rate': round(cache_hit_rate, 2),
-                'cached_content_count': len(self.content_cache)
+                'cached_content_count': len(self.content_cache),
+                'cache_evictions': cache_metrics['evictions']
             }
             
         except Exception as e:
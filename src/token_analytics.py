@@ -21,6 +21,7 @@ import base64
 
 from simba.simba.database.postgres import PostgresDB
 from src.token_monitoring import TokenMonitoringSystem, TokenUsageStatus, SystemHealthMetrics
+from src.token_usage_aggregation import TokenUsageAggregator
 
 logger = logging.getLogger(__name__)
 
@@ -137,6 +138,8 @@ class TokenAnalytics:
         """
         self.db = db or PostgresDB()
         self.monitoring = TokenMonitoringSystem(db)
+        self.aggregator = TokenUsageAggregator(self.db)
+        self.rollups = self.monitoring.rollups
         
         # Analytics configuration
         self.config = {
@@ -223,28 +226,37 @@ class TokenAnalytics:
             raise
     
     def _get_usage_data(self, user_id: Optional[str], start_date: datetime, end_date: datetime) -> pd.DataFrame:
-        """Retrieve usage data from database."""
+        """
+        Retrieve usage data from database, pre-aggregated per hour, user and endpoint.
+        
+        Each row holds the tokens_used and requests totals of one group, so the
+        frame grows with hours x users x endpoints rather than with requests.
+        Completed hours are read from the usage rollups; only the tail after the
+        rollup watermark is aggregated from raw rows.
+        """
         try:
-            # Get token usage records
-            usage_records = self.db.get_user_token_usage(
+            buckets = self.rollups.series(
+                'hour',
                 user_id=user_id,
                 start_date=start_date,
                 end_date=end_date,
-                user_id=user_id if user_id else "default"
+                group_by=('user_id', 'api_endpoint')
             )
             
-            if not usage_records:
+            if not len(buckets):
                 # Return empty DataFrame with expected columns
                 return pd.DataFrame(columns=[
-                    'user_id', 'session_id', 'tokens_used', 'api_endpoint', 
-                    'priority_level', 'timestamp'
+                    'timestamp', 'user_id', 'api_endpoint', 'tokens_used', 'requests'
                 ])
             
-            # Convert to DataFrame
-            df = pd.DataFrame(usage_records)
-            
-            # Convert timestamp to datetime
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            # Columns map directly onto the DataFrame
+            df = pd.DataFrame({
+                'timestamp': pd.to_datetime(buckets['bucket']),
+                'user_id': buckets['user_id'],
+                'api_endpoint': buckets['api_endpoint'],
+                'tokens_used': buckets['total_tokens'],
+                'requests': buckets['total_requests']
+            })
             
             return df
             
@@ -271,7 +283,7 @@ class TokenAnalytics:
                     period_end = (period_start[0] + timedelta(days=1)) if granularity == TimeGranularity.DAILY else (period_start[0] + timedelta(weeks=1))
                     
                     total_tokens = group['tokens_used'].sum()
-                    total_requests = len(group)
+                    total_requests = group['requests'].sum()
                     average_tokens = total_tokens / total_requests if total_requests > 0 else 0
                     
                     # Calculate trend
@@ -279,7 +291,7 @@ class TokenAnalytics:
                     growth_rate = self._calculate_growth_rate(group)
                     
                     # Get top endpoints
-                    top_endpoints = group['api_endpoint'].value_counts().head(3).index.tolist()
+                    top_endpoints = group.groupby('api_endpoint')['requests'].sum().nlargest(3).index.tolist()
                     
                     # Get unique user count
                     user_count = group['user_id'].nunique() if 'user_id' in group.columns else 1
@@ -361,10 +373,12 @@ class TokenAnalytics:
                     'period_days': 0
                 }
             
+            total_tokens = int(usage_data['tokens_used'].sum())
+            total_requests = int(usage_data['requests'].sum())
             summary = {
-                'total_tokens': int(usage_data['tokens_used'].sum()),
-                'total_requests': len(usage_data),
-                'average_tokens_per_request': round(usage_data['tokens_used'].mean(), 2),
+                'total_tokens': total_tokens,
+                'total_requests': total_requests,
+                'average_tokens_per_request': round(total_tokens / total_requests, 2) if total_requests else 0,
                 'unique_users': usage_data['user_id'].nunique() if 'user_id' in usage_data.columns else 1,
                 'unique_endpoints': usage_data['api_endpoint'].nunique(),
                 'period_days': (usage_data['timestamp'].max() - usage_data['timestamp'].min()).days + 1
@@ -404,10 +418,11 @@ class TokenAnalytics:
             projected_cost = total_cost * 1.1  # Simple 10% projection
             
             # Cost breakdown by endpoint
-            cost_breakdown = {}
-            for endpoint in usage_data['api_endpoint'].unique():
-                endpoint_tokens = usage_data[usage_data['api_endpoint'] == endpoint]['tokens_used'].sum()
-                cost_breakdown[endpoint] = endpoint_tokens * self.config['cost_per_token']
+            endpoint_tokens = usage_data.groupby('api_endpoint')['tokens_used'].sum()
+            cost_breakdown = {
+                endpoint: tokens * self.config['cost_per_token']
+                for endpoint, tokens in endpoint_tokens.items()
+            }
             
             return CostAnalysis(
                 total_cost=round(total_cost, 4),
@@ -426,11 +441,11 @@ class TokenAnalytics:
     def _generate_forecast(self, usage_data: pd.DataFrame) -> Optional[ForecastData]:
         """Generate usage forecast."""
         try:
-            if usage_data.empty or len(usage_data) < self.config['min_data_points']:
+            if usage_data.empty or usage_data['timestamp'].nunique() < self.config['min_data_points']:
                 return None
             
-            # Simple linear regression forecast
-            tokens = usage_data['tokens_used'].values
+            # Simple linear regression forecast over hourly totals
+            tokens = usage_data.groupby('timestamp')['tokens_used'].sum().values
             x = np.arange(len(tokens))
             
             # Fit linear model
@@ -483,7 +498,8 @@ class TokenAnalytics:
                 return recommendations
             
             # Check for high usage patterns
-            avg_tokens = usage_data['tokens_used'].mean()
+            total_requests = usage_data['requests'].sum()
+            avg_tokens = usage_data['tokens_used'].sum() / total_requests if total_requests else 0
             if avg_tokens > 1000:  # High usage threshold
                 recommendations.append(Recommendation(
                     id="high_usage_optimization",
@@ -491,12 +507,12 @@ class TokenAnalytics:
                     priority="high",
                     description=f"High average token usage detected ({avg_tokens:.0f} tokens/request). Consider implementing caching or optimizing prompts.",
                     impact="significant",
-                    estimated_savings=avg_tokens * 0.1 * self.config['cost_per_token'] * len(usage_data),
+                    estimated_savings=avg_tokens * 0.1 * self.config['cost_per_token'] * total_requests,
                     implementation_effort="medium"
                 ))
             
             # Check for API endpoint optimization
-            endpoint_counts = usage_data['api_endpoint'].value_counts()
+            endpoint_counts = usage_data.groupby('api_endpoint')['requests'].sum()
             if len(endpoint_counts) > 10:  # Too many endpoints
                 recommendations.append(Recommendation(
                     id="endpoint_consolidation",
@@ -521,9 +537,9 @@ class TokenAnalytics:
                 ))
             
             # Check for user behavior patterns
-            user_counts = usage_data['user_id'].value_counts()
-            if len(user_counts) > 0:
-                top_user_usage = user_counts.iloc[0] / len(usage_data)
+            user_counts = usage_data.groupby('user_id')['requests'].sum().sort_values(ascending=False)
+            if len(user_counts) > 0 and total_requests:
+                top_user_usage = user_counts.iloc[0] / total_requests
                 if top_user_usage > 0.5:  # One user dominates usage
                     recommendations.append(Recommendation(
                         id="user_balancing",
@@ -274,6 +274,9 @@ class TokenDashboard:
         self.running = True
         self.setup_default_widgets(user_id)
         
+        # Keep the usage rollups current so widgets only aggregate the raw tail
+        self.monitoring.rollups.start(interval=self.config['refresh_interval'])
+        
         def refresh_loop():
             while self.running:
                 try:
@@ -301,6 +304,7 @@ class TokenDashboard:
         self.running = False
         if self.refresh_thread:
             self.refresh_thread.join(timeout=5.0)
+        self.monitoring.rollups.stop()
         
         logger.info("Real-time dashboard stopped")
     
@@ -0,0 +1,181 @@
+"""
+Shared In-Memory Cache for the Token Subsystem
+
+This module provides a thread-safe LRU cache with optional per-entry TTL and an
+optional byte-size bound. Reads refresh recency, so the entries evicted first are
+the least recently used, and hit/miss/eviction counters are kept for metrics.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with TTL and size bounds.
+
+    Supports dict-style access (cache[key], key in cache, del cache[key], len)
+    in addition to get/set, so it can replace a plain dict cache directly.
+    Membership tests and len() do not count towards hits and misses.
+    """
+
+    def __init__(self, max_entries: Optional[int] = 1000, ttl: Optional[float] = None,
+                 max_bytes: Optional[int] = None,
+                 sizeof: Callable[[Any], int] = sys.getsizeof,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries (None for unbounded)
+            ttl: Default time-to-live in seconds (None for no expiry)
+            max_bytes: Maximum total size of values as measured by sizeof (None for unbounded)
+            sizeof: Function returning the size in bytes of a value
+            clock: Monotonic time source in seconds
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._clock = clock
+        # key -> (value, expires_at, size)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Optional[float], int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, expires_at: Optional[float], now: float) -> bool:
+        return expires_at is not None and now >= expires_at
+
+    def _remove(self, key: Hashable) -> Any:
+        value, _, size = self._entries.pop(key)
+        self._bytes -= size
+        return value
+
+    def _evict(self):
+        """Drop least recently used entries until the bounds are met. Caller holds the lock."""
+        while self._entries and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a value and mark it as most recently used.
+
+        Args:
+            key: Cache key
+            default: Returned when the key is missing or expired
+
+        Returns:
+            Cached value or default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if self._expired(entry[1], self._clock()):
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        Store a value, evicting least recently used entries if a bound is exceeded.
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: Time-to-live in seconds (uses the cache default if None)
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self._clock() + ttl if ttl is not None else None
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            self._evict()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove a key and return its value (default if missing)."""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            return self._remove(key)
+
+    def purge_expired(self) -> int:
+        """Remove all expired entries. Returns the number removed."""
+        now = self._clock()
+        with self._lock:
+            expired = [key for key, (_, expires_at, _) in self._entries.items()
+                       if self._expired(expires_at, now)]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+            return len(expired)
+
+    def clear(self):
+        """Remove all entries. Counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get size, bounds and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes if self.max_bytes is not None else None,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups * 100) if lookups else 0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self.set(key, value)
+
+    def __delitem__(self, key: Hashable):
+        if self.pop(key, _MISSING) is _MISSING:
+            raise KeyError(key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not self._expired(entry[1], self._clock())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        with self._lock:
+            return iter(list(self._entries))
@@ -5,11 +5,14 @@ This module provides thread-safe locking mechanisms for rate limiting and token
 to ensure proper handling of concurrent requests and prevent race conditions.
 """
 
+import asyncio
+import bisect
 import logging
 import threading
 import time
-from typing import Dict, Optional, Any, Set
-from contextlib import contextmanager
+import zlib
+from typing import Dict, Optional, Any, Set, Tuple
+from contextlib import asynccontextmanager, contextmanager
 from dataclasses import dataclass
 from enum import Enum
 import uuid
@@ -43,29 +46,100 @@ class LockTimeoutError(Exception):
     pass
 
 
+# Upper bounds (milliseconds) of the wait-time histogram buckets
+WAIT_HISTOGRAM_BUCKETS_MS = (0.1, 1.0, 5.0, 10.0, 50.0, 100.0, 500.0, 1000.0, 5000.0, float("inf"))
+
+
+class LockStats:
+    """
+    Contention counters and wait-time histogram for one lock type.
+    
+    Attempts on different stripes record concurrently, so the counters have
+    their own lock.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.wait_histogram = [0] * len(WAIT_HISTOGRAM_BUCKETS_MS)
+    
+    def record(self, wait_ms: float, contended: bool, timed_out: bool = False):
+        """Record one acquisition attempt."""
+        bucket = bisect.bisect_left(WAIT_HISTOGRAM_BUCKETS_MS, wait_ms)
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.acquisitions += 1
+            if contended:
+                self.contended += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self.wait_histogram[bucket] += 1
+    
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            attempts = self.acquisitions + self.timeouts
+            return {
+                'acquisitions': self.acquisitions,
+                'contended': self.contended,
+                'timeouts': self.timeouts,
+                'contention_rate': self.contended / attempts if attempts else 0.0,
+                'average_wait_ms': self.total_wait_ms / attempts if attempts else 0.0,
+                'max_wait_ms': self.max_wait_ms,
+                'wait_histogram_ms': {
+                    ('inf' if bound == float("inf") else str(bound)): count
+                    for bound, count in zip(WAIT_HISTOGRAM_BUCKETS_MS, self.wait_histogram)
+                },
+            }
+
+
+def _stripe_index(lock_type: LockType, resource_id: str, stripes: int) -> int:
+    """Map a (lock type, resource) pair onto a stripe."""
+    return zlib.crc32(f"{lock_type.value}:{resource_id}".encode("utf-8")) % stripes
+
+
+def _is_expired(info: LockInfo, now: datetime) -> bool:
+    return (now - info.acquired_at).total_seconds() > info.timeout
+
+
 class LockManager:
     """
     Thread-safe lock manager for rate limiting and token allocation.
     
     Provides various types of locks with timeout handling and deadlock prevention.
     Supports recursive locking for the same thread and automatic cleanup.
+    
+    Resources are hashed onto a fixed set of striped condition variables. Waiters
+    sleep on their stripe's condition and are woken as soon as a lock on that
+    stripe is released, instead of polling.
     """
     
-    def __init__(self, default_timeout: float = 30.0, cleanup_interval: float = 60.0):
+    def __init__(self, default_timeout: float = 30.0, cleanup_interval: float = 60.0,
+                 stripes: int = 64):
         """
         Initialize the lock manager.
         
         Args:
             default_timeout: Default timeout for acquiring locks in seconds
             cleanup_interval: Interval for cleaning up expired locks in seconds
+            stripes: Number of condition variables resources are hashed onto
         """
         self.default_timeout = default_timeout
         self.cleanup_interval = cleanup_interval
-        self._locks: Dict[str, threading.Lock] = {}
+        self._stripes = [threading.Condition(threading.Lock()) for _ in range(stripes)]
+        # (lock type, resource) -> lock_id of the current holder
+        self._holders: Dict[Tuple[LockType, str], str] = {}
         self._lock_info: Dict[str, LockInfo] = {}
+        self._stats: Dict[LockType, LockStats] = {lock_type: LockStats() for lock_type in LockType}
         self._thread_local = threading.local()
         self._cleanup_thread: Optional[threading.Thread] = None
         self._running = False
+        self._stop_event = threading.Event()
         self._lock = threading.Lock()
         
         # Start cleanup thread
@@ -77,6 +151,7 @@ class LockManager:
         """Start the background cleanup thread."""
         if self._cleanup_thread is None or not self._cleanup_thread.is_alive():
             self._running = True
+            self._stop_event.clear()
             self._cleanup_thread = threading.Thread(target=self._cleanup_expired_locks, daemon=True)
             self._cleanup_thread.start()
             logger.info("Lock cleanup thread started")
@@ -85,7 +160,8 @@ class LockManager:
         """Background thread to clean up expired locks."""
         while self._running:
             try:
-                time.sleep(self.cleanup_interval)
+                if self._stop_event.wait(self.cleanup_interval):
+                    break
                 self._remove_expired_locks()
             except Exception as e:
                 logger.error(f"Error in lock cleanup thread: {e}")
@@ -93,27 +169,35 @@ class LockManager:
     def _remove_expired_locks(self):
         """Remove expired locks from the manager."""
         current_time = datetime.utcnow()
-        expired_locks = []
+        expired_locks = [
+            lock_id for lock_id, info in list(self._lock_info.items())
+            if _is_expired(info, current_time)
+        ]
         
-        with self._lock:
-            for lock_id, info in self._lock_info.items():
-                if (current_time - info.acquired_at).total_seconds() > info.timeout:
-                    expired_locks.append(lock_id)
-            
-            for lock_id in expired_locks:
-                self._force_release_lock(lock_id)
-                logger.warning(f"Force released expired lock: {lock_id}")
+        for lock_id in expired_locks:
+            self._force_release_lock(lock_id)
+            logger.warning(f"Force released expired lock: {lock_id}")
+    
+    def _stripe(self, lock_type: LockType, resource_id: str) -> threading.Condition:
+        return self._stripes[_stripe_index(lock_type, resource_id, len(self._stripes))]
     
     def _force_release_lock(self, lock_id: str):
         """Force release a lock without checking thread ownership."""
-        if lock_id in self._locks:
-            try:
-                self._locks[lock_id].release()
-                del self._locks[lock_id]
-                del self._lock_info[lock_id]
-                logger.debug(f"Force released lock: {lock_id}")
-            except Exception as e:
-                logger.error(f"Error force releasing lock {lock_id}: {e}")
+        info = self._lock_info.get(lock_id)
+        if info is None:
+            return
+        condition = self._stripe(info.lock_type, info.resource_id)
+        with condition:
+            self._drop_holder(lock_id, info)
+            condition.notify_all()
+        logger.debug(f"Force released lock: {lock_id}")
+    
+    def _drop_holder(self, lock_id: str, info: LockInfo):
+        """Remove a lock's bookkeeping. Caller holds the resource's stripe."""
+        key = (info.lock_type, info.resource_id)
+        if self._holders.get(key) == lock_id:
+            del self._holders[key]
+        self._lock_info.pop(lock_id, None)
     
     def _get_thread_id(self) -> int:
         """Get the current thread ID, creating thread-local storage if needed."""
@@ -126,22 +210,6 @@ class LockManager:
         """Generate a unique lock ID."""
         return f"{lock_type.value}_{resource_id}_{uuid.uuid4().hex[:8]}"
     
-    def _can_acquire_lock(self, lock_id: str, thread_id: int) -> bool:
-        """Check if the current thread can acquire a lock."""
-        if lock_id not in self._lock_info:
-            return True
-        
-        info = self._lock_info[lock_id]
-        # Allow recursive locking by the same thread
-        if info.thread_id == thread_id:
-            return True
-        
-        # Check if lock has expired
-        if (datetime.utcnow() - info.acquired_at).total_seconds() > info.timeout:
-            return True
-        
-        return False
-    
     def acquire_lock(self, lock_type: LockType, resource_id: str, 
                    timeout: Optional[float] = None) -> str:
         """
@@ -161,51 +229,61 @@ class LockManager:
         if timeout is None:
             timeout = self.default_timeout
         
-        lock_id = self._generate_lock_id(lock_type, resource_id)
+        key = (lock_type, resource_id)
         thread_id = self._get_thread_id()
-        start_time = time.time()
+        condition = self._stripe(lock_type, resource_id)
+        start = time.monotonic()
+        deadline = start + timeout
+        contended = False
         
-        logger.debug(f"Attempting to acquire lock: {lock_id} for resource: {resource_id}")
+        logger.debug(f"Attempting to acquire lock: {lock_type.value} for resource: {resource_id}")
         
-        while True:
-            # Check if we can acquire the lock
-            if self._can_acquire_lock(lock_id, thread_id):
-                break
-            
-            # Check timeout
-            if time.time() - start_time > timeout:
-                raise LockTimeoutError(f"Could not acquire lock {lock_id} within {timeout} seconds")
+        with condition:
+            while True:
+                holder_id = self._holders.get(key)
+                info = self._lock_info.get(holder_id) if holder_id else None
+                
+                if info is not None and info.thread_id == thread_id:
+                    # Recursive lock
+                    info.recursive_count += 1
+                    logger.debug(f"Acquired lock: {holder_id} (recursive: {info.recursive_count})")
+                    return holder_id
+                
+                if info is not None and _is_expired(info, datetime.utcnow()):
+                    logger.warning(f"Taking over expired lock: {holder_id}")
+                    self._drop_holder(holder_id, info)
+                    info = None
+                
+                if info is None:
+                    break
+                
+                contended = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats[lock_type].record((time.monotonic() - start) * 1000, True, timed_out=True)
+                    raise LockTimeoutError(
+                        f"Could not acquire lock {lock_type.value}_{resource_id} within {timeout} seconds"
+                    )
+                
+                # Wake up no later than the holder's expiry so it can be taken over
+                holder_expiry = info.timeout - (datetime.utcnow() - info.acquired_at).total_seconds()
+                condition.wait(min(remaining, max(holder_expiry, 0.001)))
             
-            # Sleep briefly before retrying
-            time.sleep(0.1)
+            lock_id = self._generate_lock_id(lock_type, resource_id)
+            self._holders[key] = lock_id
+            self._lock_info[lock_id] = LockInfo(
+                lock_id=lock_id,
+                lock_type=lock_type,
+                resource_id=resource_id,
+                acquired_at=datetime.utcnow(),
+                timeout=timeout,
+                thread_id=thread_id,
+                recursive_count=1
+            )
+            self._stats[lock_type].record((time.monotonic() - start) * 1000, contended)
         
-        # Acquire the lock
-        with self._lock:
-            # Create lock if it doesn't exist
-            if lock_id not in self._locks:
-                self._locks[lock_id] = threading.Lock()
-            
-            # Acquire the actual lock
-            self._locks[lock_id].acquire()
-            
-            # Update lock info
-            if lock_id in self._lock_info and self._lock_info[lock_id].thread_id == thread_id:
-                # Recursive lock
-                self._lock_info[lock_id].recursive_count += 1
-            else:
-                # New lock
-                self._lock_info[lock_id] = LockInfo(
-                    lock_id=lock_id,
-                    lock_type=lock_type,
-                    resource_id=resource_id,
-                    acquired_at=datetime.utcnow(),
-                    timeout=timeout,
-                    thread_id=thread_id,
-                    recursive_count=1
-                )
-            
-            logger.debug(f"Acquired lock: {lock_id} (recursive: {self._lock_info[lock_id].recursive_count})")
-            return lock_id
+        logger.debug(f"Acquired lock: {lock_id} (recursive: 1)")
+        return lock_id
     
     def release_lock(self, lock_id: str):
         """
@@ -214,12 +292,17 @@ class LockManager:
         Args:
             lock_id: Lock ID to release
         """
-        with self._lock:
+        info = self._lock_info.get(lock_id)
+        if info is None:
+            logger.warning(f"Attempted to release unknown lock: {lock_id}")
+            return
+        
+        condition = self._stripe(info.lock_type, info.resource_id)
+        with condition:
             if lock_id not in self._lock_info:
                 logger.warning(f"Attempted to release unknown lock: {lock_id}")
                 return
             
-            info = self._lock_info[lock_id]
             thread_id = self._get_thread_id()
             
             # Check if current thread owns the lock
@@ -233,14 +316,10 @@ class LockManager:
                 info.recursive_count -= 1
                 logger.debug(f"Released recursive lock: {lock_id} (remaining: {info.recursive_count})")
             else:
-                # Final release
-                try:
-                    self._locks[lock_id].release()
-                    del self._locks[lock_id]
-                    del self._lock_info[lock_id]
-                    logger.debug(f"Released lock: {lock_id}")
-                except Exception as e:
-                    logger.error(f"Error releasing lock {lock_id}: {e}")
+                # Final release; wake waiters on this stripe
+                self._drop_holder(lock_id, info)
+                condition.notify_all()
+                logger.debug(f"Released lock: {lock_id}")
     
     @contextmanager
     def lock(self, lock_type: LockType, resource_id: str, timeout: Optional[float] = None):
@@ -277,12 +356,7 @@ class LockManager:
         Returns:
             True if the resource is locked, False otherwise
         """
-        with self._lock:
-            # Look for any lock of this type for this resource
-            for info in self._lock_info.values():
-                if info.lock_type == lock_type and info.resource_id == resource_id:
-                    return True
-            return False
+        return (lock_type, resource_id) in self._holders
     
     def get_lock_info(self, lock_id: str) -> Optional[LockInfo]:
         """
@@ -294,8 +368,7 @@ class LockManager:
         Returns:
             LockInfo if the lock exists, None otherwise
         """
-        with self._lock:
-            return self._lock_info.get(lock_id)
+        return self._lock_info.get(lock_id)
     
     def get_active_locks(self) -> Dict[str, LockInfo]:
         """
@@ -304,8 +377,17 @@ class LockManager:
         Returns:
             Dictionary of lock_id to LockInfo for all active locks
         """
+        return dict(self._lock_info)
+    
+    def get_lock_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get contention statistics and wait-time histograms per lock type.
+        
+        Returns:
+            Dictionary of lock type value to statistics
+        """
         with self._lock:
-            return self._lock_info.copy()
+            return {lock_type.value: stats.to_dict() for lock_type, stats in self._stats.items()}
     
     def emergency_release_all(self, lock_type: Optional[LockType] = None):
         """
@@ -314,20 +396,20 @@ class LockManager:
         Args:
             lock_type: Specific lock type to release (None for all types)
         """
-        with self._lock:
-            locks_to_release = []
-            for lock_id, info in self._lock_info.items():
-                if lock_type is None or info.lock_type == lock_type:
-                    locks_to_release.append(lock_id)
-            
-            for lock_id in locks_to_release:
-                self._force_release_lock(lock_id)
-            
-            logger.warning(f"Emergency released {len(locks_to_release)} locks")
+        locks_to_release = [
+            lock_id for lock_id, info in list(self._lock_info.items())
+            if lock_type is None or info.lock_type == lock_type
+        ]
+        
+        for lock_id in locks_to_release:
+            self._force_release_lock(lock_id)
+        
+        logger.warning(f"Emergency released {len(locks_to_release)} locks")
     
     def shutdown(self):
         """Shutdown the lock manager and cleanup resources."""
         self._running = False
+        self._stop_event.set()
         if self._cleanup_thread and self._cleanup_thread.is_alive():
             self._cleanup_thread.join(timeout=5.0)
         
@@ -345,6 +427,159 @@ class LockManager:
         self.shutdown()
 
 
+class AsyncLockManager:
+    """
+    Asyncio-native lock manager for use from the FastAPI middleware.
+    
+    Mirrors LockManager: locks are keyed by (lock type, resource), re-entrant for
+    the owning task, and waiters sleep on striped asyncio conditions rather than
+    blocking a thread. Must be used from a single event loop.
+    
+    Contention is recorded into ``LockStats`` per lock type; pass the stats of
+    a LockManager to report both managers' waits in one set of histograms.
+    """
+    
+    def __init__(self, default_timeout: float = 30.0, stripes: int = 64,
+                 stats: Optional[Dict[LockType, LockStats]] = None):
+        """
+        Initialize the async lock manager.
+        
+        Args:
+            default_timeout: Default timeout for acquiring locks in seconds
+            stripes: Number of conditions resources are hashed onto
+            stats: Per lock type statistics to record into, shared with another manager
+        """
+        self.default_timeout = default_timeout
+        self._num_stripes = stripes
+        self._stripes: Optional[list] = None
+        self._holders: Dict[Tuple[LockType, str], str] = {}
+        self._lock_info: Dict[str, LockInfo] = {}
+        self._owners: Dict[str, "asyncio.Task"] = {}
+        self._stats: Dict[LockType, LockStats] = (
+            stats if stats is not None else {lock_type: LockStats() for lock_type in LockType}
+        )
+    
+    def _stripe(self, lock_type: LockType, resource_id: str) -> asyncio.Condition:
+        # Conditions are created lazily so they bind to the running loop
+        if self._stripes is None:
+            self._stripes = [asyncio.Condition() for _ in range(self._num_stripes)]
+        return self._stripes[_stripe_index(lock_type, resource_id, self._num_stripes)]
+    
+    async def acquire_lock(self, lock_type: LockType, resource_id: str,
+                           timeout: Optional[float] = None) -> str:
+        """
+        Acquire a lock of the specified type for a resource.
+        
+        Raises:
+            LockTimeoutError: If lock cannot be acquired within timeout
+        """
+        if timeout is None:
+            timeout = self.default_timeout
+        
+        key = (lock_type, resource_id)
+        task = asyncio.current_task()
+        condition = self._stripe(lock_type, resource_id)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + timeout
+        contended = False
+        
+        async with condition:
+            while True:
+                holder_id = self._holders.get(key)
+                if holder_id is None:
+                    break
+                info = self._lock_info[holder_id]
+                if self._owners.get(holder_id) is task:
+                    info.recursive_count += 1
+                    return holder_id
+                if _is_expired(info, datetime.utcnow()):
+                    logger.warning(f"Taking over expired lock: {holder_id}")
+                    self._drop_holder(holder_id, info)
+                    break
+                
+                contended = True
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self._stats[lock_type].record((loop.time() - start) * 1000, True, timed_out=True)
+                    raise LockTimeoutError(
+                        f"Could not acquire lock {lock_type.value}_{resource_id} within {timeout} seconds"
+                    )
+                holder_expiry = info.timeout - (datetime.utcnow() - info.acquired_at).total_seconds()
+                try:
+                    await asyncio.wait_for(condition.wait(), min(remaining, max(holder_expiry, 0.001)))
+                except asyncio.TimeoutError:
+                    pass
+            
+            lock_id = self._generate_lock_id(lock_type, resource_id)
+            self._holders[key] = lock_id
+            self._owners[lock_id] = task
+            self._lock_info[lock_id] = LockInfo(
+                lock_id=lock_id,
+                lock_type=lock_type,
+                resource_id=resource_id,
+                acquired_at=datetime.utcnow(),
+                timeout=timeout,
+                thread_id=threading.get_ident(),
+                recursive_count=1
+            )
+            self._stats[lock_type].record((loop.time() - start) * 1000, contended)
+            return lock_id
+    
+    async def release_lock(self, lock_id: str):
+        """Release a lock acquired by the current task."""
+        info = self._lock_info.get(lock_id)
+        if info is None:
+            logger.warning(f"Attempted to release unknown lock: {lock_id}")
+            return
+        if self._owners.get(lock_id) is not asyncio.current_task():
+            logger.error(f"Task attempted to release lock {lock_id} it does not own")
+            return
+        
+        if info.recursive_count > 1:
+            info.recursive_count -= 1
+            return
+        
+        condition = self._stripe(info.lock_type, info.resource_id)
+        async with condition:
+            self._drop_holder(lock_id, info)
+            condition.notify_all()
+    
+    def _drop_holder(self, lock_id: str, info: LockInfo):
+        key = (info.lock_type, info.resource_id)
+        if self._holders.get(key) == lock_id:
+            del self._holders[key]
+        self._lock_info.pop(lock_id, None)
+        self._owners.pop(lock_id, None)
+    
+    def _generate_lock_id(self, lock_type: LockType, resource_id: str) -> str:
+        """Generate a unique lock ID."""
+        return f"{lock_type.value}_{resource_id}_{uuid.uuid4().hex[:8]}"
+    
+    @asynccontextmanager
+    async def lock(self, lock_type: LockType, resource_id: str, timeout: Optional[float] = None):
+        """Async context manager for acquiring and releasing locks."""
+        lock_id = None
+        try:
+            lock_id = await self.acquire_lock(lock_type, resource_id, timeout)
+            yield lock_id
+        finally:
+            if lock_id:
+                await self.release_lock(lock_id)
+    
+    def is_locked(self, lock_type: LockType, resource_id: str) -> bool:
+        """Check if a resource is currently locked."""
+        return (lock_type, resource_id) in self._holders
+    
+    def get_active_locks(self) -> Dict[str, LockInfo]:
+        """Get all currently active locks."""
+        return dict(self._lock_info)
+    
+    def get_lock_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get contention statistics and wait-time histograms per lock type."""
+        return {lock_type.value: stats.to_dict() for lock_type, stats in self._stats.items()}
+
+
 # Global lock manager instance
 _global_lock_manager = None
 
@@ -360,4 +595,16 @@ def get_lock_manager() -> LockManager:
 def set_lock_manager(manager: LockManager):
     """Set the global lock manager instance."""
     global _global_lock_manager
-    _global_lock_manager = manager
\ No newline at end of file
+    _global_lock_manager = manager
+
+
+# Global async lock manager instance
+_global_async_lock_manager = None
+
+
+def get_async_lock_manager() -> AsyncLockManager:
+    """Get the global async lock manager instance."""
+    global _global_async_lock_manager
+    if _global_async_lock_manager is None:
+        _global_async_lock_manager = AsyncLockManager(stats=get_lock_manager()._stats)
+    return _global_async_lock_manager
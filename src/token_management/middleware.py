@@ -5,7 +5,10 @@ This module provides middleware components for integrating token counting
 into API frameworks and request/response handling.
 """
 
+import asyncio
+import codecs
 import logging
+import re
 import time
 import json
 from typing import Callable, Any, Dict, Optional, List
@@ -75,6 +78,8 @@ except ImportError:
 
 from .token_counter import TokenCounter, TokenizationModel, TokenCountResult
 from .decorators import TokenUsageRecord
+from .lock_manager import AsyncLockManager, LockType, get_async_lock_manager
+from .rate_limiter import RateLimiter, RateLimitExceededError
 
 logger = logging.getLogger(__name__)
 
@@ -95,18 +100,192 @@ class APITokenUsage:
     model: TokenizationModel
 
 
+# Last run of whitespace followed by a (possibly partial) word at the end of the buffer
+_TRAILING_WORD = re.compile(r"\s+\S*\Z")
+
+
+class StreamingTokenTally:
+    """
+    Incremental token count over a streamed body.
+    
+    Chunks are decoded incrementally and counted in segments that end on a
+    whitespace boundary, so words split across chunks are counted once and
+    memory stays bounded by roughly flush_chars regardless of body size.
+    """
+    
+    def __init__(self, count_fn: Callable[[str], int], flush_chars: int = 4096):
+        """
+        Initialize the tally.
+        
+        Args:
+            count_fn: Function returning the token count of a text segment
+            flush_chars: Buffered characters that trigger counting a segment
+        """
+        self._count_fn = count_fn
+        self.flush_chars = flush_chars
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        self._pending = ''
+        self.tokens = 0
+        self.bytes_seen = 0
+    
+    def feed(self, chunk) -> None:
+        """Add a chunk (bytes or str) of the body."""
+        if isinstance(chunk, str):
+            self.bytes_seen += len(chunk)
+            self._pending += chunk
+        else:
+            self.bytes_seen += len(chunk)
+            self._pending += self._decoder.decode(chunk)
+        
+        if len(self._pending) < self.flush_chars:
+            return
+        
+        match = _TRAILING_WORD.search(self._pending)
+        if match and match.start() > 0:
+            # The whitespace run stays with the carried-over word, which BPE
+            # pre-tokenizers split as "<run> word" with the last space on the word
+            cut = match.start()
+        elif len(self._pending) >= self.flush_chars * 4:
+            # No whitespace to split on (e.g. compact JSON); count it anyway
+            cut = len(self._pending)
+        else:
+            return
+        
+        self.tokens += self._count_fn(self._pending[:cut])
+        self._pending = self._pending[cut:]
+    
+    def finish(self) -> int:
+        """Count whatever is still buffered and return the total."""
+        self._pending += self._decoder.decode(b'', final=True)
+        if self._pending:
+            self.tokens += self._count_fn(self._pending)
+            self._pending = ''
+        return self.tokens
+
+
+class TokenUsageLogQueue:
+    """
+    Background writer for API token usage records.
+    
+    Records are queued without blocking the request and written by a single
+    worker task, which runs the (synchronous, database-backed) log_token_usage
+    calls in a thread. When the queue is full new records are dropped and
+    counted rather than applying backpressure to requests.
+    """
+    
+    def __init__(self, token_counter: TokenCounter, maxsize: int = 10000, batch_size: int = 100):
+        """
+        Initialize the log queue.
+        
+        Args:
+            token_counter: TokenCounter whose log_token_usage persists records
+            maxsize: Maximum number of queued records
+            batch_size: Maximum records written per worker wake-up
+        """
+        self.token_counter = token_counter
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {'submitted': 0, 'written': 0, 'failed': 0, 'dropped': 0}
+    
+    def _ensure_worker(self):
+        """Create the queue and worker on the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            if self._loop is not loop:
+                self._queue = asyncio.Queue(maxsize=self.maxsize)
+                self._loop = loop
+            self._worker = loop.create_task(self._run())
+    
+    def submit(self, record: APITokenUsage, priority_level: str) -> bool:
+        """
+        Queue a usage record for writing. Must be called from the event loop.
+        
+        Returns:
+            True if queued, False if the queue was full and the record was dropped
+        """
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((record, priority_level))
+        except asyncio.QueueFull:
+            self.stats['dropped'] += 1
+            logger.warning(f"Token usage log queue full, dropped record for {record.method} {record.endpoint}")
+            return False
+        self.stats['submitted'] += 1
+        return True
+    
+    async def _run(self):
+        """Drain the queue in batches until cancelled."""
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                self.stats['failed'] += len(batch)
+                logger.warning(f"Failed to write {len(batch)} token usage records: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    def _write_batch(self, batch: List[tuple]):
+        """Persist a batch of records; runs in a worker thread."""
+        for record, priority_level in batch:
+            logged = self.token_counter.log_token_usage(
+                user_id=record.user_id or "anonymous",
+                session_id=record.session_id or "anonymous",
+                tokens_used=record.total_tokens,
+                api_endpoint=f"{record.method} {record.endpoint}",
+                priority_level=priority_level
+            )
+            self.stats['written' if logged else 'failed'] += 1
+    
+    async def flush(self):
+        """Wait until every queued record has been written."""
+        if self._queue is not None and self._loop is asyncio.get_running_loop():
+            await self._queue.join()
+    
+    async def close(self):
+        """Flush pending records and stop the worker."""
+        await self.flush()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+
 class TokenCountingMiddleware(BaseHTTPMiddleware):
     """
     FastAPI middleware for automatic token counting of API requests and responses.
     
     This middleware intercepts API requests and responses to count tokens
     and log usage to the database.
+    
+    In streaming mode tokens are counted in-process (no database round trip) and
+    the response body is counted chunk by chunk as it is sent, so the response
+    keeps streaming and is never buffered. Output token totals are then only
+    available in the usage log, not in response headers. In both modes usage is
+    logged through a background TokenUsageLogQueue.
     """
     
+    # Response content types whose bodies are counted in streaming mode
+    STREAMING_CONTENT_TYPES = ('application/json', 'text/', 'application/x-ndjson')
+    
     def __init__(self, app, token_counter: Optional[TokenCounter] = None,
                  model: TokenizationModel = TokenizationModel.CL100K_BASE,
                  exclude_paths: Optional[List[str]] = None,
-                 include_methods: Optional[List[str]] = None):
+                 include_methods: Optional[List[str]] = None,
+                 streaming: bool = False,
+                 log_queue: Optional[TokenUsageLogQueue] = None):
         """
         Initialize the token counting middleware.
         
@@ -116,6 +295,8 @@ class TokenCountingMiddleware(BaseHTTPMiddleware):
             model: Tokenization model to use
             exclude_paths: List of paths to exclude from token counting
             include_methods: List of HTTP methods to include (None means all)
+            streaming: Count response bodies incrementally without buffering them
+            log_queue: Background queue for usage records (created if None)
         """
         if not FASTAPI_AVAILABLE:
             logger.warning("FastAPI not available, TokenCountingMiddleware will be disabled")
@@ -126,8 +307,10 @@ class TokenCountingMiddleware(BaseHTTPMiddleware):
         self.model = model
         self.exclude_paths = exclude_paths or ['/health', '/metrics', '/docs', '/redoc']
         self.include_methods = include_methods or ['GET', 'POST', 'PUT', 'DELETE', 'PATCH']
+        self.streaming = streaming
+        self.log_queue = log_queue or TokenUsageLogQueue(self.token_counter)
         
-        logger.info(f"TokenCountingMiddleware initialized with model: {model.value}")
+        logger.info(f"TokenCountingMiddleware initialized with model: {model.value}, streaming: {streaming}")
     
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         """
@@ -151,6 +334,11 @@ class TokenCountingMiddleware(BaseHTTPMiddleware):
         # Count input tokens
         input_tokens = await self._count_input_tokens(request)
         
+        if self.streaming:
+            return await self._dispatch_streaming(
+                request, call_next, input_tokens, start_time, user_id, session_id
+            )
+        
         # Process the request
         response = await call_next(request)
         
@@ -182,6 +370,73 @@ class TokenCountingMiddleware(BaseHTTPMiddleware):
         
         return response
     
+    async def _dispatch_streaming(self, request: Request, call_next: Callable,
+                                  input_tokens: int, start_time: float,
+                                  user_id: Optional[str], session_id: Optional[str]) -> Response:
+        """Pass the response through while counting its body as it streams."""
+        response = await call_next(request)
+        response.headers['X-Token-Input'] = str(input_tokens)
+        
+        content_type = response.headers.get('content-type', '')
+        body_iterator = getattr(response, 'body_iterator', None)
+        if body_iterator is None or not content_type.startswith(self.STREAMING_CONTENT_TYPES):
+            self._submit_usage(request, response, input_tokens, 0, start_time, user_id, session_id)
+            return response
+        
+        tally = StreamingTokenTally(self._count_text)
+        response.body_iterator = self._count_stream(
+            body_iterator, tally, request, response, input_tokens, start_time, user_id, session_id
+        )
+        return response
+    
+    async def _count_stream(self, body_iterator, tally: StreamingTokenTally,
+                            request: Request, response: Response, input_tokens: int,
+                            start_time: float, user_id: Optional[str], session_id: Optional[str]):
+        """Yield the body unchanged, counting each chunk, and log once it is sent."""
+        try:
+            async for chunk in body_iterator:
+                tally.feed(chunk)
+                yield chunk
+        finally:
+            output_tokens = 0
+            try:
+                output_tokens = tally.finish()
+            except Exception as e:
+                logger.warning(f"Error counting streamed output tokens: {e}")
+            self._submit_usage(request, response, input_tokens, output_tokens,
+                               start_time, user_id, session_id)
+    
+    def _submit_usage(self, request: Request, response: Response, input_tokens: int,
+                      output_tokens: int, start_time: float,
+                      user_id: Optional[str], session_id: Optional[str]):
+        """Queue a usage record for a streamed request if it used any tokens."""
+        total_tokens = input_tokens + output_tokens
+        if total_tokens <= 0:
+            return
+        usage_record = APITokenUsage(
+            endpoint=request.url.path,
+            method=request.method,
+            user_id=user_id,
+            session_id=session_id,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            total_tokens=total_tokens,
+            processing_time=time.time() - start_time,
+            timestamp=datetime.now(),
+            status_code=response.status_code,
+            model=self.model
+        )
+        try:
+            self.log_queue.submit(usage_record, self._get_priority_level(response.status_code))
+        except Exception as e:
+            logger.warning(f"Failed to queue API token usage: {e}")
+    
+    def _count_text(self, text: str) -> int:
+        """Count tokens in text; never leaves the process in streaming mode."""
+        if self.streaming:
+            return self.token_counter.count_tokens_local(text, self.model)
+        return self.token_counter.count_tokens(text, self.model).token_count
+    
     def _should_skip_token_counting(self, request: Request) -> bool:
         """Check if token counting should be skipped for this request."""
         # Check method
@@ -246,8 +501,7 @@ class TokenCountingMiddleware(BaseHTTPMiddleware):
             # For GET requests, count query parameters
             if request.method == 'GET':
                 query_str = str(request.query_params)
-                result = self.token_counter.count_tokens(query_str, self.model)
-                return result.token_count
+                return self._count_text(query_str)
             
             # For other methods, try to read the body
             content_type = request.headers.get('content-type', '')
@@ -256,8 +510,7 @@ class TokenCountingMiddleware(BaseHTTPMiddleware):
                 try:
                     body = await request.body()
                     body_str = body.decode('utf-8')
-                    result = self.token_counter.count_tokens(body_str, self.model)
-                    return result.token_count
+                    return self._count_text(body_str)
                 except Exception as e:
                     logger.warning(f"Failed to count JSON request tokens: {e}")
             
@@ -265,8 +518,7 @@ class TokenCountingMiddleware(BaseHTTPMiddleware):
                 try:
                     form_data = await request.form()
                     form_str = str(form_data)
-                    result = self.token_counter.count_tokens(form_str, self.model)
-                    return result.token_count
+                    return self._count_text(form_str)
                 except Exception as e:
                     logger.warning(f"Failed to count form request tokens: {e}")
             
@@ -274,8 +526,7 @@ class TokenCountingMiddleware(BaseHTTPMiddleware):
             try:
                 body = await request.body()
                 body_str = body.decode('utf-8', errors='ignore')
-                result = self.token_counter.count_tokens(body_str, self.model)
-                return result.token_count
+                return self._count_text(body_str)
             except Exception as e:
                 logger.warning(f"Failed to count generic request tokens: {e}")
         
@@ -314,7 +565,7 @@ class TokenCountingMiddleware(BaseHTTPMiddleware):
                                  input_tokens: int, output_tokens: int,
                                  total_tokens: int, processing_time: float,
                                  user_id: Optional[str], session_id: Optional[str]):
-        """Log API token usage to the database."""
+        """Queue API token usage for logging to the database."""
         try:
             usage_record = APITokenUsage(
                 endpoint=request.url.path,
@@ -330,16 +581,10 @@ class TokenCountingMiddleware(BaseHTTPMiddleware):
                 model=self.model
             )
             
-            # Log to database
-            self.token_counter.log_token_usage(
-                user_id=user_id or "anonymous",
-                session_id=session_id or "anonymous",
-                tokens_used=total_tokens,
-                api_endpoint=f"{request.method} {request.url.path}",
-                priority_level=self._get_priority_level(response.status_code)
-            )
+            # Written to the database by the background log queue
+            self.log_queue.submit(usage_record, self._get_priority_level(response.status_code))
             
-            logger.info(f"API token usage logged: {total_tokens} tokens for {request.method} {request.url.path}")
+            logger.debug(f"API token usage queued: {total_tokens} tokens for {request.method} {request.url.path}")
         
         except Exception as e:
             logger.warning(f"Failed to log API token usage: {e}")
@@ -361,11 +606,16 @@ class TokenQuotaMiddleware(BaseHTTPMiddleware):
     Middleware for enforcing token quotas and limits.
     
     This middleware checks if users have sufficient token quota
-    before processing API requests.
+    before processing API requests. The rate limit and quota checks for a
+    user run under that user's RATE_LIMIT_CHECK lock on the asyncio lock
+    manager, so concurrent requests from one user are checked in turn
+    without blocking the event loop.
     """
     
     def __init__(self, app, token_counter: Optional[TokenCounter] = None,
-                 default_quota: int = 10000, quota_header: str = "X-Token-Quota"):
+                 default_quota: int = 10000, quota_header: str = "X-Token-Quota",
+                 rate_limiter: Optional[RateLimiter] = None,
+                 lock_manager: Optional[AsyncLockManager] = None):
         """
         Initialize the token quota middleware.
         
@@ -374,6 +624,8 @@ class TokenQuotaMiddleware(BaseHTTPMiddleware):
             token_counter: TokenCounter instance (optional)
             default_quota: Default token quota for users
             quota_header: Header name for quota information
+            rate_limiter: RateLimiter to enforce per endpoint (optional)
+            lock_manager: AsyncLockManager serializing each user's checks (optional)
         """
         if not FASTAPI_AVAILABLE:
             logger.warning("FastAPI not available, TokenQuotaMiddleware will be disabled")
@@ -383,6 +635,8 @@ class TokenQuotaMiddleware(BaseHTTPMiddleware):
         self.token_counter = token_counter or TokenCounter()
         self.default_quota = default_quota
         self.quota_header = quota_header
+        self.rate_limiter = rate_limiter
+        self.lock_manager = lock_manager or get_async_lock_manager()
         
         logger.info(f"TokenQuotaMiddleware initialized with default quota: {default_quota}")
     
@@ -406,12 +660,29 @@ class TokenQuotaMiddleware(BaseHTTPMiddleware):
         # Estimate tokens needed for this request
         estimated_tokens = await self._estimate_request_tokens(request)
         
-        # Check quota
-        quota_check = self.token_counter.db.check_token_quota(
-            user_id=user_id,
-            tokens_requested=estimated_tokens,
-            priority_level="Medium"
-        )
+        # Check rate limits and quota; the checks hit the database, so they
+        # run on a worker thread while the user's lock is held
+        async with self.lock_manager.lock(LockType.RATE_LIMIT_CHECK, user_id):
+            if self.rate_limiter is not None:
+                try:
+                    await asyncio.to_thread(
+                        self.rate_limiter.enforce_rate_limit, user_id, request.url.path
+                    )
+                except RateLimitExceededError as e:
+                    return JSONResponse(
+                        status_code=429,
+                        content={
+                            "error": "Rate limit exceeded",
+                            "message": str(e)
+                        }
+                    )
+            
+            quota_check = await asyncio.to_thread(
+                self.token_counter.db.check_token_quota,
+                user_id=user_id,
+                tokens_requested=estimated_tokens,
+                priority_level="Medium"
+            )
         
         if not quota_check['allowed']:
             return JSONResponse(
@@ -15,6 +15,7 @@ import threading
 from contextlib import contextmanager
 
 from .lock_manager import LockManager, LockType, LockTimeoutError
+from .sliding_window import SlidingWindowRateLimiter
 from .allocation_strategies import (
     AllocationStrategy, PriorityBasedAllocation, DynamicPriorityAllocation,
     EmergencyOverrideAllocation, BurstTokenAllocation, AllocationResult,
@@ -118,9 +119,8 @@ class RateLimiter:
         self.user_configs: Dict[str, RateLimitConfig] = {}
         self.api_configs: Dict[str, RateLimitConfig] = {}
         
-        # In-memory rate tracking for performance
-        self._rate_tracking: Dict[str, List[Tuple[datetime, int]]] = {}
-        self._tracking_lock = threading.Lock()
+        # In-memory sliding-window counters, O(1) per check
+        self._window_engine = SlidingWindowRateLimiter()
         
         # Performance metrics
         self.metrics = {
@@ -157,25 +157,8 @@ class RateLimiter:
     
     def _cleanup_old_tracking_data(self):
         """Clean up old rate tracking data."""
-        cutoff_time = datetime.utcnow() - timedelta(hours=24)
-        
-        with self._tracking_lock:
-            keys_to_remove = []
-            for key, timestamps in self._rate_tracking.items():
-                # Remove old timestamps
-                self._rate_tracking[key] = [
-                    (ts, count) for ts, count in timestamps 
-                    if ts > cutoff_time
-                ]
-                
-                # Remove empty entries
-                if not self._rate_tracking[key]:
-                    keys_to_remove.append(key)
-            
-            for key in keys_to_remove:
-                del self._rate_tracking[key]
-        
-        logger.debug(f"Cleaned up {len(keys_to_remove)} old rate tracking entries")
+        removed = self._window_engine.prune()
+        logger.debug(f"Cleaned up {removed} old rate tracking entries")
     
     def set_user_rate_limit(self, user_id: str, config: RateLimitConfig):
         """
@@ -260,19 +243,19 @@ class RateLimiter:
                 self.metrics['allowed_requests'] += 1
                 return result
             
-            # Check rate limits
-            with self.lock_manager.lock(LockType.RATE_LIMIT_CHECK, f"{user_id}_{api_endpoint}"):
-                limit_result = self._check_rate_limits(user_id, api_endpoint, config, request_weight)
-                
-                if not limit_result.allowed:
-                    self.metrics['denied_requests'] += 1
-                    raise RateLimitExceededError(
-                        f"Rate limit exceeded for user {user_id} on API {api_endpoint}: "
-                        f"{limit_result.reason}"
-                    )
-                
-                self.metrics['allowed_requests'] += 1
-                return limit_result
+            # Check rate limits; the window engine is internally synchronized,
+            # so no LockManager round trip is needed on this hot path
+            limit_result = self._check_rate_limits(user_id, api_endpoint, config, request_weight)
+            
+            if not limit_result.allowed:
+                self.metrics['denied_requests'] += 1
+                raise RateLimitExceededError(
+                    f"Rate limit exceeded for user {user_id} on API {api_endpoint}: "
+                    f"{limit_result.reason}"
+                )
+            
+            self.metrics['allowed_requests'] += 1
+            return limit_result
                 
         except RateLimitExceededError:
             raise
@@ -311,42 +294,34 @@ class RateLimiter:
                           config: RateLimitConfig, request_weight: int) -> RateLimitCheckResult:
         """Check rate limits with the given configuration."""
         current_time = datetime.utcnow()
+        window_duration = self._get_window_duration(config.window_duration, config.custom_window_seconds)
+        window_start = current_time - window_duration
+        
+        check = self._window_engine.try_acquire(
+            f"{user_id}_{api_endpoint}",
+            limit=config.max_requests_per_window,
+            window_seconds=window_duration.total_seconds(),
+            weight=request_weight
+        )
         
-        # Calculate window start
-        window_start = self._get_window_start(current_time, config.window_duration, config.custom_window_seconds)
-        
-        # Get current usage
-        usage = self._get_current_usage(user_id, api_endpoint, window_start, current_time)
-        
-        # Calculate remaining requests
-        remaining_requests = config.max_requests_per_window - usage
-        
-        # Check if request is allowed
-        allowed = remaining_requests >= request_weight
-        
-        if not allowed:
-            # Calculate retry after time
-            retry_after = self._calculate_retry_after(window_start, config.window_duration)
-            
+        if not check.allowed:
+            retry_after = int(check.retry_after) + 1
             return RateLimitCheckResult(
                 allowed=False,
-                remaining_requests=remaining_requests,
-                reset_time=window_start + self._get_window_duration(config.window_duration, config.custom_window_seconds),
+                remaining_requests=check.remaining,
+                reset_time=current_time + timedelta(seconds=check.retry_after),
                 window_start=window_start,
-                window_duration=self._get_window_duration(config.window_duration, config.custom_window_seconds),
-                reason=f"Rate limit exceeded: {usage}/{config.max_requests_per_window} requests used",
+                window_duration=window_duration,
+                reason=f"Rate limit exceeded: {check.used}/{config.max_requests_per_window} requests used",
                 retry_after=retry_after
             )
         
-        # Update usage tracking
-        self._update_usage_tracking(user_id, api_endpoint, request_weight, current_time)
-        
         return RateLimitCheckResult(
             allowed=True,
-            remaining_requests=remaining_requests,
-            reset_time=window_start + self._get_window_duration(config.window_duration, config.custom_window_seconds),
+            remaining_requests=check.remaining,
+            reset_time=current_time + window_duration,
             window_start=window_start,
-            window_duration=self._get_window_duration(config.window_duration, config.custom_window_seconds),
+            window_duration=window_duration,
             reason="Request allowed"
         )
     
@@ -385,55 +360,8 @@ class RateLimiter:
     
     def _get_current_usage(self, user_id: str, api_endpoint: str, 
                           window_start: datetime, current_time: datetime) -> int:
-        """Get current usage for user and API in the specified window."""
-        # Check in-memory tracking first for performance
-        tracking_key = f"{user_id}_{api_endpoint}"
-        
-        with self._tracking_lock:
-            if tracking_key in self._rate_tracking:
-                window_usage = sum(count for ts, count in self._rate_tracking[tracking_key] 
-                                 if ts >= window_start)
-                return window_usage
-        
-        # Fallback to database query
-        try:
-            usage_records = self.db.get_user_token_usage(
-                user_id=user_id,
-                start_date=window_start,
-                end_date=current_time
-            )
-            
-            # Filter by API endpoint if specified
-            if api_endpoint:
-                usage_records = [
-                    record for record in usage_records 
-                    if record.get('api_endpoint') == api_endpoint
-                ]
-            
-            total_usage = sum(record.get('tokens_used', 0) for record in usage_records)
-            return total_usage
-            
-        except Exception as e:
-            logger.error(f"Error getting current usage from database: {e}")
-            return 0
-    
-    def _update_usage_tracking(self, user_id: str, api_endpoint: str, 
-                              weight: int, timestamp: datetime):
-        """Update in-memory usage tracking."""
-        tracking_key = f"{user_id}_{api_endpoint}"
-        
-        with self._tracking_lock:
-            if tracking_key not in self._rate_tracking:
-                self._rate_tracking[tracking_key] = []
-            
-            self._rate_tracking[tracking_key].append((timestamp, weight))
-            
-            # Keep only recent entries (last 24 hours)
-            cutoff_time = datetime.utcnow() - timedelta(hours=24)
-            self._rate_tracking[tracking_key] = [
-                (ts, count) for ts, count in self._rate_tracking[tracking_key]
-                if ts > cutoff_time
-            ]
+        """Get current usage for user and API in the sliding window."""
+        return self._window_engine.usage(f"{user_id}_{api_endpoint}")
     
     def _calculate_retry_after(self, window_start: datetime, window: RateLimitWindow) -> int:
         """Calculate retry after time in seconds."""
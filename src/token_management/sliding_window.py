@@ -0,0 +1,200 @@
+"""
+Sliding-Window Rate Limiter Engine
+
+This module provides a constant-time, in-memory sliding-window counter used by the
+RateLimiter. Each key owns a fixed-size ring buffer of time buckets plus a running
+total, so a check never scans the request history regardless of request rate.
+"""
+
+import asyncio
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+
+@dataclass
+class WindowCheckResult:
+    """Result of a sliding-window check."""
+    allowed: bool
+    used: int
+    remaining: int
+    retry_after: float
+
+
+class _RingWindow:
+    """Fixed-size ring of bucket counts covering one sliding window."""
+
+    __slots__ = ("window_seconds", "num_buckets", "bucket_width", "counts",
+                 "total", "head_slot", "last_seen")
+
+    def __init__(self, window_seconds: float, num_buckets: int):
+        self.window_seconds = window_seconds
+        self.num_buckets = num_buckets
+        self.bucket_width = window_seconds / num_buckets
+        self.counts: List[int] = [0] * num_buckets
+        self.total = 0
+        self.head_slot: Optional[int] = None
+        self.last_seen = 0.0
+
+    def advance(self, now: float) -> int:
+        """Expire buckets that slid out of the window. Touches at most num_buckets slots."""
+        slot = int(now // self.bucket_width)
+        if self.head_slot is None:
+            self.head_slot = slot
+        elif slot > self.head_slot:
+            steps = min(slot - self.head_slot, self.num_buckets)
+            for i in range(1, steps + 1):
+                idx = (self.head_slot + i) % self.num_buckets
+                self.total -= self.counts[idx]
+                self.counts[idx] = 0
+            self.head_slot = slot
+        return slot
+
+    def retry_after(self, now: float, needed: int) -> float:
+        """Seconds until enough of the oldest buckets expire to free `needed` units."""
+        freed = 0
+        oldest = self.head_slot - self.num_buckets + 1
+        for slot in range(oldest, self.head_slot + 1):
+            freed += self.counts[slot % self.num_buckets]
+            if freed >= needed:
+                return max(0.0, (slot + self.num_buckets) * self.bucket_width - now)
+        return self.window_seconds
+
+
+class SlidingWindowRateLimiter:
+    """
+    Sliding-window request counter with O(1) checks.
+
+    Each key is tracked with a ring buffer of `num_buckets` counters spanning the
+    window, so memory per key is fixed and a check costs at most one pass over the
+    buckets that expired since the previous check. Keys are spread over striped
+    locks, so checks for different keys do not contend.
+
+    The critical section never blocks or awaits, which makes the same instance safe
+    to use from threads and from an asyncio event loop (see acquire()).
+    """
+
+    def __init__(self, num_buckets: int = 60, stripes: int = 64,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the engine.
+
+        Args:
+            num_buckets: Buckets per window; more buckets give a smoother window
+            stripes: Number of locks keys are hashed onto
+            clock: Monotonic time source in seconds
+        """
+        self.num_buckets = num_buckets
+        self.clock = clock
+        self._windows: Dict[str, _RingWindow] = {}
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+
+    def _stripe(self, key: str) -> threading.Lock:
+        return self._stripes[zlib.crc32(key.encode("utf-8")) % len(self._stripes)]
+
+    def _window(self, key: str, window_seconds: float) -> _RingWindow:
+        window = self._windows.get(key)
+        if window is None or window.window_seconds != window_seconds:
+            window = _RingWindow(window_seconds, self.num_buckets)
+            self._windows[key] = window
+        return window
+
+    def try_acquire(self, key: str, limit: int, window_seconds: float,
+                    weight: int = 1, now: Optional[float] = None) -> WindowCheckResult:
+        """
+        Count a request against a key if it fits within the limit.
+
+        Args:
+            key: Identifier of the limited resource (e.g. "user_endpoint")
+            limit: Maximum weight allowed per window
+            window_seconds: Length of the sliding window
+            weight: Weight of this request
+            now: Override of the current time, mainly for tests and benchmarks
+
+        Returns:
+            WindowCheckResult; the request is only recorded when allowed
+        """
+        now = self.clock() if now is None else now
+        with self._stripe(key):
+            window = self._window(key, window_seconds)
+            slot = window.advance(now)
+            window.last_seen = now
+
+            if window.total + weight > limit:
+                return WindowCheckResult(
+                    allowed=False,
+                    used=window.total,
+                    remaining=max(0, limit - window.total),
+                    retry_after=window.retry_after(now, window.total + weight - limit),
+                )
+
+            window.counts[slot % window.num_buckets] += weight
+            window.total += weight
+            return WindowCheckResult(
+                allowed=True,
+                used=window.total,
+                remaining=limit - window.total,
+                retry_after=0.0,
+            )
+
+    async def acquire(self, key: str, limit: int, window_seconds: float,
+                      weight: int = 1) -> WindowCheckResult:
+        """Asyncio entry point for try_acquire; never blocks the event loop."""
+        return self.try_acquire(key, limit, window_seconds, weight)
+
+    async def wait_for(self, key: str, limit: int, window_seconds: float,
+                       weight: int = 1, timeout: Optional[float] = None) -> WindowCheckResult:
+        """
+        Wait until a request fits within the limit, then record it.
+
+        Sleeps on the event loop for the computed retry_after instead of polling.
+
+        Raises:
+            asyncio.TimeoutError: If the request does not fit before the timeout
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            result = self.try_acquire(key, limit, window_seconds, weight)
+            if result.allowed:
+                return result
+            delay = result.retry_after
+            if deadline is not None:
+                remaining = deadline - self.clock()
+                if remaining <= 0 or delay > remaining:
+                    raise asyncio.TimeoutError(f"Rate limit for {key} not available within {timeout}s")
+            await asyncio.sleep(max(delay, 0.001))
+
+    def usage(self, key: str, now: Optional[float] = None) -> int:
+        """Current weight counted in the key's window (0 for unknown keys)."""
+        now = self.clock() if now is None else now
+        with self._stripe(key):
+            window = self._windows.get(key)
+            if window is None:
+                return 0
+            window.advance(now)
+            return window.total
+
+    def reset(self, key: Optional[str] = None):
+        """Forget one key, or all keys when key is None."""
+        if key is None:
+            self._windows.clear()
+            return
+        with self._stripe(key):
+            self._windows.pop(key, None)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop keys whose whole window has elapsed since their last request."""
+        now = self.clock() if now is None else now
+        removed = 0
+        for key in list(self._windows):
+            with self._stripe(key):
+                window = self._windows.get(key)
+                if window is not None and now - window.last_seen >= window.window_seconds:
+                    del self._windows[key]
+                    removed += 1
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._windows)
@@ -9,13 +9,15 @@ import logging
 import time
 import functools
 from typing import List, Dict, Any, Optional, Union, Callable
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from enum import Enum
 import hashlib
 import json
 
 from simba.simba.database.postgres import PostgresDB
 from simba.simba.database.token_models import TokenUsage
+from .cache import LRUCache
+from .tokenizer_engine import TokenizerBackend, TokenizerUnavailableError, create_tokenizer_backend
 
 logger = logging.getLogger(__name__)
 
@@ -34,7 +36,7 @@ class TokenCountResult:
     text: str
     token_count: int
     model: TokenizationModel
-    method: str  # 'pg_tiktoken' or 'fallback'
+    method: str  # 'local', 'pg_tiktoken' or 'fallback'
     processing_time: float
     cache_hit: bool = False
 
@@ -53,24 +55,39 @@ class TokenCounter:
     """
     Comprehensive token counting module with pg_tiktoken integration.
     
-    Provides accurate token counting using pg_tiktoken when available,
-    with fallback estimation and caching for performance.
+    Counts with an in-process BPE tokenizer (see tokenizer_engine) when one can
+    be built for the model. pg_tiktoken is used when no local tokenizer is
+    available, or to cross-check local counts in verification mode, and the
+    heuristic estimate is the last resort. Results are cached.
     """
     
-    def __init__(self, db: Optional[PostgresDB] = None, cache_size: int = 1000):
+    def __init__(self, db: Optional[PostgresDB] = None, cache_size: int = 1000,
+                 tokenizer: Optional[str] = "auto", vocab_dir: Optional[str] = None,
+                 verify_with_pg_tiktoken: bool = False, cache_ttl: Optional[float] = None):
         """
         Initialize the token counter.
         
         Args:
             db: Database instance for pg_tiktoken integration
             cache_size: Maximum number of entries in the token count cache
+            tokenizer: Local tokenizer backend name, "auto", or None to disable
+            vocab_dir: Directory of .tiktoken vocabulary files for the local tokenizer
+            verify_with_pg_tiktoken: Compare local counts against pg_tiktoken
+            cache_ttl: Seconds a cached count stays valid (None for no expiry)
         """
         self.db = db or PostgresDB()
         self.cache_size = cache_size
-        self.token_cache: Dict[str, TokenCountResult] = {}
+        self.tokenizer = tokenizer
+        self.vocab_dir = vocab_dir
+        self.verify_with_pg_tiktoken = verify_with_pg_tiktoken
+        self._tokenizers: Dict[TokenizationModel, Optional[TokenizerBackend]] = {}
+        self.token_cache = LRUCache(max_entries=cache_size, ttl=cache_ttl)
         self.performance_metrics = {
+            'local_calls': 0,
             'pg_tiktoken_calls': 0,
             'fallback_calls': 0,
+            'verification_checks': 0,
+            'verification_mismatches': 0,
             'cache_hits': 0,
             'cache_misses': 0,
             'total_processing_time': 0.0
@@ -78,6 +95,68 @@ class TokenCounter:
         
         logger.info(f"TokenCounter initialized with cache size: {cache_size}")
     
+    def _get_tokenizer(self, model: TokenizationModel) -> Optional[TokenizerBackend]:
+        """Get the local tokenizer for a model, building it on first use."""
+        if self.tokenizer is None:
+            return None
+        if model not in self._tokenizers:
+            try:
+                self._tokenizers[model] = create_tokenizer_backend(
+                    model.value, backend=self.tokenizer, vocab_dir=self.vocab_dir
+                )
+                logger.info(f"Using {self._tokenizers[model].name} tokenizer for {model.value}")
+            except TokenizerUnavailableError as e:
+                logger.warning(f"Local tokenizer unavailable, using database counting: {e}")
+                self._tokenizers[model] = None
+        return self._tokenizers[model]
+    
+    def _verify_local_count(self, text: str, local_count: int):
+        """Cross-check a local count against pg_tiktoken."""
+        try:
+            if not self.db.is_tiktoken_available():
+                return
+            db_count = int(self.db.get_token_count(text))
+        except Exception as e:
+            logger.warning(f"pg_tiktoken verification failed: {e}")
+            return
+        self.performance_metrics['verification_checks'] += 1
+        if db_count != local_count:
+            self.performance_metrics['verification_mismatches'] += 1
+            logger.warning(f"Token count mismatch: local={local_count}, pg_tiktoken={db_count}")
+    
+    def _count_uncached(self, text: str, model: TokenizationModel):
+        """Count tokens without the cache. Returns (token_count, method)."""
+        tokenizer = self._get_tokenizer(model)
+        if tokenizer is not None:
+            try:
+                token_count = tokenizer.count(text)
+                self.performance_metrics['local_calls'] += 1
+                if self.verify_with_pg_tiktoken:
+                    self._verify_local_count(text, token_count)
+                return token_count, 'local'
+            except Exception as e:
+                logger.warning(f"Local tokenizer failed, falling back: {e}")
+        
+        # Try pg_tiktoken if available
+        try:
+            tiktoken_available = self.db.is_tiktoken_available()
+        except Exception as e:
+            logger.warning(f"pg_tiktoken availability check failed: {e}")
+            tiktoken_available = False
+        
+        if tiktoken_available:
+            try:
+                token_count = self.db.get_token_count(text)
+                self.performance_metrics['pg_tiktoken_calls'] += 1
+                logger.debug(f"Used pg_tiktoken for {len(text)} characters, got {token_count} tokens")
+                return token_count, 'pg_tiktoken'
+            except Exception as e:
+                logger.warning(f"pg_tiktoken failed, falling back: {e}")
+        
+        # Use fallback estimation
+        self.performance_metrics['fallback_calls'] += 1
+        return self.estimate_tokens_fallback(text, model), 'fallback'
+    
     def _generate_cache_key(self, text: str, model: TokenizationModel) -> str:
         """Generate a cache key for the given text and model."""
         # Use SHA256 hash to avoid storing large texts in cache
@@ -86,24 +165,16 @@ class TokenCounter:
     
     def _get_from_cache(self, cache_key: str) -> Optional[TokenCountResult]:
         """Get token count from cache if available."""
-        if cache_key in self.token_cache:
-            result = self.token_cache[cache_key]
-            result.cache_hit = True
-            self.performance_metrics['cache_hits'] += 1
-            logger.debug(f"Cache hit for key: {cache_key[:16]}...")
-            return result
-        return None
+        result = self.token_cache.get(cache_key)
+        if result is None:
+            return None
+        self.performance_metrics['cache_hits'] += 1
+        logger.debug(f"Cache hit for key: {cache_key[:16]}...")
+        return replace(result, cache_hit=True)
     
     def _add_to_cache(self, cache_key: str, result: TokenCountResult):
         """Add token count result to cache."""
-        # Simple LRU cache implementation
-        if len(self.token_cache) >= self.cache_size:
-            # Remove the oldest entry (first item in dict)
-            oldest_key = next(iter(self.token_cache))
-            del self.token_cache[oldest_key]
-            logger.debug(f"Cache evicted: {oldest_key[:16]}...")
-        
-        self.token_cache[cache_key] = result
+        self.token_cache.set(cache_key, result)
         self.performance_metrics['cache_misses'] += 1
         logger.debug(f"Cache added for key: {cache_key[:16]}...")
     
@@ -135,23 +206,7 @@ class TokenCounter:
         if cached_result:
             return cached_result
         
-        # Try pg_tiktoken if available
-        if self.db.is_tiktoken_available():
-            try:
-                token_count = self.db.get_token_count(text)
-                method = 'pg_tiktoken'
-                self.performance_metrics['pg_tiktoken_calls'] += 1
-                logger.debug(f"Used pg_tiktoken for {len(text)} characters, got {token_count} tokens")
-            except Exception as e:
-                logger.warning(f"pg_tiktoken failed, falling back: {e}")
-                token_count = self.estimate_tokens_fallback(text, model)
-                method = 'fallback'
-                self.performance_metrics['fallback_calls'] += 1
-        else:
-            # Use fallback estimation
-            token_count = self.estimate_tokens_fallback(text, model)
-            method = 'fallback'
-            self.performance_metrics['fallback_calls'] += 1
+        token_count, method = self._count_uncached(text, model)
         
         processing_time = time.time() - start_time
         self.performance_metrics['total_processing_time'] += processing_time
@@ -167,9 +222,33 @@ class TokenCounter:
         # Add to cache
         self._add_to_cache(cache_key, result)
         
-        logger.info(f"Token count: {token_count} tokens using {method} for {len(text)} characters")
+        logger.debug(f"Token count: {token_count} tokens using {method} for {len(text)} characters")
         return result
     
+    def count_tokens_local(self, text: str, model: TokenizationModel = TokenizationModel.CL100K_BASE) -> int:
+        """
+        Count tokens without touching the database or the cache.
+        
+        Uses the local tokenizer when available and the heuristic estimate otherwise,
+        which makes it safe to call from latency-sensitive paths such as middleware.
+        
+        Args:
+            text: Text to count tokens for
+            model: Tokenization model to use
+            
+        Returns:
+            Token count
+        """
+        if not text or not text.strip():
+            return 0
+        tokenizer = self._get_tokenizer(model)
+        if tokenizer is not None:
+            try:
+                return tokenizer.count(text)
+            except Exception as e:
+                logger.warning(f"Local tokenizer failed, estimating: {e}")
+        return self.estimate_tokens_fallback(text, model)
+    
     def count_tokens_batch(self, texts: List[str], model: TokenizationModel = TokenizationModel.CL100K_BASE) -> BatchTokenCountResult:
         """
         Count tokens for multiple texts efficiently.
@@ -187,8 +266,18 @@ class TokenCounter:
         cache_hits = 0
         cache_misses = 0
         
+        # Encode all uncached texts in one call to the local tokenizer
+        fresh: Dict[str, TokenCountResult] = {}
+        tokenizer = self._get_tokenizer(model)
+        if tokenizer is not None and not self.verify_with_pg_tiktoken:
+            fresh = self._count_batch_local(texts, model, tokenizer)
+        
         for text in texts:
-            result = self.count_tokens(text, model)
+            result = None
+            if fresh and text and text.strip():
+                result = fresh.pop(self._generate_cache_key(text, model), None)
+            if result is None:
+                result = self.count_tokens(text, model)
             results.append(result)
             total_tokens += result.token_count
             if result.cache_hit:
@@ -206,6 +295,45 @@ class TokenCounter:
             cache_misses=cache_misses
         )
     
+    def _count_batch_local(self, texts: List[str], model: TokenizationModel,
+                           tokenizer: TokenizerBackend) -> Dict[str, TokenCountResult]:
+        """
+        Count uncached texts with the local tokenizer's batch encoder.
+        
+        Returns:
+            Newly computed results by cache key; they are also added to the cache
+        """
+        pending: Dict[str, str] = {}
+        for text in texts:
+            if text and text.strip():
+                cache_key = self._generate_cache_key(text, model)
+                if cache_key not in self.token_cache:
+                    pending[cache_key] = text
+        if not pending:
+            return {}
+        
+        start_time = time.time()
+        try:
+            counts = tokenizer.count_batch(list(pending.values()))
+        except Exception as e:
+            logger.warning(f"Local batch tokenization failed: {e}")
+            return {}
+        processing_time = (time.time() - start_time) / len(pending)
+        self.performance_metrics['local_calls'] += len(pending)
+        self.performance_metrics['total_processing_time'] += processing_time * len(pending)
+        
+        fresh = {}
+        for (cache_key, text), token_count in zip(pending.items(), counts):
+            fresh[cache_key] = TokenCountResult(
+                text=text,
+                token_count=token_count,
+                model=model,
+                method='local',
+                processing_time=processing_time
+            )
+            self._add_to_cache(cache_key, fresh[cache_key])
+        return fresh
+    
     def estimate_tokens_fallback(self, text: str, model: TokenizationModel = TokenizationModel.CL100K_BASE) -> int:
         """
         Fallback token estimation when pg_tiktoken is not available.
@@ -304,17 +432,23 @@ class TokenCounter:
     
     def get_performance_metrics(self) -> Dict[str, Any]:
         """Get performance metrics for the token counter."""
-        total_calls = (self.performance_metrics['pg_tiktoken_calls'] + 
+        total_calls = (self.performance_metrics['local_calls'] +
+                      self.performance_metrics['pg_tiktoken_calls'] + 
                       self.performance_metrics['fallback_calls'])
         
         return {
             'cache_size': len(self.token_cache),
             'max_cache_size': self.cache_size,
             'total_calls': total_calls,
+            'local_calls': self.performance_metrics['local_calls'],
             'pg_tiktoken_calls': self.performance_metrics['pg_tiktoken_calls'],
             'fallback_calls': self.performance_metrics['fallback_calls'],
             'cache_hits': self.performance_metrics['cache_hits'],
             'cache_misses': self.performance_metrics['cache_misses'],
+            'cache_evictions': self.token_cache.evictions,
+            'cache_expirations': self.token_cache.expirations,
+            'verification_checks': self.performance_metrics['verification_checks'],
+            'verification_mismatches': self.performance_metrics['verification_mismatches'],
             'cache_hit_rate': (self.performance_metrics['cache_hits'] / total_calls * 100) if total_calls > 0 else 0,
             'total_processing_time': self.performance_metrics['total_processing_time'],
             'average_processing_time': (self.performance_metrics['total_processing_time'] / total_calls) if total_calls > 0 else 0
@@ -0,0 +1,305 @@
+"""
+In-Process Tokenizer Engine
+
+This module provides local BPE tokenizer backends for the TokenCounter so token
+counts do not require a database round trip. Vocabularies are read from local
+`.tiktoken` files (one base64 token and its merge rank per line), the same
+format used by tiktoken and pg_tiktoken.
+
+Backends:
+    tiktoken: Native tiktoken encoder; batches are encoded across its thread pool.
+    bpe: Pure-Python byte-pair encoder for environments without tiktoken.
+"""
+
+import base64
+import logging
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Type
+
+# Optional imports for native and Unicode-aware tokenization
+TIKTOKEN_AVAILABLE = False
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    tiktoken = None
+
+REGEX_AVAILABLE = False
+try:
+    import regex
+    REGEX_AVAILABLE = True
+except ImportError:
+    regex = None
+
+logger = logging.getLogger(__name__)
+
+# Environment variable pointing at a directory of <encoding>.tiktoken files
+VOCAB_DIR_ENV = "TOKENIZER_VOCAB_DIR"
+
+_R50K_PATTERN = r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+"""
+_CL100K_PATTERN = (
+    r"""(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+"""
+)
+# Approximations of the patterns above for the stdlib re module, which lacks \p{...}
+_R50K_PATTERN_RE = r"""'s|'t|'re|'ve|'m|'ll|'d| ?[^\W\d_]+| ?\d+| ?[^\s\w]+|\s+(?!\S)|\s+"""
+_CL100K_PATTERN_RE = (
+    r"""(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\w]?[^\W\d_]+|\d{1,3}| ?[^\s\w]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+"""
+)
+
+# encoding name -> (vocab file stem, pattern, stdlib pattern, special tokens)
+ENCODING_SPECS: Dict[str, tuple] = {
+    "cl100k_base": ("cl100k_base", _CL100K_PATTERN, _CL100K_PATTERN_RE, {
+        "<|endoftext|>": 100257,
+        "<|fim_prefix|>": 100258,
+        "<|fim_middle|>": 100259,
+        "<|fim_suffix|>": 100260,
+        "<|endofprompt|>": 100276,
+    }),
+    "p50k_base": ("p50k_base", _R50K_PATTERN, _R50K_PATTERN_RE, {"<|endoftext|>": 50256}),
+    "p50k_edit": ("p50k_base", _R50K_PATTERN, _R50K_PATTERN_RE, {
+        "<|endoftext|>": 50256,
+        "<|fim_prefix|>": 50281,
+        "<|fim_middle|>": 50282,
+        "<|fim_suffix|>": 50283,
+    }),
+    "r50k_base": ("r50k_base", _R50K_PATTERN, _R50K_PATTERN_RE, {"<|endoftext|>": 50256}),
+}
+
+
+class TokenizerUnavailableError(Exception):
+    """Raised when no local tokenizer can be built for an encoding."""
+    pass
+
+
+def find_vocab_file(encoding_name: str, vocab_dir: Optional[str] = None) -> Optional[Path]:
+    """
+    Locate the vocabulary file for an encoding.
+
+    Args:
+        encoding_name: Encoding name (e.g. "cl100k_base")
+        vocab_dir: Directory to search; defaults to $TOKENIZER_VOCAB_DIR
+
+    Returns:
+        Path to the .tiktoken file, or None if not found
+    """
+    vocab_dir = vocab_dir or os.environ.get(VOCAB_DIR_ENV)
+    if not vocab_dir or encoding_name not in ENCODING_SPECS:
+        return None
+    path = Path(vocab_dir) / f"{ENCODING_SPECS[encoding_name][0]}.tiktoken"
+    return path if path.is_file() else None
+
+
+def load_bpe_ranks(path: Path) -> Dict[bytes, int]:
+    """
+    Load BPE merge ranks from a .tiktoken vocabulary file.
+
+    Args:
+        path: File with one "<base64 token> <rank>" pair per line
+
+    Returns:
+        Mapping of token bytes to rank
+    """
+    ranks: Dict[bytes, int] = {}
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            token, rank = line.split()
+            ranks[base64.b64decode(token)] = int(rank)
+    logger.info(f"Loaded {len(ranks)} BPE ranks from {path}")
+    return ranks
+
+
+class TokenizerBackend(ABC):
+    """Local tokenizer for a single encoding."""
+
+    name = "base"
+
+    def __init__(self, encoding_name: str):
+        if encoding_name not in ENCODING_SPECS:
+            raise TokenizerUnavailableError(f"Unknown encoding: {encoding_name}")
+        self.encoding_name = encoding_name
+
+    @abstractmethod
+    def encode(self, text: str) -> List[int]:
+        """Encode text to token ids, treating special tokens as plain text."""
+
+    def count(self, text: str) -> int:
+        """Count tokens in text."""
+        return len(self.encode(text))
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        """Count tokens for several texts."""
+        return [self.count(text) for text in texts]
+
+
+class TiktokenBackend(TokenizerBackend):
+    """Native tiktoken encoder, built from a local vocabulary file."""
+
+    name = "tiktoken"
+
+    def __init__(self, encoding_name: str, vocab_dir: Optional[str] = None, num_threads: int = 8):
+        """
+        Initialize the backend.
+
+        Args:
+            encoding_name: Encoding name (e.g. "cl100k_base")
+            vocab_dir: Directory containing <encoding>.tiktoken files
+            num_threads: Threads used by count_batch
+        """
+        super().__init__(encoding_name)
+        if not TIKTOKEN_AVAILABLE:
+            raise TokenizerUnavailableError("tiktoken is not installed")
+        self.num_threads = num_threads
+
+        # Never fall back to tiktoken.get_encoding(), which downloads the vocabulary
+        vocab_file = find_vocab_file(encoding_name, vocab_dir)
+        if vocab_file is None:
+            raise TokenizerUnavailableError(
+                f"No vocabulary file for {encoding_name}; set {VOCAB_DIR_ENV}"
+            )
+        _, pattern, _, special_tokens = ENCODING_SPECS[encoding_name]
+        self._encoding = tiktoken.Encoding(
+            name=encoding_name,
+            pat_str=pattern,
+            mergeable_ranks=load_bpe_ranks(vocab_file),
+            special_tokens=special_tokens,
+        )
+
+    def encode(self, text: str) -> List[int]:
+        return self._encoding.encode_ordinary(text)
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        # tiktoken releases the GIL, so the batch is encoded in parallel
+        return [len(tokens) for tokens in
+                self._encoding.encode_ordinary_batch(texts, num_threads=self.num_threads)]
+
+
+class PythonBPEBackend(TokenizerBackend):
+    """
+    Pure-Python byte-pair encoder over a local vocabulary file.
+
+    Uses the exact pre-tokenization pattern when the regex module is installed
+    and a close stdlib approximation otherwise. Encoded pieces are memoized, so
+    repeated words cost a dictionary lookup.
+    """
+
+    name = "bpe"
+
+    def __init__(self, encoding_name: str, vocab_dir: Optional[str] = None,
+                 num_threads: int = 4, piece_cache_size: int = 100000):
+        """
+        Initialize the backend.
+
+        Args:
+            encoding_name: Encoding name (e.g. "cl100k_base")
+            vocab_dir: Directory containing <encoding>.tiktoken files
+            num_threads: Threads used by count_batch for large batches
+            piece_cache_size: Maximum number of memoized pre-tokenized pieces
+        """
+        super().__init__(encoding_name)
+        vocab_file = find_vocab_file(encoding_name, vocab_dir)
+        if vocab_file is None:
+            raise TokenizerUnavailableError(
+                f"No vocabulary file for {encoding_name}; set {VOCAB_DIR_ENV}"
+            )
+        _, pattern, fallback_pattern, _ = ENCODING_SPECS[encoding_name]
+        self._ranks = load_bpe_ranks(vocab_file)
+        self._pattern = regex.compile(pattern) if REGEX_AVAILABLE else re.compile(fallback_pattern)
+        self.num_threads = num_threads
+        self.piece_cache_size = piece_cache_size
+        self._piece_cache: Dict[str, List[int]] = {}
+        self._piece_lock = threading.Lock()
+
+    def _bpe(self, piece: bytes) -> List[int]:
+        """Merge the bytes of one piece by ascending rank."""
+        rank = self._ranks.get(piece)
+        if rank is not None:
+            return [rank]
+
+        parts = [piece[i:i + 1] for i in range(len(piece))]
+        while len(parts) > 1:
+            best_rank = None
+            best_index = -1
+            for i in range(len(parts) - 1):
+                pair_rank = self._ranks.get(parts[i] + parts[i + 1])
+                if pair_rank is not None and (best_rank is None or pair_rank < best_rank):
+                    best_rank = pair_rank
+                    best_index = i
+            if best_rank is None:
+                break
+            parts[best_index:best_index + 2] = [parts[best_index] + parts[best_index + 1]]
+        return [self._ranks[part] for part in parts]
+
+    def encode(self, text: str) -> List[int]:
+        tokens: List[int] = []
+        for piece in self._pattern.findall(text):
+            encoded = self._piece_cache.get(piece)
+            if encoded is None:
+                encoded = self._bpe(piece.encode("utf-8"))
+                with self._piece_lock:
+                    if len(self._piece_cache) >= self.piece_cache_size:
+                        self._piece_cache.clear()
+                    self._piece_cache[piece] = encoded
+            tokens.extend(encoded)
+        return tokens
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        if len(texts) < 2 * self.num_threads:
+            return [self.count(text) for text in texts]
+        with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
+            return list(executor.map(self.count, texts))
+
+
+_BACKENDS: Dict[str, Type[TokenizerBackend]] = {
+    TiktokenBackend.name: TiktokenBackend,
+    PythonBPEBackend.name: PythonBPEBackend,
+}
+
+
+def register_tokenizer_backend(name: str, backend_class: Type[TokenizerBackend]):
+    """
+    Register a tokenizer backend.
+
+    Args:
+        name: Backend name used with create_tokenizer_backend
+        backend_class: TokenizerBackend subclass taking (encoding_name, vocab_dir)
+    """
+    _BACKENDS[name] = backend_class
+
+
+def create_tokenizer_backend(encoding_name: str, backend: str = "auto",
+                             vocab_dir: Optional[str] = None) -> TokenizerBackend:
+    """
+    Create a local tokenizer for an encoding.
+
+    Args:
+        encoding_name: Encoding name (e.g. "cl100k_base")
+        backend: Registered backend name, or "auto" to try tiktoken then bpe
+        vocab_dir: Directory containing <encoding>.tiktoken files
+
+    Returns:
+        TokenizerBackend instance
+
+    Raises:
+        TokenizerUnavailableError: If no backend can be built
+    """
+    names = [TiktokenBackend.name, PythonBPEBackend.name] if backend == "auto" else [backend]
+    errors = []
+    for name in names:
+        backend_class = _BACKENDS.get(name)
+        if backend_class is None:
+            errors.append(f"{name}: not registered")
+            continue
+        try:
+            return backend_class(encoding_name, vocab_dir=vocab_dir)
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+    raise TokenizerUnavailableError(
+        f"No local tokenizer for {encoding_name} ({'; '.join(errors)})"
+    )
@@ -21,6 +21,9 @@ from simba.simba.database.postgres import PostgresDB
 from src.token_usage_logger import TokenUsageLogger, LoggingConfig
 from src.token_management.rate_limiter import RateLimiter, RateLimitConfig
 from src.token_management.token_counter import TokenCounter
+from src.token_usage_aggregation import TokenUsageAggregator
+from src.token_usage_rollups import TokenUsageRollups
+from src.token_usage_anomaly import OnlineAnomalyDetector, UsageAnomaly, get_anomaly_detector
 
 logger = logging.getLogger(__name__)
 
@@ -121,6 +124,8 @@ class MonitoringConfig:
     enable_cost_analysis: bool = True
     data_retention_days: int = 90
     performance_monitoring: bool = True
+    enable_rollups: bool = True  # refresh usage rollups in the monitoring loop
+    rollup_lateness: int = 300  # seconds
 
 
 class TokenMonitoringSystem:
@@ -131,21 +136,37 @@ class TokenMonitoringSystem:
     capabilities for the token management system.
     """
     
-    def __init__(self, db: Optional[PostgresDB] = None, config: Optional[MonitoringConfig] = None):
+    def __init__(self, db: Optional[PostgresDB] = None, config: Optional[MonitoringConfig] = None,
+                 anomaly_detector: Optional[OnlineAnomalyDetector] = None):
         """
         Initialize the token monitoring system.
         
         Args:
             db: Database instance for monitoring queries
             config: Monitoring configuration
+            anomaly_detector: Online detector fed by the usage loggers (defaults to the shared
+                one, or a detector of its own if anomaly_threshold_multiplier differs from
+                the shared one's threshold; loggers must then be given this instance's
+                anomaly_detector)
         """
         self.db = db or PostgresDB()
         self.config = config or MonitoringConfig()
         
+        if anomaly_detector is None:
+            anomaly_detector = get_anomaly_detector()
+            # Never retune the shared detector: other monitors and loggers score with it
+            if anomaly_detector.threshold != self.config.anomaly_threshold_multiplier:
+                anomaly_detector = OnlineAnomalyDetector(threshold=self.config.anomaly_threshold_multiplier)
+        self.anomaly_detector = anomaly_detector
+        # Seed from history before this instance's logger can observe live usage
+        if self.config.anomaly_detection_enabled and not self.anomaly_detector.backfilled:
+            self._backfill_anomaly_detector()
+        
         # Core components
         self.token_counter = TokenCounter(self.db)
         self.rate_limiter = RateLimiter(self.db)
-        self.usage_logger = TokenUsageLogger(self.db, LoggingConfig())
+        self.usage_logger = TokenUsageLogger(self.db, LoggingConfig(), anomaly_detector=self.anomaly_detector)
+        self.rollups = TokenUsageRollups(self.db, lateness=timedelta(seconds=self.config.rollup_lateness))
         
         # Monitoring state
         self._monitoring_active = False
@@ -179,6 +200,10 @@ class TokenMonitoringSystem:
         self._monitoring_active = True
         self._stop_event.clear()
         
+        # Retry seeding the detector if the database was unavailable when built
+        if self.config.anomaly_detection_enabled and not self.anomaly_detector.backfilled:
+            self._backfill_anomaly_detector()
+        
         # Start monitoring thread
         self._monitoring_thread = threading.Thread(target=self._monitoring_loop, daemon=True)
         self._monitoring_thread.start()
@@ -205,6 +230,12 @@ class TokenMonitoringSystem:
                 start_time = time.time()
                 
                 # Perform monitoring tasks
+                if self.config.enable_rollups:
+                    try:
+                        self.rollups.refresh()
+                    except Exception:
+                        pass  # Logged by refresh; reads fall back to raw rows past the watermark
+                
                 if self.config.enable_real_time_monitoring:
                     self._check_token_usage_status()
                 
@@ -309,10 +340,13 @@ class TokenMonitoringSystem:
     def _check_token_usage_status(self):
         """Check token usage status for all users."""
         try:
-            # Get all users with limits
-            users_with_limits = self.db.get_token_usage_summary()
+            # Users active in the last day, served from the usage rollups
+            active_users = self.rollups.totals(
+                start_date=datetime.utcnow() - timedelta(days=1),
+                group_by=('user_id',)
+            )
             
-            for user_id in users_with_limits:
+            for user_id in active_users['user_id']:
                 status = self.get_token_usage_status(user_id)
                 
                 # Check if we need to generate alerts
@@ -358,92 +392,17 @@ class TokenMonitoringSystem:
         """
         Detect anomalous token consumption patterns.
         
+        Usage records are scored as they are logged by the online detector; this
+        collects what it raised since the last call. The detector is seeded with
+        the anomaly window from the database when the monitor is built.
+        
         Returns:
             List of detected anomalies
         """
         anomalies = []
         
         try:
-            # Get usage data for anomaly detection window
-            start_date = datetime.utcnow() - timedelta(hours=self.config.anomaly_detection_window)
-            usage_data = self.db.get_token_usage_history(start_date=start_date)
-            
-            if not usage_data:
-                return anomalies
-            
-            # Group by user for individual analysis
-            user_usage = {}
-            for record in usage_data:
-                user_id = record['user_id']
-                if user_id not in user_usage:
-                    user_usage[user_id] = []
-                user_usage[user_id].append(record['tokens_used'])
-            
-            # Analyze each user's usage patterns
-            for user_id, usage_values in user_usage.items():
-                if len(usage_values) < 5:  # Need sufficient data points
-                    continue
-                
-                # Calculate statistics
-                mean_usage = statistics.mean(usage_values)
-                median_usage = statistics.median(usage_values)
-                std_usage = statistics.stdev(usage_values) if len(usage_values) > 1 else 0
-                
-                # Detect anomalies using statistical methods
-                for i, usage in enumerate(usage_values):
-                    # Z-score method
-                    if std_usage > 0:
-                        z_score = abs(usage - mean_usage) / std_usage
-                        if z_score > self.config.anomaly_threshold_multiplier:
-                            anomaly = AnomalyDetectionResult(
-                                user_id=user_id,
-                                anomaly_type="statistical_outlier",
-                                severity=AlertSeverity.HIGH if z_score > 5 else AlertSeverity.MEDIUM,
-                                description=f"Unusual token consumption detected: {usage} tokens (Z-score: {z_score:.2f})",
-                                detected_at=datetime.utcnow(),
-                                metrics={
-                                    'usage_value': usage,
-                                    'mean_usage': mean_usage,
-                                    'median_usage': median_usage,
-                                    'std_usage': std_usage,
-                                    'z_score': z_score,
-                                    'request_index': i
-                                },
-                                confidence_score=min(1.0, z_score / 5.0),
-                                suggested_action="Review user's usage pattern and consider adjusting limits"
-                            )
-                            anomalies.append(anomaly)
-                
-                # Detect trend anomalies
-                if len(usage_values) >= 10:
-                    # Simple trend detection
-                    recent_usage = usage_values[-5:]  # Last 5 requests
-                    earlier_usage = usage_values[-10:-5] if len(usage_values) >= 10 else usage_values[:-5]
-                    
-                    if recent_usage and earlier_usage:
-                        recent_avg = statistics.mean(recent_usage)
-                        earlier_avg = statistics.mean(earlier_usage)
-                        
-                        # Significant increase detection
-                        if recent_avg > earlier_avg * 2:  # 2x increase
-                            anomaly = AnomalyDetectionResult(
-                                user_id=user_id,
-                                anomaly_type="usage_spike",
-                                severity=AlertSeverity.MEDIUM,
-                                description=f"Significant usage spike detected: {recent_avg:.1f} vs {earlier_avg:.1f} tokens",
-                                detected_at=datetime.utcnow(),
-                                metrics={
-                                    'recent_avg': recent_avg,
-                                    'earlier_avg': earlier_avg,
-                                    'increase_factor': recent_avg / earlier_avg,
-                                    'recent_values': recent_usage,
-                                    'earlier_values': earlier_usage
-                                },
-                                confidence_score=min(1.0, (recent_avg / earlier_avg - 1) / 2),
-                                suggested_action="Investigate the cause of usage spike and consider temporary limits"
-                            )
-                            anomalies.append(anomaly)
-            
+            anomalies = [self._to_anomaly_result(anomaly) for anomaly in self.anomaly_detector.drain()]
             self.performance_metrics['anomalies_detected'] += len(anomalies)
             
         except Exception as e:
@@ -451,6 +410,42 @@ class TokenMonitoringSystem:
         
         return anomalies
     
+    def _backfill_anomaly_detector(self):
+        """Seed the online detector with the anomaly window from the database."""
+        try:
+            start_date = datetime.utcnow() - timedelta(hours=self.config.anomaly_detection_window)
+            rows = TokenUsageAggregator(self.db).stream_rows(start_date=start_date,
+                                                             end_date=self.anomaly_detector.started_at)
+            count = self.anomaly_detector.backfill(rows)
+            logger.info(f"Backfilled anomaly detector with {count} usage records")
+        except Exception as e:
+            logger.error(f"Error backfilling anomaly detector: {e}")
+    
+    def _to_anomaly_result(self, anomaly: UsageAnomaly) -> AnomalyDetectionResult:
+        """Describe a detector event as an AnomalyDetectionResult."""
+        metrics = anomaly.metrics
+        if anomaly.anomaly_type == "usage_spike":
+            return AnomalyDetectionResult(
+                user_id=anomaly.user_id,
+                anomaly_type=anomaly.anomaly_type,
+                severity=AlertSeverity.MEDIUM,
+                description=f"Significant usage spike detected: {metrics['recent_avg']:.1f} vs {metrics['earlier_avg']:.1f} tokens",
+                detected_at=anomaly.detected_at,
+                metrics=metrics,
+                confidence_score=min(1.0, (anomaly.score - 1) / 2),
+                suggested_action="Investigate the cause of usage spike and consider temporary limits"
+            )
+        return AnomalyDetectionResult(
+            user_id=anomaly.user_id,
+            anomaly_type=anomaly.anomaly_type,
+            severity=AlertSeverity.HIGH if anomaly.score > 5 else AlertSeverity.MEDIUM,
+            description=f"Unusual token consumption detected: {metrics['usage_value']} tokens (Z-score: {anomaly.score:.2f})",
+            detected_at=anomaly.detected_at,
+            metrics=metrics,
+            confidence_score=min(1.0, anomaly.score / 5.0),
+            suggested_action="Review user's usage pattern and consider adjusting limits"
+        )
+    
     def _handle_anomaly(self, anomaly: AnomalyDetectionResult):
         """Handle a detected anomaly."""
         try:
@@ -483,11 +478,14 @@ class TokenMonitoringSystem:
         try:
             self.performance_metrics['system_health_checks'] += 1
             
-            # Get basic metrics from database
-            start_date = datetime.utcnow() - timedelta(hours=24)
-            usage_data = self.db.get_token_usage_history(start_date=start_date)
+            # Get basic metrics from the usage rollups, grouped finely enough for every figure below
+            now = datetime.utcnow()
+            usage = self.rollups.totals(
+                start_date=now - timedelta(hours=24),
+                group_by=('user_id', 'api_endpoint', 'priority_level')
+            )
             
-            if not usage_data:
+            if not len(usage):
                 return SystemHealthMetrics(
                     timestamp=datetime.utcnow(),
                     total_requests_24h=0,
@@ -502,22 +500,18 @@ class TokenMonitoringSystem:
                 )
             
             # Calculate metrics
-            total_requests = len(usage_data)
-            total_tokens = sum(record['tokens_used'] for record in usage_data)
+            total_requests = sum(usage['total_requests'])
+            total_tokens = sum(usage['total_tokens'])
             avg_tokens_per_request = total_tokens / total_requests if total_requests > 0 else 0.0
-            max_tokens_single_request = max(record['tokens_used'] for record in usage_data)
+            max_tokens_single_request = max(usage['max_tokens'])
             
             # Get recent requests (last hour)
-            recent_start = datetime.utcnow() - timedelta(hours=1)
-            recent_requests = [
-                record for record in usage_data 
-                if record['timestamp'] >= recent_start
-            ]
-            requests_last_hour = len(recent_requests)
+            recent = self.rollups.totals(start_date=now - timedelta(hours=1))
+            requests_last_hour = sum(recent['total_requests'])
             
             # Get unique users and endpoints
-            unique_users = set(record['user_id'] for record in usage_data)
-            unique_endpoints = set(record['api_endpoint'] for record in usage_data)
+            unique_users = set(usage['user_id'])
+            unique_endpoints = set(usage['api_endpoint'])
             
             # Determine system load
             if requests_last_hour > 1000:
@@ -547,7 +541,10 @@ class TokenMonitoringSystem:
                 quota_status = "normal"
             
             # Determine error rate status (simplified)
-            high_priority_requests = sum(1 for record in usage_data if record['priority_level'] == 'High')
+            high_priority_requests = sum(
+                requests for priority, requests in zip(usage['priority_level'], usage['total_requests'])
+                if priority == 'High'
+            )
             error_rate = high_priority_requests / total_requests if total_requests > 0 else 0.0
             
             if error_rate > 0.1:
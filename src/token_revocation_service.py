@@ -16,6 +16,7 @@ from concurrent.futures import ThreadPoolExecutor
 import time
 
 from src.vault_token_storage import VaultTokenStorage
+from src.token_management.cache import LRUCache
 from simba.simba.database.postgres import PostgresDB
 from simba.simba.database.token_models import TokenRevocations
 
@@ -64,9 +65,8 @@ class TokenRevocationService:
         self.max_workers = max_workers
         
         # Thread-safe revocation cache
-        self._revocation_cache = set()
-        self._cache_lock = threading.RLock()
         self._cache_expiry = 300  # 5 minutes
+        self._revocation_cache = LRUCache(max_entries=100000, ttl=self._cache_expiry)
         
         # Background executor for async operations
         self._executor = ThreadPoolExecutor(max_workers=max_workers)
@@ -99,8 +99,7 @@ class TokenRevocationService:
             logger.info(f"Attempting to revoke token {token_id} for user {user_id}")
             
             # Update revocation cache
-            with self._cache_lock:
-                self._revocation_cache.add(token_id)
+            self._revocation_cache.set(token_id, True)
             
             # Revoke in Vault
             if immediate:
@@ -160,8 +159,8 @@ class TokenRevocationService:
             logger.info(f"Starting batch revocation of {len(token_ids)} tokens for user {user_id}")
             
             # Update revocation cache
-            with self._cache_lock:
-                self._revocation_cache.update(token_ids)
+            for revoked_id in token_ids:
+                self._revocation_cache.set(revoked_id, True)
             
             # Process revocations in parallel
             futures = []
@@ -275,17 +274,15 @@ class TokenRevocationService:
         """
         try:
             # Check cache first
-            with self._cache_lock:
-                if token_id in self._revocation_cache:
-                    return True
+            if self._revocation_cache.get(token_id):
+                return True
             
             # Check database
             is_revoked = self.postgres_db.is_token_revoked(token_id)
             
             if is_revoked:
                 # Update cache
-                with self._cache_lock:
-                    self._revocation_cache.add(token_id)
+                self._revocation_cache.set(token_id, True)
             
             return is_revoked
             
@@ -435,9 +432,8 @@ class TokenRevocationService:
     def _cleanup_cache(self):
         """Clean up old entries from revocation cache."""
         try:
-            # In a real implementation, we would track cache entry timestamps
-            # For now, we'll just log it
-            logger.debug("Running cache cleanup")
+            removed = self._revocation_cache.purge_expired()
+            logger.debug(f"Revocation cache cleanup removed {removed} expired entries")
             
         except Exception as e:
             logger.error(f"Error cleaning up cache: {e}")
@@ -474,8 +470,8 @@ class TokenRevocationService:
             recent_revocations = result['recent_revocations'] if result else 0
             
             # Get cache statistics
-            with self._cache_lock:
-                cache_size = len(self._revocation_cache)
+            cache_metrics = self._revocation_cache.get_metrics()
+            cache_size = cache_metrics['size']
             
             return {
                 'total_revocations': total_revocations,
@@ -485,7 +481,9 @@ class TokenRevocationService:
                     {'reason': row['reason'], 'count': row['count']}
                     for row in reason_stats
                 ],
-                'cache_expiry_seconds': self._cache_expiry
+                'cache_expiry_seconds': self._cache_expiry,
+                'cache_hit_rate': cache_metrics['hit_rate'],
+                'cache_evictions': cache_metrics['evictions']
             }
             
         except Exception as e:
@@ -0,0 +1,319 @@
+"""
+Token Usage Aggregation Engine
+
+This module pushes token usage aggregation into PostgreSQL: time bucketing with
+date_trunc, GROUP BY over the usage dimensions, and distinct counts (approximate
+with the hll extension when installed, exact COUNT(DISTINCT) otherwise). Results
+come back as compact column lists with one entry per bucket or group, and raw rows
+for exports are streamed through a server-side cursor instead of fetched at once.
+"""
+
+import csv
+import io
+import json
+import logging
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from simba.simba.database.postgres import PostgresDB
+
+logger = logging.getLogger(__name__)
+
+# date_trunc units accepted for time buckets
+DATE_TRUNC_UNITS = ("minute", "hour", "day", "week", "month", "year")
+
+# Columns that may be grouped on or counted distinctly
+DIMENSIONS = ("user_id", "session_id", "api_endpoint", "priority_level")
+
+EXPORT_COLUMNS = ("id", "user_id", "session_id", "tokens_used", "api_endpoint", "priority_level", "timestamp")
+
+_DISTINCT_NAMES = {
+    "user_id": "unique_users",
+    "session_id": "unique_sessions",
+    "api_endpoint": "unique_endpoints",
+    "priority_level": "unique_priorities",
+}
+
+
+@dataclass
+class ColumnarResult:
+    """Aggregation result stored as one list per column."""
+    columns: Dict[str, List[Any]] = field(default_factory=dict)
+    approximate: bool = False
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]], names: Sequence[str],
+                  approximate: bool = False) -> "ColumnarResult":
+        return cls({name: [row[name] for row in rows] for name in names}, approximate)
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()), []))
+
+    def __getitem__(self, name: str) -> List[Any]:
+        return self.columns[name]
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over the result as row dictionaries."""
+        names = list(self.columns)
+        for values in zip(*(self.columns[name] for name in names)):
+            yield dict(zip(names, values))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'columns': self.columns, 'approximate': self.approximate}
+
+
+class TokenUsageAggregator:
+    """
+    SQL-side aggregation over the token_usage table.
+
+    Only aggregated rows cross the wire, so the cost of a dashboard query is
+    proportional to the number of buckets or groups returned, not the number
+    of usage events in the range.
+    """
+
+    def __init__(self, db: Optional[PostgresDB] = None, approximate_distinct: bool = True):
+        """
+        Initialize the aggregator.
+
+        Args:
+            db: Database instance for queries
+            approximate_distinct: Use HyperLogLog distinct counts when the hll extension is installed
+        """
+        self.db = db or PostgresDB()
+        self.approximate_distinct = approximate_distinct
+        self._hll_available: Optional[bool] = None
+
+    def _use_hll(self) -> bool:
+        """Check once whether the hll extension is installed."""
+        if not self.approximate_distinct:
+            return False
+        if self._hll_available is None:
+            try:
+                row = self.db.fetch_one("SELECT 1 AS id FROM pg_extension WHERE extname = 'hll'")
+                self._hll_available = bool(row)
+            except Exception as e:
+                logger.warning(f"Could not check for the hll extension: {e}")
+                self._hll_available = False
+            if not self._hll_available:
+                logger.info("hll extension not installed; using exact distinct counts")
+        return self._hll_available
+
+    def _distinct_expr(self, column: str) -> str:
+        if self._use_hll():
+            return f"hll_cardinality(hll_add_agg(hll_hash_text({column})))::bigint"
+        return f"COUNT(DISTINCT {column})"
+
+    @staticmethod
+    def _where(user_id: Optional[str], start_date: Optional[datetime],
+               end_date: Optional[datetime]) -> Tuple[str, List[Any]]:
+        clauses = []
+        params: List[Any] = []
+        if user_id:
+            clauses.append("user_id = %s")
+            params.append(user_id)
+        if start_date:
+            clauses.append("timestamp >= %s")
+            params.append(start_date)
+        if end_date:
+            clauses.append("timestamp <= %s")
+            params.append(end_date)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    @staticmethod
+    def _check_dimensions(dimensions: Sequence[str]):
+        for dimension in dimensions:
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension: {dimension}")
+
+    def time_buckets(self, unit: str, user_id: Optional[str] = None,
+                     start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                     group_by: Sequence[str] = (),
+                     distinct: Sequence[str] = ("user_id", "session_id", "api_endpoint"),
+                     limit: Optional[int] = None) -> ColumnarResult:
+        """
+        Aggregate usage into time buckets.
+
+        Args:
+            unit: date_trunc unit ('minute', 'hour', 'day', 'week', 'month', 'year')
+            user_id: Filter by specific user (optional)
+            start_date: Start of the range (optional)
+            end_date: End of the range (optional)
+            group_by: Extra dimensions to group on within each bucket
+            distinct: Dimensions to count distinct values of
+            limit: Maximum number of rows to return (optional)
+
+        Returns:
+            ColumnarResult with bucket, group_by columns, total_tokens,
+            total_requests and unique_* columns, ordered by bucket
+        """
+        if unit not in DATE_TRUNC_UNITS:
+            raise ValueError(f"Unknown time bucket unit: {unit}")
+        self._check_dimensions(group_by)
+        self._check_dimensions(distinct)
+
+        where, params = self._where(user_id, start_date, end_date)
+        select = ["date_trunc(%s, timestamp) AS bucket"]
+        select += list(group_by)
+        select += ["SUM(tokens_used)::bigint AS total_tokens", "COUNT(*) AS total_requests"]
+        select += [f"{self._distinct_expr(column)} AS {_DISTINCT_NAMES[column]}" for column in distinct]
+        group = ", ".join(["bucket"] + list(group_by))
+
+        query = f"SELECT {', '.join(select)} FROM token_usage{where} GROUP BY {group} ORDER BY {group}"
+        params = [unit] + params
+        if limit:
+            query += " LIMIT %s"
+            params.append(limit)
+
+        rows = self.db.fetch_all(query, params)
+        names = ["bucket", *group_by, "total_tokens", "total_requests", *(_DISTINCT_NAMES[c] for c in distinct)]
+        return ColumnarResult.from_rows(rows, names, approximate=bool(distinct) and self._use_hll())
+
+    def summary(self, user_id: Optional[str] = None, start_date: Optional[datetime] = None,
+                end_date: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Compute summary statistics over a range in one query.
+
+        Returns:
+            Dictionary with total_tokens, total_requests, min/max/avg/median/stddev
+            tokens per request, unique_users/sessions/endpoints, first_seen and last_seen
+        """
+        where, params = self._where(user_id, start_date, end_date)
+        query = f"""
+            SELECT
+                COALESCE(SUM(tokens_used), 0)::bigint AS total_tokens,
+                COUNT(*) AS total_requests,
+                COALESCE(MIN(tokens_used), 0) AS min_tokens,
+                COALESCE(MAX(tokens_used), 0) AS max_tokens,
+                COALESCE(AVG(tokens_used), 0)::float AS avg_tokens,
+                COALESCE(percentile_cont(0.5) WITHIN GROUP (ORDER BY tokens_used), 0)::float AS median_tokens,
+                COALESCE(stddev_samp(tokens_used), 0)::float AS stddev_tokens,
+                {self._distinct_expr('user_id')} AS unique_users,
+                {self._distinct_expr('session_id')} AS unique_sessions,
+                {self._distinct_expr('api_endpoint')} AS unique_endpoints,
+                MIN(timestamp) AS first_seen,
+                MAX(timestamp) AS last_seen
+            FROM token_usage{where}
+        """
+        row = self.db.fetch_one(query, params)
+        return dict(row) if row else {}
+
+    def top(self, dimension: str, user_id: Optional[str] = None,
+            start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+            limit: Optional[int] = 10) -> ColumnarResult:
+        """
+        Rank values of a dimension by tokens used.
+
+        Args:
+            dimension: Column to group on (see DIMENSIONS)
+            user_id: Filter by specific user (optional)
+            start_date: Start of the range (optional)
+            end_date: End of the range (optional)
+            limit: Number of groups to return (None for all)
+
+        Returns:
+            ColumnarResult with key, tokens and requests columns
+        """
+        self._check_dimensions([dimension])
+        where, params = self._where(user_id, start_date, end_date)
+        query = (f"SELECT {dimension} AS key, SUM(tokens_used)::bigint AS tokens, COUNT(*) AS requests "
+                 f"FROM token_usage{where} GROUP BY {dimension} ORDER BY tokens DESC")
+        if limit:
+            query += " LIMIT %s"
+            params.append(limit)
+        return ColumnarResult.from_rows(self.db.fetch_all(query, params), ("key", "tokens", "requests"))
+
+    def stream_rows(self, user_id: Optional[str] = None, start_date: Optional[datetime] = None,
+                    end_date: Optional[datetime] = None, limit: Optional[int] = None,
+                    fetch_size: int = 10000) -> Iterator[Dict[str, Any]]:
+        """
+        Stream raw usage rows in timestamp order through a server-side cursor.
+
+        Args:
+            user_id: Filter by specific user (optional)
+            start_date: Start of the range (optional)
+            end_date: End of the range (optional)
+            limit: Maximum number of rows (optional)
+            fetch_size: Rows fetched per round trip
+
+        Yields:
+            Usage rows as dictionaries
+        """
+        where, params = self._where(user_id, start_date, end_date)
+        query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM token_usage{where} ORDER BY timestamp"
+        if limit:
+            query += " LIMIT %s"
+            params.append(limit)
+
+        with self.db.get_connection() as conn:
+            try:
+                # Named cursors are server-side; rows arrive fetch_size at a time
+                with conn.cursor(name=f"token_usage_stream_{uuid.uuid4().hex}",
+                                 cursor_factory=RealDictCursor) as cursor:
+                    cursor.itersize = fetch_size
+                    cursor.execute(query, params)
+                    for row in cursor:
+                        yield dict(row)
+            finally:
+                # End the read transaction before the connection returns to the pool
+                conn.rollback()
+
+    def stream_export(self, format: str, user_id: Optional[str] = None,
+                      start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                      chunk_rows: int = 1000, **kwargs) -> Iterator[str]:
+        """
+        Stream raw usage rows encoded as JSON or CSV.
+
+        Args:
+            format: 'json' (a JSON array) or 'csv'
+            user_id: Filter by specific user (optional)
+            start_date: Start of the range (optional)
+            end_date: End of the range (optional)
+            chunk_rows: Rows encoded per yielded chunk
+            **kwargs: Passed to stream_rows
+
+        Yields:
+            Encoded text chunks that concatenate to the full export
+        """
+        rows = self.stream_rows(user_id, start_date, end_date, **kwargs)
+        if format == "json":
+            yield from self._json_chunks(rows, chunk_rows)
+        elif format == "csv":
+            yield from self._csv_chunks(rows, chunk_rows)
+        else:
+            raise ValueError(f"Unsupported streaming export format: {format}")
+
+    @staticmethod
+    def _json_chunks(rows: Iterator[Dict[str, Any]], chunk_rows: int) -> Iterator[str]:
+        yield "["
+        parts: List[str] = []
+        first = True
+        for row in rows:
+            parts.append(("\n  " if first else ",\n  ") + json.dumps(row, default=str))
+            first = False
+            if len(parts) >= chunk_rows:
+                yield "".join(parts)
+                parts = []
+        if parts:
+            yield "".join(parts)
+        yield "\n]" if not first else "]"
+
+    @staticmethod
+    def _csv_chunks(rows: Iterator[Dict[str, Any]], chunk_rows: int) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        pending = 0
+        for row in rows:
+            writer.writerow(row)
+            pending += 1
+            if pending >= chunk_rows:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+        if buffer.tell():
+            yield buffer.getvalue()
@@ -10,8 +10,9 @@ import json
 import csv
 import io
 import gzip
+import zlib
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Union, Callable
+from typing import List, Dict, Any, Iterator, Optional, Union, Callable
 from dataclasses import dataclass, asdict
 from enum import Enum
 import pandas as pd
@@ -23,6 +24,8 @@ import hashlib
 from simba.simba.database.postgres import PostgresDB
 from simba.simba.database.token_models import TokenUsage
 from src.token_usage_logger import TokenUsageRecord, LoggingConfig
+from src.token_management.cache import LRUCache
+from src.token_usage_aggregation import TokenUsageAggregator
 
 logger = logging.getLogger(__name__)
 
@@ -91,6 +94,9 @@ class AnalyticsConfig:
     anomaly_threshold: float = 2.0  # standard deviations
     cache_results: bool = True
     cache_ttl: int = 3600  # seconds
+    cache_max_entries: int = 512
+    cache_max_bytes: Optional[int] = None
+    approximate_distinct: bool = True  # HyperLogLog counts when the hll extension is installed
 
 
 class TokenUsageAnalytics:
@@ -118,54 +124,41 @@ class TokenUsageAnalytics:
         self.config = config or AnalyticsConfig()
         
         # Cache for analytics results
-        self._cache: Dict[str, Dict[str, Any]] = {}
-        self._cache_ttl = {}
+        self._cache = LRUCache(
+            max_entries=self.config.cache_max_entries,
+            ttl=self.config.cache_ttl,
+            max_bytes=self.config.cache_max_bytes,
+            sizeof=lambda result: len(json.dumps(result, default=str))
+        )
+        
+        # SQL-side aggregation
+        self._aggregator = TokenUsageAggregator(self.db, approximate_distinct=self.config.approximate_distinct)
         
         logger.info(f"TokenUsageAnalytics initialized with {self.config.default_granularity.value} granularity")
     
     def _generate_cache_key(self, operation: str, **kwargs) -> str:
         """Generate a cache key for the given operation and parameters."""
+        # Freshness is bounded by the cache TTL, so the key only covers the query
         key_data = {
             'operation': operation,
-            'params': kwargs,
-            'timestamp': datetime.utcnow().isoformat()
+            'params': kwargs
         }
-        return hashlib.md5(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+        return hashlib.md5(json.dumps(key_data, sort_keys=True, default=str).encode()).hexdigest()
     
     def _get_from_cache(self, cache_key: str) -> Optional[Dict[str, Any]]:
         """Get analytics result from cache if available and not expired."""
-        if cache_key not in self._cache:
-            return None
-        
-        # Check TTL
-        if cache_key in self._cache_ttl:
-            if datetime.utcnow() > self._cache_ttl[cache_key]:
-                del self._cache[cache_key]
-                del self._cache_ttl[cache_key]
-                return None
-        
-        return self._cache[cache_key]
+        return self._cache.get(cache_key)
     
     def _add_to_cache(self, cache_key: str, result: Dict[str, Any], ttl: Optional[int] = None):
         """Add analytics result to cache."""
         if not self.config.cache_results:
             return
         
-        self._cache[cache_key] = result
-        
-        # Set TTL
-        ttl = ttl or self.config.cache_ttl
-        self._cache_ttl[cache_key] = datetime.utcnow() + timedelta(seconds=ttl)
-        
-        # Simple cache cleanup - remove expired entries
-        current_time = datetime.utcnow()
-        expired_keys = [
-            key for key, expiry in self._cache_ttl.items()
-            if current_time > expiry
-        ]
-        for key in expired_keys:
-            del self._cache[key]
-            del self._cache_ttl[key]
+        self._cache.set(cache_key, result, ttl=ttl)
+    
+    def get_performance_metrics(self) -> Dict[str, Any]:
+        """Get cache metrics for the analytics system."""
+        return {'cache': self._cache.get_metrics()}
     
     def get_token_usage_history(self, user_id: Optional[str] = None,
                                start_date: Optional[datetime] = None,
@@ -203,6 +196,11 @@ class TokenUsageAnalytics:
             return cached_result['data']
         
         try:
+            if granularity != AnalyticsGranularity.MINUTE:
+                results = self._aggregate_by_time(user_id, start_date, end_date, granularity, limit)
+                self._add_to_cache(cache_key, {'data': results})
+                return results
+            
             # Build query
             query = "SELECT * FROM token_usage WHERE 1=1"
             params = []
@@ -228,10 +226,6 @@ class TokenUsageAnalytics:
             # Execute query
             results = self.db.fetch_all(query, params)
             
-            # Apply time aggregation if needed
-            if granularity != AnalyticsGranularity.MINUTE:
-                results = self._aggregate_by_time(results, granularity)
-            
             # Cache result
             self._add_to_cache(cache_key, {'data': results})
             
@@ -241,52 +235,33 @@ class TokenUsageAnalytics:
             logger.error(f"Failed to get token usage history: {e}")
             return []
     
-    def _aggregate_by_time(self, records: List[Dict[str, Any]], 
-                          granularity: AnalyticsGranularity) -> List[Dict[str, Any]]:
-        """Aggregate records by time period."""
-        if not records:
-            return []
-        
-        # Group by time period
-        grouped = defaultdict(list)
+    def _aggregate_by_time(self, user_id: Optional[str], start_date: Optional[datetime],
+                          end_date: Optional[datetime], granularity: AnalyticsGranularity,
+                          limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Aggregate usage by time period in the database."""
+        buckets = self._aggregator.time_buckets(
+            granularity.value,
+            user_id=user_id,
+            start_date=start_date,
+            end_date=end_date,
+            limit=limit
+        )
+        duration = self._get_period_duration(granularity)
         
-        for record in records:
-            timestamp = record['timestamp']
-            
-            if granularity == AnalyticsGranularity.HOUR:
-                period_key = timestamp.replace(minute=0, second=0, microsecond=0)
-            elif granularity == AnalyticsGranularity.DAY:
-                period_key = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
-            elif granularity == AnalyticsGranularity.WEEK:
-                # Start of week (Monday)
-                days_since_monday = timestamp.weekday()
-                period_key = timestamp - timedelta(days=days_since_monday)
-                period_key = period_key.replace(hour=0, minute=0, second=0, microsecond=0)
-            elif granularity == AnalyticsGranularity.MONTH:
-                period_key = timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            elif granularity == AnalyticsGranularity.YEAR:
-                period_key = timestamp.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-            else:  # MINUTE
-                period_key = timestamp
-            
-            grouped[period_key].append(record)
-        
-        # Aggregate each period
         aggregated = []
-        for period_key, period_records in grouped.items():
-            total_tokens = sum(r['tokens_used'] for r in period_records)
-            total_requests = len(period_records)
-            
+        for row in buckets.rows():
+            total_tokens = row['total_tokens']
+            total_requests = row['total_requests']
             aggregated.append({
-                'period_start': period_key.isoformat(),
-                'period_end': (period_key + self._get_period_duration(granularity)).isoformat(),
+                'period_start': row['bucket'].isoformat(),
+                'period_end': (row['bucket'] + duration).isoformat(),
                 'total_tokens': total_tokens,
                 'total_requests': total_requests,
                 'average_tokens_per_request': total_tokens / total_requests if total_requests > 0 else 0,
-                'unique_users': len(set(r['user_id'] for r in period_records)),
-                'unique_sessions': len(set(r['session_id'] for r in period_records)),
-                'unique_endpoints': len(set(r['api_endpoint'] for r in period_records)),
-                'records': period_records
+                'unique_users': row['unique_users'],
+                'unique_sessions': row['unique_sessions'],
+                'unique_endpoints': row['unique_endpoints'],
+                'approximate_unique_counts': buckets.approximate
             })
         
         return aggregated
@@ -336,15 +311,10 @@ class TokenUsageAnalytics:
             return UsageSummary(**cached_result['data'])
         
         try:
-            # Get all records
-            records = self.get_token_usage_history(
-                user_id=user_id,
-                start_date=start_date,
-                end_date=end_date,
-                granularity=AnalyticsGranularity.MINUTE
-            )
+            # Scalar statistics, computed in one aggregate query
+            stats = self._aggregator.summary(user_id=user_id, start_date=start_date, end_date=end_date)
             
-            if not records:
+            if not stats or not stats['total_requests']:
                 return UsageSummary(
                     total_tokens=0,
                     total_requests=0,
@@ -362,59 +332,37 @@ class TokenUsageAnalytics:
                     priority_distribution={}
                 )
             
-            # Calculate basic statistics
-            tokens_used = [r['tokens_used'] for r in records]
-            total_tokens = sum(tokens_used)
-            total_requests = len(records)
-            average_tokens = total_tokens / total_requests if total_requests > 0 else 0
-            min_tokens = min(tokens_used) if tokens_used else 0
-            max_tokens = max(tokens_used) if tokens_used else 0
-            median_tokens = statistics.median(tokens_used) if tokens_used else 0
-            std_dev_tokens = statistics.stdev(tokens_used) if len(tokens_used) > 1 else 0
-            
-            # Calculate unique values
-            unique_users = len(set(r['user_id'] for r in records))
-            unique_sessions = len(set(r['session_id'] for r in records))
-            unique_endpoints = len(set(r['api_endpoint'] for r in records))
-            
-            # Get time period
-            timestamps = [r['timestamp'] for r in records]
-            time_period = {
-                'start': min(timestamps),
-                'end': max(timestamps)
-            }
-            
-            # Get top users
-            user_counts = Counter(r['user_id'] for r in records)
+            # Get top users and endpoints by tokens used
+            users = self._aggregator.top('user_id', user_id=user_id, start_date=start_date, end_date=end_date)
             top_users = [
-                {'user_id': user, 'tokens': user_counts[user]}
-                for user in user_counts.most_common(10)
+                {'user_id': key, 'tokens': tokens}
+                for key, tokens in zip(users['key'], users['tokens'])
             ]
             
-            # Get top endpoints
-            endpoint_counts = Counter(r['api_endpoint'] for r in records)
+            endpoints = self._aggregator.top('api_endpoint', user_id=user_id, start_date=start_date, end_date=end_date)
             top_endpoints = [
-                {'endpoint': endpoint, 'tokens': endpoint_counts[endpoint]}
-                for endpoint in endpoint_counts.most_common(10)
+                {'endpoint': key, 'tokens': tokens}
+                for key, tokens in zip(endpoints['key'], endpoints['tokens'])
             ]
             
             # Get priority distribution
-            priority_counts = Counter(r['priority_level'] for r in records)
-            priority_distribution = dict(priority_counts)
+            priorities = self._aggregator.top('priority_level', user_id=user_id, start_date=start_date,
+                                              end_date=end_date, limit=None)
+            priority_distribution = dict(zip(priorities['key'], priorities['requests']))
             
             # Create summary
             summary = UsageSummary(
-                total_tokens=total_tokens,
-                total_requests=total_requests,
-                average_tokens_per_request=average_tokens,
-                min_tokens_per_request=min_tokens,
-                max_tokens_per_request=max_tokens,
-                median_tokens_per_request=median_tokens,
-                std_dev_tokens_per_request=std_dev_tokens,
-                unique_users=unique_users,
-                unique_sessions=unique_sessions,
-                unique_endpoints=unique_endpoints,
-                time_period=time_period,
+                total_tokens=stats['total_tokens'],
+                total_requests=stats['total_requests'],
+                average_tokens_per_request=stats['avg_tokens'],
+                min_tokens_per_request=stats['min_tokens'],
+                max_tokens_per_request=stats['max_tokens'],
+                median_tokens_per_request=stats['median_tokens'],
+                std_dev_tokens_per_request=stats['stddev_tokens'],
+                unique_users=stats['unique_users'],
+                unique_sessions=stats['unique_sessions'],
+                unique_endpoints=stats['unique_endpoints'],
+                time_period={'start': stats['first_seen'], 'end': stats['last_seen']},
                 top_users=top_users,
                 top_endpoints=top_endpoints,
                 priority_distribution=priority_distribution
@@ -666,6 +614,9 @@ class TokenUsageAnalytics:
         """
         Export token usage logs in various formats.
         
+        JSON and CSV exports are streamed from the database; use
+        stream_token_usage_logs to write them out without holding them in memory.
+        
         Args:
             user_id: Filter by specific user (optional)
             start_date: Start date for the query (optional)
@@ -677,39 +628,39 @@ class TokenUsageAnalytics:
             Exported data as string or bytes
         """
         try:
-            # Get records
-            records = self.get_token_usage_history(
-                user_id=user_id,
-                start_date=start_date,
-                end_date=end_date,
-                granularity=AnalyticsGranularity.MINUTE
-            )
-            
-            if not records:
-                return ""
-            
-            # Convert to DataFrame for easier processing
-            df = pd.DataFrame(records)
-            
-            # Export based on format
-            if format == ExportFormat.JSON:
-                output = df.to_json(orient='records', indent=2)
-            elif format == ExportFormat.CSV:
-                output = df.to_csv(index=False)
-            elif format == ExportFormat.EXCEL:
-                output = io.BytesIO()
-                df.to_excel(output, index=False)
-                output.seek(0)
-                output = output.getvalue()
-            elif format == ExportFormat.PARQUET:
-                output = io.BytesIO()
-                df.to_parquet(output, index=False)
-                output.seek(0)
-                output = output.getvalue()
-            elif format == ExportFormat.HTML:
-                output = df.to_html(index=False)
+            if format in (ExportFormat.JSON, ExportFormat.CSV):
+                output = "".join(self.stream_token_usage_logs(
+                    user_id=user_id,
+                    start_date=start_date,
+                    end_date=end_date,
+                    format=format
+                ))
             else:
-                raise ValueError(f"Unsupported export format: {format}")
+                # Binary and HTML formats are built in memory by pandas
+                df = pd.DataFrame(list(self._aggregator.stream_rows(
+                    user_id=user_id,
+                    start_date=start_date,
+                    end_date=end_date,
+                    limit=self.config.max_records
+                )))
+                if df.empty:
+                    return ""
+                
+                # Export based on format
+                if format == ExportFormat.EXCEL:
+                    output = io.BytesIO()
+                    df.to_excel(output, index=False)
+                    output.seek(0)
+                    output = output.getvalue()
+                elif format == ExportFormat.PARQUET:
+                    output = io.BytesIO()
+                    df.to_parquet(output, index=False)
+                    output.seek(0)
+                    output = output.getvalue()
+                elif format == ExportFormat.HTML:
+                    output = df.to_html(index=False)
+                else:
+                    raise ValueError(f"Unsupported export format: {format}")
             
             # Compress if requested
             if compression:
@@ -730,6 +681,44 @@ class TokenUsageAnalytics:
             logger.error(f"Failed to export token usage logs: {e}")
             return ""
     
+    def stream_token_usage_logs(self, user_id: Optional[str] = None,
+                                start_date: Optional[datetime] = None,
+                                end_date: Optional[datetime] = None,
+                                format: ExportFormat = ExportFormat.JSON,
+                                compression: bool = False) -> Iterator[Union[str, bytes]]:
+        """
+        Stream token usage logs as JSON or CSV chunks.
+        
+        Rows are read through a server-side cursor, so memory use does not
+        depend on the size of the export.
+        
+        Args:
+            user_id: Filter by specific user (optional)
+            start_date: Start date for the query (optional)
+            end_date: End date for the query (optional)
+            format: ExportFormat.JSON or ExportFormat.CSV
+            compression: Yield gzip-compressed bytes instead of text
+            
+        Yields:
+            Chunks that concatenate to the full export
+        """
+        chunks = self._aggregator.stream_export(
+            format.value,
+            user_id=user_id,
+            start_date=start_date,
+            end_date=end_date
+        )
+        if not compression:
+            yield from chunks
+            return
+        
+        compressor = zlib.compressobj(wbits=31)  # gzip container
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode('utf-8'))
+            if data:
+                yield data
+        yield compressor.flush()
+    
     def cleanup_old_logs(self, retention_days: int = 90) -> Dict[str, Any]:
         """
         Clean up old token usage logs based on retention policy.
@@ -843,7 +832,6 @@ class TokenUsageAnalytics:
     def clear_cache(self):
         """Clear the analytics cache."""
         self._cache.clear()
-        self._cache_ttl.clear()
         logger.info("Analytics cache cleared")
 
 
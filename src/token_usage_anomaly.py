@@ -0,0 +1,256 @@
+"""
+Online Token Usage Anomaly Detection
+
+This module flags anomalous token consumption as usage records are logged. Each
+user has constant-size running statistics (an exponentially weighted mean and
+variance, and the last ten values for spike detection), so every event is
+scored and folded in with O(1) work instead of rescanning the usage window.
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+from src.token_management.cache import LRUCache
+
+# Values compared by spike detection: the last SPIKE_WINDOW against the SPIKE_WINDOW before
+SPIKE_WINDOW = 5
+
+
+@dataclass
+class UsageAnomaly:
+    """An anomalous usage event."""
+    user_id: str
+    anomaly_type: str  # 'statistical_outlier' or 'usage_spike'
+    score: float  # z-score for outliers, increase factor for spikes
+    detected_at: datetime
+    metrics: Dict[str, Any] = field(default_factory=dict)
+
+
+class _UserStats:
+    """Running statistics of one user's tokens per request."""
+    __slots__ = ("count", "mean", "var", "recent", "spiking")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.recent: Deque[int] = deque(maxlen=2 * SPIKE_WINDOW)
+        self.spiking = False
+
+    def update(self, value: float, alpha: float):
+        """Fold a value into the exponentially weighted mean and variance."""
+        self.count += 1
+        # Plain running mean/variance until 1/alpha values are seen, weighted after
+        weight = max(alpha, 1.0 / self.count)
+        diff = value - self.mean
+        increment = weight * diff
+        self.mean += increment
+        self.var = (1 - weight) * (self.var + diff * increment)
+
+
+class OnlineAnomalyDetector:
+    """
+    Per-user streaming anomaly detector.
+
+    A value is an outlier if it is more than threshold standard deviations from
+    the user's weighted mean before the value is added. A spike is flagged when
+    the mean of the last five values first exceeds spike_factor times the mean
+    of the five before. Users idle for longer than the window are forgotten.
+    """
+
+    def __init__(self, threshold: float = 3.0, span: int = 100, min_samples: int = 5,
+                 spike_factor: float = 2.0, window_seconds: float = 24 * 3600,
+                 max_users: int = 100000, max_pending: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the detector.
+
+        Args:
+            threshold: Z-score above which a value is an outlier
+            span: Number of recent requests the weighted statistics mostly reflect
+            min_samples: Requests seen before a user's values are scored
+            spike_factor: Increase of the recent mean that counts as a spike
+            window_seconds: Idle time after which a user's statistics are dropped
+            max_users: Maximum number of users tracked
+            max_pending: Maximum number of undrained anomalies kept
+            clock: Monotonic time source in seconds
+        """
+        self.threshold = threshold
+        self.alpha = 2.0 / (span + 1)
+        self.min_samples = min_samples
+        self.spike_factor = spike_factor
+        self._users = LRUCache(max_entries=max_users, ttl=window_seconds, clock=clock)
+        self._pending: Deque[UsageAnomaly] = deque(maxlen=max_pending)
+        self._lock = threading.Lock()
+        # Rows logged from here on arrive through observe(); backfill only takes older rows
+        self.started_at = datetime.utcnow()
+        self.backfilled = False
+        self.metrics = {
+            'events': 0,
+            'backfilled_events': 0,
+            'outliers': 0,
+            'spikes': 0,
+        }
+
+    def observe(self, user_id: str, tokens_used: int,
+                timestamp: Optional[datetime] = None) -> List[UsageAnomaly]:
+        """
+        Score a usage event and add it to the user's statistics.
+
+        Args:
+            user_id: User identifier
+            tokens_used: Tokens consumed by the request
+            timestamp: Time of the request (defaults to now)
+
+        Returns:
+            Anomalies raised by this event (also queued for drain())
+        """
+        detected_at = timestamp or datetime.utcnow()
+        with self._lock:
+            stats = self._users.get(user_id)
+            if stats is None:
+                stats = _UserStats()
+            anomalies = self._score(user_id, stats, tokens_used, detected_at)
+            self._count(1, anomalies)
+            # Re-set to refresh the idle TTL
+            self._users.set(user_id, stats)
+            self._pending.extend(anomalies)
+        return anomalies
+
+    def backfill(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Seed statistics from stored usage rows logged before the detector started.
+
+        History is replayed into separate statistics and installed only for
+        users not yet seen live, so rows never enter a user's statistics after
+        newer ones did.
+
+        Args:
+            records: Rows with user_id, tokens_used and timestamp, in timestamp order
+
+        Returns:
+            Number of rows observed
+        """
+        history: Dict[str, _UserStats] = {}
+        anomalies: Dict[str, List[UsageAnomaly]] = {}
+        for record in records:
+            if record['timestamp'] >= self.started_at:
+                # Later rows were logged while the detector was running and already observed
+                break
+            user_id = record['user_id']
+            stats = history.get(user_id)
+            if stats is None:
+                stats = history[user_id] = _UserStats()
+                anomalies[user_id] = []
+            anomalies[user_id].extend(
+                self._score(user_id, stats, record['tokens_used'], record['timestamp']))
+
+        count = 0
+        with self._lock:
+            for user_id, stats in history.items():
+                if user_id in self._users:
+                    continue
+                self._users.set(user_id, stats)
+                self._pending.extend(anomalies[user_id])
+                self._count(stats.count, anomalies[user_id])
+                count += stats.count
+            self.metrics['backfilled_events'] += count
+            self.backfilled = True
+        return count
+
+    def _score(self, user_id: str, stats: _UserStats, tokens_used: int,
+               detected_at: datetime) -> List[UsageAnomaly]:
+        """Score a value against a user's statistics, then fold it in."""
+        anomalies = []
+        if stats.count >= self.min_samples and stats.var > 0:
+            std = stats.var ** 0.5
+            z_score = abs(tokens_used - stats.mean) / std
+            if z_score > self.threshold:
+                anomalies.append(UsageAnomaly(
+                    user_id=user_id,
+                    anomaly_type="statistical_outlier",
+                    score=z_score,
+                    detected_at=detected_at,
+                    metrics={
+                        'usage_value': tokens_used,
+                        'mean_usage': stats.mean,
+                        'std_usage': std,
+                        'z_score': z_score,
+                        'observations': stats.count
+                    }
+                ))
+
+        stats.update(tokens_used, self.alpha)
+        stats.recent.append(tokens_used)
+        if len(stats.recent) == stats.recent.maxlen:
+            values = list(stats.recent)
+            earlier_avg = sum(values[:SPIKE_WINDOW]) / SPIKE_WINDOW
+            recent_avg = sum(values[SPIKE_WINDOW:]) / SPIKE_WINDOW
+            spiking = earlier_avg > 0 and recent_avg > earlier_avg * self.spike_factor
+            # Report the start of a spike, not every request while it lasts
+            if spiking and not stats.spiking:
+                anomalies.append(UsageAnomaly(
+                    user_id=user_id,
+                    anomaly_type="usage_spike",
+                    score=recent_avg / earlier_avg,
+                    detected_at=detected_at,
+                    metrics={
+                        'recent_avg': recent_avg,
+                        'earlier_avg': earlier_avg,
+                        'increase_factor': recent_avg / earlier_avg,
+                        'recent_values': values[SPIKE_WINDOW:],
+                        'earlier_values': values[:SPIKE_WINDOW]
+                    }
+                ))
+            stats.spiking = spiking
+        return anomalies
+
+    def _count(self, events: int, anomalies: List[UsageAnomaly]):
+        """Add scored events and their anomalies to the counters (lock held)."""
+        self.metrics['events'] += events
+        for anomaly in anomalies:
+            if anomaly.anomaly_type == "usage_spike":
+                self.metrics['spikes'] += 1
+            else:
+                self.metrics['outliers'] += 1
+
+    def drain(self) -> List[UsageAnomaly]:
+        """Return and clear the anomalies raised since the last drain."""
+        with self._lock:
+            anomalies = list(self._pending)
+            self._pending.clear()
+        return anomalies
+
+    def get_user_stats(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get a user's current statistics, or None if the user is not tracked."""
+        with self._lock:
+            stats = self._users.get(user_id)
+            if stats is None:
+                return None
+            return {'count': stats.count, 'mean': stats.mean, 'std': stats.var ** 0.5}
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get event and anomaly counters."""
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics['pending'] = len(self._pending)
+        metrics['users'] = self._users.get_metrics()
+        return metrics
+
+
+# Shared by TokenUsageLogger, TokenUsageBatchProcessor and TokenMonitoringSystem
+_anomaly_detector: Optional[OnlineAnomalyDetector] = None
+_anomaly_detector_lock = threading.Lock()
+
+
+def get_anomaly_detector() -> OnlineAnomalyDetector:
+    """Get the process-wide usage anomaly detector."""
+    global _anomaly_detector
+    with _anomaly_detector_lock:
+        if _anomaly_detector is None:
+            _anomaly_detector = OnlineAnomalyDetector()
+        return _anomaly_detector
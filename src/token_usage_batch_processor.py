@@ -7,12 +7,14 @@ optimized for high-throughput scenarios with automatic batching and compression.
 
 import logging
 import asyncio
+import os
+import tempfile
 import json
 import gzip
 import pickle
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Union, Callable
-from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Optional, Set, Tuple, Union, Callable
+from dataclasses import dataclass, asdict, field
 from enum import Enum
 import threading
 import queue
@@ -24,6 +26,9 @@ import hashlib
 from simba.simba.database.postgres import PostgresDB
 from simba.simba.database.token_models import TokenUsage
 from src.token_usage_logger import TokenUsageRecord, LoggingConfig, LoggingStrategy
+from src.token_usage_bulk_sink import TokenUsageCopySink, TokenUsageSpool, default_spool_path
+from src.token_usage_dedup import RequestDeduplicator, get_request_deduplicator
+from src.token_usage_anomaly import OnlineAnomalyDetector, get_anomaly_detector
 
 logger = logging.getLogger(__name__)
 
@@ -70,9 +75,27 @@ class BatchProcessorConfig:
     max_workers: int = 5
     enable_compression: bool = True
     enable_deduplication: bool = True
+    enable_anomaly_detection: bool = True  # feed accepted records to the online detector
     retry_failed_batches: bool = True
     batch_timeout: float = 30.0  # seconds
     health_check_interval: float = 60.0  # seconds
+    # Bulk COPY sink; max_batch_size is the upper bound of its adaptive batch size
+    use_copy_sink: bool = True
+    min_batch_size: int = 100
+    copy_target_latency: float = 0.25  # seconds per COPY
+    # Write-ahead spool for batches not yet committed. Each processor spools to a
+    # file of its own under data_dir, keyed by pid and instance id, and adopts the
+    # files of dead processes on start; spool_path overrides the file and
+    # data_dir=None with no spool_path disables the spool.
+    data_dir: Optional[str] = field(default_factory=lambda: os.environ.get(
+        "TOKEN_USAGE_DATA_DIR", os.path.join(tempfile.gettempdir(), "token_usage")))
+    spool_path: Optional[str] = None
+    # Failed batches are retried after retry_backoff_base * 2**(retry - 1) seconds,
+    # capped at retry_backoff_max; spooled batches are retried until they commit
+    retry_backoff_base: float = 1.0
+    retry_backoff_max: float = 300.0
+    # How often batches left in the spool are re-driven
+    spool_redrive_interval: float = 30.0
 
 
 class TokenUsageBatchProcessor:
@@ -81,20 +104,25 @@ class TokenUsageBatchProcessor:
     
     Features:
     - Automatic batching with configurable size and timeout
-    - Compression for storage efficiency
+    - Bulk COPY writes with adaptive batch sizing and a write-ahead spool
+    - Compression for storage efficiency (ORM insert path only)
     - Priority-based processing
     - Retry mechanisms for failed batches
     - Performance monitoring and metrics
     - Thread-safe operations
     """
     
-    def __init__(self, db: Optional[PostgresDB] = None, config: Optional[BatchProcessorConfig] = None):
+    def __init__(self, db: Optional[PostgresDB] = None, config: Optional[BatchProcessorConfig] = None,
+                 deduplicator: Optional[RequestDeduplicator] = None,
+                 anomaly_detector: Optional[OnlineAnomalyDetector] = None):
         """
         Initialize the batch processor.
         
         Args:
             db: Database instance for batch operations
             config: Batch processor configuration
+            deduplicator: request_id deduplicator (defaults to the one shared with TokenUsageLogger)
+            anomaly_detector: Online usage anomaly detector (defaults to the shared one)
         """
         self.db = db or PostgresDB()
         self.config = config or BatchProcessorConfig()
@@ -104,8 +132,9 @@ class TokenUsageBatchProcessor:
         self._stop_event = threading.Event()
         self._executor = ThreadPoolExecutor(max_workers=self.config.max_workers)
         
-        # Initialize processed requests set for deduplication
-        self._processed_requests = set()
+        # Time-windowed request_id deduplication
+        self._deduplicator = deduplicator or get_request_deduplicator()
+        self._anomaly_detector = anomaly_detector or get_anomaly_detector()
         
         # Queues for different priorities
         self._queues = {
@@ -122,6 +151,36 @@ class TokenUsageBatchProcessor:
             BatchPriority.MEDIUM: [],
             BatchPriority.LOW: []
         }
+        self._buffer_lock = threading.Lock()
+        # When the oldest record in each buffer was added
+        self._buffer_started: Dict[BatchPriority, Optional[float]] = {priority: None for priority in BatchPriority}
+        
+        # Failed batches waiting out their backoff, and batches queued or being processed
+        self._retry_lock = threading.Lock()
+        self._delayed: Dict[str, Tuple[float, BatchJob]] = {}
+        self._in_flight: Set[str] = set()
+        self._redrive_wakeup = threading.Event()
+        
+        # Bulk COPY sink, with a write-ahead spool unless disabled
+        self.instance_id = uuid.uuid4().hex[:12]
+        self._sink: Optional[TokenUsageCopySink] = None
+        if self.config.use_copy_sink:
+            spool = None
+            spool_path = self.config.spool_path
+            if spool_path is None and self.config.data_dir:
+                spool_path = default_spool_path(self.config.data_dir, self.instance_id)
+            if spool_path:
+                spool = TokenUsageSpool(spool_path)
+                if self.config.data_dir:
+                    spool.adopt_orphans(self.config.data_dir)
+            self._sink = TokenUsageCopySink(
+                self.db,
+                spool=spool,
+                initial_batch_size=self.config.max_batch_size,
+                min_batch_size=min(self.config.min_batch_size, self.config.max_batch_size),
+                max_batch_size=self.config.max_batch_size,
+                target_latency=self.config.copy_target_latency
+            )
         
         # Performance metrics
         self.metrics = {
@@ -129,6 +188,7 @@ class TokenUsageBatchProcessor:
             'total_records_processed': 0,
             'successful_batches': 0,
             'failed_batches': 0,
+            'duplicate_records': 0,
             'compression_savings': 0,
             'processing_time': 0.0,
             'queue_sizes': {priority.value: 0 for priority in BatchPriority},
@@ -136,12 +196,80 @@ class TokenUsageBatchProcessor:
             'error_timestamp': None
         }
         
+        # Re-queue batches left in the spool by a previous run
+        self._redrive(include_spool=True)
+        
         # Start background workers
         self._start_workers()
         self._start_health_monitor()
+        self._start_redrive()
         
         logger.info(f"TokenUsageBatchProcessor initialized with {self.config.max_workers} workers")
     
+    def _redrive(self, include_spool: bool = False):
+        """
+        Queue failed batches whose backoff has elapsed.
+        
+        With include_spool, also queue spooled batches that are neither queued,
+        being processed nor waiting out a backoff: batches recovered from a
+        previous run or adopted from a dead one, and batches a full queue refused.
+        """
+        now = time.monotonic()
+        with self._retry_lock:
+            due = [batch for due_at, batch in self._delayed.values() if due_at <= now]
+            for batch in due:
+                del self._delayed[batch.batch_id]
+            if include_spool and self._sink is not None and self._sink.spool is not None:
+                for batch_id, records in self._sink.spool.pending().items():
+                    if batch_id in self._delayed or batch_id in self._in_flight:
+                        continue
+                    due.append(BatchJob(
+                        batch_id=batch_id,
+                        records=records,
+                        priority=BatchPriority.HIGH,
+                        compression=self.config.compression,
+                        created_at=datetime.utcnow(),
+                        metadata={'replayed': True}
+                    ))
+            self._in_flight.update(batch.batch_id for batch in due)
+        
+        for batch in due:
+            try:
+                self._queues[batch.priority].put_nowait(batch)
+            except queue.Full:
+                logger.error(f"Queue full, delaying batch {batch.batch_id}")
+                with self._retry_lock:
+                    self._in_flight.discard(batch.batch_id)
+                self._schedule_retry(batch)
+    
+    def _start_redrive(self):
+        """Start the thread that re-drives delayed and spooled batches."""
+        redrive = threading.Thread(
+            target=self._redrive_loop,
+            daemon=True,
+            name="BatchRedrive"
+        )
+        redrive.start()
+        logger.debug("Started batch redrive")
+    
+    def _redrive_loop(self):
+        """Release delayed retries when due and re-drive the spool periodically."""
+        next_spool_pass = time.monotonic() + self.config.spool_redrive_interval
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            include_spool = now >= next_spool_pass
+            if include_spool:
+                next_spool_pass = now + self.config.spool_redrive_interval
+            try:
+                self._redrive(include_spool=include_spool)
+            except Exception as e:
+                logger.error(f"Batch redrive error: {e}")
+            
+            with self._retry_lock:
+                next_due = min((due_at for due_at, _ in self._delayed.values()), default=next_spool_pass)
+            self._redrive_wakeup.wait(timeout=max(0.0, min(next_due, next_spool_pass) - time.monotonic()))
+            self._redrive_wakeup.clear()
+    
     def _start_workers(self):
         """Start background processing workers."""
         for priority in BatchPriority:
@@ -215,19 +343,18 @@ class TokenUsageBatchProcessor:
     
     def _get_batch_for_processing(self, priority: BatchPriority) -> Optional[BatchJob]:
         """Get a batch for processing from the given priority level."""
-        # Check buffer first
-        buffer = self._batch_buffers[priority]
-        if buffer:
-            with self._lock:
-                if buffer:
-                    batch = buffer.pop(0)
-                    return batch
+        # Flush buffered records that have waited long enough
+        started = self._buffer_started[priority]
+        if started is not None and time.monotonic() - started >= self.config.max_batch_wait_time:
+            self._flush_buffer(priority)
         
         # Check queue
         try:
             record = self._queues[priority].get(timeout=1.0)
             if record is None:  # Sentinel
                 return None
+            if isinstance(record, BatchJob):
+                return record
             
             # Create batch from single record
             return BatchJob(
@@ -244,31 +371,42 @@ class TokenUsageBatchProcessor:
     def _process_batch(self, batch: BatchJob):
         """Process a batch of token usage records."""
         start_time = time.time()
+        with self._retry_lock:
+            self._in_flight.add(batch.batch_id)
         
+        record_count = len(batch.records)
         try:
-            # Compress batch if enabled
-            compressed_data = self._compress_batch(batch)
-            
-            # Insert into database
-            success = self._insert_batch_to_db(batch, compressed_data)
+            if self._sink is not None:
+                written = self._sink.write_batch(batch.batch_id, batch.records)
+                success = written == len(batch.records)
+                # Only the uncommitted tail is retried
+                batch.records = batch.records[written:]
+            else:
+                # Compress batch if enabled
+                compressed_data = self._compress_batch(batch)
+                
+                # Insert into database
+                success = self._insert_batch_to_db(batch, compressed_data)
             
             # Update metrics
             processing_time = time.time() - start_time
             with self._lock:
                 self.metrics['total_batches_processed'] += 1
-                self.metrics['total_records_processed'] += len(batch.records)
+                self.metrics['total_records_processed'] += record_count
                 self.metrics['processing_time'] += processing_time
                 
                 if success:
                     self.metrics['successful_batches'] += 1
-                    logger.debug(f"Successfully processed batch {batch.batch_id} with {len(batch.records)} records")
+                    logger.debug(f"Successfully processed batch {batch.batch_id} with {record_count} records")
                 else:
                     self.metrics['failed_batches'] += 1
                     self.metrics['last_error'] = f"Batch {batch.batch_id} failed"
                     self.metrics['error_timestamp'] = datetime.utcnow().isoformat()
                     
-                    # Retry if enabled and within retry limit
-                    if self.config.retry_failed_batches and batch.retry_count < batch.max_retries:
+                    # Retry if enabled and within retry limit; spooled batches
+                    # stay durable, so they keep retrying at the capped backoff
+                    spooled = self._sink is not None and self._sink.spool is not None
+                    if self.config.retry_failed_batches and (spooled or batch.retry_count < batch.max_retries):
                         batch.retry_count += 1
                         self._retry_batch(batch)
             
@@ -278,6 +416,9 @@ class TokenUsageBatchProcessor:
                 self.metrics['failed_batches'] += 1
                 self.metrics['last_error'] = str(e)
                 self.metrics['error_timestamp'] = datetime.utcnow().isoformat()
+        finally:
+            with self._retry_lock:
+                self._in_flight.discard(batch.batch_id)
     
     def _compress_batch(self, batch: BatchJob) -> bytes:
         """Compress batch data for storage efficiency."""
@@ -312,122 +453,6 @@ class TokenUsageBatchProcessor:
             logger.error("Database not available for batch insertion")
             return False
         
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
-        if not self.db:
-            logger.error("Database not available for batch insertion")
-            return False
-            
         session = self.db._Session()
         try:
             # Create batch records
@@ -456,21 +481,27 @@ class TokenUsageBatchProcessor:
             session.close()
     
     def _retry_batch(self, batch: BatchJob):
-        """Retry a failed batch."""
+        """Retry a failed batch after an exponential backoff."""
         try:
             # Reduce priority for retry
-            new_priority = min(batch.priority.value - 1, BatchPriority.LOW.value)
-            retry_priority = BatchPriority(new_priority)
+            new_priority = max(batch.priority.value - 1, BatchPriority.LOW.value)
+            batch.priority = BatchPriority(new_priority)
             
-            # Add back to queue with lower priority
-            self._queues[retry_priority].put_nowait(batch)
-            logger.info(f"Retrying batch {batch.batch_id} with priority {retry_priority.value}")
+            delay = self._schedule_retry(batch)
+            logger.info(f"Retrying batch {batch.batch_id} with priority {batch.priority.value} in {delay:.1f}s")
             
-        except queue.Full:
-            logger.error(f"Cannot retry batch {batch.batch_id} - queue full")
         except Exception as e:
             logger.error(f"Failed to retry batch {batch.batch_id}: {e}")
     
+    def _schedule_retry(self, batch: BatchJob) -> float:
+        """Hold a batch back for its backoff; the redrive thread queues it when due."""
+        delay = min(self.config.retry_backoff_max,
+                    self.config.retry_backoff_base * 2 ** max(batch.retry_count - 1, 0))
+        with self._retry_lock:
+            self._delayed[batch.batch_id] = (time.monotonic() + delay, batch)
+        self._redrive_wakeup.set()
+        return delay
+    
     def add_record(self, record: TokenUsageRecord, priority: BatchPriority = BatchPriority.MEDIUM) -> bool:
         """
         Add a record to the batch processor.
@@ -482,19 +513,28 @@ class TokenUsageBatchProcessor:
         Returns:
             True if successfully added, False otherwise
         """
+        # Check for duplicates if enabled
+        if self.config.enable_deduplication and self._is_duplicate_record(record):
+            logger.debug(f"Duplicate record detected, skipping: {record.request_id}")
+            return True
+        return self._buffer_record(record, priority)
+    
+    def _buffer_record(self, record: TokenUsageRecord, priority: BatchPriority) -> bool:
+        """Append a record to its priority buffer, flushing the buffer when full."""
         try:
-            # Check for duplicates if enabled
-            if self.config.enable_deduplication:
-                if self._is_duplicate_record(record):
-                    logger.debug(f"Duplicate record detected, skipping: {record.request_id}")
-                    return True
+            if self.config.enable_anomaly_detection:
+                self._anomaly_detector.observe(record.user_id, record.tokens_used, record.timestamp)
             
             # Add to appropriate buffer
-            buffer = self._batch_buffers[priority]
-            buffer.append(record)
+            with self._buffer_lock:
+                buffer = self._batch_buffers[priority]
+                if not buffer:
+                    self._buffer_started[priority] = time.monotonic()
+                buffer.append(record)
+                full = len(buffer) >= self._flush_threshold()
             
             # Check if buffer should be processed
-            if len(buffer) >= self.config.max_batch_size:
+            if full:
                 self._flush_buffer(priority)
             
             # Update metrics
@@ -508,28 +548,38 @@ class TokenUsageBatchProcessor:
             return False
     
     def _is_duplicate_record(self, record: TokenUsageRecord) -> bool:
-        """Check if a record is a duplicate."""
-        # Simple deduplication based on request_id
-        # In production, you might want a more sophisticated approach
-        return hasattr(record, 'request_id') and record.request_id in getattr(self, '_processed_requests', set())
+        """Check if a record is a duplicate, remembering its request_id otherwise."""
+        is_duplicate = self._deduplicator.check_and_add(getattr(record, 'request_id', None))
+        if is_duplicate:
+            with self._lock:
+                self.metrics['duplicate_records'] += 1
+        return is_duplicate
+    
+    def _flush_threshold(self) -> int:
+        """Buffer size that triggers a flush: the sink's adaptive batch size when enabled."""
+        if self._sink is not None:
+            return min(self._sink.batch_size, self.config.max_batch_size)
+        return self.config.max_batch_size
     
     def _flush_buffer(self, priority: BatchPriority):
         """Flush a buffer by creating a batch job."""
-        buffer = self._batch_buffers[priority]
-        if not buffer:
-            return
-        
-        # Create batch job
-        batch = BatchJob(
-            batch_id=str(uuid.uuid4()),
-            records=buffer.copy(),
-            priority=priority,
-            compression=self.config.compression,
-            created_at=datetime.utcnow()
-        )
-        
-        # Clear buffer
-        buffer.clear()
+        with self._buffer_lock:
+            buffer = self._batch_buffers[priority]
+            if not buffer:
+                return
+            
+            # Create batch job
+            batch = BatchJob(
+                batch_id=str(uuid.uuid4()),
+                records=buffer.copy(),
+                priority=priority,
+                compression=self.config.compression,
+                created_at=datetime.utcnow()
+            )
+            
+            # Clear buffer
+            buffer.clear()
+            self._buffer_started[priority] = None
         
         # Add to queue
         try:
@@ -564,7 +614,7 @@ class TokenUsageBatchProcessor:
                 results['duplicates'] += 1
                 continue
             
-            if self.add_record(record, priority):
+            if self._buffer_record(record, priority):
                 results['successful'] += 1
             else:
                 results['failed'] += 1
@@ -615,6 +665,20 @@ class TokenUsageBatchProcessor:
         # Add queue and buffer sizes
         metrics['queue_sizes'] = self.get_queue_sizes()
         metrics['buffer_sizes'] = self.get_buffer_sizes()
+        with self._retry_lock:
+            metrics['delayed_retries'] = len(self._delayed)
+        if self.config.enable_deduplication:
+            metrics['deduplication'] = self._deduplicator.get_metrics()
+        
+        # Bulk sink throughput
+        if self._sink is not None:
+            metrics['sink'] = self._sink.get_metrics()
+            metrics['rows_per_second'] = metrics['sink']['rows_per_second']
+        else:
+            metrics['rows_per_second'] = (
+                metrics['total_records_processed'] / metrics['processing_time']
+                if metrics['processing_time'] > 0 else 0.0
+            )
         
         return metrics
     
@@ -675,6 +739,7 @@ class TokenUsageBatchProcessor:
         
         # Signal stop
         self._stop_event.set()
+        self._redrive_wakeup.set()
         
         # Flush all buffers
         self.flush_all_buffers()
@@ -685,6 +750,10 @@ class TokenUsageBatchProcessor:
         # Shutdown executor
         self._executor.shutdown(wait=True)
         
+        # Unwritten batches stay in the spool for the next instance to adopt
+        if self._sink is not None and self._sink.spool is not None:
+            self._sink.spool.close()
+        
         logger.info("TokenUsageBatchProcessor shutdown complete")
     
     def __enter__(self):
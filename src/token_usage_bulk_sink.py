@@ -0,0 +1,386 @@
+"""
+Token Usage Bulk Sink
+
+This module provides a bulk writer that streams token_usage rows to PostgreSQL with
+COPY FROM STDIN over a pooled connection, together with a local write-ahead spool
+so that batches accepted for writing survive a database outage or process restart.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from simba.simba.database.postgres import PostgresDB
+from src.token_usage_logger import TokenUsageRecord
+
+logger = logging.getLogger(__name__)
+
+# Spool files are named <prefix><pid>_<instance id>.jsonl inside the data directory
+SPOOL_FILE_PREFIX = "token_usage_spool_"
+
+# Spool paths opened by live instances in this process
+_live_spools = set()
+_live_spools_lock = threading.Lock()
+
+COPY_COLUMNS = ("user_id", "session_id", "tokens_used", "api_endpoint", "priority_level", "timestamp")
+COPY_SQL = f"COPY token_usage ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT text)"
+
+
+def _copy_text(value: Any) -> str:
+    """Format a value for COPY text format."""
+    if value is None:
+        return r"\N"
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def encode_copy_row(record: TokenUsageRecord) -> str:
+    """Encode one record as a COPY text-format line."""
+    return "\t".join(_copy_text(getattr(record, column)) for column in COPY_COLUMNS) + "\n"
+
+
+class _CopyRowReader:
+    """File-like object that feeds encoded rows to copy_expert as they are read."""
+
+    def __init__(self, rows: Iterable[str]):
+        self._rows: Iterator[str] = iter(rows)
+        self._buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._rows).encode("utf-8")
+            except StopIteration:
+                break
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    readline = read
+
+
+def _record_to_json(record: TokenUsageRecord) -> Dict[str, Any]:
+    data = asdict(record)
+    data["timestamp"] = record.timestamp.isoformat() if record.timestamp else None
+    return data
+
+
+def _record_from_json(data: Dict[str, Any]) -> TokenUsageRecord:
+    data = dict(data)
+    if data.get("timestamp"):
+        data["timestamp"] = datetime.fromisoformat(data["timestamp"])
+    return TokenUsageRecord(**data)
+
+
+def default_spool_path(data_dir: str, instance_id: str) -> str:
+    """Spool file for one instance, keyed by process id and instance id."""
+    return os.path.join(data_dir, f"{SPOOL_FILE_PREFIX}{os.getpid()}_{instance_id}.jsonl")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def _is_orphaned(path: str) -> bool:
+    """Whether no live instance owns a spool file named by default_spool_path."""
+    name = os.path.basename(path)[len(SPOOL_FILE_PREFIX):-len(".jsonl")]
+    try:
+        pid = int(name.split("_", 1)[0])
+    except ValueError:
+        return False
+    if pid == os.getpid():
+        # A previous run may have had our pid (e.g. pid 1 in a container)
+        with _live_spools_lock:
+            return os.path.abspath(path) not in _live_spools
+    return not _pid_alive(pid)
+
+
+def _read_spool(path: str) -> Dict[str, List[TokenUsageRecord]]:
+    """Unacknowledged batches in a spool file."""
+    batches: Dict[str, List[TokenUsageRecord]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn final line from a crash mid-append
+                logger.warning(f"Skipping corrupt spool entry in {path}")
+                continue
+            if "ack" in entry:
+                batches.pop(entry["ack"], None)
+            else:
+                batches[entry["batch_id"]] = [_record_from_json(r) for r in entry["records"]]
+    return batches
+
+
+class TokenUsageSpool:
+    """
+    Append-only write-ahead spool of token usage batches.
+
+    Each batch is appended (and fsynced) before it is written to the database and
+    acknowledged once committed. Batches without an acknowledgement are returned by
+    pending() after a restart. The file is truncated whenever nothing is pending,
+    so a spool file must not be shared between instances; default_spool_path()
+    gives each instance its own, and adopt_orphans() takes over the files of
+    instances that died.
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        """
+        Initialize the spool.
+
+        Args:
+            path: Spool file location
+            fsync: Flush appends to disk before returning
+        """
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._pending: Dict[str, List[TokenUsageRecord]] = {}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with _live_spools_lock:
+            _live_spools.add(os.path.abspath(path))
+        self._load()
+
+    def _load(self):
+        """Read unacknowledged batches left by a previous run and compact the file."""
+        if not os.path.exists(self.path):
+            return
+        self._pending = _read_spool(self.path)
+        self._rewrite()
+        if self._pending:
+            logger.warning(f"Recovered {len(self._pending)} unwritten token usage batches from {self.path}")
+
+    def _rewrite(self):
+        """Rewrite the file with only the pending batches. Caller holds the lock or is __init__."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for batch_id, records in self._pending.items():
+                f.write(json.dumps({"batch_id": batch_id,
+                                    "records": [_record_to_json(r) for r in records]}) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _append(self, entry: Dict[str, Any]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def append(self, batch_id: str, records: List[TokenUsageRecord]):
+        """Persist a batch before it is written to the database."""
+        with self._lock:
+            if batch_id in self._pending:
+                return
+            self._append({"batch_id": batch_id, "records": [_record_to_json(r) for r in records]})
+            self._pending[batch_id] = records
+
+    def ack(self, batch_id: str):
+        """Mark a batch as committed."""
+        with self._lock:
+            if self._pending.pop(batch_id, None) is None:
+                return
+            if self._pending:
+                self._append({"ack": batch_id})
+            else:
+                # Nothing left to recover; start the file over
+                open(self.path, "w").close()
+
+    def replace(self, batch_id: str, records: List[TokenUsageRecord]):
+        """Swap a pending batch's rows for its uncommitted remainder."""
+        with self._lock:
+            if batch_id not in self._pending:
+                return
+            self._pending[batch_id] = records
+            # One atomic rewrite: a crash leaves either the old rows or the remainder
+            self._rewrite()
+
+    def adopt_orphans(self, directory: str) -> int:
+        """
+        Take over the spool files of dead instances in a directory.
+
+        Their pending batches are appended to this spool and the files removed.
+
+        Returns:
+            Number of batches adopted
+        """
+        if not os.path.isdir(directory):
+            return 0
+        adopted = 0
+        own_path = os.path.abspath(self.path)
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if (not name.startswith(SPOOL_FILE_PREFIX) or not name.endswith(".jsonl")
+                    or os.path.abspath(path) == own_path or not _is_orphaned(path)):
+                continue
+            # Claim the file first so two starting instances do not both adopt it
+            claimed = f"{path}.adopting.{os.getpid()}"
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            try:
+                batches = _read_spool(claimed)
+            except OSError as e:
+                logger.error(f"Could not read orphaned spool {path}: {e}")
+                continue
+            for batch_id, records in batches.items():
+                self.append(batch_id, records)
+            os.remove(claimed)
+            adopted += len(batches)
+            if batches:
+                logger.warning(f"Adopted {len(batches)} unwritten token usage batches from {path}")
+        return adopted
+
+    def close(self):
+        """Release the spool, removing its file when nothing is pending."""
+        with self._lock:
+            if not self._pending and os.path.exists(self.path):
+                os.remove(self.path)
+        with _live_spools_lock:
+            _live_spools.discard(os.path.abspath(self.path))
+
+    def pending(self) -> Dict[str, List[TokenUsageRecord]]:
+        """Batches appended but not yet acknowledged."""
+        with self._lock:
+            return dict(self._pending)
+
+    @property
+    def pending_rows(self) -> int:
+        with self._lock:
+            return sum(len(records) for records in self._pending.values())
+
+
+class TokenUsageCopySink:
+    """
+    Bulk writer for token_usage rows using COPY FROM STDIN.
+
+    Rows are streamed to the server as the COPY consumes them rather than built into
+    one payload. Batches are split into chunks of batch_size rows, one COPY and commit
+    per chunk, and batch_size adapts so a chunk takes about target_latency seconds.
+    """
+
+    def __init__(self, db: Optional[PostgresDB] = None, spool: Optional[TokenUsageSpool] = None,
+                 initial_batch_size: int = 1000, min_batch_size: int = 100,
+                 max_batch_size: int = 50000, target_latency: float = 0.25):
+        """
+        Initialize the sink.
+
+        Args:
+            db: Database providing pooled connections via get_connection()
+            spool: Write-ahead spool; batches are not durable before commit without one
+            initial_batch_size: Rows per COPY to start with
+            min_batch_size: Lower bound for the adaptive batch size
+            max_batch_size: Upper bound for the adaptive batch size
+            target_latency: Desired duration of one COPY in seconds
+        """
+        self.db = db or PostgresDB()
+        self.spool = spool
+        self.batch_size = initial_batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.target_latency = target_latency
+        self._lock = threading.Lock()
+        self.metrics = {
+            'rows_written': 0,
+            'copy_batches': 0,
+            'copy_failures': 0,
+            'copy_seconds': 0.0,
+            'last_rows_per_second': 0.0,
+        }
+
+    def _copy(self, records: List[TokenUsageRecord]):
+        with self.db.get_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.copy_expert(COPY_SQL, _CopyRowReader(encode_copy_row(r) for r in records))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def _adapt(self, rows: int, seconds: float):
+        """Move batch_size towards the row count that takes target_latency."""
+        if rows == 0 or seconds <= 0:
+            return
+        ideal = self.target_latency * rows / seconds
+        smoothed = 0.7 * self.batch_size + 0.3 * ideal
+        self.batch_size = int(min(self.max_batch_size, max(self.min_batch_size, smoothed)))
+
+    def write_batch(self, batch_id: str, records: List[TokenUsageRecord]) -> int:
+        """
+        Write a batch of records.
+
+        The batch is spooled first; on success it is acknowledged, on failure its
+        uncommitted rows stay in the spool for a later retry or replay after restart.
+
+        Args:
+            batch_id: Identifier used to acknowledge the batch in the spool
+            records: Records to write
+
+        Returns:
+            Number of leading records committed; len(records) on full success
+        """
+        if not records:
+            return 0
+        if self.spool is not None:
+            self.spool.append(batch_id, records)
+
+        offset = 0
+        try:
+            while offset < len(records):
+                chunk = records[offset:offset + self.batch_size]
+                start = time.perf_counter()
+                self._copy(chunk)
+                elapsed = time.perf_counter() - start
+                offset += len(chunk)
+                with self._lock:
+                    self.metrics['rows_written'] += len(chunk)
+                    self.metrics['copy_batches'] += 1
+                    self.metrics['copy_seconds'] += elapsed
+                    self.metrics['last_rows_per_second'] = len(chunk) / elapsed if elapsed > 0 else 0.0
+                    self._adapt(len(chunk), elapsed)
+        except Exception as e:
+            with self._lock:
+                self.metrics['copy_failures'] += 1
+                self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            logger.error(f"COPY of token usage batch {batch_id} failed after {offset} rows: {e}")
+            if offset and self.spool is not None:
+                # Keep only the uncommitted tail spooled
+                self.spool.replace(batch_id, records[offset:])
+            return offset
+
+        if self.spool is not None:
+            self.spool.ack(batch_id)
+        return offset
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get throughput metrics for the sink."""
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics['batch_size'] = self.batch_size
+        metrics['rows_per_second'] = (
+            metrics['rows_written'] / metrics['copy_seconds'] if metrics['copy_seconds'] > 0 else 0.0
+        )
+        metrics['spooled_rows'] = self.spool.pending_rows if self.spool is not None else 0
+        return metrics
@@ -0,0 +1,196 @@
+"""
+Token Usage Request Deduplication
+
+This module provides time-windowed deduplication of token usage records by
+request_id in fixed memory. A rotating Bloom filter remembers every request_id
+seen in the window, and a bounded exact LRU of recent request_ids answers the
+common case (client retries within seconds) without relying on the filter.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from src.token_management.cache import LRUCache
+
+
+class RotatingBloomFilter:
+    """
+    Bloom filter made of generations that are retired as time passes.
+
+    Items are added to the newest generation and looked up in all of them.
+    Every window / (generations - 1) seconds the oldest generation is dropped
+    and an empty one started, so an item is remembered for at least window
+    seconds and memory never grows.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 1e-4, window_seconds: float = 3600.0,
+                 generations: int = 3, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the filter.
+
+        Args:
+            capacity: Expected number of items added per rotation interval
+            error_rate: Target false positive rate of one generation at capacity
+            window_seconds: Minimum time an item is remembered
+            generations: Number of generations kept (at least 2)
+            clock: Monotonic time source in seconds
+        """
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        if generations < 2:
+            raise ValueError("generations must be at least 2")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.window_seconds = window_seconds
+        self.generations = generations
+        self.rotation_interval = window_seconds / (generations - 1)
+        self._clock = clock
+
+        # Optimal size and hash count for capacity items at error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+
+        self._filters: List[bytearray] = [self._new_filter() for _ in range(generations)]
+        self._counts: List[int] = [0] * generations
+        self._rotated_at = self._clock()
+        self.rotations = 0
+
+    def _new_filter(self) -> bytearray:
+        return bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str) -> List[int]:
+        """Bit positions for an item using double hashing over one digest."""
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def _rotate(self):
+        """Retire generations older than the window. Not thread-safe; callers serialize."""
+        elapsed = self._clock() - self._rotated_at
+        if elapsed < self.rotation_interval:
+            return
+        steps = int(elapsed // self.rotation_interval)
+        for _ in range(min(steps, self.generations)):
+            self._filters.pop(0)
+            self._counts.pop(0)
+            self._filters.append(self._new_filter())
+            self._counts.append(0)
+        self._rotated_at += steps * self.rotation_interval
+        self.rotations += steps
+
+    def __contains__(self, item: str) -> bool:
+        self._rotate()
+        positions = self._positions(item)
+        return any(all(bits[p >> 3] & (1 << (p & 7)) for p in positions) for bits in self._filters)
+
+    def add(self, item: str):
+        """Add an item to the newest generation."""
+        self._rotate()
+        bits = self._filters[-1]
+        for p in self._positions(item):
+            bits[p >> 3] |= 1 << (p & 7)
+        self._counts[-1] += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get size and saturation of the filter."""
+        return {
+            'num_bits': self.num_bits,
+            'num_hashes': self.num_hashes,
+            'memory_bytes': len(self._filters[0]) * self.generations,
+            'generation_counts': list(self._counts),
+            'saturated': self._counts[-1] > self.capacity,
+            'rotations': self.rotations,
+        }
+
+
+class RequestDeduplicator:
+    """
+    Time-windowed request_id deduplicator with fixed memory.
+
+    A request_id is a duplicate if it is in the exact LRU of recent ids or, once
+    it has aged out of the LRU, if the Bloom filter has seen it in the window.
+    The latter can misreport a new id as a duplicate with a probability of about
+    error_rate per generation; set trust_bloom=False to only drop exact matches.
+    """
+
+    def __init__(self, window_seconds: float = 3600.0, expected_requests: int = 500000,
+                 error_rate: float = 1e-4, exact_entries: int = 100000,
+                 trust_bloom: bool = True, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the deduplicator.
+
+        Args:
+            window_seconds: How long a request_id is remembered
+            expected_requests: Expected distinct request_ids per half window
+            error_rate: Target false positive rate of the Bloom filter
+            exact_entries: Size of the exact LRU of recent request_ids
+            trust_bloom: Treat Bloom-only matches as duplicates
+            clock: Monotonic time source in seconds
+        """
+        self.window_seconds = window_seconds
+        self.trust_bloom = trust_bloom
+        self._bloom = RotatingBloomFilter(expected_requests, error_rate, window_seconds, clock=clock)
+        self._recent = LRUCache(max_entries=exact_entries, ttl=window_seconds, clock=clock)
+        self._lock = threading.Lock()
+        self.metrics = {
+            'checks': 0,
+            'duplicates': 0,
+            'exact_hits': 0,
+            'bloom_hits': 0,
+        }
+
+    def check_and_add(self, request_id: Optional[str]) -> bool:
+        """
+        Record a request_id and report whether it was already seen.
+
+        Args:
+            request_id: Request identifier; None is never a duplicate
+
+        Returns:
+            True if the request_id is a duplicate within the window
+        """
+        if request_id is None:
+            return False
+        with self._lock:
+            self.metrics['checks'] += 1
+            if self._recent.get(request_id) is not None:
+                self.metrics['exact_hits'] += 1
+                self.metrics['duplicates'] += 1
+                return True
+            if request_id in self._bloom:
+                self.metrics['bloom_hits'] += 1
+                if self.trust_bloom:
+                    self.metrics['duplicates'] += 1
+                    return True
+            self._recent.set(request_id, True)
+            self._bloom.add(request_id)
+            return False
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get dedup counters and memory use of both stages."""
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics['bloom'] = self._bloom.get_metrics()
+        metrics['exact'] = self._recent.get_metrics()
+        return metrics
+
+
+# Shared by TokenUsageLogger and TokenUsageBatchProcessor
+_request_deduplicator: Optional[RequestDeduplicator] = None
+_request_deduplicator_lock = threading.Lock()
+
+
+def get_request_deduplicator() -> RequestDeduplicator:
+    """Get the process-wide request deduplicator."""
+    global _request_deduplicator
+    with _request_deduplicator_lock:
+        if _request_deduplicator is None:
+            _request_deduplicator = RequestDeduplicator()
+        return _request_deduplicator
@@ -21,6 +21,8 @@ import uuid
 from simba.simba.database.postgres import PostgresDB
 from simba.simba.database.token_models import TokenUsage
 from src.token_management.token_counter import TokenCounter, TokenizationModel
+from src.token_usage_dedup import RequestDeduplicator, get_request_deduplicator
+from src.token_usage_anomaly import OnlineAnomalyDetector, get_anomaly_detector
 
 logger = logging.getLogger(__name__)
 
@@ -75,6 +77,8 @@ class LoggingConfig:
     retention_days: int = 90
     enable_compression: bool = True
     performance_monitoring: bool = True
+    enable_deduplication: bool = True
+    enable_anomaly_detection: bool = True  # feed logged records to the online detector
 
 
 class TokenUsageLogger:
@@ -85,17 +89,23 @@ class TokenUsageLogger:
     with fallback mechanisms and performance monitoring.
     """
     
-    def __init__(self, db: Optional[PostgresDB] = None, config: Optional[LoggingConfig] = None):
+    def __init__(self, db: Optional[PostgresDB] = None, config: Optional[LoggingConfig] = None,
+                 deduplicator: Optional[RequestDeduplicator] = None,
+                 anomaly_detector: Optional[OnlineAnomalyDetector] = None):
         """
         Initialize the token usage logger.
         
         Args:
             db: Database instance for logging
             config: Logging configuration
+            deduplicator: request_id deduplicator (defaults to the one shared with the batch processor)
+            anomaly_detector: Online usage anomaly detector (defaults to the one shared with monitoring)
         """
         self.db = db or PostgresDB()
         self.config = config or LoggingConfig()
         self.token_counter = TokenCounter(self.db)
+        self._deduplicator = deduplicator or get_request_deduplicator()
+        self._anomaly_detector = anomaly_detector or get_anomaly_detector()
         
         # Threading and queue for async logging
         self._queue = queue.Queue(maxsize=self.config.max_queue_size)
@@ -112,6 +122,7 @@ class TokenUsageLogger:
             'batch_logs': 0,
             'async_logs': 0,
             'fallback_logs': 0,
+            'duplicate_logs': 0,
             'processing_time': 0.0,
             'last_error': None,
             'error_timestamp': None
@@ -318,10 +329,14 @@ class TokenUsageLogger:
     def log_token_usage(self, user_id: str, session_id: str, tokens_used: int,
                        api_endpoint: str, priority_level: str = "Medium",
                        strategy: Optional[LoggingStrategy] = None,
-                       metadata: Optional[Dict[str, Any]] = None) -> bool:
+                       metadata: Optional[Dict[str, Any]] = None,
+                       request_id: Optional[str] = None) -> bool:
         """
         Log token usage for a specific request.
         
+        A request_id already logged within the deduplication window is skipped,
+        so client retries are not counted twice.
+        
         Args:
             user_id: The user identifier
             session_id: The session identifier
@@ -330,9 +345,10 @@ class TokenUsageLogger:
             priority_level: Priority level ('Low', 'Medium', 'High')
             strategy: Logging strategy to use (overrides config)
             metadata: Additional metadata for the log entry
+            request_id: Client-supplied request identifier (generated if None)
             
         Returns:
-            True if successful, False otherwise
+            True if successful or a duplicate, False otherwise
         """
         start_time = time.time()
         
@@ -354,6 +370,7 @@ class TokenUsageLogger:
                 tokens_used=tokens_used,
                 api_endpoint=api_endpoint,
                 priority_level=priority_level,
+                request_id=request_id,
                 metadata=metadata or {}
             )
             
@@ -361,6 +378,12 @@ class TokenUsageLogger:
             if record.timestamp is None:
                 record.timestamp = datetime.utcnow()
             
+            if self._is_duplicate(record):
+                logger.debug(f"Duplicate request {record.request_id}, not logging")
+                return True
+            
+            self._observe_usage(record)
+            
             # Determine logging strategy
             strategy = strategy or self.config.strategy
             
@@ -394,6 +417,21 @@ class TokenUsageLogger:
                 self.metrics['error_timestamp'] = datetime.utcnow().isoformat()
             return False
     
+    def _is_duplicate(self, record: TokenUsageRecord) -> bool:
+        """Check if a record's request_id was already logged, remembering it otherwise."""
+        if not self.config.enable_deduplication:
+            return False
+        is_duplicate = self._deduplicator.check_and_add(record.request_id)
+        if is_duplicate:
+            with self._lock:
+                self.metrics['duplicate_logs'] += 1
+        return is_duplicate
+    
+    def _observe_usage(self, record: TokenUsageRecord):
+        """Score a logged record for anomalies and add it to the user's running statistics."""
+        if self.config.enable_anomaly_detection:
+            self._anomaly_detector.observe(record.user_id, record.tokens_used, record.timestamp)
+    
     def _log_real_time(self, record: TokenUsageRecord) -> bool:
         """Log token usage in real-time."""
         if not self.db:
@@ -484,9 +522,16 @@ class TokenUsageLogger:
             'total_records': len(records),
             'successful': 0,
             'failed': 0,
+            'duplicates': 0,
             'errors': []
         }
         
+        unique_records = [record for record in records if not self._is_duplicate(record)]
+        results['duplicates'] = len(records) - len(unique_records)
+        records = unique_records
+        for record in records:
+            self._observe_usage(record)
+        
         try:
             # Process records based on strategy
             if self.config.strategy == LoggingStrategy.REAL_TIME:
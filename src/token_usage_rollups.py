@@ -0,0 +1,417 @@
+"""
+Token Usage Rollups
+
+This module maintains minute, hour and day rollup tables of token_usage and
+serves totals and time series from them. A background refresh recomputes the
+most recent buckets from the raw table (minutes) or the next finer rollup
+(hours, days) and advances a per-granularity watermark; reads use the coarsest
+rollup that covers each part of the requested range and query the raw table
+only for the unfinished tail after the minute watermark.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from simba.simba.database.postgres import PostgresDB
+from src.token_usage_aggregation import ColumnarResult, DATE_TRUNC_UNITS, DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Finest first; each level is rolled up from the previous one
+ROLLUP_GRANULARITIES = ("minute", "hour", "day")
+
+_UNIT_STEPS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+ROLLUP_DIMENSIONS = ("user_id", "api_endpoint", "priority_level")
+
+# token_usage.timestamp is TIMESTAMPTZ while buckets, watermarks and the
+# datetimes passed in are naive UTC. Converting explicitly keeps bucket
+# boundaries independent of the session TimeZone.
+RAW_TIME_UTC = "(timestamp AT TIME ZONE 'UTC')"
+UTC_PARAM = "(%s::timestamp AT TIME ZONE 'UTC')"
+
+# Key columns have the types of the token_usage columns they are copied from
+ROLLUP_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS token_usage_rollup_{granularity} (
+        bucket TIMESTAMP NOT NULL,
+        user_id TEXT NOT NULL,
+        api_endpoint TEXT NOT NULL,
+        priority_level TEXT NOT NULL,
+        tokens_used BIGINT NOT NULL,
+        requests BIGINT NOT NULL,
+        max_tokens INTEGER NOT NULL,
+        PRIMARY KEY (bucket, user_id, api_endpoint, priority_level)
+    )
+"""
+
+# Widens key columns of rollup tables created before they were TEXT
+ROLLUP_TEXT_KEYS_DDL = """
+    ALTER TABLE token_usage_rollup_{granularity}
+        ALTER COLUMN user_id TYPE TEXT,
+        ALTER COLUMN api_endpoint TYPE TEXT,
+        ALTER COLUMN priority_level TYPE TEXT
+"""
+
+ROLLUP_STATE_DDL = """
+    CREATE TABLE IF NOT EXISTS token_usage_rollup_state (
+        granularity VARCHAR(10) PRIMARY KEY,
+        watermark TIMESTAMP NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def floor_time(value: datetime, unit: str) -> datetime:
+    """Truncate a datetime to the start of its minute, hour or day."""
+    if unit == "minute":
+        return value.replace(second=0, microsecond=0)
+    if unit == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    if unit == "day":
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown rollup granularity: {unit}")
+
+
+def ceil_time(value: datetime, unit: str) -> datetime:
+    """Round a datetime up to the next minute, hour or day boundary."""
+    floored = floor_time(value, unit)
+    if floored == value or value > datetime.max - _UNIT_STEPS[unit]:
+        return floored
+    return floored + _UNIT_STEPS[unit]
+
+
+class TokenUsageRollups:
+    """
+    Incrementally maintained rollups of token_usage.
+
+    Each refresh recomputes buckets from (watermark - lateness) up to
+    (now - lateness) and replaces them in one transaction, so refreshes are
+    idempotent and rows arriving up to about twice the lateness after their
+    timestamp are still counted.
+    """
+
+    def __init__(self, db: Optional[PostgresDB] = None, lateness: timedelta = timedelta(minutes=5),
+                 backfill_chunk: timedelta = timedelta(days=1)):
+        """
+        Initialize the rollups.
+
+        Args:
+            db: Database instance
+            lateness: How far behind now the minute watermark stays, and how far
+                back each refresh recomputes
+            backfill_chunk: Largest span of raw rows rolled up in one transaction
+        """
+        self.db = db or PostgresDB()
+        self.lateness = lateness
+        self.backfill_chunk = backfill_chunk
+        self._schema_ready = False
+        self._refresh_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.metrics = {
+            'refreshes': 0,
+            'refresh_failures': 0,
+            'refresh_seconds': 0.0,
+            'rollup_segments_read': 0,
+            'raw_segments_read': 0,
+        }
+
+    # Maintenance
+
+    def ensure_schema(self):
+        """Create the rollup and state tables if needed."""
+        if self._schema_ready:
+            return
+        for granularity in ROLLUP_GRANULARITIES:
+            self.db.execute_query(ROLLUP_TABLE_DDL.format(granularity=granularity))
+            self.db.execute_query(ROLLUP_TEXT_KEYS_DDL.format(granularity=granularity))
+        self.db.execute_query(ROLLUP_STATE_DDL)
+        self._schema_ready = True
+
+    def get_watermarks(self) -> Dict[str, datetime]:
+        """
+        Get the time up to which each rollup is complete.
+
+        Returns:
+            Mapping of granularity to watermark; empty if rollups are not set up
+        """
+        try:
+            rows = self.db.fetch_all("SELECT granularity, watermark FROM token_usage_rollup_state")
+            return {row['granularity']: row['watermark'] for row in rows}
+        except Exception as e:
+            logger.debug(f"Rollup state unavailable, reading raw usage: {e}")
+            return {}
+
+    def _first_raw_timestamp(self) -> Optional[datetime]:
+        row = self.db.fetch_one(f"SELECT MIN({RAW_TIME_UTC}) AS first_seen FROM token_usage")
+        return row['first_seen'] if row else None
+
+    def _first_minute_bucket(self) -> Optional[datetime]:
+        row = self.db.fetch_one("SELECT MIN(bucket) AS first_bucket FROM token_usage_rollup_minute")
+        return row['first_bucket'] if row else None
+
+    def _roll(self, cursor, granularity: str, start: datetime, end: datetime):
+        """Replace the buckets of one granularity in [start, end). Caller commits."""
+        table = f"token_usage_rollup_{granularity}"
+        cursor.execute(f"DELETE FROM {table} WHERE bucket >= %s AND bucket < %s", (start, end))
+        if granularity == "minute":
+            cursor.execute(f"""
+                INSERT INTO {table} (bucket, user_id, api_endpoint, priority_level, tokens_used, requests, max_tokens)
+                SELECT date_trunc('minute', {RAW_TIME_UTC}), user_id, api_endpoint, priority_level,
+                       SUM(tokens_used), COUNT(*), MAX(tokens_used)
+                FROM token_usage
+                WHERE timestamp >= {UTC_PARAM} AND timestamp < {UTC_PARAM}
+                GROUP BY 1, 2, 3, 4
+            """, (start, end))
+        else:
+            source = f"token_usage_rollup_{ROLLUP_GRANULARITIES[ROLLUP_GRANULARITIES.index(granularity) - 1]}"
+            cursor.execute(f"""
+                INSERT INTO {table} (bucket, user_id, api_endpoint, priority_level, tokens_used, requests, max_tokens)
+                SELECT date_trunc('{granularity}', bucket), user_id, api_endpoint, priority_level,
+                       SUM(tokens_used), SUM(requests), MAX(max_tokens)
+                FROM {source}
+                WHERE bucket >= %s AND bucket < %s
+                GROUP BY 1, 2, 3, 4
+            """, (start, end))
+        cursor.execute("""
+            INSERT INTO token_usage_rollup_state (granularity, watermark, updated_at)
+            VALUES (%s, %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (granularity) DO UPDATE
+            SET watermark = EXCLUDED.watermark, updated_at = EXCLUDED.updated_at
+        """, (granularity, end))
+
+    def refresh(self, now: Optional[datetime] = None) -> Dict[str, datetime]:
+        """
+        Bring all rollups up to date.
+
+        Args:
+            now: Current UTC time (defaults to datetime.utcnow())
+
+        Returns:
+            Watermarks after the refresh
+        """
+        now = now or datetime.utcnow()
+        started = time.perf_counter()
+        with self._refresh_lock:
+            try:
+                self.ensure_schema()
+                watermarks = self.get_watermarks()
+                # Levels without a watermark are built from the first minute on; fixed
+                # here because the minute level advances its watermark first
+                backfill_start = None
+                if "minute" not in watermarks:
+                    first_seen = self._first_raw_timestamp()
+                    if first_seen is None:
+                        return watermarks
+                    # Buckets before the first row are empty; the recheck below starts from here
+                    backfill_start = floor_time(first_seen, "minute")
+                    watermarks["minute"] = backfill_start + self.lateness
+                elif any(granularity not in watermarks for granularity in ROLLUP_GRANULARITIES):
+                    backfill_start = self._first_minute_bucket() or watermarks["minute"] - self.lateness
+
+                # Upper bound for each level: minutes lag now, coarser levels follow the finer watermark
+                target = floor_time(now - self.lateness, "minute")
+                with self.db.get_connection() as conn:
+                    try:
+                        with conn.cursor() as cursor:
+                            for granularity in ROLLUP_GRANULARITIES:
+                                if granularity in watermarks:
+                                    start = floor_time(watermarks[granularity] - self.lateness, granularity)
+                                else:
+                                    start = floor_time(backfill_start, granularity)
+                                end = target if granularity == "minute" else floor_time(watermarks["minute"],
+                                                                                        granularity)
+                                while start < end:
+                                    chunk_end = min(end, start + self.backfill_chunk)
+                                    self._roll(cursor, granularity, start, chunk_end)
+                                    conn.commit()
+                                    start = chunk_end
+                                    watermarks[granularity] = chunk_end
+                    except Exception:
+                        conn.rollback()
+                        raise
+                self.metrics['refreshes'] += 1
+                return watermarks
+            except Exception as e:
+                self.metrics['refresh_failures'] += 1
+                logger.error(f"Rollup refresh failed: {e}")
+                raise
+            finally:
+                self.metrics['refresh_seconds'] += time.perf_counter() - started
+
+    def start(self, interval: float = 60.0):
+        """Refresh the rollups on a background thread every interval seconds."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+
+        def refresh_loop():
+            while not self._stop_event.is_set():
+                try:
+                    self.refresh()
+                except Exception:
+                    pass  # Logged by refresh; retried on the next tick
+                self._stop_event.wait(interval)
+
+        self._thread = threading.Thread(target=refresh_loop, daemon=True)
+        self._thread.start()
+        logger.info(f"Token usage rollup refresh started (every {interval}s)")
+
+    def stop(self):
+        """Stop the background refresh."""
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5.0)
+
+    # Reads
+
+    def _plan(self, start: datetime, end: datetime, watermarks: Dict[str, datetime],
+              levels: Sequence[str]) -> List[Tuple[Optional[str], datetime, datetime]]:
+        """
+        Split [start, end) into segments read from rollups (coarsest first) or raw rows.
+
+        Returns:
+            List of (granularity or None for raw, segment start, segment end)
+        """
+        if start >= end:
+            return []
+        if not levels:
+            return [(None, start, end)]
+        unit, finer = levels[0], levels[1:]
+        watermark = watermarks.get(unit)
+        if watermark is None:
+            return self._plan(start, end, watermarks, finer)
+        inner_start = ceil_time(start, unit)
+        inner_end = min(floor_time(end, unit), watermark)
+        if inner_start >= inner_end:
+            return self._plan(start, end, watermarks, finer)
+        return (self._plan(start, inner_start, watermarks, finer)
+                + [(unit, inner_start, inner_end)]
+                + self._plan(inner_end, end, watermarks, finer))
+
+    @staticmethod
+    def _range_clause(column: str, start: datetime, end: datetime, user_id: Optional[str],
+                      placeholder: str = "%s") -> Tuple[str, List[Any]]:
+        clauses = []
+        params: List[Any] = []
+        if start > datetime.min:
+            clauses.append(f"{column} >= {placeholder}")
+            params.append(start)
+        if end < datetime.max:
+            clauses.append(f"{column} < {placeholder}")
+            params.append(end)
+        if user_id:
+            clauses.append("user_id = %s")
+            params.append(user_id)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _query_segments(self, segments, user_id: Optional[str], group_by: Sequence[str],
+                        unit: Optional[str]) -> ColumnarResult:
+        """Run one aggregate query per segment and merge the groups."""
+        keys = (["bucket"] if unit else []) + list(group_by)
+        merged: Dict[tuple, List[int]] = {}
+        for granularity, seg_start, seg_end in segments:
+            if granularity is None:
+                table, time_column, time_value = "token_usage", "timestamp", RAW_TIME_UTC
+                placeholder = UTC_PARAM
+                measures = "SUM(tokens_used) AS total_tokens, COUNT(*) AS total_requests, MAX(tokens_used) AS max_tokens"
+                self.metrics['raw_segments_read'] += 1
+            else:
+                table, time_column, time_value = f"token_usage_rollup_{granularity}", "bucket", "bucket"
+                placeholder = "%s"
+                measures = "SUM(tokens_used) AS total_tokens, SUM(requests) AS total_requests, MAX(max_tokens) AS max_tokens"
+                self.metrics['rollup_segments_read'] += 1
+
+            select = ([f"date_trunc(%s, {time_value}) AS bucket"] if unit else []) + list(group_by)
+            where, params = self._range_clause(time_column, seg_start, seg_end, user_id, placeholder)
+            query = f"SELECT {', '.join(select + [measures])} FROM {table}{where}"
+            if keys:
+                query += f" GROUP BY {', '.join(keys)}"
+            rows = self.db.fetch_all(query, ([unit] if unit else []) + params)
+
+            for row in rows:
+                if not row['total_requests']:
+                    continue
+                key = tuple(row[name] for name in keys)
+                tokens, requests, max_tokens = (int(row['total_tokens']), int(row['total_requests']),
+                                                int(row['max_tokens']))
+                totals = merged.get(key)
+                if totals is None:
+                    merged[key] = [tokens, requests, max_tokens]
+                else:
+                    totals[0] += tokens
+                    totals[1] += requests
+                    totals[2] = max(totals[2], max_tokens)
+
+        columns: Dict[str, List[Any]] = {name: [] for name in keys}
+        columns.update(total_tokens=[], total_requests=[], max_tokens=[])
+        for key in sorted(merged, key=lambda k: tuple("" if v is None else v for v in k)):
+            for name, value in zip(keys, key):
+                columns[name].append(value)
+            tokens, requests, max_tokens = merged[key]
+            columns['total_tokens'].append(tokens)
+            columns['total_requests'].append(requests)
+            columns['max_tokens'].append(max_tokens)
+        return ColumnarResult(columns)
+
+    @staticmethod
+    def _check_group_by(group_by: Sequence[str]):
+        for dimension in group_by:
+            if dimension not in ROLLUP_DIMENSIONS:
+                raise ValueError(f"Rollups cannot be grouped by {dimension}; use one of {ROLLUP_DIMENSIONS}")
+
+    def totals(self, user_id: Optional[str] = None, start_date: Optional[datetime] = None,
+               end_date: Optional[datetime] = None, group_by: Sequence[str] = ()) -> ColumnarResult:
+        """
+        Get token and request totals over a range.
+
+        Args:
+            user_id: Filter by specific user (optional)
+            start_date: Start of the range, inclusive (optional)
+            end_date: End of the range, exclusive (optional)
+            group_by: Dimensions to group on (user_id, api_endpoint, priority_level)
+
+        Returns:
+            ColumnarResult with the group_by columns, total_tokens, total_requests and max_tokens
+        """
+        self._check_group_by(group_by)
+        segments = self._plan(start_date or datetime.min, end_date or datetime.max,
+                              self.get_watermarks(), ROLLUP_GRANULARITIES[::-1])
+        return self._query_segments(segments, user_id, group_by, None)
+
+    def series(self, unit: str, user_id: Optional[str] = None, start_date: Optional[datetime] = None,
+               end_date: Optional[datetime] = None, group_by: Sequence[str] = ()) -> ColumnarResult:
+        """
+        Get token and request totals per time bucket.
+
+        Args:
+            unit: date_trunc unit of the buckets ('minute' to 'year')
+            user_id: Filter by specific user (optional)
+            start_date: Start of the range, inclusive (optional)
+            end_date: End of the range, exclusive (optional)
+            group_by: Dimensions to group on within each bucket
+
+        Returns:
+            ColumnarResult with bucket, the group_by columns, total_tokens,
+            total_requests and max_tokens, ordered by bucket
+        """
+        if unit not in DATE_TRUNC_UNITS:
+            raise ValueError(f"Unknown time bucket unit: {unit}")
+        self._check_group_by(group_by)
+        # Only rollups at least as fine as the requested buckets can be re-bucketed
+        levels = [g for g in ROLLUP_GRANULARITIES[::-1]
+                  if DATE_TRUNC_UNITS.index(g) <= DATE_TRUNC_UNITS.index(unit)]
+        segments = self._plan(start_date or datetime.min, end_date or datetime.max,
+                              self.get_watermarks(), levels)
+        return self._query_segments(segments, user_id, group_by, unit)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get refresh and read counters."""
+        return dict(self.metrics)
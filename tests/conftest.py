@@ -121,7 +121,7 @@ def mock_db():
 @pytest.fixture
 def token_counter(mock_db):
     """Fixture providing a TokenCounter instance with mock database."""
-    return TokenCounter(mock_db)
+    return TokenCounter(mock_db, tokenizer=None)
 
 @pytest.fixture
 def rate_limiter(mock_db):
@@ -0,0 +1,139 @@
+"""
+Test Suite for the PNG to Markdown Converter
+
+Covers building the converter from a configuration, converting generated
+pages on thread and process worker pools, streaming manifests and output writes.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from PIL import Image, ImageDraw
+
+from core.converter import PNGToMarkdownConverter
+from errors.exceptions import FileOperationError
+
+
+TESSERACT_AVAILABLE = shutil.which('tesseract') is not None
+
+
+def make_page(path: str, lines):
+    """Write a white PNG page with black text lines."""
+    image = Image.new('RGB', (800, 60 + 40 * len(lines)), color='white')
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((40, 30 + 40 * i), line, fill='black')
+    image.save(path)
+
+
+class TestPNGToMarkdownConverter(unittest.TestCase):
+    """Test cases for PNGToMarkdownConverter."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+        self.output_dir = os.path.join(self.temp_dir, 'output')
+        os.makedirs(self.output_dir)
+        self.config = {
+            'tesseract': {'psm': 6},
+            'preprocessing': {'max_size': 2000},
+            'validation': {'min_file_size': 0},
+            'cache': {'enabled': False},
+            'output': {'include_backup': False}
+        }
+        self.files = []
+        for i in range(4):
+            path = os.path.join(self.temp_dir, f'page_{i}.png')
+            make_page(path, [f'Page {i}', 'The quick brown fox jumps over the lazy dog'])
+            self.files.append(path)
+
+    def test_components_read_full_configuration(self):
+        """Test each component is built from its section of the configuration."""
+        converter = PNGToMarkdownConverter(self.config)
+
+        self.assertEqual(converter.ocr_processor.psm, 6)
+        self.assertEqual(converter.preprocessor.max_size, 2000)
+        self.assertEqual(converter.validator.default_validation_config['min_file_size'], 0)
+        self.assertIsNone(converter.result_cache)
+
+    def _convert(self, execution_mode):
+        converter = PNGToMarkdownConverter(self.config)
+        results = dict(converter.iter_convert_files(self.files, self.output_dir,
+                                                    execution_mode=execution_mode, max_workers=2))
+
+        self.assertEqual(sorted(results), sorted(self.files))
+        for file_path, result in results.items():
+            self.assertIsNone(result['error'], file_path)
+            self.assertTrue(result['success'], file_path)
+            self.assertTrue(os.path.exists(result['output_path']))
+        self.assertEqual(converter.statistics['successful_files'], len(self.files))
+
+    def _convert_streaming(self, converter):
+        return converter.convert_directory(self.temp_dir, self.output_dir, streaming=True,
+                                           execution_mode='thread', max_workers=2)
+
+    def test_streaming_manifest_replaced_each_run(self):
+        """Test a streaming run's manifest holds one record per file of that run only."""
+        converter = PNGToMarkdownConverter(self.config)
+
+        with patch.object(converter, 'convert_file', return_value=True):
+            self._convert_streaming(converter)
+            result = self._convert_streaming(converter)
+
+        with open(result['manifest_path'], encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(sorted(record['input_path'] for record in records), sorted(self.files))
+        self.assertTrue(all(record['success'] for record in records))
+        self.assertEqual(result['summary']['total_files'], len(self.files))
+
+    def test_streaming_summary_caps_failed_files(self):
+        """Test the summary lists a bounded number of failures and counts the rest."""
+        converter = PNGToMarkdownConverter(self.config)
+
+        with patch.object(converter, 'convert_file', return_value=False), \
+                patch('core.converter.MAX_SUMMARY_FAILURES', 1):
+            result = self._convert_streaming(converter)
+
+        summary = result['summary']
+        self.assertEqual(summary['successful_files'], 0)
+        self.assertEqual(len(summary['failed_files']), 1)
+        self.assertEqual(summary['failed_files_omitted'], len(self.files) - 1)
+        # The manifest has every failure
+        with open(result['manifest_path'], encoding='utf-8') as f:
+            self.assertEqual(sum(1 for _ in f), len(self.files))
+
+    def test_failed_write_keeps_previous_output(self):
+        """Test a write failing part-way leaves the previous output and no temporary file."""
+        converter = PNGToMarkdownConverter(self.config)
+        output_path = os.path.join(self.output_dir, 'page.md')
+        converter._write_output_file(output_path, '# Previous\n')
+
+        def chunks():
+            yield '# New\n'
+            raise OSError("disk full")
+
+        with self.assertRaises(FileOperationError):
+            converter._write_output_file(output_path, chunks())
+
+        with open(output_path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), '# Previous\n')
+        self.assertEqual(os.listdir(self.output_dir), ['page.md'])
+
+    @unittest.skipUnless(TESSERACT_AVAILABLE, "Tesseract is not installed")
+    def test_iter_convert_files_thread_mode(self):
+        """Test converting generated pages on a thread pool."""
+        self._convert('thread')
+
+    @unittest.skipUnless(TESSERACT_AVAILABLE, "Tesseract is not installed")
+    def test_iter_convert_files_process_mode(self):
+        """Test converting generated pages on a process pool with worker-resident converters."""
+        self._convert('process')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@ Comprehensive Test Suite for Rate Limiter
 This module contains unit tests for the rate limiting and dynamic token allocation system.
 """
 
+import asyncio
 import unittest
 import time
 import threading
@@ -23,7 +24,8 @@ from token_management.allocation_strategies import (
     PriorityBasedAllocation, DynamicPriorityAllocation, EmergencyOverrideAllocation,
     BurstTokenAllocation, AllocationStrategyFactory, AllocationStrategy
 )
-from token_management.lock_manager import LockManager, LockType, LockTimeoutError
+from token_management.lock_manager import AsyncLockManager, LockManager, LockType, LockTimeoutError
+from token_management.sliding_window import SlidingWindowRateLimiter
 from simba.simba.database.postgres import PostgresDB
 
 
@@ -251,9 +253,19 @@ class TestLockManager(unittest.TestCase):
         # Acquire lock
         lock_id = self.lock_manager.acquire_lock(LockType.TOKEN_ALLOCATION, "test_resource")
         
-        # Try to acquire same lock with timeout
-        with self.assertRaises(LockTimeoutError):
-            self.lock_manager.acquire_lock(LockType.TOKEN_ALLOCATION, "test_resource", timeout=0.5)
+        # Try to acquire same lock with timeout from another thread
+        errors = []
+        
+        def contend():
+            try:
+                self.lock_manager.acquire_lock(LockType.TOKEN_ALLOCATION, "test_resource", timeout=0.5)
+            except LockTimeoutError as e:
+                errors.append(e)
+        
+        thread = threading.Thread(target=contend)
+        thread.start()
+        thread.join()
+        self.assertEqual(len(errors), 1)
         
         # Release lock
         self.lock_manager.release_lock(lock_id)
@@ -287,6 +299,85 @@ class TestLockManager(unittest.TestCase):
         self.assertFalse(self.lock_manager.is_locked(LockType.TOKEN_ALLOCATION, "test_resource"))
 
 
+    def test_waiter_woken_on_release(self):
+        """Test that a blocked waiter acquires as soon as the holder releases."""
+        lock_id = self.lock_manager.acquire_lock(LockType.TOKEN_ALLOCATION, "test_resource")
+        waited = []
+        
+        def waiter():
+            start = time.monotonic()
+            with self.lock_manager.lock(LockType.TOKEN_ALLOCATION, "test_resource", timeout=5.0):
+                waited.append(time.monotonic() - start)
+        
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(0.05)
+        self.lock_manager.release_lock(lock_id)
+        thread.join()
+        
+        self.assertEqual(len(waited), 1)
+        self.assertLess(waited[0], 1.0)
+        stats = self.lock_manager.get_lock_stats()[LockType.TOKEN_ALLOCATION.value]
+        self.assertEqual(stats['acquisitions'], 2)
+        self.assertEqual(stats['contended'], 1)
+    
+    def test_async_lock_manager(self):
+        """Test mutual exclusion and re-entrancy of the asyncio lock manager."""
+        manager = AsyncLockManager(default_timeout=1.0)
+        active = []
+        
+        async def job():
+            async with manager.lock(LockType.USAGE_UPDATE, "user") as lock_id:
+                async with manager.lock(LockType.USAGE_UPDATE, "user") as inner_id:
+                    self.assertEqual(lock_id, inner_id)
+                active.append(lock_id)
+                self.assertEqual(len(active), 1)
+                await asyncio.sleep(0.01)
+                active.remove(lock_id)
+        
+        async def run():
+            await asyncio.gather(*(job() for _ in range(5)))
+        
+        asyncio.run(run())
+        self.assertFalse(manager.is_locked(LockType.USAGE_UPDATE, "user"))
+        stats = manager.get_lock_stats()[LockType.USAGE_UPDATE.value]
+        self.assertEqual(stats['acquisitions'], 5)
+        self.assertEqual(stats['contended'], 4)
+    
+    def test_async_lock_manager_shares_stats(self):
+        """Test that an async manager built on a LockManager's stats records into them."""
+        manager = AsyncLockManager(stats=self.lock_manager._stats)
+        
+        async def run():
+            async with manager.lock(LockType.RATE_LIMIT_CHECK, "user"):
+                pass
+        
+        with self.lock_manager.lock(LockType.RATE_LIMIT_CHECK, "user"):
+            pass
+        asyncio.run(run())
+        
+        stats = self.lock_manager.get_lock_stats()[LockType.RATE_LIMIT_CHECK.value]
+        self.assertEqual(stats['acquisitions'], 2)
+        self.assertEqual(sum(stats['wait_histogram_ms'].values()), 2)
+    
+    def test_lock_stats_concurrent_stripes(self):
+        """Test that acquisitions on different stripes are all counted."""
+        def worker(number):
+            for i in range(200):
+                with self.lock_manager.lock(LockType.USAGE_UPDATE, f"resource_{number}_{i}"):
+                    pass
+        
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        stats = self.lock_manager.get_lock_stats()[LockType.USAGE_UPDATE.value]
+        self.assertEqual(stats['acquisitions'], 1600)
+        self.assertEqual(sum(stats['wait_histogram_ms'].values()), 1600)
+
+
 class TestRateLimiter(unittest.TestCase):
     """Test cases for RateLimiter."""
     
@@ -422,6 +513,47 @@ class TestRateLimiter(unittest.TestCase):
             self.assertTrue(result.allowed if hasattr(result, 'allowed') else result != "denied")
 
 
+class TestSlidingWindowRateLimiter(unittest.TestCase):
+    """Test cases for the sliding-window engine."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.engine = SlidingWindowRateLimiter(num_buckets=10)
+    
+    def test_allows_until_limit(self):
+        """Test requests are allowed up to the limit and then denied."""
+        results = [self.engine.try_acquire("key", 5, 10, now=t) for t in range(6)]
+        
+        self.assertEqual([r.allowed for r in results], [True] * 5 + [False])
+        self.assertEqual(results[4].remaining, 0)
+        self.assertEqual(results[5].used, 5)
+    
+    def test_window_slides(self):
+        """Test old buckets expire and free capacity."""
+        for t in range(5):
+            self.engine.try_acquire("key", 5, 10, now=t)
+        
+        denied = self.engine.try_acquire("key", 5, 10, now=5)
+        self.assertFalse(denied.allowed)
+        self.assertAlmostEqual(denied.retry_after, 5.0)
+        
+        # The request at t=0 has left the window by t=10
+        self.assertTrue(self.engine.try_acquire("key", 5, 10, now=10.5).allowed)
+    
+    def test_request_weight(self):
+        """Test weighted requests consume more capacity."""
+        self.assertTrue(self.engine.try_acquire("key", 10, 60, weight=7, now=0).allowed)
+        self.assertFalse(self.engine.try_acquire("key", 10, 60, weight=4, now=1).allowed)
+        self.assertEqual(self.engine.usage("key", now=1), 7)
+    
+    def test_prune_idle_keys(self):
+        """Test idle keys are dropped after a full window."""
+        self.engine.try_acquire("key", 5, 10, now=0)
+        self.assertEqual(self.engine.prune(now=5), 0)
+        self.assertEqual(self.engine.prune(now=20), 1)
+        self.assertEqual(len(self.engine), 0)
+
+
 class TestAllocationStrategyFactory(unittest.TestCase):
     """Test cases for AllocationStrategyFactory."""
     
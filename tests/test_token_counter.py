@@ -10,7 +10,11 @@ This test suite covers all functionality of the token counting module including:
 - Error handling
 """
 
+import asyncio
+import base64
 import pytest
+import re
+import tempfile
 import unittest
 from unittest.mock import Mock, patch, MagicMock
 import time
@@ -28,9 +32,17 @@ from src.token_management.token_counter import (
 from src.token_management.decorators import (
     token_counter_decorator, track_token_usage, batch_token_counter
 )
+from src.token_management.cache import LRUCache
+from src.token_management.tokenizer_engine import (
+    TIKTOKEN_AVAILABLE, PythonBPEBackend, TiktokenBackend, TokenizerUnavailableError,
+    create_tokenizer_backend
+)
 from src.token_management.middleware import (
-    TokenCountingMiddleware, TokenQuotaMiddleware, APITokenUsage, create_token_middleware
+    TokenCountingMiddleware, TokenQuotaMiddleware, APITokenUsage, create_token_middleware,
+    StreamingTokenTally, TokenUsageLogQueue
 )
+from src.token_management.lock_manager import AsyncLockManager
+from src.token_management.rate_limiter import RateLimitExceededError
 
 
 class TestTokenCounter(unittest.TestCase):
@@ -41,7 +53,7 @@ class TestTokenCounter(unittest.TestCase):
         self.mock_db = Mock()
         self.mock_db.is_tiktoken_available.return_value = True
         self.mock_db.get_token_count.return_value = 10
-        self.token_counter = TokenCounter(self.mock_db)
+        self.token_counter = TokenCounter(self.mock_db, tokenizer=None)
     
     def test_init(self):
         """Test TokenCounter initialization."""
@@ -217,7 +229,7 @@ class TestTokenCounterIntegration(unittest.TestCase):
         # Mock the database to avoid actual database calls in tests
         self.mock_db = Mock()
         self.mock_db.is_tiktoken_available.return_value = False  # Force fallback
-        self.token_counter = TokenCounter(self.mock_db)
+        self.token_counter = TokenCounter(self.mock_db, tokenizer=None)
     
     def test_realistic_token_estimates(self):
         """Test token estimation with realistic text."""
@@ -420,6 +432,69 @@ class TestMiddleware(unittest.TestCase):
         self.assertFalse(quota_check['allowed'])
         self.assertEqual(quota_check['reason'], 'Quota exceeded')
     
+    def test_token_quota_middleware_serializes_user_checks(self):
+        """Test a user's rate limit and quota checks run one request at a time."""
+        active = []
+        overlaps = []
+        
+        def check_token_quota(**kwargs):
+            active.append(kwargs['user_id'])
+            overlaps.append(len(active))
+            time.sleep(0.02)
+            active.remove(kwargs['user_id'])
+            return {'allowed': True, 'reason': 'ok', 'remaining_tokens': 100}
+        
+        self.mock_counter.db.check_token_quota.side_effect = check_token_quota
+        rate_limiter = Mock()
+        middleware = TokenQuotaMiddleware(
+            self.mock_app, token_counter=self.mock_counter, rate_limiter=rate_limiter,
+            lock_manager=AsyncLockManager()
+        )
+        
+        def make_request():
+            request = Mock()
+            request.method = 'GET'
+            request.url.path = '/search'
+            request.headers = {'X-User-ID': 'test_user'}
+            return request
+        
+        async def call_next(request):
+            response = Mock()
+            response.status_code = 200
+            response.headers = {}
+            return response
+        
+        async def run():
+            return await asyncio.gather(
+                *(middleware.dispatch(make_request(), call_next) for _ in range(3))
+            )
+        
+        responses = asyncio.run(run())
+        self.assertEqual([response.status_code for response in responses], [200, 200, 200])
+        self.assertEqual(overlaps, [1, 1, 1])
+        self.assertEqual(rate_limiter.enforce_rate_limit.call_count, 3)
+        rate_limiter.enforce_rate_limit.assert_called_with('test_user', '/search')
+    
+    def test_token_quota_middleware_rate_limited(self):
+        """Test a request over its rate limit is rejected before the quota check."""
+        rate_limiter = Mock()
+        rate_limiter.enforce_rate_limit.side_effect = RateLimitExceededError("too many requests")
+        middleware = TokenQuotaMiddleware(
+            self.mock_app, token_counter=self.mock_counter, rate_limiter=rate_limiter,
+            lock_manager=AsyncLockManager()
+        )
+        request = Mock()
+        request.method = 'GET'
+        request.url.path = '/search'
+        request.headers = {'X-User-ID': 'test_user'}
+        call_next = Mock()
+        
+        response = asyncio.run(middleware.dispatch(request, call_next))
+        
+        self.assertEqual(response.status_code, 429)
+        self.mock_counter.db.check_token_quota.assert_not_called()
+        call_next.assert_not_called()
+    
     def test_create_token_middleware(self):
         """Test token middleware creation."""
         middleware = create_token_middleware(
@@ -450,6 +525,54 @@ class TestMiddleware(unittest.TestCase):
         self.assertEqual(usage.method, 'GET')
         self.assertEqual(usage.total_tokens, 15)
         self.assertEqual(usage.model, TokenizationModel.CL100K_BASE)
+    
+    def test_streaming_tally_across_chunks(self):
+        """Test incremental counting matches counting the whole body."""
+        body = ("token counting stream " * 2000).encode('utf-8')
+        tally = StreamingTokenTally(lambda text: len(text.split()), flush_chars=256)
+        
+        for i in range(0, len(body), 13):
+            tally.feed(body[i:i + 13])
+        
+        self.assertEqual(tally.finish(), len(body.decode('utf-8').split()))
+        self.assertEqual(tally.bytes_seen, len(body))
+    
+    def test_streaming_tally_whitespace_sensitive_counts(self):
+        """Test segment boundaries add no tokens when whitespace is counted on its own."""
+        # The cl100k pre-tokenizer split: a space joins the following word and
+        # the rest of a whitespace run is a token of its own
+        def count(text):
+            return len(re.findall(r" ?\S+|\s+(?!\S)|\s+", text))
+        
+        body = ("first line of text\n  indented words follow here " * 500).encode('utf-8')
+        for chunk_size in (7, 13, 64):
+            tally = StreamingTokenTally(count, flush_chars=50)
+            for i in range(0, len(body), chunk_size):
+                tally.feed(body[i:i + chunk_size])
+            
+            self.assertEqual(tally.finish(), count(body.decode('utf-8')), chunk_size)
+    
+    def test_usage_log_queue_writes_in_background(self):
+        """Test queued usage records are written by the background worker."""
+        usage = APITokenUsage(
+            endpoint='/test', method='POST', user_id=None, session_id='s',
+            input_tokens=5, output_tokens=10, total_tokens=15, processing_time=0.1,
+            timestamp=datetime.now(), status_code=200, model=TokenizationModel.CL100K_BASE
+        )
+        log_queue = TokenUsageLogQueue(self.mock_counter)
+        
+        async def run():
+            for _ in range(3):
+                self.assertTrue(log_queue.submit(usage, 'Low'))
+            await log_queue.close()
+        
+        asyncio.run(run())
+        self.assertEqual(self.mock_counter.log_token_usage.call_count, 3)
+        self.mock_counter.log_token_usage.assert_called_with(
+            user_id='anonymous', session_id='s', tokens_used=15,
+            api_endpoint='POST /test', priority_level='Low'
+        )
+        self.assertEqual(log_queue.stats['written'], 3)
 
 
 class TestTokenizationModels(unittest.TestCase):
@@ -478,7 +601,7 @@ class TestErrorHandling(unittest.TestCase):
         """Set up test fixtures."""
         self.mock_db = Mock()
         self.mock_db.is_tiktoken_available.return_value = False
-        self.token_counter = TokenCounter(self.mock_db)
+        self.token_counter = TokenCounter(self.mock_db, tokenizer=None)
     
     def test_database_connection_failure(self):
         """Test handling of database connection failures."""
@@ -524,6 +647,129 @@ class TestErrorHandling(unittest.TestCase):
         self.assertEqual(result, "test")
 
 
+class TestLocalTokenizer(unittest.TestCase):
+    """Test cases for the in-process tokenizer engine."""
+    
+    def setUp(self):
+        """Write a small vocabulary: all single bytes plus merges up to 'hello'."""
+        self.vocab_dir = tempfile.TemporaryDirectory()
+        tokens = [bytes([i]) for i in range(256)] + [b"he", b"ll", b"hell", b"hello"]
+        with open(os.path.join(self.vocab_dir.name, "cl100k_base.tiktoken"), "w") as f:
+            for rank, token in enumerate(tokens):
+                f.write(f"{base64.b64encode(token).decode()} {rank}\n")
+        
+        self.mock_db = Mock()
+        self.mock_db.is_tiktoken_available.return_value = True
+        self.mock_db.get_token_count.return_value = 7
+    
+    def tearDown(self):
+        """Remove the vocabulary directory."""
+        self.vocab_dir.cleanup()
+    
+    def test_bpe_backend_merges(self):
+        """Test byte-pair merges follow vocabulary ranks."""
+        backend = PythonBPEBackend("cl100k_base", vocab_dir=self.vocab_dir.name)
+        
+        self.assertEqual(backend.encode("hello"), [259])
+        self.assertEqual(backend.count("hello world"), 7)
+        self.assertEqual(backend.count_batch(["hello world"] * 20), [7] * 20)
+    
+    def test_missing_vocabulary(self):
+        """Test backend creation fails cleanly without a vocabulary file."""
+        with self.assertRaises(TokenizerUnavailableError):
+            create_tokenizer_backend("r50k_base", backend="bpe", vocab_dir=self.vocab_dir.name)
+    
+    @unittest.skipUnless(TIKTOKEN_AVAILABLE, "tiktoken is not installed")
+    def test_tiktoken_requires_local_vocabulary(self):
+        """Test the tiktoken backend never downloads a missing vocabulary."""
+        with patch("tiktoken.get_encoding") as get_encoding:
+            with self.assertRaises(TokenizerUnavailableError):
+                TiktokenBackend("r50k_base", vocab_dir=self.vocab_dir.name)
+        get_encoding.assert_not_called()
+    
+    def test_counter_uses_local_tokenizer(self):
+        """Test TokenCounter counts locally and skips the database."""
+        counter = TokenCounter(self.mock_db, tokenizer="bpe", vocab_dir=self.vocab_dir.name)
+        
+        result = counter.count_tokens("hello world")
+        batch_result = counter.count_tokens_batch(["hello", "hello hello", "hello"])
+        
+        self.assertEqual(result.method, 'local')
+        self.assertEqual(result.token_count, 7)
+        # " hello" has no merge for the leading space: 1 + 2 tokens
+        self.assertEqual([r.token_count for r in batch_result.results], [1, 3, 1])
+        self.assertEqual(batch_result.cache_misses, 2)
+        self.mock_db.get_token_count.assert_not_called()
+    
+    def test_verification_mode(self):
+        """Test local counts are checked against pg_tiktoken in verification mode."""
+        self.mock_db.get_token_count.return_value = 8
+        counter = TokenCounter(self.mock_db, tokenizer="bpe", vocab_dir=self.vocab_dir.name,
+                               verify_with_pg_tiktoken=True)
+        
+        result = counter.count_tokens("hello world")
+        metrics = counter.get_performance_metrics()
+        
+        self.assertEqual(result.token_count, 7)
+        self.assertEqual(metrics['verification_checks'], 1)
+        self.assertEqual(metrics['verification_mismatches'], 1)
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test cases for the shared LRU cache."""
+    
+    def setUp(self):
+        """Set up a cache with a controllable clock."""
+        self.now = 0.0
+        self.cache = LRUCache(max_entries=2, ttl=10, clock=lambda: self.now)
+    
+    def test_hits_refresh_recency(self):
+        """Test the least recently used entry is evicted, not the oldest inserted."""
+        self.cache['a'] = 1
+        self.cache['b'] = 2
+        self.assertEqual(self.cache.get('a'), 1)
+        self.cache['c'] = 3
+        
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+        self.assertEqual(self.cache.get_metrics()['evictions'], 1)
+    
+    def test_ttl_expiry(self):
+        """Test entries expire after their TTL."""
+        self.cache.set('a', 1)
+        self.cache.set('b', 2, ttl=100)
+        self.now = 11.0
+        
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('b'), 2)
+        metrics = self.cache.get_metrics()
+        self.assertEqual(metrics['expirations'], 1)
+        self.assertEqual((metrics['hits'], metrics['misses']), (1, 1))
+    
+    def test_byte_bound(self):
+        """Test entries are evicted to stay within max_bytes."""
+        cache = LRUCache(max_entries=None, max_bytes=10, sizeof=len)
+        cache['x'] = '12345'
+        cache['y'] = '123456'
+        
+        self.assertEqual(list(cache), ['y'])
+        self.assertEqual(cache.get_metrics()['bytes'], 6)
+    
+    def test_token_counter_cache_is_lru(self):
+        """Test TokenCounter keeps recently used counts when the cache is full."""
+        mock_db = Mock()
+        mock_db.is_tiktoken_available.return_value = False
+        counter = TokenCounter(mock_db, cache_size=2, tokenizer=None)
+        
+        counter.count_tokens("first text")
+        counter.count_tokens("second text")
+        counter.count_tokens("first text")
+        counter.count_tokens("third text")
+        
+        self.assertTrue(counter.count_tokens("first text").cache_hit)
+        self.assertEqual(counter.get_performance_metrics()['cache_evictions'], 1)
+
+
 class TestPerformance(unittest.TestCase):
     """Test performance-related functionality."""
     
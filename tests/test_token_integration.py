@@ -251,7 +251,7 @@ class TestTokenIntegration:
     @pytest.fixture
     def token_counter(self, mock_db):
         """Fixture providing a TokenCounter instance."""
-        return TokenCounter(mock_db)
+        return TokenCounter(mock_db, tokenizer=None)
     
     @pytest.fixture
     def rate_limiter(self, mock_db):
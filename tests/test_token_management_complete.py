@@ -55,7 +55,7 @@ class TestTokenManagementComplete:
     def complete_system_setup(self, mock_db):
         """Fixture that sets up the complete token management system."""
         # Initialize all components
-        token_counter = TokenCounter(mock_db)
+        token_counter = TokenCounter(mock_db, tokenizer=None)
         rate_limiter = RateLimiter(mock_db)
         lock_manager = LockManager()
         
@@ -22,11 +22,26 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from simba.simba.database.postgres import PostgresDB
-from src.token_monitoring import TokenMonitoringSystem, TokenUsageStatus, SystemHealthMetrics, Anomaly
-from src.token_alerting import TokenAlertingSystem, Alert, AlertSeverity, AlertingConfig
+from src.token_monitoring import (
+    TokenMonitoringSystem, TokenUsageStatus, SystemHealthMetrics, MonitoringAlert, AlertSeverity,
+    MonitoringStatus, MonitoringConfig, AnomalyDetectionResult
+)
+from src.token_alerting import TokenAlertingSystem, AlertingConfig
 from src.token_analytics import TokenAnalytics, ReportFormat, UsageTrend, CostAnalysis
 from src.token_dashboard import TokenDashboard, TokenCLI, UsageStatusWidget, SystemHealthWidget
 from src.token_management.token_counter import TokenCounter, TokenizationModel
+from src.token_usage_aggregation import ColumnarResult
+from src.token_usage_anomaly import OnlineAnomalyDetector, get_anomaly_detector
+
+
+def make_token_limit(used, quota=1000):
+    """Token limit row as returned by PostgresDB.get_user_token_limit."""
+    return {
+        'tokens_used_in_period': used,
+        'max_tokens_per_period': quota,
+        'period_start': datetime(2024, 1, 1),
+        'period_interval': '1 day'
+    }
 
 
 class TestTokenMonitoringSystem(unittest.TestCase):
@@ -35,27 +50,23 @@ class TestTokenMonitoringSystem(unittest.TestCase):
     def setUp(self):
         """Set up test fixtures."""
         self.mock_db = MagicMock()
-        self.monitoring = TokenMonitoringSystem(self.mock_db)
-        
-        # Mock database responses
-        self.mock_usage_data = [
-            {
-                'user_id': 'user1',
-                'session_id': 'session1',
-                'tokens_used': 100,
-                'api_endpoint': 'chat/completions',
-                'priority_level': 'Medium',
-                'timestamp': datetime.utcnow()
-            },
-            {
-                'user_id': 'user1',
-                'session_id': 'session2',
-                'tokens_used': 150,
-                'api_endpoint': 'chat/completions',
-                'priority_level': 'High',
-                'timestamp': datetime.utcnow() - timedelta(hours=1)
-            }
-        ]
+        self.detector = OnlineAnomalyDetector()
+        self.monitoring = TokenMonitoringSystem(self.mock_db, anomaly_detector=self.detector)
+        
+        # Rollup totals: 24 hours grouped by user, endpoint and priority, then the last hour
+        self.usage_24h = ColumnarResult({
+            'user_id': ['user1', 'user1', 'user2'],
+            'api_endpoint': ['chat/completions', 'embeddings', 'chat/completions'],
+            'priority_level': ['Medium', 'High', 'Low'],
+            'total_tokens': [1000, 500, 300],
+            'total_requests': [10, 5, 3],
+            'max_tokens': [200, 150, 120]
+        })
+        self.usage_1h = ColumnarResult({
+            'total_tokens': [400],
+            'total_requests': [4],
+            'max_tokens': [150]
+        })
     
     def test_init(self):
         """Test TokenMonitoringSystem initialization."""
@@ -65,80 +76,131 @@ class TestTokenMonitoringSystem(unittest.TestCase):
     
     def test_get_token_usage_status_success(self):
         """Test successful token usage status retrieval."""
-        self.mock_db.get_user_token_usage.return_value = self.mock_usage_data
+        self.mock_db.get_user_token_limit.return_value = make_token_limit(250)
         
         status = self.monitoring.get_token_usage_status('user1')
         
-        self.assertIsNotNone(status)
         self.assertEqual(status.user_id, 'user1')
-        self.assertEqual(status.total_tokens, 250)
-        self.assertEqual(status.total_requests, 2)
-        self.assertEqual(status.average_tokens_per_request, 125.0)
+        self.assertEqual(status.current_usage, 250)
+        self.assertEqual(status.max_quota, 1000)
+        self.assertEqual(status.remaining_tokens, 750)
+        self.assertEqual(status.usage_percentage, 25.0)
+        self.assertEqual(status.period_end, datetime(2024, 1, 2))
     
-    def test_get_token_usage_status_no_data(self):
-        """Test token usage status with no data."""
-        self.mock_db.get_user_token_usage.return_value = []
+    def test_get_token_usage_status_quota_exceeded(self):
+        """Test status of a user over quota."""
+        self.mock_db.get_user_token_limit.return_value = make_token_limit(1200)
         
         status = self.monitoring.get_token_usage_status('user1')
         
-        self.assertIsNotNone(status)
-        self.assertEqual(status.total_tokens, 0)
-        self.assertEqual(status.total_requests, 0)
-        self.assertEqual(status.average_tokens_per_request, 0.0)
+        self.assertEqual(status.status, MonitoringStatus.CRITICAL)
+        self.assertEqual(status.remaining_tokens, -200)
     
-    def test_get_token_usage_status_all_users(self):
-        """Test token usage status for all users."""
-        self.mock_db.get_user_token_usage.return_value = self.mock_usage_data
+    def test_get_token_usage_status_no_limit(self):
+        """Test token usage status for a user without a token limit."""
+        self.mock_db.get_user_token_limit.return_value = None
         
-        status = self.monitoring.get_token_usage_status()
+        status = self.monitoring.get_token_usage_status('user1')
         
-        self.assertIsNotNone(status)
-        self.assertIsNone(status.user_id)
-        self.assertEqual(status.total_tokens, 250)
+        self.assertEqual(status.status, MonitoringStatus.UNKNOWN)
+        self.assertEqual(status.current_usage, 0)
+        self.assertEqual(status.max_quota, 0)
     
-    def test_get_system_health_success(self):
-        """Test successful system health retrieval."""
-        mock_health = {
-            'cpu_usage': 45.5,
-            'memory_usage': 60.2,
-            'disk_usage': 75.0,
-            'error_rate': 1.5,
-            'average_response_time': 0.8,
-            'active_users': 10,
-            'total_requests': 1000
-        }
-        
-        self.mock_db.get_system_health.return_value = mock_health
+    def test_get_token_usage_status_error(self):
+        """Test token usage status when the database fails."""
+        self.mock_db.get_user_token_limit.side_effect = Exception("Database error")
         
-        health = self.monitoring.get_system_health()
+        status = self.monitoring.get_token_usage_status('user1')
         
-        self.assertIsNotNone(health)
-        self.assertEqual(health.cpu_usage, 45.5)
-        self.assertEqual(health.memory_usage, 60.2)
-        self.assertEqual(health.error_rate, 1.5)
+        self.assertEqual(status.status, MonitoringStatus.ERROR)
+        self.assertEqual(status.current_usage, 0)
+    
+    def test_get_system_health_success(self):
+        """Test system health computed from the usage rollups."""
+        self.mock_db.get_user_token_limit.return_value = make_token_limit(100)
+        
+        with patch.object(self.monitoring.rollups, 'totals', side_effect=[self.usage_24h, self.usage_1h]):
+            health = self.monitoring.get_system_health()
+        
+        self.assertEqual(health.total_requests_24h, 18)
+        self.assertEqual(health.requests_last_hour, 4)
+        self.assertEqual(health.avg_tokens_per_request, 100.0)
+        self.assertEqual(health.max_tokens_single_request, 200)
+        self.assertEqual(health.active_users_24h, 2)
+        self.assertEqual(health.active_endpoints, 2)
+        self.assertEqual(health.system_load, 'low')
+        self.assertEqual(health.quota_status, 'normal')
+        # 5 of 18 requests are High priority
+        self.assertEqual(health.error_rate_status, 'high')
     
     def test_get_system_health_no_data(self):
-        """Test system health with no data."""
-        self.mock_db.get_system_health.return_value = None
+        """Test system health with no usage in the last day."""
+        with patch.object(self.monitoring.rollups, 'totals', return_value=ColumnarResult()):
+            health = self.monitoring.get_system_health()
         
-        health = self.monitoring.get_system_health()
+        self.assertEqual(health.total_requests_24h, 0)
+        self.assertEqual(health.active_users_24h, 0)
+        self.assertEqual(health.system_load, 'low')
+    
+    def test_get_system_health_error(self):
+        """Test system health when the rollups cannot be read."""
+        with patch.object(self.monitoring.rollups, 'totals', side_effect=Exception("Database error")):
+            health = self.monitoring.get_system_health()
         
-        self.assertIsNone(health)
+        self.assertEqual(health.system_load, 'error')
+        self.assertEqual(health.quota_status, 'error')
     
     def test_detect_anomalies_success(self):
-        """Test successful anomaly detection."""
-        self.mock_db.get_user_token_usage.return_value = self.mock_usage_data
+        """Test anomalies raised by the online detector are collected."""
+        for tokens in [90, 110] * 10:
+            self.detector.observe('user1', tokens)
+        self.detector.observe('user1', 1000)
         
         anomalies = self.monitoring.detect_anomalies()
         
-        self.assertIsInstance(anomalies, list)
-        # Should detect anomalies based on high usage
-        self.assertTrue(len(anomalies) > 0)
+        self.assertTrue(all(isinstance(a, AnomalyDetectionResult) for a in anomalies))
+        outliers = [a for a in anomalies if a.anomaly_type == 'statistical_outlier']
+        self.assertEqual(len(outliers), 1)
+        self.assertEqual(outliers[0].user_id, 'user1')
+        self.assertEqual(outliers[0].severity, AlertSeverity.HIGH)
+        self.assertEqual(self.monitoring.get_performance_metrics()['anomalies_detected'], len(anomalies))
+        
+        # Anomalies are only reported once
+        self.assertEqual(self.monitoring.detect_anomalies(), [])
+    
+    def test_anomaly_threshold_does_not_retune_shared_detector(self):
+        """Test a monitor with its own threshold gets a detector of its own."""
+        shared = get_anomaly_detector()
+        threshold = shared.threshold
+        
+        monitoring = TokenMonitoringSystem(self.mock_db, MonitoringConfig(anomaly_threshold_multiplier=threshold + 1))
+        
+        self.assertEqual(shared.threshold, threshold)
+        self.assertIsNot(monitoring.anomaly_detector, shared)
+        self.assertEqual(monitoring.anomaly_detector.threshold, threshold + 1)
+        self.assertIs(monitoring.usage_logger._anomaly_detector, monitoring.anomaly_detector)
+        self.assertIs(TokenMonitoringSystem(self.mock_db).anomaly_detector, shared)
+    
+    def test_anomaly_detector_seeded_when_built(self):
+        """Test the detector is seeded from history before any live usage."""
+        detector = OnlineAnomalyDetector()
+        rows = [
+            {'user_id': 'user1', 'tokens_used': tokens, 'timestamp': detector.started_at - timedelta(minutes=30 - i)}
+            for i, tokens in enumerate([90, 110] * 10)
+        ]
+        cursor = self.mock_db.get_connection.return_value.__enter__.return_value.cursor.return_value
+        cursor.__enter__.return_value.__iter__.return_value = iter(rows)
+        
+        monitoring = TokenMonitoringSystem(self.mock_db, anomaly_detector=detector)
+        
+        self.assertTrue(detector.backfilled)
+        self.assertEqual(detector.get_user_stats('user1')['count'], 20)
+        # Live usage is scored against the history
+        detector.observe('user1', 1000)
+        self.assertIn('statistical_outlier', [a.anomaly_type for a in monitoring.detect_anomalies()])
     
     def test_detect_anomalies_no_data(self):
         """Test anomaly detection with no data."""
-        self.mock_db.get_user_token_usage.return_value = []
-        
         anomalies = self.monitoring.detect_anomalies()
         
         self.assertEqual(len(anomalies), 0)
@@ -222,7 +284,7 @@ class TestTokenAlertingSystem(unittest.TestCase):
         self.alerting = TokenAlertingSystem(self.mock_db)
         
         # Mock alert data
-        self.mock_alert = Alert(
+        self.mock_alert = MonitoringAlert(
             alert_id='alert1',
             user_id='user1',
             message='High token usage detected',
@@ -382,28 +444,47 @@ class TestTokenAnalytics(unittest.TestCase):
         self.assertIsInstance(self.analytics.config, dict)
         self.assertIsInstance(self.analytics.metrics, dict)
     
+    def _hourly_rows(self, usage_data):
+        """Usage data as returned by the hourly per-user, per-endpoint aggregation query."""
+        return [
+            {
+                'bucket': record['timestamp'].replace(minute=0, second=0, microsecond=0),
+                'user_id': record['user_id'],
+                'api_endpoint': record['api_endpoint'],
+                'total_tokens': record['tokens_used'],
+                'total_requests': 1,
+                'max_tokens': record['tokens_used']
+            }
+            for record in usage_data
+        ]
+    
     def test_generate_usage_report_success(self):
         """Test successful usage report generation."""
-        self.mock_db.get_user_token_usage.return_value = self.mock_usage_data
+        self.mock_db.fetch_all.return_value = self._hourly_rows(self.mock_usage_data)
         
         report = self.analytics.generate_usage_report('user1', days=7)
         
         self.assertIsNotNone(report)
-        self.assertEqual(report.user_id, 'user1')
-        self.assertEqual(report.total_tokens, 250)
-        self.assertEqual(report.total_requests, 2)
-        self.assertEqual(report.average_tokens_per_request, 125.0)
+        self.assertIn('user1', report.title)
+        self.assertEqual(report.summary['total_tokens'], 250)
+        self.assertEqual(report.summary['total_requests'], 2)
+        self.assertEqual(report.summary['average_tokens_per_request'], 125.0)
+        
+        # Grouping happens in the database, not over raw rows
+        self.mock_db.get_user_token_usage.assert_not_called()
+        query = self.mock_db.fetch_all.call_args[0][0]
+        self.assertIn('GROUP BY bucket, user_id, api_endpoint', query)
     
     def test_generate_usage_report_no_data(self):
         """Test usage report generation with no data."""
-        self.mock_db.get_user_token_usage.return_value = []
+        self.mock_db.fetch_all.return_value = []
         
         report = self.analytics.generate_usage_report('user1', days=7)
         
         self.assertIsNotNone(report)
-        self.assertEqual(report.total_tokens, 0)
-        self.assertEqual(report.total_requests, 0)
-        self.assertEqual(report.average_tokens_per_request, 0.0)
+        self.assertEqual(report.summary['total_tokens'], 0)
+        self.assertEqual(report.summary['total_requests'], 0)
+        self.assertEqual(report.summary['average_tokens_per_request'], 0)
     
     def test_export_metrics_success(self):
         """Test successful metrics export."""
@@ -869,7 +950,17 @@ class TestPerformance(unittest.TestCase):
                 'timestamp': datetime.utcnow() - timedelta(hours=i)
             })
         
-        self.mock_db.get_user_token_usage.return_value = large_dataset
+        self.mock_db.fetch_all.return_value = [
+            {
+                'bucket': record['timestamp'].replace(minute=0, second=0, microsecond=0),
+                'user_id': record['user_id'],
+                'api_endpoint': record['api_endpoint'],
+                'total_tokens': record['tokens_used'],
+                'total_requests': 1,
+                'max_tokens': record['tokens_used']
+            }
+            for record in large_dataset
+        ]
         
         # Measure performance
         start_time = time.time()
@@ -878,7 +969,7 @@ class TestPerformance(unittest.TestCase):
         
         # Should generate report in reasonable time
         self.assertLess(end_time - start_time, 2.0)
-        self.assertEqual(report.total_tokens, sum(record['tokens_used'] for record in large_dataset))
+        self.assertEqual(report.summary['total_tokens'], sum(record['tokens_used'] for record in large_dataset))
 
 
 if __name__ == '__main__':
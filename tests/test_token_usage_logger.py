@@ -10,10 +10,12 @@ import pytest
 import asyncio
 import tempfile
 import os
+import time
 from datetime import datetime, timedelta
 from unittest.mock import Mock, patch, MagicMock, AsyncMock
 from typing import List, Dict, Any, Optional
 import json
+import re
 import uuid
 
 # Import the modules to test
@@ -25,8 +27,20 @@ from src.token_usage_logger import (
 )
 from src.token_usage_batch_processor import (
     TokenUsageBatchProcessor,
-    BatchProcessorConfig
+    BatchProcessorConfig,
+    BatchJob,
+    BatchPriority,
+    BatchCompression
 )
+from src.token_usage_bulk_sink import (
+    TokenUsageCopySink,
+    TokenUsageSpool,
+    default_spool_path,
+    encode_copy_row
+)
+from src.token_usage_dedup import RequestDeduplicator, RotatingBloomFilter
+from src.token_usage_rollups import TokenUsageRollups, floor_time
+from src.token_usage_anomaly import OnlineAnomalyDetector
 from src.token_usage_analytics import (
     TokenUsageAnalytics,
     AnalyticsConfig,
@@ -423,6 +437,466 @@ class TestTokenUsageBatchProcessor(unittest.TestCase):
             mock_cleanup.assert_called_once()
 
 
+class TestTokenUsageBulkSink(unittest.TestCase):
+    """Test suite for the COPY sink and its write-ahead spool."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.spool_path = os.path.join(self.temp_dir.name, "spool.jsonl")
+        self.records = [
+            TokenUsageRecord(
+                user_id=f"user-{i}",
+                session_id=f"session-{i}",
+                tokens_used=i * 10,
+                api_endpoint=f"/endpoint-{i}",
+                priority_level="Medium",
+                timestamp=datetime(2024, 1, 1, 12, 0, i)
+            )
+            for i in range(5)
+        ]
+        
+        # Database whose connections record every COPY payload
+        self.copied = []
+        self.conn = MagicMock()
+        cursor = self.conn.cursor.return_value.__enter__.return_value
+        cursor.copy_expert.side_effect = lambda sql, f: self.copied.append(f.read())
+        self.db = MagicMock(spec=PostgresDB)
+        self.db.get_connection.return_value.__enter__.return_value = self.conn
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.temp_dir.cleanup()
+    
+    def test_encode_copy_row_escapes_text(self):
+        """Test COPY text-format escaping."""
+        record = TokenUsageRecord(
+            user_id="a\\b",
+            session_id=None,
+            tokens_used=3,
+            api_endpoint="/x\ty\nz",
+            priority_level="Low",
+            timestamp=datetime(2024, 1, 1)
+        )
+        self.assertEqual(
+            encode_copy_row(record),
+            "a\\\\b\t\\N\t3\t/x\\ty\\nz\tLow\t2024-01-01T00:00:00\n"
+        )
+    
+    def test_write_batch_chunks_and_acks(self):
+        """Test a batch is written in chunks and removed from the spool."""
+        spool = TokenUsageSpool(self.spool_path)
+        sink = TokenUsageCopySink(self.db, spool=spool, initial_batch_size=2,
+                                  min_batch_size=2, max_batch_size=2)
+        
+        written = sink.write_batch("batch-1", self.records)
+        
+        self.assertEqual(written, 5)
+        self.assertEqual(len(self.copied), 3)
+        self.assertEqual(sum(chunk.count(b"\n") for chunk in self.copied), 5)
+        self.assertEqual(spool.pending(), {})
+        self.assertEqual(sink.get_metrics()['rows_written'], 5)
+    
+    def test_failed_tail_survives_restart(self):
+        """Test uncommitted rows are recovered from the spool by a new instance."""
+        spool = TokenUsageSpool(self.spool_path)
+        sink = TokenUsageCopySink(self.db, spool=spool, initial_batch_size=2,
+                                  min_batch_size=2, max_batch_size=2)
+        cursor = self.conn.cursor.return_value.__enter__.return_value
+        cursor.copy_expert.side_effect = [None, Exception("connection lost")]
+        
+        written = sink.write_batch("batch-1", self.records)
+        
+        self.assertEqual(written, 2)
+        self.conn.rollback.assert_called_once()
+        recovered = TokenUsageSpool(self.spool_path).pending()
+        self.assertEqual(list(recovered), ["batch-1"])
+        self.assertEqual([r.user_id for r in recovered["batch-1"]], ["user-2", "user-3", "user-4"])
+        self.assertEqual(recovered["batch-1"][0].timestamp, self.records[2].timestamp)
+    
+    def test_partial_failure_rewrites_remaining_rows(self):
+        """Test a partial write leaves one spool entry holding only the uncommitted rows."""
+        spool = TokenUsageSpool(self.spool_path)
+        sink = TokenUsageCopySink(self.db, spool=spool, initial_batch_size=2,
+                                  min_batch_size=2, max_batch_size=2)
+        cursor = self.conn.cursor.return_value.__enter__.return_value
+        cursor.copy_expert.side_effect = [None, Exception("connection lost")]
+        
+        sink.write_batch("batch-1", self.records)
+        
+        with open(self.spool_path, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual(len(entries), 1)
+        self.assertEqual([r["user_id"] for r in entries[0]["records"]], ["user-2", "user-3", "user-4"])
+        self.assertFalse(os.path.exists(f"{self.spool_path}.tmp"))
+    
+    def test_orphaned_spool_adopted(self):
+        """Test a new instance takes over the spool of one that is gone."""
+        orphan = TokenUsageSpool(default_spool_path(self.temp_dir.name, "old"))
+        orphan.append("batch-1", self.records[:2])
+        orphan.close()
+        
+        spool = TokenUsageSpool(default_spool_path(self.temp_dir.name, "new"))
+        live = TokenUsageSpool(default_spool_path(self.temp_dir.name, "live"))
+        live.append("batch-2", self.records[2:])
+        
+        self.assertEqual(spool.adopt_orphans(self.temp_dir.name), 1)
+        self.assertEqual([r.user_id for r in spool.pending()["batch-1"]], ["user-0", "user-1"])
+        self.assertFalse(os.path.exists(orphan.path))
+        # A spool still owned by a live instance is left alone
+        self.assertEqual(list(live.pending()), ["batch-2"])
+        self.assertTrue(os.path.exists(live.path))
+    
+    def _wait_for(self, condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return condition()
+    
+    def test_failed_batch_retried_after_backoff(self):
+        """Test a failed batch is held back for its backoff before being written again."""
+        config = BatchProcessorConfig(data_dir=self.temp_dir.name, retry_backoff_base=0.3,
+                                      enable_deduplication=False, enable_anomaly_detection=False)
+        processor = TokenUsageBatchProcessor(self.db, config)
+        self.addCleanup(processor.shutdown)
+        self.assertTrue(processor._sink.spool.path.startswith(
+            os.path.join(self.temp_dir.name, f"token_usage_spool_{os.getpid()}_")))
+        attempts = []
+        
+        def write_batch(batch_id, records):
+            attempts.append(time.monotonic())
+            return 0 if len(attempts) == 1 else len(records)
+        
+        processor._sink.write_batch = write_batch
+        processor._queues[BatchPriority.HIGH].put(BatchJob(
+            batch_id="batch-1", records=self.records, priority=BatchPriority.HIGH,
+            compression=BatchCompression.NONE, created_at=datetime.utcnow()
+        ))
+        
+        self.assertTrue(self._wait_for(lambda: len(attempts) == 2))
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.3)
+    
+    def test_spooled_batches_redriven_periodically(self):
+        """Test batches left in the spool while running are written by the periodic redrive."""
+        config = BatchProcessorConfig(data_dir=self.temp_dir.name, spool_redrive_interval=0.1,
+                                      enable_deduplication=False, enable_anomaly_detection=False)
+        processor = TokenUsageBatchProcessor(self.db, config)
+        self.addCleanup(processor.shutdown)
+        
+        processor._sink.spool.append("batch-1", self.records)
+        
+        self.assertTrue(self._wait_for(lambda: processor._sink.spool.pending() == {}))
+        self.assertEqual(sum(chunk.count(b"\n") for chunk in self.copied), 5)
+
+
+class TestRequestDeduplicator(unittest.TestCase):
+    """Test suite for time-windowed request_id deduplication."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.now = 0.0
+        self.clock = lambda: self.now
+    
+    def test_retry_is_duplicate(self):
+        """Test a repeated request_id is reported once as new."""
+        dedup = RequestDeduplicator(window_seconds=60, expected_requests=1000, clock=self.clock)
+        
+        self.assertFalse(dedup.check_and_add("req-1"))
+        self.assertTrue(dedup.check_and_add("req-1"))
+        self.assertFalse(dedup.check_and_add("req-2"))
+        self.assertFalse(dedup.check_and_add(None))
+        self.assertFalse(dedup.check_and_add(None))
+        
+        metrics = dedup.get_metrics()
+        self.assertEqual(metrics['duplicates'], 1)
+        self.assertEqual(metrics['exact_hits'], 1)
+    
+    def test_bloom_catches_ids_evicted_from_lru(self):
+        """Test ids that aged out of the exact LRU are still caught by the filter."""
+        dedup = RequestDeduplicator(window_seconds=60, expected_requests=1000,
+                                    exact_entries=10, clock=self.clock)
+        for i in range(100):
+            dedup.check_and_add(f"req-{i}")
+        
+        self.assertTrue(dedup.check_and_add("req-0"))
+        self.assertEqual(dedup.get_metrics()['bloom_hits'], 1)
+        
+        strict = RequestDeduplicator(window_seconds=60, expected_requests=1000,
+                                     exact_entries=10, trust_bloom=False, clock=self.clock)
+        for i in range(100):
+            strict.check_and_add(f"req-{i}")
+        self.assertFalse(strict.check_and_add("req-0"))
+    
+    def test_window_expiry(self):
+        """Test request_ids are forgotten after the window and memory stays fixed."""
+        dedup = RequestDeduplicator(window_seconds=60, expected_requests=1000, clock=self.clock)
+        dedup.check_and_add("req-1")
+        memory = dedup.get_metrics()['bloom']['memory_bytes']
+        
+        self.now = 59.0
+        self.assertTrue(dedup.check_and_add("req-1"))
+        
+        self.now = 200.0
+        self.assertFalse(dedup.check_and_add("req-1"))
+        self.assertEqual(dedup.get_metrics()['bloom']['memory_bytes'], memory)
+    
+    def test_bloom_false_positive_rate(self):
+        """Test the filter stays near its target error rate at capacity."""
+        bloom = RotatingBloomFilter(capacity=5000, error_rate=0.01, clock=self.clock)
+        for i in range(5000):
+            bloom.add(f"seen-{i}")
+        
+        self.assertTrue(all(f"seen-{i}" in bloom for i in range(5000)))
+        false_positives = sum(1 for i in range(5000) if f"unseen-{i}" in bloom)
+        self.assertLess(false_positives / 5000, 0.03)
+
+
+class TestOnlineAnomalyDetector(unittest.TestCase):
+    """Test suite for streaming per-user anomaly detection."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.now = 0.0
+        self.detector = OnlineAnomalyDetector(window_seconds=3600, clock=lambda: self.now)
+    
+    def test_outlier_flagged_against_running_statistics(self):
+        """Test a value far from the user's running mean is flagged."""
+        for tokens in [100, 110, 90, 105, 95, 100, 102, 98]:
+            self.assertEqual(self.detector.observe("user-1", tokens), [])
+        
+        anomalies = self.detector.observe("user-1", 1000)
+        
+        self.assertEqual([a.anomaly_type for a in anomalies], ["statistical_outlier"])
+        self.assertGreater(anomalies[0].score, 3.0)
+        self.assertAlmostEqual(anomalies[0].metrics['mean_usage'], 100.0)
+        # Other users have their own statistics
+        self.assertEqual(self.detector.observe("user-2", 1000), [])
+        self.assertEqual(len(self.detector.drain()), 1)
+        self.assertEqual(self.detector.drain(), [])
+    
+    def test_spike_reported_once(self):
+        """Test a sustained increase is reported when it starts, not on every request."""
+        for _ in range(5):
+            self.detector.observe("user-1", 100)
+        for _ in range(5):
+            self.detector.observe("user-1", 300)
+        for _ in range(3):
+            self.detector.observe("user-1", 300)
+        
+        spikes = [a for a in self.detector.drain() if a.anomaly_type == "usage_spike"]
+        self.assertEqual(len(spikes), 1)
+        self.assertEqual(spikes[0].metrics['earlier_avg'], 100)
+        self.assertEqual(spikes[0].metrics['recent_avg'], 300)
+    
+    def test_backfill_skips_rows_observed_live(self):
+        """Test backfill only replays rows logged before the detector started."""
+        start = self.detector.started_at
+        rows = [
+            {'user_id': 'user-1', 'tokens_used': 100, 'timestamp': start - timedelta(minutes=10 - i)}
+            for i in range(5)
+        ]
+        rows.append({'user_id': 'user-1', 'tokens_used': 100, 'timestamp': start + timedelta(seconds=1)})
+        
+        self.assertEqual(self.detector.backfill(rows), 5)
+        self.assertEqual(self.detector.get_user_stats("user-1")['count'], 5)
+        self.assertEqual(self.detector.get_metrics()['backfilled_events'], 5)
+        self.assertTrue(self.detector.backfilled)
+    
+    def test_backfill_after_live_observes_keeps_order(self):
+        """Test history arriving after live usage does not replace live statistics."""
+        for tokens in [100, 110, 90, 105, 95, 100]:
+            self.detector.observe("user-1", tokens)
+        live_stats = self.detector.get_user_stats("user-1")
+        start = self.detector.started_at
+        rows = [
+            {'user_id': user_id, 'tokens_used': 5000, 'timestamp': start - timedelta(minutes=10 - i)}
+            for i, user_id in enumerate(["user-1", "user-1", "user-2", "user-2"])
+        ]
+        
+        self.assertEqual(self.detector.backfill(rows), 2)
+        
+        self.assertEqual(self.detector.get_user_stats("user-1"), live_stats)
+        self.assertEqual(self.detector.get_user_stats("user-2")['count'], 2)
+        self.assertEqual(self.detector.get_metrics()['events'], 8)
+        # Old rows are not scored against the live mean
+        self.assertEqual(self.detector.drain(), [])
+    
+    def test_idle_users_forgotten(self):
+        """Test a user's statistics expire after the window."""
+        self.detector.observe("user-1", 100)
+        self.now = 3601.0
+        
+        self.assertIsNone(self.detector.get_user_stats("user-1"))
+
+
+class InMemoryRollupDB:
+    """Just enough of PostgresDB to run TokenUsageRollups refreshes and reads on Python lists."""
+    
+    def __init__(self, rows):
+        self.rows = rows  # (timestamp, user_id, tokens_used)
+        self.tables = {'minute': [], 'hour': [], 'day': []}  # (bucket, user_id, tokens_used, requests, max_tokens)
+        self.state = {}
+    
+    def execute_query(self, query, params=None):
+        pass
+    
+    def fetch_one(self, query, params=None):
+        return {'first_seen': min((row[0] for row in self.rows), default=None)}
+    
+    def fetch_all(self, query, params=None):
+        if 'token_usage_rollup_state' in query:
+            return [{'granularity': g, 'watermark': w} for g, w in self.state.items()]
+        start, end = params
+        granularity = re.search(r"FROM token_usage_rollup_(\w+)", query)
+        if granularity:
+            rows = [(r[0], r[2], r[3], r[4]) for r in self.tables[granularity.group(1)]]
+        else:
+            rows = [(r[0], r[2], 1, r[2]) for r in self.rows]
+        rows = [r for r in rows if start <= r[0] < end]
+        return [{'total_tokens': sum(r[1] for r in rows), 'total_requests': sum(r[2] for r in rows),
+                 'max_tokens': max((r[3] for r in rows), default=None)}]
+    
+    def _execute(self, query, params):
+        if query.startswith('DELETE'):
+            table = self.tables[re.search(r"token_usage_rollup_(\w+)", query).group(1)]
+            table[:] = [r for r in table if not params[0] <= r[0] < params[1]]
+        elif 'token_usage_rollup_state' in query:
+            self.state[params[0]] = params[1]
+        else:
+            target, source = re.findall(r"(?:INTO|FROM) token_usage(?:_rollup_(\w+))?", query)[:2]
+            start, end = params
+            if source:
+                rows = [r for r in self.tables[source] if start <= r[0] < end]
+            else:
+                rows = [(r[0], r[1], r[2], 1, r[2]) for r in self.rows if start <= r[0] < end]
+            groups = {}
+            for bucket, user_id, tokens, requests, max_tokens in rows:
+                key = (floor_time(bucket, target), user_id)
+                totals = groups.setdefault(key, [0, 0, 0])
+                totals[0] += tokens
+                totals[1] += requests
+                totals[2] = max(totals[2], max_tokens)
+            self.tables[target].extend(key + tuple(totals) for key, totals in groups.items())
+    
+    def get_connection(self):
+        conn = MagicMock()
+        conn.__enter__.return_value = conn
+        conn.cursor.return_value.__enter__.return_value.execute.side_effect = (
+            lambda query, params=None: self._execute(query.strip(), params))
+        return conn
+
+
+class TestTokenUsageRollups(unittest.TestCase):
+    """Test suite for minute/hour/day usage rollups."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.mock_db = MagicMock(spec=PostgresDB)
+        self.rollups = TokenUsageRollups(self.mock_db)
+        self.watermarks = {
+            'day': datetime(2026, 10, 18),
+            'hour': datetime(2026, 10, 18, 10),
+            'minute': datetime(2026, 10, 18, 10, 37)
+        }
+    
+    def test_plan_uses_coarsest_rollups_and_raw_tail(self):
+        """Test a range is split into day, hour and minute rollups plus the raw tail."""
+        plan = self.rollups._plan(datetime(2026, 10, 16, 13, 30), datetime(2026, 10, 18, 10, 45),
+                                  self.watermarks, ('day', 'hour', 'minute'))
+        
+        self.assertEqual(plan, [
+            ('minute', datetime(2026, 10, 16, 13, 30), datetime(2026, 10, 16, 14)),
+            ('hour', datetime(2026, 10, 16, 14), datetime(2026, 10, 17)),
+            ('day', datetime(2026, 10, 17), datetime(2026, 10, 18)),
+            ('hour', datetime(2026, 10, 18), datetime(2026, 10, 18, 10)),
+            ('minute', datetime(2026, 10, 18, 10), datetime(2026, 10, 18, 10, 37)),
+            (None, datetime(2026, 10, 18, 10, 37), datetime(2026, 10, 18, 10, 45)),
+        ])
+        
+        # Without rollups everything is read from raw rows
+        start, end = datetime(2026, 10, 16), datetime(2026, 10, 18)
+        self.assertEqual(self.rollups._plan(start, end, {}, ('day', 'hour', 'minute')), [(None, start, end)])
+    
+    def test_totals_merge_segments(self):
+        """Test totals add up across rollup and raw segments."""
+        def fetch_all(query, params=None):
+            if 'token_usage_rollup_state' in query:
+                return [{'granularity': g, 'watermark': w} for g, w in self.watermarks.items()]
+            if 'token_usage_rollup_' in query:
+                return [{'user_id': 'user-1', 'total_tokens': 1000, 'total_requests': 10, 'max_tokens': 300}]
+            return [
+                {'user_id': 'user-1', 'total_tokens': 50, 'total_requests': 1, 'max_tokens': 500},
+                {'user_id': 'user-2', 'total_tokens': 20, 'total_requests': 2, 'max_tokens': 15}
+            ]
+        self.mock_db.fetch_all.side_effect = fetch_all
+        
+        totals = self.rollups.totals(start_date=datetime(2026, 10, 17), end_date=datetime(2026, 10, 18, 10, 45),
+                                     group_by=('user_id',))
+        
+        # One day, one hour and one minute segment plus the raw tail
+        self.assertEqual(list(totals.rows()), [
+            {'user_id': 'user-1', 'total_tokens': 3050, 'total_requests': 31, 'max_tokens': 500},
+            {'user_id': 'user-2', 'total_tokens': 20, 'total_requests': 2, 'max_tokens': 15}
+        ])
+        metrics = self.rollups.get_metrics()
+        self.assertEqual(metrics['rollup_segments_read'], 3)
+        self.assertEqual(metrics['raw_segments_read'], 1)
+        
+        with self.assertRaises(ValueError):
+            self.rollups.totals(group_by=('session_id',))
+    
+    def test_refresh_backfills_and_advances_watermarks(self):
+        """Test the first refresh rolls up from the first raw row to now minus lateness."""
+        self.mock_db.fetch_all.return_value = []
+        self.mock_db.fetch_one.return_value = {'first_seen': datetime(2026, 10, 18, 9, 12, 30)}
+        conn = self.mock_db.get_connection.return_value.__enter__.return_value
+        cursor = conn.cursor.return_value.__enter__.return_value
+        
+        watermarks = self.rollups.refresh(now=datetime(2026, 10, 18, 10, 42, 10))
+        
+        self.assertEqual(watermarks['minute'], datetime(2026, 10, 18, 10, 37))
+        self.assertEqual(watermarks['hour'], datetime(2026, 10, 18, 10))
+        # No whole day since the first row yet
+        self.assertNotIn('day', watermarks)
+        
+        deletes = [c.args[1] for c in cursor.execute.call_args_list if c.args[0].startswith('DELETE')]
+        self.assertEqual(deletes[0], (datetime(2026, 10, 18, 9, 12), datetime(2026, 10, 18, 10, 37)))
+        self.assertTrue(conn.commit.called)
+        self.assertEqual(self.rollups.get_metrics()['refreshes'], 1)
+        
+        # Raw rows are bucketed in UTC whatever the session TimeZone
+        insert = next(c.args[0] for c in cursor.execute.call_args_list if 'FROM token_usage\n' in c.args[0])
+        self.assertIn("date_trunc('minute', (timestamp AT TIME ZONE 'UTC'))", insert)
+        self.assertIn("timestamp >= (%s::timestamp AT TIME ZONE 'UTC')", insert)
+    
+    def test_schema_keys_match_token_usage(self):
+        """Test rollup key columns are TEXT like the token_usage columns, including existing tables."""
+        self.rollups.ensure_schema()
+        
+        ddl = [c.args[0] for c in self.mock_db.execute_query.call_args_list]
+        self.assertFalse(any('VARCHAR(255)' in query for query in ddl))
+        self.assertEqual(sum('ALTER COLUMN api_endpoint TYPE TEXT' in query for query in ddl), 3)
+    
+    def test_first_refresh_backfills_every_level(self):
+        """Test history of several days is rolled up at hour and day level, not only minutes."""
+        first = datetime(2026, 10, 14, 22, 17)
+        db = InMemoryRollupDB([(first + timedelta(minutes=13 * i), f'user-{i % 3}', 10 + i % 7) for i in range(350)])
+        rollups = TokenUsageRollups(db)
+        start, end = datetime(2026, 10, 14), datetime(2026, 10, 18, 10, 40)
+        
+        before = rollups.totals(start_date=start, end_date=end)
+        watermarks = rollups.refresh(now=datetime(2026, 10, 18, 10, 42, 10))
+        after = rollups.totals(start_date=start, end_date=end)
+        
+        self.assertEqual(watermarks['day'], datetime(2026, 10, 18))
+        self.assertEqual(min(row[0] for row in db.tables['day']), datetime(2026, 10, 14))
+        self.assertEqual(min(row[0] for row in db.tables['hour']), datetime(2026, 10, 14, 22))
+        self.assertEqual(list(after.rows()), list(before.rows()))
+        self.assertEqual(after['total_requests'], [350])
+        # Whole days come from the day rollup after the refresh
+        self.assertEqual(rollups.get_metrics()['raw_segments_read'], 2)
+
+
 class TestTokenUsageAnalytics(unittest.TestCase):
     """Test suite for TokenUsageAnalytics class."""
     
@@ -437,7 +911,8 @@ class TestTokenUsageAnalytics(unittest.TestCase):
             enable_anomaly_detection=True,
             enable_forecasting=False,
             cache_results=True,
-            cache_ttl=3600
+            cache_ttl=3600,
+            approximate_distinct=False
         )
         self.analytics = TokenUsageAnalytics(self.db, self.config)
         
@@ -454,6 +929,48 @@ class TestTokenUsageAnalytics(unittest.TestCase):
             }
             for i in range(10)
         ]
+        
+        # The same data as returned by the daily bucket query
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.sample_buckets = [
+            {
+                'bucket': today - timedelta(days=9 - i),
+                'total_tokens': (9 - i) * 10,
+                'total_requests': 1,
+                'unique_users': 1,
+                'unique_sessions': 1,
+                'unique_endpoints': 1
+            }
+            for i in range(10)
+        ]
+        
+        # The same data as returned by the summary query
+        self.sample_stats = {
+            'total_tokens': sum(i * 10 for i in range(10)),
+            'total_requests': 10,
+            'min_tokens': 0,
+            'max_tokens': 90,
+            'avg_tokens': 45.0,
+            'median_tokens': 45.0,
+            'stddev_tokens': 30.28,
+            'unique_users': 3,
+            'unique_sessions': 10,
+            'unique_endpoints': 2,
+            'first_seen': self.sample_records[-1]['timestamp'],
+            'last_seen': self.sample_records[0]['timestamp']
+        }
+    
+    def _mock_summary_queries(self):
+        """Mock the summary query and the top users, endpoints and priorities queries."""
+        self.db.fetch_one.return_value = self.sample_stats
+        self.db.fetch_all.side_effect = [
+            [{'key': 'user-0', 'tokens': 180, 'requests': 4},
+             {'key': 'user-2', 'tokens': 150, 'requests': 3},
+             {'key': 'user-1', 'tokens': 120, 'requests': 3}],
+            [{'key': '/endpoint-1', 'tokens': 250, 'requests': 5},
+             {'key': '/endpoint-0', 'tokens': 200, 'requests': 5}],
+            [{'key': 'Medium', 'tokens': 450, 'requests': 10}]
+        ]
     
     def test_analytics_initialization(self):
         """Test analytics initialization."""
@@ -464,7 +981,7 @@ class TestTokenUsageAnalytics(unittest.TestCase):
     def test_get_token_usage_history(self):
         """Test retrieving token usage history."""
         # Mock database method
-        self.db.fetch_all.return_value = self.sample_records
+        self.db.fetch_all.return_value = self.sample_buckets
         
         # Test retrieval
         results = self.analytics.get_token_usage_history(
@@ -474,12 +991,20 @@ class TestTokenUsageAnalytics(unittest.TestCase):
         )
         
         self.assertEqual(len(results), 10)
+        self.assertEqual(results[-1]['total_tokens'], 0)
+        self.assertNotIn('records', results[0])
         self.db.fetch_all.assert_called_once()
+        
+        # Bucketing and grouping happen in the database
+        query, params = self.db.fetch_all.call_args[0]
+        self.assertIn('date_trunc(%s, timestamp)', query)
+        self.assertIn('GROUP BY bucket', query)
+        self.assertIn('COUNT(DISTINCT user_id)', query)
+        self.assertEqual(params[:2], ['day', 'user-1'])
     
     def test_get_token_usage_summary(self):
         """Test retrieving token usage summary."""
-        # Mock database method
-        self.db.fetch_all.return_value = self.sample_records
+        self._mock_summary_queries()
         
         # Test summary retrieval
         summary = self.analytics.get_token_usage_summary(
@@ -493,11 +1018,13 @@ class TestTokenUsageAnalytics(unittest.TestCase):
         self.assertEqual(summary.total_requests, 10)
         self.assertEqual(summary.unique_users, 3)
         self.assertEqual(summary.unique_endpoints, 2)
+        self.assertEqual(summary.top_users[0], {'user_id': 'user-0', 'tokens': 180})
+        self.assertEqual(summary.priority_distribution, {'Medium': 10})
     
     def test_get_trend_analysis(self):
         """Test trend analysis."""
         # Mock database method
-        self.db.fetch_all.return_value = self.sample_records
+        self.db.fetch_all.return_value = self.sample_buckets
         
         # Test trend analysis
         trend = self.analytics.get_trend_analysis(
@@ -511,10 +1038,19 @@ class TestTokenUsageAnalytics(unittest.TestCase):
         self.assertGreaterEqual(trend.trend_strength, 0.0)
         self.assertLessEqual(trend.trend_strength, 1.0)
     
+    def _mock_stream(self):
+        """Mock a server-side cursor that yields the sample records."""
+        cursor = MagicMock()
+        cursor.__iter__.side_effect = lambda: iter(self.sample_records)
+        conn = MagicMock()
+        conn.cursor.return_value.__enter__.return_value = cursor
+        self.db.get_connection = MagicMock()
+        self.db.get_connection.return_value.__enter__.return_value = conn
+        return conn
+    
     def test_export_token_usage_logs(self):
         """Test exporting token usage logs."""
-        # Mock database method
-        self.db.fetch_all.return_value = self.sample_records
+        conn = self._mock_stream()
         
         # Test JSON export
         json_export = self.analytics.export_token_usage_logs(
@@ -524,6 +1060,10 @@ class TestTokenUsageAnalytics(unittest.TestCase):
         self.assertIsInstance(json_export, str)
         self.assertTrue(json_export.startswith('['))
         self.assertTrue(json_export.endswith(']'))
+        self.assertEqual(len(json.loads(json_export)), 10)
+        
+        # Rows come from a named (server-side) cursor
+        self.assertIn('name', conn.cursor.call_args[1])
         
         # Test CSV export
         csv_export = self.analytics.export_token_usage_logs(
@@ -533,6 +1073,17 @@ class TestTokenUsageAnalytics(unittest.TestCase):
         self.assertIsInstance(csv_export, str)
         self.assertIn('user_id', csv_export)
         self.assertIn('tokens_used', csv_export)
+        self.assertEqual(len(csv_export.strip().splitlines()), 11)
+    
+    def test_stream_token_usage_logs_compressed(self):
+        """Test streaming a gzip-compressed export."""
+        import gzip
+        self._mock_stream()
+        
+        chunks = list(self.analytics.stream_token_usage_logs(format=ExportFormat.CSV, compression=True))
+        
+        self.assertTrue(all(isinstance(chunk, bytes) for chunk in chunks))
+        self.assertIn('session-9', gzip.decompress(b''.join(chunks)).decode('utf-8'))
     
     def test_cleanup_old_logs(self):
         """Test cleanup of old logs."""
@@ -549,8 +1100,7 @@ class TestTokenUsageAnalytics(unittest.TestCase):
     
     def test_cache_functionality(self):
         """Test caching functionality."""
-        # Mock database method
-        self.db.fetch_all.return_value = self.sample_records
+        self._mock_summary_queries()
         
         # First call should hit database
         summary1 = self.analytics.get_token_usage_summary()
@@ -561,8 +1111,8 @@ class TestTokenUsageAnalytics(unittest.TestCase):
         # Should be same result
         self.assertEqual(summary1.total_tokens, summary2.total_tokens)
         
-        # Database should only be called once
-        self.assertEqual(self.db.fetch_all.call_count, 1)
+        # Database should only be queried once
+        self.assertEqual(self.db.fetch_one.call_count, 1)
     
     def test_clear_cache(self):
         """Test clearing cache."""